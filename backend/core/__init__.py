@@ -7,6 +7,9 @@ must re-export every name from every submodule.
 Submodules:
   - imports.py:   All third-party and stdlib imports
   - database.py:  MongoDB connection, JWT secrets, cookie config
+  - cache.py:     In-process TTL caches (principal, module config, billing state) with hit/miss counters
+  - middleware.py: Pure ASGI request middleware (request_id, security headers, request guard)
+  - rate_limit.py: Sliding-window login limiter (in-memory / MongoDB backends)
   - security.py:  Rate limiting, sanitization, middleware, exception handlers, health endpoints
   - enums.py:     All enums (RoleEnum, AuditEventType, etc.)
   - models.py:    All Pydantic models
@@ -16,6 +19,9 @@ Submodules:
 # Re-export everything from submodules (order matters for dependencies)
 from .imports import *
 from .database import *
+from .cache import *
+from .middleware import *
+from .rate_limit import *
 from .enums import *
 from .models import *
 from .security import *
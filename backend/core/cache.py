@@ -0,0 +1,182 @@
+"""GENTURIX Core — In-Process Caches (Principal, Module Config, Billing State)
+
+Small bounded TTL caches that keep hot-path lookups off MongoDB.
+
+IMPORTANT: caches are per-process. Every uvicorn worker holds its own copy,
+so writers in this process invalidate explicitly and the TTL bounds how long
+another worker can serve a stale entry.
+
+This module only depends on the stdlib so it can be imported from anywhere
+(including modules/ that are loaded while core/ is still initializing).
+"""
+import os
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Bounded in-memory cache with per-entry TTL and LRU eviction.
+
+    - get() returns None on miss or expiry
+    - set() evicts the least recently used entry when full
+    - hit/miss/eviction/invalidation counters are exposed via stats()
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl_seconds: float):
+        self.name = name
+        self.maxsize = max(1, int(maxsize))
+        self.ttl_seconds = float(ttl_seconds)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Like get() but does not touch LRU order or hit/miss counters."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= monotonic():
+            return None
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        self._entries[key] = (monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# ==================== PRINCIPAL CACHE ====================
+# Caches the projected user document used by get_current_user().
+# Value: (user_dict, status_changed_ts, password_changed_ts) with timestamps
+# pre-parsed to POSIX floats (or None).
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.environ.get("PRINCIPAL_CACHE_TTL_SECONDS", 30))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.environ.get("PRINCIPAL_CACHE_MAX_ENTRIES", 5000))
+
+principal_cache = TTLCache(
+    "principal",
+    maxsize=PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_principal(user_id: Optional[str]) -> None:
+    """Drop a user's cached principal. Call after changing status, roles, password or condominium."""
+    if user_id:
+        principal_cache.invalidate(user_id)
+
+
+def invalidate_all_principals() -> None:
+    """Drop every cached principal. Use after bulk user updates/deletes."""
+    principal_cache.clear()
+
+
+# ==================== MODULE CONFIG CACHE ====================
+# Caches condominium.modules for require_module / require_role_and_module.
+# Value: the raw modules dict ({} when the condominium has none configured).
+MODULE_CACHE_TTL_SECONDS = float(os.environ.get("MODULE_CACHE_TTL_SECONDS", 60))
+MODULE_CACHE_MAX_ENTRIES = int(os.environ.get("MODULE_CACHE_MAX_ENTRIES", 2000))
+
+module_config_cache = TTLCache(
+    "module_config",
+    maxsize=MODULE_CACHE_MAX_ENTRIES,
+    ttl_seconds=MODULE_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_module_config(condominium_id: Optional[str]) -> None:
+    """Drop a condominium's cached module flags. Call after any write to condominium.modules."""
+    if condominium_id:
+        module_config_cache.invalidate(condominium_id)
+
+
+# ==================== BILLING STATE CACHE ====================
+# Caches the tenant billing state read by billing_block_guard.
+# Value: {"billing_status": str, "is_demo": bool} where is_demo already folds
+# in environment == "demo".
+BILLING_CACHE_TTL_SECONDS = float(os.environ.get("BILLING_CACHE_TTL_SECONDS", 60))
+BILLING_CACHE_MAX_ENTRIES = int(os.environ.get("BILLING_CACHE_MAX_ENTRIES", 2000))
+
+billing_state_cache = TTLCache(
+    "billing_state",
+    maxsize=BILLING_CACHE_MAX_ENTRIES,
+    ttl_seconds=BILLING_CACHE_TTL_SECONDS,
+)
+
+
+def refresh_billing_state(
+    condominium_id: Optional[str],
+    billing_status: str,
+    is_demo: Optional[bool] = None,
+) -> None:
+    """
+    Record a billing_status write for a condominium.
+
+    If is_demo is not given, the cached demo flag is kept; when there is no
+    cached entry to take it from, the entry is dropped and reloaded on next use.
+    """
+    if not condominium_id:
+        return
+    if is_demo is None:
+        current = billing_state_cache.peek(condominium_id)
+        if current is None:
+            billing_state_cache.invalidate(condominium_id)
+            return
+        is_demo = current["is_demo"]
+    billing_state_cache.set(condominium_id, {"billing_status": billing_status, "is_demo": bool(is_demo)})
+
+
+def invalidate_billing_state(condominium_id: Optional[str]) -> None:
+    """Drop a condominium's cached billing state. Call after changing is_demo/environment or deleting it."""
+    if condominium_id:
+        billing_state_cache.invalidate(condominium_id)
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Counters for all in-process caches (monitoring)."""
+    return {
+        "principal": principal_cache.stats(),
+        "module_config": module_config_cache.stats(),
+        "billing_state": billing_state_cache.stats(),
+    }
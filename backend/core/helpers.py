@@ -1,19 +1,24 @@
 """GENTURIX Core — Helper Functions (Auth, Push, Billing, Audit)"""
 from .imports import *
 from .database import *
+from .cache import *
 from .security import *
 from .enums import *
 from .models import *
 
 # ==================== HELPER FUNCTIONS ====================
+# bcrypt cost factor for new hashes. Existing hashes with a different cost are
+# transparently re-hashed on the next successful login.
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+
 def hash_password(password: str) -> str:
-    """Hash password using bcrypt directly"""
+    """Hash password using bcrypt directly (BLOCKING - prefer hash_password_async in handlers)"""
     password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     return bcrypt.hashpw(password_bytes, salt).decode('utf-8')
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password against hash using bcrypt directly"""
+    """Verify password against hash using bcrypt directly (BLOCKING - prefer verify_password_async in handlers)"""
     if not hashed_password:
         return False
     try:
@@ -23,6 +28,130 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     except Exception:
         return False
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True if the hash was created with a cost factor other than BCRYPT_ROUNDS"""
+    try:
+        # Format: $2b$<cost>$<salt+hash>
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (AttributeError, IndexError, ValueError):
+        return False
+
+# ==================== PASSWORD HASHING SERVICE ====================
+# bcrypt takes ~200ms per call at cost 12. Running it inline in an async handler
+# freezes the event loop (panic alerts, check-ins) for that whole time, so all
+# handlers hash/verify through a dedicated, size-limited thread pool instead.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 64))
+
+class PasswordHashingService:
+    """
+    Runs bcrypt off the event loop on a bounded executor.
+    
+    - At most `workers` hashes run concurrently (bcrypt releases the GIL)
+    - At most `max_queue` calls wait for a worker; beyond that callers get 503
+      instead of piling up unbounded work during a login storm
+    - Queue depth, wait and run times are tracked for monitoring
+    """
+    
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.total_wait_ms = 0.0
+        self.total_run_ms = 0.0
+        self.max_wait_ms = 0.0
+    
+    @staticmethod
+    def _timed(fn, *args):
+        started = get_time()
+        result = fn(*args)
+        return result, started, get_time()
+    
+    async def _run(self, fn, *args):
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            logger.warning(f"[PASSWORD-HASH] Queue full ({self.in_flight} in flight) - rejecting request")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servicio ocupado. Intenta de nuevo en unos segundos."
+            )
+        
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        submitted = get_time()
+        try:
+            loop = asyncio.get_running_loop()
+            result, started, finished = await loop.run_in_executor(self._executor, self._timed, fn, *args)
+        finally:
+            self.in_flight -= 1
+        
+        wait_ms = (started - submitted) * 1000
+        self.completed += 1
+        self.total_wait_ms += wait_ms
+        self.total_run_ms += (finished - started) * 1000
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        return result
+    
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+    
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        if not hashed_password:
+            return False
+        return await self._run(verify_password, plain_password, hashed_password)
+    
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "in_flight": self.in_flight,
+            "queue_depth": max(0, self.in_flight - self.workers),
+            "peak_in_flight": self.peak_in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "avg_wait_ms": round(self.total_wait_ms / self.completed, 2) if self.completed else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 2),
+            "avg_run_ms": round(self.total_run_ms / self.completed, 2) if self.completed else 0.0,
+        }
+
+password_hasher = PasswordHashingService(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
+async def hash_password_async(password: str) -> str:
+    """Hash password on the bcrypt worker pool (non-blocking)"""
+    return await password_hasher.hash(password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify password on the bcrypt worker pool (non-blocking)"""
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def rehash_password_if_needed(user_id: str, plain_password: str, hashed_password: str) -> bool:
+    """
+    Upgrade a stored hash to the current BCRYPT_ROUNDS after a successful login.
+    Does NOT touch password_changed_at, so existing sessions stay valid.
+    Never raises - a failed rehash just retries on the next login.
+    """
+    if not password_needs_rehash(hashed_password):
+        return False
+    try:
+        new_hash = await hash_password_async(plain_password)
+        await db.users.update_one(
+            {"id": user_id, "hashed_password": hashed_password},
+            {"$set": {"hashed_password": new_hash}}
+        )
+        password_hasher.rehashed += 1
+        logger.info(f"[PASSWORD-HASH] Rehashed password for user {user_id[:8]}... (cost={BCRYPT_ROUNDS})")
+        return True
+    except Exception as e:
+        logger.warning(f"[PASSWORD-HASH] Rehash failed for user {user_id[:8]}...: {e}")
+        return False
+
 def generate_temporary_password(length: int = 12) -> str:
     """Generate a secure temporary password"""
     alphabet = string.ascii_letters + string.digits + "!@#$%"
@@ -39,43 +168,8 @@ def generate_temporary_password(length: int = 12) -> str:
     secrets.SystemRandom().shuffle(password)
     return ''.join(password)
 
-async def send_credentials_email(
-    recipient_email: str,
-    user_name: str,
-    role: str,
-    condominium_name: str,
-    temporary_password: str,
-    login_url: str
-) -> dict:
-    """Send credentials email to new user using Resend"""
-    
-    print(f"[EMAIL TRIGGER] create_user → sending credentials to {recipient_email}")
-    
-    # FIRST: Check if email sending is enabled via toggle
-    email_enabled = await is_email_enabled()
-    if not email_enabled:
-        print(f"[EMAIL BLOCKED] Email toggle is OFF (recipient: {recipient_email})")
-        logger.info(f"Email not sent - Email sending is DISABLED via toggle (recipient: {recipient_email})")
-        return {"status": "skipped", "reason": "Email sending disabled (testing mode)", "toggle_disabled": True}
-    
-    # SECOND: Check if API key is configured
-    if not RESEND_API_KEY:
-        print(f"[EMAIL BLOCKED] RESEND_API_KEY not configured")
-        logger.warning("Email not sent - RESEND_API_KEY not configured")
-        return {"status": "skipped", "reason": "Email service not configured"}
-    
-    # Role name in Spanish
-    role_names = {
-        "Residente": "Residente",
-        "Guarda": "Guardia de Seguridad",
-        "HR": "Recursos Humanos",
-        "Supervisor": "Supervisor",
-        "Estudiante": "Estudiante",
-        "Administrador": "Administrador"
-    }
-    role_display = role_names.get(role, role)
-    
-    html_content = f"""
+# Compiled once into the email template registry (values HTML-escaped on render)
+_CREDENTIALS_EMAIL_TEMPLATE = register_template("credentials", """
     <!DOCTYPE html>
     <html>
     <head>
@@ -157,32 +251,82 @@ async def send_credentials_email(
         </table>
     </body>
     </html>
+    """)
+
+async def send_credentials_email(
+    recipient_email: str,
+    user_name: str,
+    role: str,
+    condominium_name: str,
+    temporary_password: str,
+    login_url: str,
+    user_id: str = None,
+    actor_id: str = None,
+    condominium_id: str = None
+) -> dict:
+    """
+    Queue credentials email to new user (sent via Resend by the email outbox worker).
+    Returns status "queued", not "success": whether it was delivered is only
+    known later, when _on_credentials_email_final records it on the user.
     """
     
-    params = {
-        "from": SENDER_EMAIL,
-        "to": [recipient_email],
-        "subject": f"Tus Credenciales de Acceso a GENTURIX - {condominium_name}",
-        "html": html_content
+    print(f"[EMAIL TRIGGER] create_user → sending credentials to {recipient_email}")
+    
+    # FIRST: Check if email sending is enabled via toggle
+    email_enabled = await is_email_enabled()
+    if not email_enabled:
+        print(f"[EMAIL BLOCKED] Email toggle is OFF (recipient: {recipient_email})")
+        logger.info(f"Email not sent - Email sending is DISABLED via toggle (recipient: {recipient_email})")
+        return {"status": "skipped", "reason": "Email sending disabled (testing mode)", "toggle_disabled": True}
+    
+    # SECOND: Check if API key is configured
+    if not RESEND_API_KEY:
+        print(f"[EMAIL BLOCKED] RESEND_API_KEY not configured")
+        logger.warning("Email not sent - RESEND_API_KEY not configured")
+        return {"status": "skipped", "reason": "Email service not configured"}
+    
+    # Role name in Spanish
+    role_names = {
+        "Residente": "Residente",
+        "Guarda": "Guardia de Seguridad",
+        "HR": "Recursos Humanos",
+        "Supervisor": "Supervisor",
+        "Estudiante": "Estudiante",
+        "Administrador": "Administrador"
     }
+    role_display = role_names.get(role, role)
+    
+    html_content = _CREDENTIALS_EMAIL_TEMPLATE.render(
+        user_name=user_name,
+        role_display=role_display,
+        condominium_name=condominium_name,
+        recipient_email=recipient_email,
+        temporary_password=temporary_password,
+        login_url=login_url
+    )
     
     try:
-        # Run sync SDK in thread to keep FastAPI non-blocking
-        logger.info(f"[RESEND-AUDIT] Attempting to send credentials email | recipient={recipient_email} | from={SENDER_EMAIL}")
-        email_response = await asyncio.to_thread(resend.Emails.send, params)
-        
-        # Detailed response logging for audit
-        if isinstance(email_response, dict):
-            email_id = email_response.get("id", "N/A")
-            print(f"[EMAIL SENT] {recipient_email}")
-            logger.info(f"[RESEND-AUDIT] SUCCESS | email_id={email_id} | recipient={recipient_email} | response={email_response}")
-        else:
-            print(f"[EMAIL SENT] {recipient_email}")
-            logger.info(f"[RESEND-AUDIT] SUCCESS | response_type={type(email_response).__name__} | recipient={recipient_email} | response={email_response}")
+        # Queued for the email outbox worker so user creation doesn't wait on Resend
+        logger.info(f"[RESEND-AUDIT] Queueing credentials email | recipient={recipient_email} | from={SENDER_EMAIL}")
+        queued = await enqueue_email(
+            to=recipient_email,
+            subject=f"Tus Credenciales de Acceso a GENTURIX - {condominium_name}",
+            html=html_content,
+            email_type="credentials",
+            sender=SENDER_EMAIL,
+            condominium_id=condominium_id,
+            context={"user_id": user_id, "actor_id": actor_id} if user_id else None
+        )
+        if not queued.get("queued"):
+            logger.warning(f"[RESEND-AUDIT] NOT QUEUED | recipient={recipient_email} | reason={queued.get('reason')}")
+            return {"status": "skipped", "reason": queued.get("reason"), "recipient": recipient_email}
         
+        print(f"[EMAIL QUEUED] {recipient_email}")
+        logger.info(f"[RESEND-AUDIT] QUEUED | outbox_id={queued['id']} | recipient={recipient_email}")
         return {
-            "status": "success",
-            "email_id": email_response.get("id") if isinstance(email_response, dict) else str(email_response),
+            "status": "queued",
+            "queued": True,
+            "outbox_id": queued["id"],
             "recipient": recipient_email,
             "from": SENDER_EMAIL
         }
@@ -198,6 +342,32 @@ async def send_credentials_email(
             "from": SENDER_EMAIL
         }
 
+async def _on_credentials_email_final(message: dict, state: str, error: Optional[str]) -> None:
+    """Email outbox hook: record the delivery outcome of a credentials email on the user and in the audit log."""
+    context = message.get("context") or {}
+    user_id = context.get("user_id")
+    if not user_id:
+        return
+    sent = state == "sent"
+    await db.users.update_one(
+        {"id": user_id},
+        {"$set": {"credentials_email_sent": sent, "credentials_email_status": state}}
+    )
+    details = {"user_id": user_id, "recipient_email": message["to"], "outbox_id": message["id"]}
+    if not sent:
+        details["error"] = error or "Unknown error"
+    await log_audit_event(
+        AuditEventType.CREDENTIALS_EMAIL_SENT if sent else AuditEventType.CREDENTIALS_EMAIL_FAILED,
+        context.get("actor_id"),
+        "admin",
+        details,
+        "email-outbox",
+        "email-outbox",
+        condominium_id=message.get("condominium_id")
+    )
+
+register_final_state_hook("credentials", _on_credentials_email_final)
+
 async def send_password_reset_email(
     recipient_email: str,
     user_name: str,
@@ -504,9 +674,65 @@ def verify_refresh_token(token: str) -> Optional[dict]:
     except jwt.InvalidTokenError:
         return None
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = verify_access_token(token)
+# Fields handlers read from current_user. Only these are loaded and cached;
+# add a field here before reading it from current_user in a router.
+PRINCIPAL_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "email": 1,
+    "full_name": 1,
+    "roles": 1,
+    "is_active": 1,
+    "status": 1,
+    "created_at": 1,
+    "condominium_id": 1,
+    "apartment": 1,
+    "role_data": 1,
+    "phone": 1,
+    "profile_photo": 1,
+    "public_description": 1,
+    "language": 1,
+    "password_reset_required": 1,
+    "status_changed_at": 1,
+    "password_changed_at": 1,
+}
+
+def _parse_iso_timestamp(value: Optional[str], field_name: str) -> Optional[float]:
+    """Parse an ISO timestamp to POSIX seconds. Returns None (never blocks) on bad data."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except Exception as e:
+        logger.warning(f"[JWT-CHECK] Error parsing {field_name}: {e}")
+        return None
+
+async def load_principal(user_id: str) -> Optional[tuple]:
+    """
+    Load (user, status_changed_ts, password_changed_ts) for get_current_user.
+    
+    Served from principal_cache when possible; on a miss the projected user
+    document is fetched and its session-invalidation timestamps parsed once.
+    """
+    entry = principal_cache.get(user_id)
+    if entry is not None:
+        return entry
+    
+    user = await db.users.find_one({"id": user_id}, PRINCIPAL_PROJECTION)
+    if not user:
+        return None
+    
+    entry = (
+        user,
+        _parse_iso_timestamp(user.get("status_changed_at"), "status_changed_at"),
+        _parse_iso_timestamp(user.get("password_changed_at"), "password_changed_at"),
+    )
+    principal_cache.set(user_id, entry)
+    return entry
+
+async def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    # Reuses the payload already decoded by billing_block_guard, if any
+    payload = get_request_token_payload(request, credentials.credentials)
     
     if not payload:
         raise HTTPException(
@@ -516,14 +742,16 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         )
     
     user_id = payload.get("sub")
-    user = await db.users.find_one({"id": user_id})
+    entry = await load_principal(user_id) if user_id else None
     
-    if not user or not user.get("is_active"):
+    if not entry or not entry[0].get("is_active"):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found or inactive"
         )
     
+    user, status_changed_ts, password_changed_ts = entry
+    
     # Security: Check user status (blocked/suspended users cannot access)
     user_status = user.get("status", "active")
     if user_status in ["blocked", "suspended"]:
@@ -537,64 +765,36 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Security: Check if token was issued before status was changed (session invalidation)
-    status_changed_at = user.get("status_changed_at")
     token_iat = payload.get("iat")
     
-    if status_changed_at and token_iat:
-        try:
-            status_time = datetime.fromisoformat(status_changed_at.replace("Z", "+00:00"))
-            status_timestamp = status_time.timestamp()
-            
-            if token_iat < status_timestamp:
-                logger.info(f"[JWT-CHECK] Rejecting token - issued before status change. User: {user_id}")
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Session expired due to account status change. Please login again.",
-                    headers={"WWW-Authenticate": "Bearer"},
-                )
-        except HTTPException:
-            raise
-        except Exception as e:
-            logger.warning(f"[JWT-CHECK] Error parsing status_changed_at: {e}")
-            pass
+    # Security: Check if token was issued before status was changed (session invalidation)
+    if status_changed_ts and token_iat and token_iat < status_changed_ts:
+        logger.info(f"[JWT-CHECK] Rejecting token - issued before status change. User: {user_id}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Session expired due to account status change. Please login again.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
     # Security: Check if token was issued before password was changed
     # This invalidates all sessions after a password change
-    password_changed_at = user.get("password_changed_at")
-    
-    if password_changed_at and token_iat:
-        try:
-            # Parse password_changed_at (ISO format) to timestamp
-            pwd_changed_time = datetime.fromisoformat(password_changed_at.replace("Z", "+00:00"))
-            pwd_changed_timestamp = pwd_changed_time.timestamp()
-            
-            logger.debug(f"[JWT-CHECK] Token iat: {token_iat}, Password changed at: {pwd_changed_timestamp}")
-            
-            # If token was issued BEFORE password was changed, reject it
-            if token_iat < pwd_changed_timestamp:
-                logger.info(f"[JWT-CHECK] Rejecting token - issued before password change. User: {user_id}")
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Session expired due to password change. Please login again.",
-                    headers={"WWW-Authenticate": "Bearer"},
-                )
-        except HTTPException:
-            # Re-raise HTTP exceptions
-            raise
-        except Exception as e:
-            # Log any parsing errors but don't block the user
-            logger.warning(f"[JWT-CHECK] Error parsing password_changed_at: {e}")
-            pass
+    if password_changed_ts and token_iat and token_iat < password_changed_ts:
+        logger.info(f"[JWT-CHECK] Rejecting token - issued before password change. User: {user_id}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Session expired due to password change. Please login again.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
-    return user
+    # Hand out a copy so handlers can't mutate the cached principal
+    return dict(user)
 
-async def get_current_user_optional(credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))):
+async def get_current_user_optional(request: Request, credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))):
     """Like get_current_user but returns None instead of raising on missing/invalid auth."""
     if not credentials:
         return None
     try:
-        return await get_current_user(credentials)
+        return await get_current_user(request, credentials)
     except HTTPException:
         return None
 
@@ -609,6 +809,60 @@ def require_role(*allowed_roles):
         return current_user
     return check_role
 
+# ==================== MODULE GATING ====================
+async def get_condominium_modules(condo_id: str) -> Optional[dict]:
+    """
+    Return the condominium's modules config, served from module_config_cache.
+    Returns None if the condominium does not exist (misses are not cached).
+    """
+    modules = module_config_cache.get(condo_id)
+    if modules is not None:
+        return modules
+    
+    condo = await db.condominiums.find_one({"id": condo_id}, {"_id": 0, "modules": 1})
+    if not condo:
+        return None
+    
+    modules = condo.get("modules") or {}
+    module_config_cache.set(condo_id, modules)
+    return modules
+
+def is_module_enabled(modules: dict, module_name: str, default: bool = True) -> bool:
+    """
+    Evaluate a module flag. Handles both boolean and dict ({"enabled": ...}) formats.
+    `default` applies when the module is not configured at all.
+    """
+    module_config = modules.get(module_name)
+    if isinstance(module_config, bool):
+        return module_config
+    if isinstance(module_config, dict):
+        return module_config.get("enabled", False)
+    if module_config is None:
+        return default
+    return False
+
+async def _ensure_module_enabled(current_user: dict, module_name: str) -> None:
+    """Shared module check for require_module / require_role_and_module"""
+    condo_id = current_user.get("condominium_id")
+    if not condo_id:
+        # Users without condominium can't access module-protected endpoints
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Usuario no asignado a un condominio"
+        )
+    
+    modules = await get_condominium_modules(condo_id)
+    if modules is None:
+        raise HTTPException(status_code=404, detail="Condominio no encontrado")
+    
+    # Module not configured - default to enabled for backwards compatibility
+    if not is_module_enabled(modules, module_name, default=True):
+        logger.warning(f"[module-check] Access DENIED to module '{module_name}' for user {current_user.get('email')}")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Módulo '{module_name}' no está habilitado para este condominio"
+        )
+
 def require_role_and_module(*allowed_roles, module: str):
     """Combined dependency that checks both role AND module status"""
     async def check_role_and_module(current_user = Depends(get_current_user)):
@@ -625,38 +879,7 @@ def require_role_and_module(*allowed_roles, module: str):
         if "SuperAdmin" in user_roles:
             return current_user
         
-        # Check module status
-        condo_id = current_user.get("condominium_id")
-        if not condo_id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Usuario no asignado a un condominio"
-            )
-        
-        condo = await db.condominiums.find_one({"id": condo_id}, {"_id": 0, "modules": 1})
-        if not condo:
-            raise HTTPException(status_code=404, detail="Condominio no encontrado")
-        
-        modules = condo.get("modules", {})
-        module_config = modules.get(module)
-        
-        # Handle both boolean and dict formats
-        is_enabled = False
-        if isinstance(module_config, bool):
-            is_enabled = module_config
-        elif isinstance(module_config, dict):
-            is_enabled = module_config.get("enabled", False)
-        elif module_config is None:
-            # Module not configured - default to enabled for backwards compatibility
-            is_enabled = True
-        
-        if not is_enabled:
-            logger.warning(f"[module-check] Access DENIED to module '{module}' for user {current_user.get('email')}")
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Módulo '{module}' no está habilitado para este condominio"
-            )
-        
+        await _ensure_module_enabled(current_user, module)
         return current_user
     return check_role_and_module
 
@@ -665,45 +888,9 @@ def require_module(module_name: str):
     async def check_module(current_user = Depends(get_current_user)):
         # SuperAdmin bypasses module checks
         if "SuperAdmin" in current_user.get("roles", []):
-            logger.info(f"[module-check] SuperAdmin bypasses {module_name} check")
             return current_user
         
-        condo_id = current_user.get("condominium_id")
-        if not condo_id:
-            # Users without condominium can't access module-protected endpoints
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Usuario no asignado a un condominio"
-            )
-        
-        condo = await db.condominiums.find_one({"id": condo_id}, {"_id": 0, "modules": 1})
-        if not condo:
-            raise HTTPException(status_code=404, detail="Condominio no encontrado")
-        
-        modules = condo.get("modules", {})
-        module_config = modules.get(module_name)
-        
-        logger.info(f"[module-check] Module '{module_name}' config: {module_config}")
-        
-        # Handle both boolean and dict formats
-        is_enabled = False
-        if isinstance(module_config, bool):
-            is_enabled = module_config
-        elif isinstance(module_config, dict):
-            is_enabled = module_config.get("enabled", False)
-        elif module_config is None:
-            # Module not configured - default to enabled for backwards compatibility
-            is_enabled = True
-        
-        logger.info(f"[module-check] Module '{module_name}' is_enabled: {is_enabled}")
-        
-        if not is_enabled:
-            logger.warning(f"[module-check] Access DENIED to module '{module_name}' for user {current_user.get('email')}")
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Módulo '{module_name}' no está habilitado para este condominio"
-            )
-        
+        await _ensure_module_enabled(current_user, module_name)
         return current_user
     return check_module
 
@@ -928,65 +1115,55 @@ async def send_push_notification(subscription_info: dict, payload: dict) -> bool
         logger.warning("[PUSH-SEND-FAILED] Subscription missing endpoint")
         return False
     
-    try:
-        webpush(
-            subscription_info=subscription_info,
-            data=json.dumps(payload),
-            vapid_private_key=VAPID_PRIVATE_KEY,
-            vapid_claims={"sub": f"mailto:{VAPID_CLAIMS_EMAIL}"}
-        )
+    # Encryption runs off-loop and the POST uses the pooled async client
+    response = await send_web_push(subscription_info, payload, urgency=payload.get("urgency"))
+    
+    if response["success"]:
         logger.info(f"[PUSH-SEND-SUCCESS] Notification sent to: {endpoint_short}...")
         return True
-        
-    except WebPushException as e:
-        status_code = e.response.status_code if e.response else None
-        error_body = ""
-        try:
-            if e.response:
-                error_body = e.response.text[:100] if e.response.text else ""
-        except Exception as parse_err:
-            logger.debug(f"[PUSH] Could not parse error response: {parse_err}")
-        
-        # ONLY delete on 404 (Not Found) or 410 (Gone) - subscription is permanently invalid
-        if status_code in [404, 410]:
-            delete_result = await db.push_subscriptions.delete_one({"endpoint": endpoint})
-            if delete_result.deleted_count > 0:
-                logger.warning(f"[PUSH-SUB-DELETED] Removed invalid subscription (HTTP {status_code}): {endpoint_short}...")
-            else:
-                logger.warning(f"[PUSH-SEND-FAILED] HTTP {status_code} but subscription not found in DB: {endpoint_short}...")
-            return False
-        
-        # 401/403 - Auth errors, likely temporary (VAPID token refresh, etc.)
-        if status_code in [401, 403]:
-            logger.warning(f"[PUSH-SEND-FAILED] Auth error HTTP {status_code} (keeping subscription): {endpoint_short}... | {error_body}")
-            return False
-        
-        # 429 - Rate limited, definitely keep subscription
-        if status_code == 429:
-            logger.warning(f"[PUSH-SEND-FAILED] Rate limited HTTP 429 (keeping subscription): {endpoint_short}...")
-            return False
-        
-        # 500/502/503/504 - Server errors, temporary
-        if status_code in [500, 502, 503, 504]:
-            logger.warning(f"[PUSH-SEND-FAILED] Server error HTTP {status_code} (keeping subscription): {endpoint_short}...")
-            return False
-        
-        # Any other WebPush error - log but keep subscription (be conservative)
-        logger.error(f"[PUSH-SEND-FAILED] WebPush error HTTP {status_code} (keeping subscription): {endpoint_short}... | {error_body}")
+    
+    status_code = response["status_code"]
+    error_body = response["body"]
+    
+    # Network-level failures (no HTTP response) - keep subscription
+    if status_code is None:
+        if response["error"] == "Timeout":
+            logger.warning(f"[PUSH-SEND-FAILED] Timeout (keeping subscription): {endpoint_short}...")
+        elif response["error"].startswith("Connection"):
+            logger.warning(f"[PUSH-SEND-FAILED] Connection error (keeping subscription): {endpoint_short}... | {response['error']}")
+        else:
+            # Unknown error - be conservative, keep subscription
+            logger.error(f"[PUSH-SEND-FAILED] Unexpected error (keeping subscription): {endpoint_short}... | {response['error']}")
         return False
-        
-    except TimeoutError:
-        logger.warning(f"[PUSH-SEND-FAILED] Timeout (keeping subscription): {endpoint_short}...")
+    
+    # ONLY delete on 404 (Not Found) or 410 (Gone) - subscription is permanently invalid
+    if status_code in [404, 410]:
+        delete_result = await db.push_subscriptions.delete_one({"endpoint": endpoint})
+        remove_push_directory_endpoint(endpoint)
+        if delete_result.deleted_count > 0:
+            logger.warning(f"[PUSH-SUB-DELETED] Removed invalid subscription (HTTP {status_code}): {endpoint_short}...")
+        else:
+            logger.warning(f"[PUSH-SEND-FAILED] HTTP {status_code} but subscription not found in DB: {endpoint_short}...")
         return False
-        
-    except ConnectionError as e:
-        logger.warning(f"[PUSH-SEND-FAILED] Connection error (keeping subscription): {endpoint_short}... | {str(e)[:50]}")
+    
+    # 401/403 - Auth errors, likely temporary (VAPID token refresh, etc.)
+    if status_code in [401, 403]:
+        logger.warning(f"[PUSH-SEND-FAILED] Auth error HTTP {status_code} (keeping subscription): {endpoint_short}... | {error_body}")
         return False
-        
-    except Exception as e:
-        # Unknown error - be conservative, keep subscription
-        logger.error(f"[PUSH-SEND-FAILED] Unexpected error (keeping subscription): {endpoint_short}... | {type(e).__name__}: {str(e)[:100]}")
+    
+    # 429 - Rate limited, definitely keep subscription
+    if status_code == 429:
+        logger.warning(f"[PUSH-SEND-FAILED] Rate limited HTTP 429 (keeping subscription): {endpoint_short}...")
+        return False
+    
+    # 500/502/503/504 - Server errors, temporary
+    if status_code in [500, 502, 503, 504]:
+        logger.warning(f"[PUSH-SEND-FAILED] Server error HTTP {status_code} (keeping subscription): {endpoint_short}...")
         return False
+    
+    # Any other WebPush error - log but keep subscription (be conservative)
+    logger.error(f"[PUSH-SEND-FAILED] WebPush error HTTP {status_code} (keeping subscription): {endpoint_short}... | {error_body}")
+    return False
 
 async def send_push_notification_with_cleanup(subscription_info: dict, payload: dict, user_id: str = None) -> dict:
     """
@@ -1001,7 +1178,8 @@ async def send_push_notification_with_cleanup(subscription_info: dict, payload:
     """
     endpoint = subscription_info.get("endpoint", "")
     endpoint_short = endpoint[:50] if endpoint else "NO_ENDPOINT"
-    result = {"success": False, "deleted": False, "endpoint": endpoint, "error": None, "user_id": user_id}
+    result = {"success": False, "deleted": False, "endpoint": endpoint, "error": None, "user_id": user_id,
+              "status_code": None, "retry_after": None, "elapsed_ms": 0.0}
     
     if not VAPID_PUBLIC_KEY or not VAPID_PRIVATE_KEY:
         result["error"] = "VAPID not configured"
@@ -1011,51 +1189,39 @@ async def send_push_notification_with_cleanup(subscription_info: dict, payload:
         result["error"] = "Missing endpoint"
         return result
     
-    try:
-        webpush(
-            subscription_info=subscription_info,
-            data=json.dumps(payload),
-            vapid_private_key=VAPID_PRIVATE_KEY,
-            vapid_claims={"sub": f"mailto:{VAPID_CLAIMS_EMAIL}"}
-        )
+    response = await send_web_push(subscription_info, payload, urgency=payload.get("urgency"))
+    result["elapsed_ms"] = response["elapsed_ms"]
+    
+    if response["success"]:
         result["success"] = True
         logger.info(f"[PUSH-SEND-SUCCESS] Notification sent to user={user_id}: {endpoint_short}...")
         return result
-        
-    except WebPushException as e:
-        status_code = e.response.status_code if e.response else None
-        result["error"] = f"HTTP {status_code}"
-        
-        # ONLY delete on 404 (Not Found) or 410 (Gone) - subscription is permanently invalid
-        if status_code in [404, 410]:
-            delete_result = await db.push_subscriptions.delete_one({"endpoint": endpoint})
-            if delete_result.deleted_count > 0:
-                result["deleted"] = True
-                # STRUCTURED LOG for cleanup tracking
-                logger.warning(f"[PUSH-CLEANUP] Invalid subscription removed: user_id={user_id}, endpoint={endpoint_short}..., reason=HTTP_{status_code}")
-            else:
-                logger.warning(f"[PUSH-SEND-FAILED] HTTP {status_code} but subscription not in DB: user={user_id}, {endpoint_short}...")
-        else:
-            # All other errors: keep the subscription
-            logger.warning(f"[PUSH-SEND-FAILED] HTTP {status_code} (keeping subscription): user={user_id}, {endpoint_short}...")
-        
-        return result
-        
-    except TimeoutError:
-        result["error"] = "Timeout"
-        logger.warning(f"[PUSH-SEND-FAILED] Timeout (keeping subscription): user={user_id}, {endpoint_short}...")
-        return result
-        
-    except ConnectionError as e:
-        result["error"] = f"Connection: {str(e)[:30]}"
-        logger.warning(f"[PUSH-SEND-FAILED] Connection error (keeping subscription): user={user_id}, {endpoint_short}...")
-        return result
-        
-    except Exception as e:
-        result["error"] = f"{type(e).__name__}: {str(e)[:50]}"
-        logger.error(f"[PUSH-SEND-FAILED] Unexpected error (keeping subscription): user={user_id}, {endpoint_short}... | {result['error']}")
-        return result
+    
+    status_code = response["status_code"]
+    result["error"] = response["error"]
+    result["status_code"] = status_code
+    result["retry_after"] = response["retry_after"]
+    
+    if status_code is None:
+        # Timeout / network / encoding errors: keep the subscription
+        logger.warning(f"[PUSH-SEND-FAILED] {response['error']} (keeping subscription): user={user_id}, {endpoint_short}...")
         return result
+    
+    # ONLY delete on 404 (Not Found) or 410 (Gone) - subscription is permanently invalid
+    if status_code in [404, 410]:
+        delete_result = await db.push_subscriptions.delete_one({"endpoint": endpoint})
+        remove_push_directory_endpoint(endpoint)
+        if delete_result.deleted_count > 0:
+            result["deleted"] = True
+            # STRUCTURED LOG for cleanup tracking
+            logger.warning(f"[PUSH-CLEANUP] Invalid subscription removed: user_id={user_id}, endpoint={endpoint_short}..., reason=HTTP_{status_code}")
+        else:
+            logger.warning(f"[PUSH-SEND-FAILED] HTTP {status_code} but subscription not in DB: user={user_id}, {endpoint_short}...")
+    else:
+        # All other errors: keep the subscription
+        logger.warning(f"[PUSH-SEND-FAILED] HTTP {status_code} (keeping subscription): user={user_id}, {endpoint_short}...")
+    
+    return result
 
 async def notify_guards_of_panic(condominium_id: str, panic_data: dict, sender_id: str = None):
     """
@@ -1099,8 +1265,9 @@ async def notify_guards_of_panic(condominium_id: str, panic_data: dict, sender_i
         logger.warning("[PANIC-PUSH-AUDIT] FAILED: missing condominium_id")
         return result
     
-    # VALIDATION 2: Verify condominium exists
-    condo = await db.condominiums.find_one({"id": condominium_id}, {"_id": 0, "id": 1, "is_active": 1, "name": 1})
+    # VALIDATION 2: Verify condominium exists (read from the DB: the subscription
+    # directory of this worker may not have seen a change made on another one)
+    condo = await get_push_condominium(condominium_id, use_directory=False)
     if not condo:
         result["reason"] = "Condominium not found"
         logger.warning(f"[PANIC-PUSH-AUDIT] FAILED: Condominium {condominium_id} not found in database")
@@ -1113,71 +1280,41 @@ async def notify_guards_of_panic(condominium_id: str, panic_data: dict, sender_i
         logger.warning(f"[PANIC-PUSH-AUDIT] FAILED: Condominium {condo.get('name')} is inactive")
         return result
     
-    # STEP 1: Get ACTIVE guard user IDs for this condominium ONLY
-    guard_query = {
-        "condominium_id": condominium_id,
-        "roles": {"$in": ["Guarda"]},  # ONLY Guarda role
-        "is_active": True,
-        "status": {"$in": ["active", None]}  # Active or no status field (legacy)
-    }
-    
-    # Exclude sender if provided
-    if sender_id:
-        guard_query["id"] = {"$ne": sender_id}
-    
-    guards = await db.users.find(guard_query, {"_id": 0, "id": 1, "full_name": 1, "email": 1}).to_list(None)
+    # STEP 1+2: ACTIVE guards of this condominium ONLY (role='Guarda', sender excluded)
+    # with their push subscriptions in this condominium. One aggregation on the
+    # DB, not the subscription directory: a guard who subscribed or changed role
+    # on another worker must not miss the alert until the next directory reload.
+    guards = await resolve_push_recipients(
+        condominium_id, ["Guarda"],
+        exclude_user_ids=[sender_id] if sender_id else None,
+        use_directory=False
+    )
     guard_ids = [g["id"] for g in guards]
     
     # ==================== AUDIT LOG: GUARDS FOUND ====================
     logger.info(f"[PANIC-PUSH-AUDIT] Guards query | condominium_id={condominium_id} | roles='Guarda' | is_active=True")
     logger.info(f"[PANIC-PUSH-AUDIT] Guards found | count={len(guard_ids)}")
     for g in guards[:5]:  # Log first 5 guards
-        logger.info(f"[PANIC-PUSH-AUDIT]   - Guard: {g.get('email')} | id={g.get('id')[:12]}...")
+        logger.info(f"[PANIC-PUSH-AUDIT]   - Guard: {g.get('email')} | id={g.get('id')[:12]}... | subscriptions={len(g['subscriptions'])}")
     if len(guards) > 5:
         logger.info(f"[PANIC-PUSH-AUDIT]   ... and {len(guards) - 5} more guards")
-    # =================================================================
-    
-    if not guard_ids:
-        result["reason"] = "No active guards found in this condominium"
-        logger.warning(f"[PANIC-PUSH-AUDIT] FAILED: No active guards in condo {condo.get('name')}")
-        return result
-    
-    # STEP 2: Get push subscriptions for these guards ONLY
-    # Filter by user_id AND condominium_id for extra security
-    subscriptions = await db.push_subscriptions.find({
-        "user_id": {"$in": guard_ids},
-        "condominium_id": condominium_id,
-        "is_active": True
-    }).to_list(None)
-    
-    # ==================== AUDIT LOG: SUBSCRIPTIONS ====================
-    logger.info(f"[PANIC-PUSH-AUDIT] Subscriptions query | user_ids={len(guard_ids)} guards | condo={condominium_id[:12]}... | is_active=True")
-    logger.info(f"[PANIC-PUSH-AUDIT] Subscriptions found | count={len(subscriptions)}")
-    
-    # Log subscription details per guard
-    subs_by_guard = {}
-    for sub in subscriptions:
-        uid = sub.get("user_id")
-        if uid not in subs_by_guard:
-            subs_by_guard[uid] = 0
-        subs_by_guard[uid] += 1
-    
-    for gid, count in subs_by_guard.items():
-        guard = next((g for g in guards if g["id"] == gid), None)
-        guard_email = guard.get("email", "unknown") if guard else "unknown"
-        logger.info(f"[PANIC-PUSH-AUDIT]   - Guard {guard_email}: {count} active subscription(s)")
     
     # Log guards WITHOUT subscriptions
-    guards_without_subs = [g for g in guards if g["id"] not in subs_by_guard]
+    guards_without_subs = [g for g in guards if not g["subscriptions"]]
     if guards_without_subs:
         logger.warning(f"[PANIC-PUSH-AUDIT] Guards WITHOUT subscriptions: {len(guards_without_subs)}")
         for g in guards_without_subs[:3]:
             logger.warning(f"[PANIC-PUSH-AUDIT]   - {g.get('email')} has NO push subscription!")
     # =================================================================
     
-    result["total"] = len(subscriptions)
+    if not guard_ids:
+        result["reason"] = "No active guards with push subscriptions in this condominium"
+        logger.warning(f"[PANIC-PUSH-AUDIT] FAILED: No active guards with subscriptions in condo {condo.get('name')}")
+        return result
     
-    if not subscriptions:
+    result["total"] = sum(len(g["subscriptions"]) for g in guards)
+    
+    if not result["total"]:
         result["reason"] = "No push subscriptions for guards"
         logger.warning(f"[PANIC-PUSH-AUDIT] FAILED: No push subscriptions found for {len(guard_ids)} guards")
         return result
@@ -1209,46 +1346,31 @@ async def notify_guards_of_panic(condominium_id: str, panic_data: dict, sender_i
     }
     
     # ==================== PHASE 3: PARALLEL PUSH DELIVERY ====================
-    # Build push tasks, filtering invalid entries
-    push_tasks = []
-    for sub in subscriptions:
-        # Extra validation: ensure subscription belongs to a guard in this condo
-        sub_user_id = sub.get("user_id")
-        if sub_user_id not in guard_ids:
-            result["excluded"] += 1
-            continue
-        
-        endpoint = sub.get("endpoint")
-        if not endpoint:
-            result["excluded"] += 1
-            continue
-        
-        subscription_info = {
-            "endpoint": endpoint,
-            "keys": {
-                "p256dh": sub.get("p256dh"),
-                "auth": sub.get("auth")
-            }
-        }
-        # Pass user_id for better logging
-        push_tasks.append(send_push_notification_with_cleanup(subscription_info, payload, user_id=sub_user_id))
-    
-    # Execute all push notifications in parallel
-    deleted_count = 0
-    if push_tasks:
-        push_results = await asyncio.gather(*push_tasks, return_exceptions=True)
-        
-        # Process results
-        for res in push_results:
-            if isinstance(res, Exception):
-                result["failed"] += 1
-            elif isinstance(res, dict):
-                if res.get("success"):
-                    result["sent"] += 1
-                else:
-                    result["failed"] += 1
-                if res.get("deleted"):
-                    deleted_count += 1
+    # Panic alerts use the whole process-wide send capacity
+    fan_out_started = perf_counter()
+    delivery = await fan_out_push(
+        guards,
+        payload,
+        notification_type="panic_alert",
+        source_id=panic_data.get("event_id"),
+        condominium_id=condominium_id,
+        max_concurrency=PUSH_SEND_CONCURRENCY
+    )
+    result["sent"] = delivery["sent"]
+    result["failed"] = delivery["failed"]
+    result["excluded"] = result["total"] - delivery["total"]
+    result["retrying"] = delivery["retrying"]
+    deleted_count = delivery["deleted"]
+    
+    # End-to-end telemetry: panic request -> push service accepted the message
+    trigger_started = panic_data.get("trigger_started")
+    delivered_ms = [r["elapsed_ms"] for r in delivery["recipients"] if r["sent"]]
+    if trigger_started is not None and delivered_ms:
+        offset_ms = (fan_out_started - trigger_started) * 1000
+        result["trigger_to_first_delivered_ms"] = round(offset_ms + min(delivered_ms), 1)
+        result["trigger_to_all_delivered_ms"] = round(offset_ms + max(delivered_ms), 1)
+        record_panic_delivery("first_delivered", result["trigger_to_first_delivered_ms"])
+        record_panic_delivery("all_delivered", result["trigger_to_all_delivered_ms"])
     # ======================================================================
     
     # ==================== PHASE 4: STRUCTURED LOGGING ====================
@@ -1261,7 +1383,9 @@ async def notify_guards_of_panic(condominium_id: str, panic_data: dict, sender_i
         f"sent={result['sent']} | "
         f"failed={result['failed']} | "
         f"excluded={result['excluded']} | "
-        f"deleted_invalid={deleted_count}"
+        f"deleted_invalid={deleted_count} | "
+        f"retrying={result.get('retrying', 0)} | "
+        f"trigger_to_first_delivered_ms={result.get('trigger_to_first_delivered_ms')}"
     )
     logger.info(f"[PANIC-PUSH-AUDIT] ======= NOTIFY GUARDS END =======")
     # ===================================================================
@@ -1270,6 +1394,180 @@ async def notify_guards_of_panic(condominium_id: str, panic_data: dict, sender_i
 
 # ==================== CONTEXTUAL PUSH NOTIFICATION HELPERS ====================
 
+async def find_push_recipients(user_match: dict, condominium_id: str = None) -> List[dict]:
+    """
+    Resolve users and their active push subscriptions in ONE query.
+    
+    Runs an aggregation on users with a $lookup into push_subscriptions,
+    so callers no longer do users.find() followed by push_subscriptions.find().
+    
+    Args:
+        user_match: $match filter on users (tenant, roles, active, exclusions)
+        condominium_id: If provided, only subscriptions of this condominium
+    
+    Returns:
+        [{"id": user_id, "email": str, "subscriptions": [{"endpoint", "p256dh", "auth"}, ...]}, ...]
+    """
+    subscription_match = {
+        "$expr": {"$eq": ["$user_id", "$$user_id"]},
+        "is_active": True
+    }
+    if condominium_id:
+        subscription_match["condominium_id"] = condominium_id
+    
+    pipeline = [
+        {"$match": user_match},
+        {"$project": {"_id": 0, "id": 1, "email": 1}},
+        {"$lookup": {
+            "from": "push_subscriptions",
+            "let": {"user_id": "$id"},
+            "pipeline": [
+                {"$match": subscription_match},
+                {"$project": {"_id": 0, "endpoint": 1, "p256dh": 1, "auth": 1}}
+            ],
+            "as": "subscriptions"
+        }}
+    ]
+    return await db.users.aggregate(pipeline).to_list(None)
+
+async def resolve_push_recipients(
+    condominium_id: str,
+    roles: List[str],
+    exclude_user_ids: List[str] = None,
+    require_active_status: bool = True,
+    use_directory: bool = True
+) -> List[dict]:
+    """
+    Active users of a condominium with any of `roles`, with their subscriptions.
+    
+    Served from the in-memory subscription directory (no DB reads). Until the
+    directory is loaded, or with use_directory=False, reads the database
+    with find_push_recipients(). The directory of this worker can be up to
+    PUSH_DIRECTORY_REFRESH_SECONDS behind writes handled by other workers,
+    so callers that must not miss a recipient (panic alerts) bypass it.
+    """
+    if use_directory:
+        recipients = get_push_directory_recipients(
+            condominium_id, roles,
+            exclude_user_ids=exclude_user_ids,
+            require_active_status=require_active_status
+        )
+        if recipients is not None:
+            return recipients
+    
+    user_match = {
+        "condominium_id": condominium_id,
+        "roles": {"$in": roles},
+        "is_active": True
+    }
+    if require_active_status:
+        user_match["status"] = {"$in": ["active", None]}
+    if exclude_user_ids:
+        user_match["id"] = {"$nin": exclude_user_ids}
+    return await find_push_recipients(user_match, condominium_id=condominium_id)
+
+async def get_push_condominium(condominium_id: str, use_directory: bool = True) -> Optional[dict]:
+    """Condominium {"id", "name", "is_active"} from the subscription directory, else from the DB."""
+    condo = get_push_directory_condominium(condominium_id) if use_directory else None
+    if condo is None:
+        condo = await db.condominiums.find_one({"id": condominium_id}, {"_id": 0, "id": 1, "is_active": 1, "name": 1})
+    return condo
+
+async def fan_out_push(
+    recipients: List[dict],
+    payload: dict,
+    notification_type: str = None,
+    source_id: str = None,
+    condominium_id: str = None,
+    max_concurrency: int = PUSH_FANOUT_CONCURRENCY
+) -> dict:
+    """
+    Send one payload to every subscription of the given recipients in parallel.
+    
+    At most max_concurrency sends of this fan-out are in flight at once (on
+    top of the process-wide PUSH_SEND_CONCURRENCY limit), so a large
+    broadcast cannot take every slot from a concurrent panic alert.
+    Invalid subscriptions (404/410) are removed and every message is
+    recorded in the push outbox, which retries transient failures.
+    
+    Args:
+        recipients: find_push_recipients() output
+        payload: Notification payload
+        notification_type/source_id/condominium_id: Stored with outbox records
+        max_concurrency: Per fan-out send limit
+    
+    Returns:
+        dict with sent, failed, total, deleted, retrying, elapsed_ms and
+        per-recipient results ({"user_id", "subscriptions", "sent", "failed", "elapsed_ms"})
+    """
+    result = {"sent": 0, "failed": 0, "total": 0, "deleted": 0, "retrying": 0, "elapsed_ms": 0.0, "recipients": []}
+    slots = asyncio.Semaphore(max(1, max_concurrency))
+    start = perf_counter()
+    
+    async def send_one(subscription_info: dict, user_id: str):
+        async with slots:
+            send_result = await send_push_notification_with_cleanup(subscription_info, payload, user_id=user_id)
+        # Time from fan-out start until this message was answered
+        return send_result, round((perf_counter() - start) * 1000, 1)
+    
+    tasks = []
+    per_recipient = {}
+    for recipient in recipients:
+        user_id = recipient.get("id")
+        stats = {"user_id": user_id, "subscriptions": 0, "sent": 0, "failed": 0, "elapsed_ms": 0.0}
+        per_recipient[user_id] = stats
+        result["recipients"].append(stats)
+        for sub in recipient.get("subscriptions", []):
+            if not sub.get("endpoint"):
+                continue
+            stats["subscriptions"] += 1
+            subscription_info = {
+                "endpoint": sub["endpoint"],
+                "keys": {
+                    "p256dh": sub.get("p256dh"),
+                    "auth": sub.get("auth")
+                }
+            }
+            tasks.append((user_id, send_one(subscription_info, user_id)))
+    
+    result["total"] = len(tasks)
+    if not tasks:
+        return result
+    
+    outcomes = await asyncio.gather(*[task for _, task in tasks], return_exceptions=True)
+    
+    send_results = []
+    for (user_id, _), outcome in zip(tasks, outcomes):
+        stats = per_recipient[user_id]
+        if isinstance(outcome, Exception):
+            result["failed"] += 1
+            stats["failed"] += 1
+            continue
+        send_result, done_ms = outcome
+        send_results.append(send_result)
+        stats["elapsed_ms"] = max(stats["elapsed_ms"], done_ms)
+        if send_result.get("success"):
+            result["sent"] += 1
+            stats["sent"] += 1
+        else:
+            result["failed"] += 1
+            stats["failed"] += 1
+        if send_result.get("deleted"):
+            result["deleted"] += 1
+    
+    result["elapsed_ms"] = round((perf_counter() - start) * 1000, 1)
+    
+    # Record per-message delivery state; transient failures are retried by the outbox worker
+    outbox_counts = await record_push_results(
+        send_results,
+        payload,
+        notification_type=notification_type,
+        source_id=source_id,
+        condominium_id=condominium_id
+    )
+    result["retrying"] = outbox_counts.get("retrying", 0)
+    return result
+
 async def send_push_to_user(user_id: str, payload: dict) -> dict:
     """
     Send push notification to a specific user (all their active subscriptions).
@@ -1283,39 +1581,18 @@ async def send_push_to_user(user_id: str, payload: dict) -> dict:
         logger.warning("[PUSH-SEND-FAILED] VAPID keys not configured")
         return result
     
-    subscriptions = await db.push_subscriptions.find({
-        "user_id": user_id,
-        "is_active": True
-    }).to_list(None)
-    
-    result["total"] = len(subscriptions)
+    recipients = await find_push_recipients({"id": user_id})
+    subscription_count = sum(len(r["subscriptions"]) for r in recipients)
     
-    if not subscriptions:
+    if not subscription_count:
         logger.debug(f"[PUSH-SEND-FAILED] No active subscriptions for user {user_id[:8]}...")
         return result
     
-    logger.info(f"[PUSH-SEND-START] Sending to user {user_id[:8]}... ({len(subscriptions)} subscriptions)")
+    logger.info(f"[PUSH-SEND-START] Sending to user {user_id[:8]}... ({subscription_count} subscriptions)")
     
-    for sub in subscriptions:
-        sub_user_id = sub.get("user_id")
-        subscription_info = {
-            "endpoint": sub.get("endpoint"),
-            "keys": {
-                "p256dh": sub.get("p256dh"),
-                "auth": sub.get("auth")
-            }
-        }
-        # Use the function that returns detailed results (with user_id for logging)
-        send_result = await send_push_notification_with_cleanup(subscription_info, payload, user_id=sub_user_id)
-        
-        if send_result["success"]:
-            result["sent"] += 1
-        else:
-            result["failed"] += 1
-            if send_result.get("deleted"):
-                result["deleted"] += 1
+    result = await fan_out_push(recipients, payload, source_id=payload.get("tag"))
     
-    logger.info(f"[PUSH-SEND-COMPLETE] User {user_id[:8]}...: sent={result['sent']}, failed={result['failed']}, deleted={result['deleted']}")
+    logger.info(f"[PUSH-SEND-COMPLETE] User {user_id[:8]}...: sent={result['sent']}, failed={result['failed']}, deleted={result['deleted']}, elapsed={result['elapsed_ms']}ms")
     
     return result
 
@@ -1336,49 +1613,19 @@ async def send_push_to_guards(condominium_id: str, payload: dict, exclude_user_i
     if not condominium_id:
         return result
     
-    # Get ACTIVE guard user IDs for this condominium
-    guard_query = {
-        "condominium_id": condominium_id,
-        "roles": {"$in": ["Guarda"]},
-        "is_active": True
-    }
-    
-    if exclude_user_id:
-        guard_query["id"] = {"$ne": exclude_user_id}
-    
-    guards = await db.users.find(guard_query, {"_id": 0, "id": 1}).to_list(None)
-    guard_ids = [g["id"] for g in guards]
-    
-    if not guard_ids:
-        return result
-    
-    # Get subscriptions for these guards only, filtered by condo
-    subscriptions = await db.push_subscriptions.find({
-        "user_id": {"$in": guard_ids},
-        "condominium_id": condominium_id,
-        "is_active": True
-    }).to_list(None)
-    
-    result["total"] = len(subscriptions)
+    # ACTIVE guards of this condominium with their subscriptions in the same condo
+    recipients = await resolve_push_recipients(
+        condominium_id, ["Guarda"],
+        exclude_user_ids=[exclude_user_id] if exclude_user_id else None,
+        require_active_status=False
+    )
     
-    if not subscriptions:
+    if not recipients:
         return result
     
-    for sub in subscriptions:
-        subscription_info = {
-            "endpoint": sub.get("endpoint"),
-            "keys": {
-                "p256dh": sub.get("p256dh"),
-                "auth": sub.get("auth")
-            }
-        }
-        success = await send_push_notification(subscription_info, payload)
-        if success:
-            result["sent"] += 1
-        else:
-            result["failed"] += 1
+    result = await fan_out_push(recipients, payload, source_id=payload.get("tag"), condominium_id=condominium_id)
     
-    logger.info(f"[PUSH-GUARDS] Sent: {result['sent']}, Failed: {result['failed']}")
+    logger.info(f"[PUSH-GUARDS] Sent: {result['sent']}, Failed: {result['failed']}, Elapsed: {result['elapsed_ms']}ms")
     return result
 
 async def send_push_to_admins(condominium_id: str, payload: dict) -> dict:
@@ -1393,46 +1640,15 @@ async def send_push_to_admins(condominium_id: str, payload: dict) -> dict:
     if not condominium_id:
         return result
     
-    # Get admin user IDs for this condominium
-    admins = await db.users.find({
-        "condominium_id": condominium_id,
-        "roles": {"$in": ["Administrador", "Supervisor"]},
-        "is_active": True,
-        "status": {"$in": ["active", None]}
-    }, {"_id": 0, "id": 1}).to_list(None)
+    # Admins of this condominium with their subscriptions in the same condo
+    recipients = await resolve_push_recipients(condominium_id, ["Administrador", "Supervisor"])
     
-    admin_ids = [a["id"] for a in admins]
-    
-    if not admin_ids:
-        return result
-    
-    # Get subscriptions filtered by user_id AND condominium_id
-    subscriptions = await db.push_subscriptions.find({
-        "user_id": {"$in": admin_ids},
-        "condominium_id": condominium_id,
-        "is_active": True
-    }).to_list(None)
-    
-    result["total"] = len(subscriptions)
-    
-    if not subscriptions:
+    if not recipients:
         return result
     
-    for sub in subscriptions:
-        subscription_info = {
-            "endpoint": sub.get("endpoint"),
-            "keys": {
-                "p256dh": sub.get("p256dh"),
-                "auth": sub.get("auth")
-            }
-        }
-        success = await send_push_notification(subscription_info, payload)
-        if success:
-            result["sent"] += 1
-        else:
-            result["failed"] += 1
+    result = await fan_out_push(recipients, payload, source_id=payload.get("tag"), condominium_id=condominium_id)
     
-    logger.info(f"[PUSH-ADMINS] Sent: {result['sent']}, Failed: {result['failed']}")
+    logger.info(f"[PUSH-ADMINS] Sent: {result['sent']}, Failed: {result['failed']}, Elapsed: {result['elapsed_ms']}ms")
     return result
 
 # ==================== DYNAMIC PUSH TARGETING SYSTEM ====================
@@ -1508,10 +1724,7 @@ async def send_targeted_push_notification(
         return result
     
     # VALIDATION 4: Verify condominium exists and is active
-    condo = await db.condominiums.find_one(
-        {"id": condominium_id}, 
-        {"_id": 0, "id": 1, "is_active": 1, "name": 1}
-    )
+    condo = await get_push_condominium(condominium_id)
     if not condo:
         result["reason"] = "Condominium not found"
         logger.warning(f"[PUSH-TARGETED] Condominium {condominium_id} not found")
@@ -1550,20 +1763,9 @@ async def send_targeted_push_notification(
     elif target_roles:
         result["target_type"] = "roles"
         
-        # First, get user IDs that match the role criteria
-        user_query = {
-            "condominium_id": condominium_id,
-            "roles": {"$in": target_roles},
-            "is_active": True,
-            "status": {"$in": ["active", None]}
-        }
-        
-        # Apply exclusions at user level
-        if exclude_user_ids:
-            user_query["id"] = {"$nin": exclude_user_ids}
-        
-        matching_users = await db.users.find(user_query, {"_id": 0, "id": 1}).to_list(None)
-        matching_user_ids = [u["id"] for u in matching_users]
+        # Users with the roles and their subscriptions (subscription directory, DB fallback)
+        recipients = await resolve_push_recipients(condominium_id, target_roles, exclude_user_ids=exclude_user_ids)
+        matching_user_ids = [r["id"] for r in recipients]
         
         if not matching_user_ids:
             result["reason"] = f"No active users with roles {target_roles} in this condominium"
@@ -1573,15 +1775,20 @@ async def send_targeted_push_notification(
             )
             return result
         
-        subscription_query["user_id"] = {"$in": matching_user_ids}
+        subscriptions = [
+            {"user_id": r["id"], **sub}
+            for r in recipients
+            for sub in r["subscriptions"]
+        ]
         
         logger.info(
             f"[PUSH-TARGETED] Targeting roles {target_roles}: "
             f"found {len(matching_user_ids)} users in condo {condominium_id[:8]}..."
         )
     
-    # FETCH SUBSCRIPTIONS
-    subscriptions = await db.push_subscriptions.find(subscription_query).to_list(None)
+    # FETCH SUBSCRIPTIONS (specific user IDs)
+    if result["target_type"] == "user_ids":
+        subscriptions = await db.push_subscriptions.find(subscription_query).to_list(None)
     result["total"] = len(subscriptions)
     
     if not subscriptions:
@@ -1640,6 +1847,15 @@ async def send_targeted_push_notification(
                     deleted_count += 1
         
         result["deleted_invalid"] = deleted_count
+        
+        # Record per-message delivery state; transient failures are retried by the outbox worker
+        outbox_counts = await record_push_results(
+            [res for res in push_results if isinstance(res, dict)],
+            payload,
+            source_id=tag,
+            condominium_id=condominium_id
+        )
+        result["retrying"] = outbox_counts.get("retrying", 0)
     # ======================================================================
     
     # PHASE 4: STRUCTURED LOGGING
@@ -1652,13 +1868,231 @@ async def send_targeted_push_notification(
         f"total_found={result['total']} | "
         f"sent={result['sent']} | "
         f"failed={result['failed']} | "
-        f"deleted_invalid={result.get('deleted_invalid', 0)}"
+        f"deleted_invalid={result.get('deleted_invalid', 0)} | "
+        f"retrying={result.get('retrying', 0)}"
     )
     
     return result
 
 # ==================== END DYNAMIC PUSH TARGETING ====================
 
+# ==================== SUPERVISED BACKGROUND TASKS ====================
+# Work that must finish but not before the response (panic push/email
+# fan-out). Tasks are strongly referenced until done, bounded by a timeout,
+# failures are logged and counted, and shutdown waits for them.
+# NOTE: per worker process; a crash loses in-flight tasks (panic pushes
+# still have the push outbox records for retry).
+
+BACKGROUND_TASK_TIMEOUT_SECONDS = float(os.environ.get("BACKGROUND_TASK_TIMEOUT_SECONDS", 120))
+
+_background_tasks = set()
+_background_task_stats = {"started": 0, "completed": 0, "failed": 0, "timed_out": 0}
+
+async def _supervise(coro, name: str, timeout: float):
+    try:
+        await asyncio.wait_for(coro, timeout=timeout)
+        _background_task_stats["completed"] += 1
+    except asyncio.TimeoutError:
+        _background_task_stats["timed_out"] += 1
+        logger.error(f"[BACKGROUND] {name} timed out after {timeout}s")
+    except asyncio.CancelledError:
+        _background_task_stats["failed"] += 1
+        logger.warning(f"[BACKGROUND] {name} cancelled")
+        raise
+    except Exception as e:
+        _background_task_stats["failed"] += 1
+        logger.exception(f"[BACKGROUND] {name} failed: {e}")
+
+def spawn_supervised(coro, name: str, timeout: Optional[float] = None) -> asyncio.Task:
+    """Run a coroutine in the background under supervision (see section comment)."""
+    task = asyncio.create_task(_supervise(coro, name, timeout or BACKGROUND_TASK_TIMEOUT_SECONDS), name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    _background_task_stats["started"] += 1
+    return task
+
+async def drain_background_tasks(timeout: float = 10.0):
+    """Wait for running background tasks on shutdown; cancel what is left after timeout."""
+    if not _background_tasks:
+        return
+    pending = set(_background_tasks)
+    logger.info(f"[BACKGROUND] Waiting for {len(pending)} background tasks")
+    _, still_running = await asyncio.wait(pending, timeout=timeout)
+    for task in still_running:
+        task.cancel()
+    if still_running:
+        await asyncio.gather(*still_running, return_exceptions=True)
+        logger.warning(f"[BACKGROUND] Cancelled {len(still_running)} background tasks at shutdown")
+
+def get_background_task_stats() -> dict:
+    return {**_background_task_stats, "running": len(_background_tasks)}
+
+# ==================== NOTIFICATION COALESCING ====================
+# Same-type notifications for a user within the window are merged into the
+# notification that opened it ("3 visitantes han llegado"): one stored
+# document and at most two pushes per window (the first event immediately,
+# one summary at the end if more events were merged).
+# Summaries are sent by a periodic sweep of closed windows with pending_push
+# (every NOTIFICATION_COALESCE_FLUSH_SECONDS), not by in-process timers, so
+# they survive restarts and deploys and any worker can send them.
+NOTIFICATION_COALESCE_WINDOW_SECONDS = int(os.environ.get("NOTIFICATION_COALESCE_WINDOW_SECONDS", 60))
+NOTIFICATION_COALESCE_FLUSH_SECONDS = float(os.environ.get("NOTIFICATION_COALESCE_FLUSH_SECONDS", 5))
+NOTIFICATION_COALESCE_MAX_ITEMS = 20
+
+# type -> key identifying one event (dedupe), latest-name field and summary texts
+COALESCED_NOTIFICATION_TYPES = {
+    "visitor_arrival": {
+        "key": "entry_id",
+        "name_field": "visitor_name",
+        "title": ("🚪 ", " visitantes han llegado"),
+        "message": " más ingresaron al condominio",
+    },
+    "visitor_exit": {
+        "key": "entry_id",
+        "name_field": "visitor_name",
+        "title": ("👋 ", " visitantes han salido"),
+        "message": " más salieron del condominio",
+    },
+}
+
+_coalesce_flush_task: Optional[asyncio.Task] = None
+
+async def _merge_into_open_notification(user_id: str, notification_type: str, data: dict, rule: dict,
+                                        push: bool = True) -> Optional[dict]:
+    """
+    Atomically merge an event into the user's open notification of this type.
+    push=False merges without asking for a summary push (recipient excluded).
+    Returns the updated notification, or None if no window is open (or the
+    event was already merged).
+    """
+    now_iso = datetime.now(timezone.utc).isoformat()
+    key_value = data[rule["key"]]
+    title_prefix, title_suffix = rule["title"]
+    latest_name = str(data.get(rule["name_field"]) or "Visitante")
+    
+    return await db.resident_notifications.find_one_and_update(
+        {
+            "user_id": user_id,
+            "type": notification_type,
+            "coalesce_until": {"$gt": now_iso},
+            "data.coalesced_keys": {"$ne": key_value}
+        },
+        [{"$set": {
+            "coalesced_count": {"$add": ["$coalesced_count", 1]},
+            "title": {"$concat": [
+                {"$literal": title_prefix},
+                {"$toString": {"$add": ["$coalesced_count", 1]}},
+                {"$literal": title_suffix}
+            ]},
+            "message": {"$concat": [
+                {"$literal": f"{latest_name} y "},
+                {"$toString": "$coalesced_count"},
+                {"$literal": rule["message"]}
+            ]},
+            "data": {"$mergeObjects": [
+                "$data",
+                {"$literal": data},
+                {
+                    "coalesced_keys": {"$concatArrays": ["$data.coalesced_keys", {"$literal": [key_value]}]},
+                    "items": {"$slice": [
+                        {"$concatArrays": ["$data.items", {"$literal": [data]}]},
+                        -NOTIFICATION_COALESCE_MAX_ITEMS
+                    ]}
+                }
+            ]},
+            "pending_push": True if push else "$pending_push",
+            "read": False,
+            "updated_at": now_iso
+        }}],
+        projection={"_id": 0, "id": 1, "coalesced_count": 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+async def _send_notification_push(notification: dict, tag: str) -> dict:
+    """Push a stored notification to its user (tenant-scoped when the notification has a condominium)."""
+    data = {
+        "type": notification["type"],
+        "notification_id": notification["id"],
+        "url": notification.get("url") or "/resident?tab=history",
+        **{k: v for k, v in (notification.get("data") or {}).items() if k not in ("items", "coalesced_keys")},
+        "coalesced_count": notification.get("coalesced_count", 1)
+    }
+    if notification.get("condominium_id"):
+        return await send_targeted_push_notification(
+            condominium_id=notification["condominium_id"],
+            title=notification["title"],
+            body=notification["message"],
+            target_user_ids=[notification["user_id"]],
+            data=data,
+            tag=tag
+        )
+    return await send_push_to_user(notification["user_id"], {
+        "title": notification["title"],
+        "body": notification["message"],
+        "icon": "/logo192.png",
+        "badge": "/logo192.png",
+        "tag": tag,
+        "data": data
+    })
+
+async def flush_coalesced_pushes(limit: int = 100) -> int:
+    """
+    Send the summary push of every closed coalescing window that merged
+    events since its first push. Each notification is claimed atomically
+    (pending_push -> False), so concurrent sweeps never send it twice.
+    Returns the number of summaries sent.
+    """
+    # Grace second: a merge that raced the window end still gets flushed
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat()
+    flushed = 0
+    for _ in range(limit):
+        notification = await db.resident_notifications.find_one_and_update(
+            {"pending_push": True, "coalesce_until": {"$lt": cutoff}},
+            {"$set": {"pending_push": False}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if not notification:
+            break
+        # Same tag as the first push: replaces it on the device
+        tag = notification.get("push_tag") or f"{notification['type']}-{notification['id'][:8]}"
+        try:
+            await _send_notification_push(notification, tag)
+            flushed += 1
+            logger.info(f"[NOTIFY-COALESCE] Summary push sent: {notification['type']} x{notification.get('coalesced_count', 1)} for user {notification['user_id'][:8]}")
+        except Exception as e:
+            logger.warning(f"[NOTIFY-COALESCE] Summary push failed for notification {notification['id']}: {e}")
+    return flushed
+
+async def _coalesce_flush_loop():
+    while True:
+        try:
+            await flush_coalesced_pushes()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[NOTIFY-COALESCE] Flush sweep error: {e}")
+        await asyncio.sleep(NOTIFICATION_COALESCE_FLUSH_SECONDS)
+
+def start_notification_coalesce_flusher():
+    """Start the summary push sweep (app startup). The first run sends summaries left over by a restart."""
+    global _coalesce_flush_task
+    if _coalesce_flush_task is not None and not _coalesce_flush_task.done():
+        return
+    _coalesce_flush_task = asyncio.create_task(_coalesce_flush_loop())
+
+async def stop_notification_coalesce_flusher():
+    """Cancel the summary push sweep (app shutdown); unsent summaries stay pending for the next start."""
+    global _coalesce_flush_task
+    if _coalesce_flush_task is None:
+        return
+    _coalesce_flush_task.cancel()
+    try:
+        await _coalesce_flush_task
+    except asyncio.CancelledError:
+        pass
+    _coalesce_flush_task = None
+
 async def create_and_send_notification(
     user_id: str,
     condominium_id: str,
@@ -1667,23 +2101,51 @@ async def create_and_send_notification(
     message: str,
     data: dict = None,
     send_push: bool = True,
-    url: str = None
+    url: str = None,
+    exclude_user_ids: List[str] = None
 ) -> dict:
     """
     Creates a notification in DB and optionally sends push.
     Prevents duplicates by checking existing notifications.
+    No push is sent when user_id is in exclude_user_ids (e.g. the guard who
+    triggered the event is also the recipient); the notification is still stored.
+    
+    Types in COALESCED_NOTIFICATION_TYPES are merged into the user's open
+    notification of the same type while its window lasts (no new document,
+    no push; a summary push is sent when the window ends).
     """
-    now_iso = datetime.now(timezone.utc).isoformat()
+    now = datetime.now(timezone.utc)
+    now_iso = now.isoformat()
+    
+    rule = COALESCED_NOTIFICATION_TYPES.get(notification_type) if NOTIFICATION_COALESCE_WINDOW_SECONDS > 0 else None
+    if rule and not (data or {}).get(rule["key"]):
+        rule = None
+    
+    push_allowed = send_push and user_id not in (exclude_user_ids or [])
+    
+    if rule:
+        merged = await _merge_into_open_notification(user_id, notification_type, data, rule, push=push_allowed)
+        if merged:
+            logger.debug(f"Coalesced {notification_type} for user {user_id} (x{merged['coalesced_count']})")
+            return {
+                "created": False,
+                "coalesced": True,
+                "notification_id": merged["id"],
+                "coalesced_count": merged["coalesced_count"],
+                "push_sent": False
+            }
     
     # Check for duplicate (same type, user, and key data within last minute)
     duplicate_check = {
         "type": notification_type,
         "user_id": user_id,
-        "created_at": {"$gte": (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat()}
+        "created_at": {"$gte": (now - timedelta(minutes=1)).isoformat()}
     }
     
     # Add specific data fields to duplicate check based on type
-    if data:
+    if rule:
+        duplicate_check["data.coalesced_keys"] = data[rule["key"]]
+    elif data:
         if notification_type == "visitor_arrival" and data.get("entry_id"):
             duplicate_check["data.entry_id"] = data["entry_id"]
         elif notification_type == "visitor_exit" and data.get("entry_id"):
@@ -1697,8 +2159,10 @@ async def create_and_send_notification(
         return {"created": False, "push_sent": False, "reason": "duplicate"}
     
     # Create notification document
+    notification_id = str(uuid.uuid4())
+    tag = f"{notification_type}-{notification_id[:8]}"
     notification_doc = {
-        "id": str(uuid.uuid4()),
+        "id": notification_id,
         "type": notification_type,
         "user_id": user_id,
         "condominium_id": condominium_id,
@@ -1710,25 +2174,21 @@ async def create_and_send_notification(
         "created_at": now_iso
     }
     
+    if rule:
+        # Open a coalescing window
+        notification_doc["data"] = {**data, "coalesced_keys": [data[rule["key"]]], "items": [data]}
+        notification_doc["coalesced_count"] = 1
+        notification_doc["coalesce_until"] = (now + timedelta(seconds=NOTIFICATION_COALESCE_WINDOW_SECONDS)).isoformat()
+        # Later merges set pending_push; flush_coalesced_pushes sends the summary
+        notification_doc["pending_push"] = False
+        notification_doc["push_tag"] = tag
+    
     await db.resident_notifications.insert_one(notification_doc)
     
     # Send push if enabled
     push_result = {"sent": 0}
-    if send_push:
-        payload = {
-            "title": title,
-            "body": message,
-            "icon": "/logo192.png",
-            "badge": "/logo192.png",
-            "tag": f"{notification_type}-{notification_doc['id'][:8]}",
-            "data": {
-                "type": notification_type,
-                "notification_id": notification_doc["id"],
-                "url": url or "/resident?tab=history",
-                **(data or {})
-            }
-        }
-        push_result = await send_push_to_user(user_id, payload)
+    if push_allowed:
+        push_result = await _send_notification_push(notification_doc, tag)
     
     return {
         "created": True,
@@ -17,17 +17,19 @@ import re
 import io
 import random
 import httpx
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr, field_validator
 from typing import List, Optional, Dict, Any, Tuple
 import uuid
 from datetime import datetime, timezone, timedelta
-from time import time as get_time
+from time import time as get_time, perf_counter
 from zoneinfo import ZoneInfo
 import bcrypt
 import jwt
 from enum import Enum
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 # ==================== SECURITY IMPORTS (2026-03-01) ====================
 import bleach  # XSS protection via input sanitization
@@ -77,6 +79,7 @@ from modules.billing.service import (
     log_billing_engine_event,
     send_billing_notification_email,
     update_condominium_billing_status,
+    ensure_billing_email_log_index,
 )
 
 # Import scheduler functions from billing module
@@ -110,6 +113,7 @@ from modules.users.models import (
 from services.email_service import (
     send_email,
     send_email_sync,
+    send_bulk_emails,
     is_email_configured,
     get_email_status,
     get_sender,
@@ -122,6 +126,104 @@ from services.email_service import (
     get_user_credentials_email_html,
 )
 
+# Import non-blocking Web Push sender
+from services.push_service import (
+    send_web_push,
+    close_push_client,
+    get_push_sender_stats,
+    is_push_configured,
+    PUSH_SEND_CONCURRENCY,
+    PUSH_FANOUT_CONCURRENCY,
+)
+from services.push_metrics import (
+    record_panic_delivery,
+    get_push_metrics,
+    get_push_metrics_summary,
+    reset_push_metrics,
+)
+from services.push_outbox import (
+    init_push_outbox,
+    record_push_results,
+    process_due_messages as process_due_push_messages,
+    start_push_outbox_worker,
+    stop_push_outbox_worker,
+    get_push_deliveries,
+)
+from services.email_templates import (
+    register_template,
+    render_template,
+    get_template,
+    compile_template,
+    list_templates,
+    get_template_cache_stats,
+)
+from services.authorization_validity import (
+    ValidityClock,
+    validity_clock,
+    evaluate_authorizations,
+    apply_validity,
+)
+from services.search_keys import (
+    AUTHORIZATION_SEARCH_FIELDS,
+    ENTRY_SEARCH_FIELDS,
+    normalize_search_text,
+    authorization_search_keys,
+    entry_search_keys,
+    search_filter,
+    rank_search_results,
+)
+from services.search_keys_backfill import (
+    init_search_keys_backfill,
+    search_keys_backfill_pending,
+    start_search_keys_backfill,
+    stop_search_keys_backfill,
+    get_search_keys_backfill_stats,
+)
+from services.email_outbox import (
+    init_email_outbox,
+    enqueue_email,
+    enqueue_emails,
+    register_final_state_hook,
+    process_due_messages as process_due_email_messages,
+    start_email_outbox_worker,
+    stop_email_outbox_worker,
+    get_email_outbox_metrics,
+    get_email_outbox_backlog,
+)
+from services.visitor_occupancy import (
+    init_visitor_occupancy,
+    occupy,
+    vacate,
+    find_occupant,
+    get_occupancy_by_authorization,
+    count_inside,
+    get_inside_entries,
+    reconcile_occupancy,
+    start_occupancy_reconciler,
+    stop_occupancy_reconciler,
+    get_occupancy_stats,
+)
+from services.push_directory import (
+    init_push_directory,
+    start_push_directory,
+    stop_push_directory,
+    load_push_directory,
+    refresh_push_directory_user,
+    refresh_push_directory_condominium,
+    remove_push_directory_endpoint,
+    get_push_directory_recipients,
+    get_push_directory_condominium,
+    get_push_directory_stats,
+)
+from services.push_validation import (
+    init_push_validation,
+    start_push_validation_job,
+    resume_push_validation_jobs,
+    stop_push_validation_job,
+    get_push_validation_job,
+    job_snapshot as push_validation_job_snapshot,
+)
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
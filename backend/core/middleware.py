@@ -0,0 +1,96 @@
+"""GENTURIX Core — Pure ASGI Request Middleware
+
+Replaces the former @app.middleware("http") layers (request_id_middleware and
+billing_block_middleware). BaseHTTPMiddleware spawns a task and wraps the
+response body per layer; this middleware only rewrites the response start
+message, so streaming responses pass through untouched.
+
+Only depends on the stdlib and Starlette so it can be loaded on its own
+(see scripts/bench_middleware.py).
+"""
+import logging
+import uuid
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+__all__ = ["RequestContextMiddleware", "SECURITY_HEADERS", "CONTENT_SECURITY_POLICY"]
+
+logger = logging.getLogger(__name__)
+
+CONTENT_SECURITY_POLICY = (
+    "default-src 'self'; "
+    "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
+    "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com https://cdnjs.cloudflare.com; "
+    "font-src 'self' https://fonts.gstatic.com https://cdnjs.cloudflare.com; "
+    "img-src 'self' data: blob: https:; "
+    "connect-src 'self' https://*.emergentagent.com https://*.stripe.com https://*.genturix.com; "
+    "frame-src https://*.stripe.com"
+)
+
+# Encoded once at import; appended to every HTTP response
+SECURITY_HEADERS: Tuple[Tuple[bytes, bytes], ...] = (
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    (b"content-security-policy", CONTENT_SECURITY_POLICY.encode("latin-1")),
+)
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+# Headers this middleware owns; any value set downstream is replaced
+_OWNED_HEADERS = frozenset([REQUEST_ID_HEADER] + [name for name, _ in SECURITY_HEADERS])
+
+# Returns a Response to short-circuit the request (e.g. 402 for suspended
+# condominiums) or None to let it through
+RequestGuard = Callable[[Request], Awaitable[Optional[Response]]]
+
+
+def _with_owned_headers(headers: Iterable[Tuple[bytes, bytes]], request_id: bytes) -> List[Tuple[bytes, bytes]]:
+    result = [(name, value) for name, value in headers if name.lower() not in _OWNED_HEADERS]
+    result.append((REQUEST_ID_HEADER, request_id))
+    result.extend(SECURITY_HEADERS)
+    return result
+
+
+class RequestContextMiddleware:
+    """
+    Per-request context for every HTTP request:
+    - Generates a request_id, stored in request.state.request_id
+    - Runs the optional guard (billing block) before the app
+    - Adds X-Request-ID and the precomputed security headers to the response
+    """
+
+    def __init__(self, app: ASGIApp, guard: Optional[RequestGuard] = None, debug_log: bool = False):
+        self.app = app
+        self.guard = guard
+        self.debug_log = debug_log
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+        request_id_bytes = request_id.encode("latin-1")
+
+        if self.debug_log:
+            logger.debug(f"[REQUEST-START] {request_id} | {scope['method']} {scope['path']}")
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = _with_owned_headers(message.get("headers", ()), request_id_bytes)
+                if self.debug_log:
+                    logger.debug(f"[REQUEST-END] {request_id} | Status: {message['status']}")
+            await send(message)
+
+        if self.guard is not None:
+            response = await self.guard(Request(scope, receive))
+            if response is not None:
+                await response(scope, receive, send_with_headers)
+                return
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,227 @@
+"""GENTURIX Core — Sliding-Window Login Limiter
+
+Brute-force protection for login / change-password (see check_rate_limit in
+core/security.py).
+
+Each identifier owns a fixed ring of N buckets covering the window, so memory
+per identifier is O(N) regardless of how many attempts it makes. The count
+for the sliding window is the sum of the buckets that are still inside it
+(granularity = window / N).
+
+Backends:
+- InMemoryRateLimitBackend: per-process, bounded (LRU cap + periodic sweep)
+- MongoRateLimitBackend:    shared across all workers; one atomic
+                            find_one_and_update per hit, expired identifiers
+                            are removed by a TTL index on expires_at
+"""
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+__all__ = [
+    "RateLimitBackend",
+    "InMemoryRateLimitBackend",
+    "MongoRateLimitBackend",
+    "LoginRateLimiter",
+]
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitBackend(ABC):
+    """
+    Storage interface for the login limiter.
+
+    hit() records one attempt for key at time `now` (POSIX seconds) and
+    returns the number of attempts inside the sliding window, this one included.
+    """
+
+    name = "base"
+
+    def __init__(self, window_seconds: float, buckets: int):
+        self.window_seconds = float(window_seconds)
+        self.buckets = max(1, int(buckets))
+        self.bucket_seconds = self.window_seconds / self.buckets
+
+    def bucket_for(self, now: float) -> int:
+        return int(now // self.bucket_seconds)
+
+    def window_total(self, counts: List[int], stamps: List[int], bucket: int) -> int:
+        oldest = bucket - self.buckets
+        return sum(count for count, stamp in zip(counts, stamps) if stamp > oldest)
+
+    @abstractmethod
+    async def hit(self, key: str, now: float) -> int:
+        """Record an attempt and return the attempts in the window."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "window_seconds": self.window_seconds,
+            "buckets": self.buckets,
+        }
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Per-process ring buckets, capped at max_keys identifiers."""
+
+    name = "memory"
+
+    def __init__(self, window_seconds: float, buckets: int = 6, max_keys: int = 10000,
+                 sweep_interval_seconds: Optional[float] = None):
+        super().__init__(window_seconds, buckets)
+        self.max_keys = max(1, int(max_keys))
+        self.sweep_interval_seconds = float(sweep_interval_seconds or self.window_seconds)
+        self._entries: "OrderedDict[str, Tuple[List[int], List[int]]]" = OrderedDict()
+        self._next_sweep = 0.0
+        self.evictions = 0
+        self.swept = 0
+
+    def _sweep(self, bucket: int) -> None:
+        oldest = bucket - self.buckets
+        expired = [key for key, (_, stamps) in self._entries.items() if max(stamps) <= oldest]
+        for key in expired:
+            del self._entries[key]
+        self.swept += len(expired)
+
+    async def hit(self, key: str, now: float) -> int:
+        bucket = self.bucket_for(now)
+        if now >= self._next_sweep:
+            self._sweep(bucket)
+            self._next_sweep = now + self.sweep_interval_seconds
+
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = ([0] * self.buckets, [-1] * self.buckets)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._entries.move_to_end(key)
+
+        counts, stamps = entry
+        slot = bucket % self.buckets
+        if stamps[slot] != bucket:
+            stamps[slot] = bucket
+            counts[slot] = 0
+        counts[slot] += 1
+        return self.window_total(counts, stamps, bucket)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "size": len(self._entries),
+            "max_keys": self.max_keys,
+            "evictions": self.evictions,
+            "swept": self.swept,
+        }
+
+
+class MongoRateLimitBackend(RateLimitBackend):
+    """
+    Ring buckets stored in one document per identifier:
+        {_id: key, counts: [N ints], stamps: [N bucket numbers], expires_at}
+
+    Requires a TTL index on expires_at (expireAfterSeconds=0), created in
+    server.py:initialize_indexes.
+    """
+
+    name = "mongo"
+
+    def __init__(self, collection, window_seconds: float, buckets: int = 6):
+        super().__init__(window_seconds, buckets)
+        self.collection = collection
+
+    def _update_pipeline(self, bucket: int, expires_at: datetime) -> List[dict]:
+        slot = bucket % self.buckets
+        indexes = {"$range": [0, self.buckets]}
+        return [
+            {"$set": {
+                "counts": {"$ifNull": ["$counts", [0] * self.buckets]},
+                "stamps": {"$ifNull": ["$stamps", [-1] * self.buckets]},
+            }},
+            # Both fields are computed from the previous stage's values
+            {"$set": {
+                "counts": {"$map": {"input": indexes, "as": "i", "in": {"$cond": [
+                    {"$eq": ["$$i", slot]},
+                    {"$cond": [
+                        {"$eq": [{"$arrayElemAt": ["$stamps", slot]}, bucket]},
+                        {"$add": [{"$arrayElemAt": ["$counts", slot]}, 1]},
+                        1,
+                    ]},
+                    {"$arrayElemAt": ["$counts", "$$i"]},
+                ]}}},
+                "stamps": {"$map": {"input": indexes, "as": "i", "in": {"$cond": [
+                    {"$eq": ["$$i", slot]},
+                    bucket,
+                    {"$arrayElemAt": ["$stamps", "$$i"]},
+                ]}}},
+                "expires_at": expires_at,
+            }},
+        ]
+
+    async def hit(self, key: str, now: float) -> int:
+        bucket = self.bucket_for(now)
+        expires_at = datetime.fromtimestamp(now, tz=timezone.utc) + timedelta(seconds=self.window_seconds)
+        doc = await self.collection.find_one_and_update(
+            {"_id": key},
+            self._update_pipeline(bucket, expires_at),
+            projection={"_id": 0, "counts": 1, "stamps": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return self.window_total(doc["counts"], doc["stamps"], bucket)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "collection": self.collection.name}
+
+
+class LoginRateLimiter:
+    """
+    Allows at most max_attempts per identifier inside the sliding window.
+
+    Every call counts as an attempt, including rejected ones. If the primary
+    backend fails (e.g. MongoDB unreachable) the fallback backend is used so
+    the limit still holds per process.
+    """
+
+    def __init__(self, backend: RateLimitBackend, max_attempts: int,
+                 fallback: Optional[RateLimitBackend] = None):
+        self.backend = backend
+        self.max_attempts = int(max_attempts)
+        self.fallback = fallback
+        self.allowed = 0
+        self.rejected = 0
+        self.backend_errors = 0
+
+    async def hit(self, identifier: str, now: float) -> bool:
+        """Record an attempt; returns False if the identifier is over the limit."""
+        try:
+            count = await self.backend.hit(identifier, now)
+        except Exception as e:
+            if self.fallback is None:
+                raise
+            self.backend_errors += 1
+            logger.warning(f"[RATE-LIMIT] {self.backend.name} backend failed, using {self.fallback.name}: {e}")
+            count = await self.fallback.hit(identifier, now)
+
+        if count > self.max_attempts:
+            self.rejected += 1
+            return False
+        self.allowed += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_attempts": self.max_attempts,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "backend_errors": self.backend_errors,
+            "backend": self.backend.stats(),
+            "fallback": self.fallback.stats() if self.fallback else None,
+        }
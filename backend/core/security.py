@@ -2,33 +2,45 @@
 from .imports import *
 from .imports import _rate_limit_exceeded_handler
 from .database import *
+from .cache import *
+from .middleware import *
+from .rate_limit import *
 
 # ==================== RATE LIMITING CONFIGURATION ====================
-# In-memory rate limiting for login brute-force protection
-LOGIN_ATTEMPTS: Dict[str, list] = {}
+# Sliding-window login brute-force protection (see core/rate_limit.py).
+# LOGIN_RATE_LIMIT_BACKEND=mongo shares counters across all uvicorn workers;
+# the in-memory backend is the per-process fallback if MongoDB is unavailable.
 MAX_ATTEMPTS_PER_MINUTE = 5
 BLOCK_WINDOW_SECONDS = 60
+LOGIN_RATE_LIMIT_BUCKETS = int(os.environ.get('LOGIN_RATE_LIMIT_BUCKETS', 6))
+LOGIN_RATE_LIMIT_MAX_KEYS = int(os.environ.get('LOGIN_RATE_LIMIT_MAX_KEYS', 10000))
+LOGIN_RATE_LIMIT_BACKEND = os.environ.get('LOGIN_RATE_LIMIT_BACKEND', 'mongo').lower()
 
-def check_rate_limit(identifier: str) -> None:
+_login_memory_backend = InMemoryRateLimitBackend(
+    window_seconds=BLOCK_WINDOW_SECONDS,
+    buckets=LOGIN_RATE_LIMIT_BUCKETS,
+    max_keys=LOGIN_RATE_LIMIT_MAX_KEYS,
+)
+
+if LOGIN_RATE_LIMIT_BACKEND == 'mongo' and db is not None:
+    login_rate_limiter = LoginRateLimiter(
+        MongoRateLimitBackend(db.login_rate_limits, window_seconds=BLOCK_WINDOW_SECONDS, buckets=LOGIN_RATE_LIMIT_BUCKETS),
+        max_attempts=MAX_ATTEMPTS_PER_MINUTE,
+        fallback=_login_memory_backend,
+    )
+else:
+    login_rate_limiter = LoginRateLimiter(_login_memory_backend, max_attempts=MAX_ATTEMPTS_PER_MINUTE)
+
+async def check_rate_limit(identifier: str) -> None:
     """
     Check if the identifier (email:ip) has exceeded rate limits.
     Raises HTTPException 429 if too many attempts.
     """
-    now = get_time()
-    attempts = LOGIN_ATTEMPTS.get(identifier, [])
-    
-    # Filter out old attempts outside the window
-    attempts = [ts for ts in attempts if now - ts < BLOCK_WINDOW_SECONDS]
-    
-    if len(attempts) >= MAX_ATTEMPTS_PER_MINUTE:
+    if not await login_rate_limiter.hit(identifier, get_time()):
         raise HTTPException(
             status_code=429,
             detail="Too many login attempts. Please try again later."
         )
-    
-    # Record this attempt
-    attempts.append(now)
-    LOGIN_ATTEMPTS[identifier] = attempts
 
 # ==================== PHASE 3: LOGGING CONFIGURATION ====================
 LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG' if ENVIRONMENT == 'development' else 'INFO').upper()
@@ -57,7 +69,31 @@ app = FastAPI(
 # ==================== RATE LIMITING CONFIGURATION (2026-03-01) ====================
 # Global rate limiter using slowapi
 # Limits per IP address to prevent abuse
-limiter = Limiter(key_func=get_remote_address)
+# Default: in-memory counters (per process, no I/O on the request path).
+# RATE_LIMIT_STORAGE=mongo uses the `limits` mongodb:// storage so limits are
+# shared across workers. slowapi calls storage synchronously, so every
+# rate-limited request then makes a blocking MongoDB round trip on the event
+# loop: only enable it with a low-latency MongoDB. Short timeouts bound the
+# stall, and an outage falls back to in-memory limits.
+RATE_LIMIT_STORAGE = os.environ.get('RATE_LIMIT_STORAGE', 'memory').lower()
+
+if RATE_LIMIT_STORAGE == 'mongo':
+    limiter = Limiter(
+        key_func=get_remote_address,
+        storage_uri=mongo_url,
+        storage_options={
+            "database_name": db_name,
+            "counter_collection_name": "rate_limit_counters",
+            "window_collection_name": "rate_limit_windows",
+            "serverSelectionTimeoutMS": 200,
+            "connectTimeoutMS": 200,
+            "socketTimeoutMS": 200,
+        },
+        in_memory_fallback_enabled=True,
+    )
+else:
+    limiter = Limiter(key_func=get_remote_address)
+logger.info(f"[RATE-LIMIT] slowapi storage: {RATE_LIMIT_STORAGE}")
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -114,102 +150,115 @@ SANITIZE_FIELDS = [
 
 logger.info(f"[SECURITY] Input sanitization enabled for fields: {SANITIZE_FIELDS}")
 
-# ==================== PHASE 2: REQUEST ID MIDDLEWARE ====================
-@app.middleware("http")
-async def request_id_middleware(request: Request, call_next):
+# ==================== ACCESS TOKEN (PER REQUEST) ====================
+def get_request_token_payload(request: Request, token: Optional[str] = None) -> Optional[dict]:
     """
-    Middleware that generates a unique request_id for each request.
-    - Stores in request.state.request_id for access in handlers
-    - Adds X-Request-ID header to response for client tracking
-    """
-    request_id = str(uuid.uuid4())
-    request.state.request_id = request_id
+    Decode the request's bearer access token at most once per request.
     
-    # Optional: Log request start (debug level)
-    if LOG_LEVEL == 'DEBUG':
-        logger.debug(f"[REQUEST-START] {request_id} | {request.method} {request.url.path}")
+    The result is memoized on request.state so billing_block_guard and
+    get_current_user share a single jwt.decode. Returns None for a missing,
+    invalid, expired or non-access token.
+    """
+    if token is None:
+        auth_header = request.headers.get("Authorization", "")
+        if not auth_header.startswith("Bearer "):
+            return None
+        token = auth_header.split(" ")[1]
     
-    # Process request
-    response = await call_next(request)
+    cached = getattr(request.state, "access_token", None)
+    if cached is not None and cached[0] == token:
+        return cached[1]
     
-    # Add request_id header to response
-    response.headers["X-Request-ID"] = request_id
+    try:
+        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        if payload.get("type") != "access":
+            payload = None
+    except jwt.PyJWTError:
+        payload = None
     
-    # Security headers
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-    response.headers["Content-Security-Policy"] = "default-src 'self'; script-src 'self' 'unsafe-inline' 'unsafe-eval'; style-src 'self' 'unsafe-inline' https://fonts.googleapis.com https://cdnjs.cloudflare.com; font-src 'self' https://fonts.gstatic.com https://cdnjs.cloudflare.com; img-src 'self' data: blob: https:; connect-src 'self' https://*.emergentagent.com https://*.stripe.com https://*.genturix.com; frame-src https://*.stripe.com"
+    request.state.access_token = (token, payload)
+    return payload
+
+# ==================== PARTIAL BILLING BLOCK ====================
+BILLING_ALWAYS_ALLOWED_PREFIXES = ("/api/auth/", "/api/health", "/api/billing/", "/api/super-admin/", "/api/push/")
+BILLING_BLOCKED_METHODS = frozenset(["POST", "PUT", "DELETE", "PATCH"])
+
+async def get_billing_state(condominium_id: str) -> Optional[dict]:
+    """
+    Return {"billing_status", "is_demo"} for a condominium, served from
+    billing_state_cache. Returns None if the condominium does not exist.
+    """
+    state = billing_state_cache.get(condominium_id)
+    if state is not None:
+        return state
     
-    # Optional: Log request completion (debug level)
-    if LOG_LEVEL == 'DEBUG':
-        logger.debug(f"[REQUEST-END] {request_id} | Status: {response.status_code}")
+    condo = await db.condominiums.find_one(
+        {"id": condominium_id},
+        {"_id": 0, "billing_status": 1, "is_demo": 1, "environment": 1}
+    )
+    if not condo:
+        return None
     
-    return response
+    state = {
+        "billing_status": condo.get("billing_status", "active"),
+        "is_demo": bool(condo.get("is_demo") or condo.get("environment") == "demo"),
+    }
+    billing_state_cache.set(condominium_id, state)
+    return state
 
-# ==================== PARTIAL BILLING BLOCK MIDDLEWARE ====================
-@app.middleware("http")
-async def billing_block_middleware(request: Request, call_next):
+async def billing_block_guard(request: Request) -> Optional[JSONResponse]:
     """
-    Middleware for partial blocking of suspended condominiums.
+    Partial blocking of suspended condominiums (runs in RequestContextMiddleware).
     
     - Blocks POST/PUT/DELETE/PATCH for suspended condos
     - Allows GET requests (dashboard, queries)
     - Always allows: auth, health, billing, super-admin routes
-    """
-    # Always allow certain routes
-    always_allowed = ["/api/auth/", "/api/health", "/api/billing/", "/api/super-admin/", "/api/push/"]
-    path = request.url.path
-    
-    for allowed in always_allowed:
-        if path.startswith(allowed):
-            return await call_next(request)
     
+    Returns the 402 response to send, or None to let the request through.
+    """
     # Only block POST/PUT/DELETE/PATCH
-    if request.method.upper() not in ["POST", "PUT", "DELETE", "PATCH"]:
-        return await call_next(request)
+    if request.method.upper() not in BILLING_BLOCKED_METHODS:
+        return None
+    
+    # Always allow certain routes
+    if request.url.path.startswith(BILLING_ALWAYS_ALLOWED_PREFIXES):
+        return None
     
-    # Try to get user from token
+    # Try to get user from token (invalid tokens are left to get_current_user)
     try:
-        auth_header = request.headers.get("Authorization", "")
-        if auth_header.startswith("Bearer "):
-            token = auth_header.split(" ")[1]
-            payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-            
+        payload = get_request_token_payload(request)
+        if payload:
             # SuperAdmins are never blocked
             roles = payload.get("roles", [])
             if "SuperAdmin" in roles:
-                return await call_next(request)
+                return None
             
             condominium_id = payload.get("condominium_id")
             if condominium_id:
-                # Check billing status
-                condo = await db.condominiums.find_one(
-                    {"id": condominium_id},
-                    {"_id": 0, "billing_status": 1, "is_demo": 1, "environment": 1}
-                )
-                
-                if condo:
-                    # Demo condos are never blocked
-                    if condo.get("is_demo") or condo.get("environment") == "demo":
-                        return await call_next(request)
-                    
-                    billing_status = condo.get("billing_status", "active")
-                    if billing_status == "suspended":
-                        return JSONResponse(
-                            status_code=402,
-                            content={
-                                "detail": "Cuenta suspendida por falta de pago. Solo consultas permitidas.",
-                                "billing_status": "suspended",
-                                "action_required": "payment"
-                            }
-                        )
-    except jwt.PyJWTError:
-        pass  # Let the request continue, auth middleware will handle invalid tokens
+                # Check billing status (demo condos are never blocked)
+                state = await get_billing_state(condominium_id)
+                if state and not state["is_demo"] and state["billing_status"] == "suspended":
+                    return JSONResponse(
+                        status_code=402,
+                        content={
+                            "detail": "Cuenta suspendida por falta de pago. Solo consultas permitidas.",
+                            "billing_status": "suspended",
+                            "action_required": "payment"
+                        }
+                    )
     except Exception as e:
         logger.debug(f"[BILLING-BLOCK] Non-blocking error: {e}")
     
-    return await call_next(request)
+    return None
+
+# ==================== REQUEST CONTEXT MIDDLEWARE ====================
+# Single pure ASGI layer: request_id + security headers + billing block.
+# See core/middleware.py and scripts/bench_middleware.py.
+app.add_middleware(
+    RequestContextMiddleware,
+    guard=billing_block_guard,
+    debug_log=LOG_LEVEL == 'DEBUG',
+)
 
 # ==================== PHASE 1: GLOBAL EXCEPTION HANDLERS ====================
 from starlette.exceptions import HTTPException as StarletteHTTPException
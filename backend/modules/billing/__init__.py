@@ -37,7 +37,10 @@ from .service import (
     init_service,
     send_billing_notification_email,
     check_and_log_email_sent,
+    release_email_log,
+    send_billing_email_once,
     log_email_sent,
+    ensure_billing_email_log_index,
     log_billing_engine_event,
     update_condominium_billing_status
 )
@@ -76,7 +79,10 @@ __all__ = [
     'init_service',
     'send_billing_notification_email',
     'check_and_log_email_sent',
+    'release_email_log',
+    'send_billing_email_once',
     'log_email_sent',
+    'ensure_billing_email_log_index',
     'log_billing_engine_event',
     'update_condominium_billing_status',
     # Scheduler
@@ -14,9 +14,7 @@ from apscheduler.triggers.cron import CronTrigger
 
 from .service import (
     DEFAULT_GRACE_PERIOD_DAYS,
-    send_billing_notification_email,
-    check_and_log_email_sent,
-    log_email_sent,
+    send_billing_email_once,
     log_billing_engine_event
 )
 
@@ -46,6 +44,8 @@ async def process_billing_for_condominium(condo: dict, now: datetime, today_str:
     
     Returns a dict with processing results.
     """
+    from core.cache import refresh_billing_state
+    
     condo_id = condo.get("id")
     condo_name = condo.get("name", "Unknown")
     current_status = condo.get("billing_status", "active")
@@ -94,23 +94,19 @@ async def process_billing_for_condominium(condo: dict, now: datetime, today_str:
     if current_status == "active":
         # 3 days before reminder
         if days_until_due == 3:
-            if not await check_and_log_email_sent(condo_id, "reminder_3_days", today_str):
-                if await send_billing_notification_email(
-                    "reminder_3_days", billing_email, condo_name, 
-                    next_invoice_amount, due_date_formatted, paid_seats
-                ):
-                    await log_email_sent(condo_id, "reminder_3_days", billing_email, today_str)
-                    result["email_sent"] = "reminder_3_days"
+            if await send_billing_email_once(
+                condo_id, "reminder_3_days", today_str, billing_email, condo_name,
+                next_invoice_amount, due_date_formatted, paid_seats
+            ):
+                result["email_sent"] = "reminder_3_days"
         
         # Due today reminder
         elif days_until_due == 0:
-            if not await check_and_log_email_sent(condo_id, "reminder_due_today", today_str):
-                if await send_billing_notification_email(
-                    "reminder_due_today", billing_email, condo_name,
-                    next_invoice_amount, due_date_formatted, paid_seats
-                ):
-                    await log_email_sent(condo_id, "reminder_due_today", billing_email, today_str)
-                    result["email_sent"] = "reminder_due_today"
+            if await send_billing_email_once(
+                condo_id, "reminder_due_today", today_str, billing_email, condo_name,
+                next_invoice_amount, due_date_formatted, paid_seats
+            ):
+                result["email_sent"] = "reminder_due_today"
     
     # ===== STATUS TRANSITIONS (after due date) =====
     if days_diff > 0:  # Past due date
@@ -130,6 +126,7 @@ async def process_billing_for_condominium(condo: dict, now: datetime, today_str:
                         "updated_at": now.isoformat()
                     }}
                 )
+                refresh_billing_state(condo_id, "past_due", is_demo=False)
                 result["new_status"] = "past_due"
                 result["action_taken"] = "transitioned_to_past_due"
                 
@@ -152,15 +149,13 @@ async def process_billing_for_condominium(condo: dict, now: datetime, today_str:
                 )
                 
                 # Send past_due email
-                if not await check_and_log_email_sent(condo_id, "status_past_due", today_str):
-                    if await send_billing_notification_email(
-                        "status_past_due", billing_email, condo_name,
-                        balance_due,  # Show remaining balance, not full invoice
-                        due_date_formatted, paid_seats,
-                        days_overdue, grace_period
-                    ):
-                        await log_email_sent(condo_id, "status_past_due", billing_email, today_str)
-                        result["email_sent"] = "status_past_due"
+                if await send_billing_email_once(
+                    condo_id, "status_past_due", today_str, billing_email, condo_name,
+                    balance_due,  # Show remaining balance, not full invoice
+                    due_date_formatted, paid_seats,
+                    days_overdue, grace_period
+                ):
+                    result["email_sent"] = "status_past_due"
             elif not has_balance_due:
                 result["action_taken"] = "skipped_fully_paid"
         
@@ -175,6 +170,7 @@ async def process_billing_for_condominium(condo: dict, now: datetime, today_str:
                         "updated_at": now.isoformat()
                     }}
                 )
+                refresh_billing_state(condo_id, "suspended", is_demo=False)
                 result["new_status"] = "suspended"
                 result["action_taken"] = "transitioned_to_suspended"
                 
@@ -197,15 +193,13 @@ async def process_billing_for_condominium(condo: dict, now: datetime, today_str:
                 )
                 
                 # Send suspended email
-                if not await check_and_log_email_sent(condo_id, "status_suspended", today_str):
-                    if await send_billing_notification_email(
-                        "status_suspended", billing_email, condo_name,
-                        balance_due,  # Show remaining balance
-                        due_date_formatted, paid_seats,
-                        days_overdue, grace_period
-                    ):
-                        await log_email_sent(condo_id, "status_suspended", billing_email, today_str)
-                        result["email_sent"] = "status_suspended"
+                if await send_billing_email_once(
+                    condo_id, "status_suspended", today_str, billing_email, condo_name,
+                    balance_due,  # Show remaining balance
+                    due_date_formatted, paid_seats,
+                    days_overdue, grace_period
+                ):
+                    result["email_sent"] = "status_suspended"
             elif not has_balance_due:
                 result["action_taken"] = "skipped_fully_paid"
     
@@ -6,12 +6,14 @@ Extracted from server.py without logic changes.
 """
 
 import uuid
-import asyncio
 import logging
 from datetime import datetime, timezone, timedelta
 from typing import Optional, Callable
 
-import resend
+from pymongo.errors import DuplicateKeyError
+
+from services.email_outbox import enqueue_email
+from services.email_templates import register_template, render_template
 
 # These will be set by the main app on initialization
 db = None
@@ -179,6 +181,11 @@ BILLING_EMAIL_TEMPLATES = {
     }
 }
 
+# Compiled once into the email template registry (bodies HTML-escaped, subjects plain text)
+for _email_type, _template_config in BILLING_EMAIL_TEMPLATES.items():
+    register_template(f"billing_{_email_type}", _template_config["template"])
+    register_template(f"billing_{_email_type}_subject", _template_config["subject"], autoescape=False)
+
 
 async def send_billing_notification_email(
     email_type: str,
@@ -189,11 +196,13 @@ async def send_billing_notification_email(
     seats: int = 0,
     days_overdue: int = 0,
     grace_days: int = DEFAULT_GRACE_PERIOD_DAYS,
-    next_due_date: str = ""
+    next_due_date: str = "",
+    condominium_id: str = None,
+    idempotency_key: str = None
 ) -> bool:
     """
-    Send billing notification email using Resend.
-    Returns True if successful, False otherwise.
+    Queue a billing notification email (delivered by the email outbox worker).
+    Returns True if queued (or already queued under idempotency_key), False otherwise.
     """
     if not RESEND_API_KEY or RESEND_API_KEY == "your_resend_api_key_here":
         logger.warning(f"[BILLING-EMAIL] Skipping email - Resend not configured")
@@ -205,8 +214,9 @@ async def send_billing_notification_email(
         return False
     
     try:
-        subject = template_config["subject"].format(condo_name=condo_name)
-        html_content = template_config["template"].format(
+        subject = render_template(f"billing_{email_type}_subject", condo_name=condo_name)
+        html_content = render_template(
+            f"billing_{email_type}",
             condo_name=condo_name,
             amount=f"{amount:,.2f}",
             due_date=due_date,
@@ -216,37 +226,88 @@ async def send_billing_notification_email(
             next_due_date=next_due_date
         )
         
-        params = {
-            "from": SENDER_EMAIL,
-            "to": [recipient_email],
-            "subject": subject,
-            "html": html_content
-        }
-        
-        await asyncio.to_thread(resend.Emails.send, params)
-        logger.info(f"[BILLING-EMAIL] Sent {email_type} to {recipient_email} for {condo_name}")
+        queued = await enqueue_email(
+            to=recipient_email,
+            subject=subject,
+            html=html_content,
+            email_type=f"billing_{email_type}",
+            idempotency_key=idempotency_key,
+            sender=SENDER_EMAIL,
+            condominium_id=condominium_id
+        )
+        if not queued.get("queued") and not queued.get("duplicate"):
+            logger.warning(f"[BILLING-EMAIL] {email_type} to {recipient_email} not queued: {queued.get('reason')}")
+            return False
+        logger.info(f"[BILLING-EMAIL] Queued {email_type} to {recipient_email} for {condo_name}")
         return True
         
     except Exception as e:
-        logger.error(f"[BILLING-EMAIL] Failed to send {email_type}: {e}")
+        logger.error(f"[BILLING-EMAIL] Failed to queue {email_type}: {e}")
         return False
 
 
 async def check_and_log_email_sent(
     condominium_id: str,
     email_type: str,
-    today_str: str
+    today_str: str,
+    recipient_email: str = None
 ) -> bool:
     """
-    Check if an email of this type was already sent today.
-    Returns True if already sent, False if not.
+    Claim today's email of this type for the condominium.
+    
+    One insert against the unique (condominium_id, email_type, sent_date)
+    index, so concurrent scheduler runs cannot both send it.
+    Returns True if it was already claimed (skip), False if this call claimed it.
     """
-    existing = await db.billing_email_log.find_one({
+    try:
+        await db.billing_email_log.insert_one({
+            "condominium_id": condominium_id,
+            "email_type": email_type,
+            "recipient_email": recipient_email,
+            "sent_date": today_str,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        })
+    except DuplicateKeyError:
+        return True
+    return False
+
+
+async def release_email_log(condominium_id: str, email_type: str, today_str: str):
+    """Undo check_and_log_email_sent() when the email could not be queued."""
+    await db.billing_email_log.delete_one({
         "condominium_id": condominium_id,
         "email_type": email_type,
         "sent_date": today_str
     })
-    return existing is not None
+
+
+async def send_billing_email_once(
+    condominium_id: str,
+    email_type: str,
+    today_str: str,
+    recipient_email: str,
+    condo_name: str,
+    amount: float,
+    due_date: str,
+    seats: int = 0,
+    days_overdue: int = 0,
+    grace_days: int = DEFAULT_GRACE_PERIOD_DAYS
+) -> bool:
+    """
+    Queue a scheduler email at most once per condominium, type and day.
+    Returns True if this call queued it.
+    """
+    if await check_and_log_email_sent(condominium_id, email_type, today_str, recipient_email):
+        return False
+    queued = await send_billing_notification_email(
+        email_type, recipient_email, condo_name, amount, due_date, seats,
+        days_overdue, grace_days,
+        condominium_id=condominium_id,
+        idempotency_key=f"billing:{condominium_id}:{email_type}:{today_str}"
+    )
+    if not queued:
+        await release_email_log(condominium_id, email_type, today_str)
+    return queued
 
 
 async def log_email_sent(
@@ -256,13 +317,40 @@ async def log_email_sent(
     today_str: str
 ):
     """Log that an email was sent to prevent duplicates."""
-    await db.billing_email_log.insert_one({
-        "condominium_id": condominium_id,
-        "email_type": email_type,
-        "recipient_email": recipient_email,
-        "sent_date": today_str,
-        "created_at": datetime.now(timezone.utc).isoformat()
-    })
+    await db.billing_email_log.update_one(
+        {"condominium_id": condominium_id, "email_type": email_type, "sent_date": today_str},
+        {"$setOnInsert": {
+            "recipient_email": recipient_email,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }},
+        upsert=True
+    )
+
+
+async def ensure_billing_email_log_index(database):
+    """
+    Make (condominium_id, email_type, sent_date) unique in billing_email_log.
+    Older deployments have a non-unique index and may contain duplicates
+    from concurrent runs: keep the oldest entry, drop the old index.
+    """
+    keys = [("condominium_id", 1), ("email_type", 1), ("sent_date", 1)]
+    for name, info in (await database.billing_email_log.index_information()).items():
+        if info.get("key") == keys and not info.get("unique"):
+            duplicates = await database.billing_email_log.aggregate([
+                {"$sort": {"_id": 1}},
+                {"$group": {
+                    "_id": {"c": "$condominium_id", "t": "$email_type", "d": "$sent_date"},
+                    "ids": {"$push": "$_id"},
+                    "count": {"$sum": 1}
+                }},
+                {"$match": {"count": {"$gt": 1}}}
+            ]).to_list(None)
+            extra_ids = [doc_id for group in duplicates for doc_id in group["ids"][1:]]
+            if extra_ids:
+                await database.billing_email_log.delete_many({"_id": {"$in": extra_ids}})
+            await database.billing_email_log.drop_index(name)
+            logger.info(f"[DB-INDEX] billing_email_log: replaced non-unique index (removed {len(extra_ids)} duplicates)")
+    await database.billing_email_log.create_index(keys, unique=True, background=True)
 
 
 async def update_condominium_billing_status(
@@ -294,6 +382,13 @@ async def update_condominium_billing_status(
         {"$set": update_data}
     )
     
+    from core.cache import refresh_billing_state
+    refresh_billing_state(
+        condominium_id,
+        new_status,
+        is_demo=bool(condo.get("is_demo") or condo.get("environment") == "demo")
+    )
+    
     # Log event
     await log_billing_engine_event(
         event_type="status_changed",
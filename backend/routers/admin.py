@@ -162,7 +162,7 @@ async def create_user_by_admin(
     user_doc = {
         "id": user_id,
         "email": normalized_email,  # Use normalized email
-        "hashed_password": hash_password(password_to_use),
+        "hashed_password": await hash_password_async(password_to_use),
         "full_name": user_data.full_name,
         "roles": [user_data.role],
         "condominium_id": condominium_id,
@@ -216,32 +216,23 @@ async def create_user_by_admin(
             role=user_data.role,
             condominium_name=condo_name,
             temporary_password=password_to_use,
-            login_url=login_url
+            login_url=login_url,
+            user_id=user_id,
+            actor_id=current_user["id"],
+            condominium_id=condominium_id
         )
         
-        # Update user document with email status
-        email_sent = email_result.get("status") == "success"
+        # Queued: the email outbox sets credentials_email_sent and logs
+        # CREDENTIALS_EMAIL_SENT / _FAILED once the email is delivered or fails
+        email_queued = email_result.get("status") == "queued"
         await db.users.update_one(
-            {"id": user_id},
-            {"$set": {"credentials_email_sent": email_sent}}
+            # The outbox may already have recorded the outcome
+            {"id": user_id, "credentials_email_status": {"$exists": False}},
+            {"$set": {"credentials_email_status": email_result.get("status")}}
         )
         
-        # Log email dispatch
-        if email_sent:
-            await log_audit_event(
-                AuditEventType.CREDENTIALS_EMAIL_SENT,
-                current_user["id"],
-                "admin",
-                {
-                    "user_id": user_id,
-                    "recipient_email": user_data.email,
-                    "role": user_data.role,
-                    "condominium_id": condominium_id
-                },
-                request.client.host if request.client else "unknown",
-                request.headers.get("user-agent", "unknown")
-            )
-        else:
+        # Log email dispatch failure (nothing was queued)
+        if not email_queued:
             await log_audit_event(
                 AuditEventType.CREDENTIALS_EMAIL_FAILED,
                 current_user["id"],
@@ -275,8 +266,8 @@ async def create_user_by_admin(
     
     if send_email:
         response["email_status"] = email_result.get("status", "unknown")
-        if email_result.get("status") == "success":
-            response["email_message"] = f"Credenciales enviadas a {user_data.email}"
+        if email_result.get("status") == "queued":
+            response["email_message"] = f"Credenciales en cola de envío a {user_data.email}"
         elif email_result.get("status") == "skipped":
             if email_result.get("toggle_disabled"):
                 response["email_message"] = "Envío de emails deshabilitado (modo pruebas) - credenciales mostradas en pantalla"
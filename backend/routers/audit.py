@@ -417,7 +417,7 @@ async def get_recent_activity(current_user = Depends(get_current_user)):
         })
     
     # 2. Visitor entries (check-ins)
-    entries = await db.visitor_entries.find(condo_query, {"_id": 0}).sort("entry_at", -1).to_list(10)
+    entries = await db.visitor_entries.find(condo_query, {"_id": 0, "search_keys": 0}).sort("entry_at", -1).to_list(10)
     for entry in entries:
         activities.append({
             "id": entry.get("id"),
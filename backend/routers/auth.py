@@ -42,7 +42,7 @@ async def register(request: Request, user_data: UserCreate):
         "id": user_id,
         "email": user_data.email,
         "full_name": user_data.full_name,
-        "hashed_password": hash_password(user_data.password),
+        "hashed_password": await hash_password_async(user_data.password),
         "roles": forced_role,
         "condominium_id": user_data.condominium_id,
         "is_active": True,
@@ -92,12 +92,12 @@ async def login(request: Request, credentials: UserLogin):
     
     print(f"[AUTH EVENT] Login attempt | email={normalized_email} | ip={client_ip} | request_id={request_id}")
     
-    check_rate_limit(rate_limit_identifier)
+    await check_rate_limit(rate_limit_identifier)
     
     # ==================== AUTHENTICATION ====================
     user = await db.users.find_one({"email": normalized_email})
     
-    if not user or not verify_password(credentials.password, user.get("hashed_password", "")):
+    if not user or not await verify_password_async(credentials.password, user.get("hashed_password", "")):
         print(f"[AUTH EVENT] Login FAILED | email={normalized_email} | ip={client_ip} | reason=invalid_credentials")
         await log_audit_event(
             AuditEventType.LOGIN_FAILURE,
@@ -114,6 +114,9 @@ async def login(request: Request, credentials: UserLogin):
         print(f"[AUTH EVENT] Login BLOCKED | email={normalized_email} | reason=account_inactive")
         raise HTTPException(status_code=403, detail="User account is inactive")
     
+    # Upgrade hash if BCRYPT_ROUNDS changed since it was created
+    await rehash_password_if_needed(user["id"], credentials.password, user.get("hashed_password", ""))
+    
     # Check if password reset is required
     password_reset_required = user.get("password_reset_required", False)
     
@@ -414,14 +417,14 @@ async def change_password(
     # SECURITY: Rate limiting for password change attempts
     client_ip = request.client.host if request.client else "unknown"
     rate_limit_identifier = f"change_pwd:{current_user['id']}:{client_ip}"
-    check_rate_limit(rate_limit_identifier)
+    await check_rate_limit(rate_limit_identifier)
     
     # Verify current password
     user = await db.users.find_one({"id": current_user["id"]})
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
-    if not verify_password(password_data.current_password, user.get("hashed_password", "")):
+    if not await verify_password_async(password_data.current_password, user.get("hashed_password", "")):
         raise HTTPException(status_code=400, detail="Contraseña actual incorrecta")
     
     # Check new password is different from current
@@ -440,12 +443,13 @@ async def change_password(
         {"id": current_user["id"]},
         {
             "$set": {
-                "hashed_password": hash_password(password_data.new_password),
+                "hashed_password": await hash_password_async(password_data.new_password),
                 "password_reset_required": False,
                 "password_changed_at": password_changed_at
             }
         }
     )
+    invalidate_principal(current_user["id"])
     
     # Log audit event with full context
     await log_audit_event(
@@ -694,13 +698,14 @@ async def reset_password_with_code(
         {"email": email},
         {
             "$set": {
-                "hashed_password": hash_password(new_password),
+                "hashed_password": await hash_password_async(new_password),
                 "password_changed_at": password_changed_at,
                 "password_reset_required": False,
                 "updated_at": password_changed_at
             }
         }
     )
+    invalidate_principal(user.get("id"))
     
     # Delete used code (single use)
     await db.password_reset_codes.delete_one({"email": email})
@@ -354,7 +354,7 @@ async def create_demo_with_test_data(
         admin_doc = {
             "id": admin_id,
             "email": request_data.admin_email.lower(),
-            "hashed_password": hash_password(admin_password),
+            "hashed_password": await hash_password_async(admin_password),
             "full_name": request_data.admin_name,
             "roles": [RoleEnum.ADMINISTRADOR.value],
             "condominium_id": condo_id,
@@ -383,7 +383,7 @@ async def create_demo_with_test_data(
             guard1_doc = {
                 "id": guard1_id,
                 "email": guard1_email,
-                "hashed_password": hash_password(guard1_password),
+                "hashed_password": await hash_password_async(guard1_password),
                 "full_name": "Carlos Seguridad",
                 "roles": [RoleEnum.GUARDA.value],
                 "condominium_id": condo_id,
@@ -408,7 +408,7 @@ async def create_demo_with_test_data(
             guard2_doc = {
                 "id": guard2_id,
                 "email": guard2_email,
-                "hashed_password": hash_password(guard2_password),
+                "hashed_password": await hash_password_async(guard2_password),
                 "full_name": "María Vigilancia",
                 "roles": [RoleEnum.GUARDA.value],
                 "condominium_id": condo_id,
@@ -443,7 +443,7 @@ async def create_demo_with_test_data(
                 res_doc = {
                     "id": res_id,
                     "email": res_email,
-                    "hashed_password": hash_password(res_password),
+                    "hashed_password": await hash_password_async(res_password),
                     "full_name": resident["name"],
                     "roles": [RoleEnum.RESIDENTE.value],
                     "condominium_id": condo_id,
@@ -603,6 +603,9 @@ async def update_condominium(
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Condominium not found")
     
+    if "modules" in update_fields:
+        invalidate_module_config(condo_id)
+    
     await log_audit_event(
         AuditEventType.SECURITY_ALERT, current_user["id"], "condominiums",
         {"action": "condominium_updated", "condo_id": condo_id},
@@ -626,6 +629,7 @@ async def deactivate_condominium(
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Condominium not found")
+    await refresh_push_directory_condominium(condo_id)
     
     await log_audit_event(
         AuditEventType.SECURITY_ALERT, current_user["id"], "condominiums",
@@ -729,6 +733,9 @@ async def update_module_config(
         logger.error(f"[module-toggle] No document matched for condo_id={condo_id}")
         raise HTTPException(status_code=404, detail="Condominium not found")
     
+    # Module gating must see the change immediately (this worker); others within MODULE_CACHE_TTL_SECONDS
+    invalidate_module_config(condo_id)
+    
     logger.info(f"[module-toggle] SUCCESS: Module '{module_name}' {'enabled' if enabled else 'disabled'} for condo {condo_id}. Modified: {result.modified_count}")
     await log_audit_event(
         AuditEventType.SECURITY_ALERT, current_user["id"], "condominiums",
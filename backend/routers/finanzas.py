@@ -926,6 +926,7 @@ async def delete_unit(
         {"condominium_id": condo_id, "apartment": unit_number},
         {"$set": {"apartment": None, "role_data.apartment_number": None}},
     )
+    invalidate_all_principals()
 
     await log_audit_event(
         AuditEventType.SECURITY_ALERT, current_user["id"], "units",
@@ -962,6 +963,7 @@ async def assign_user_to_unit(
         {"id": user_id},
         {"$set": {"apartment": unit["number"], "role_data.apartment_number": unit["number"]}},
     )
+    invalidate_principal(user_id)
 
     await log_audit_event(
         AuditEventType.SECURITY_ALERT, current_user["id"], "units",
@@ -991,6 +993,7 @@ async def unassign_user_from_unit(
         {"id": user_id, "condominium_id": condo_id},
         {"$set": {"apartment": None, "role_data.apartment_number": None}},
     )
+    invalidate_principal(user_id)
 
     await log_audit_event(
         AuditEventType.SECURITY_ALERT, current_user["id"], "units",
@@ -1027,6 +1030,7 @@ async def assign_unit_to_user(
             "apartment": payload.unit_id,
         }},
     )
+    invalidate_principal(payload.user_id)
 
     # Also ensure unit_account exists
     existing = await db.unit_accounts.find_one({"condominium_id": condo_id, "unit_id": payload.unit_id})
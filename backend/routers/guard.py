@@ -222,7 +222,7 @@ async def get_guard_history(
     if condo_id:
         visitor_query["condominium_id"] = condo_id
     
-    visitor_entries = await db.visitor_entries.find(visitor_query, {"_id": 0}).sort("entry_at", -1).to_list(50)
+    visitor_entries = await db.visitor_entries.find(visitor_query, {"_id": 0, "search_keys": 0}).sort("entry_at", -1).to_list(50)
     
     for entry in visitor_entries:
         # Add check-in event
@@ -46,6 +46,8 @@ async def create_guard(guard: GuardCreate, request: Request, current_user = Depe
         {"id": guard.user_id},
         {"$addToSet": {"roles": "Guarda"}}
     )
+    invalidate_principal(guard.user_id)
+    await refresh_push_directory_user(guard.user_id)
     
     await log_audit_event(
         AuditEventType.USER_UPDATED, current_user["id"], "hr",
@@ -1227,7 +1229,7 @@ async def hire_candidate(
     user_doc = {
         "id": user_id,
         "email": candidate["email"],
-        "hashed_password": hash_password(hire_data.password),
+        "hashed_password": await hash_password_async(hire_data.password),
         "full_name": candidate["full_name"],
         "roles": [role.value],
         "condominium_id": condominium_id,
@@ -1357,7 +1359,7 @@ async def create_employee_directly(
     user_doc = {
         "id": user_id,
         "email": employee.email,
-        "hashed_password": hash_password(employee.password),
+        "hashed_password": await hash_password_async(employee.password),
         "full_name": employee.full_name,
         "roles": [RoleEnum.GUARDA.value],
         "condominium_id": condominium_id,
@@ -1430,6 +1432,8 @@ async def deactivate_employee(
             {"id": user_id},
             {"$set": {"is_active": False}}
         )
+        invalidate_principal(user_id)
+        await refresh_push_directory_user(user_id)
     
     # Get employee name safely
     employee_name = guard.get("user_name") or guard.get("name") or guard.get("full_name") or "desconocido"
@@ -1469,6 +1473,8 @@ async def activate_employee(
             {"id": user_id},
             {"$set": {"is_active": True}}
         )
+        invalidate_principal(user_id)
+        await refresh_push_directory_user(user_id)
     
     # Get employee name safely
     employee_name = guard.get("user_name") or guard.get("name") or guard.get("full_name") or "desconocido"
@@ -504,7 +504,7 @@ async def process_access_request(
             "id": str(uuid.uuid4()),
             "email": access_request["email"],
             "full_name": access_request["full_name"],
-            "hashed_password": hash_password(temp_password),
+            "hashed_password": await hash_password_async(temp_password),
             "roles": ["Residente"],
             "condominium_id": condo_id,
             "is_active": True,
@@ -765,6 +765,7 @@ async def confirm_sinpe_payment(
         {"id": condominium_id},
         {"$set": update_data}
     )
+    refresh_billing_state(condominium_id, new_status)
     
     # Log billing event with partial payment details
     event_data = {
@@ -806,7 +807,8 @@ async def confirm_sinpe_payment(
                 payment_data.amount_paid,
                 now.strftime("%d/%m/%Y"),
                 paid_seats,
-                next_due_date=next_billing.strftime("%d/%m/%Y") if next_billing else ""
+                next_due_date=next_billing.strftime("%d/%m/%Y") if next_billing else "",
+                condominium_id=condominium_id
             )
         # For partial payments, we could add a specific email template later
     
@@ -1154,6 +1156,7 @@ async def approve_seat_upgrade(
                 "updated_at": now.isoformat()
             }}
         )
+        refresh_billing_state(condo_id, "upgrade_pending")
         
         # Update request
         await db.seat_upgrade_requests.update_one(
@@ -1918,6 +1921,7 @@ async def stripe_subscription_webhook(request: Request):
                         }
                     }
                 )
+                refresh_billing_state(condo_id, "active", is_demo=False)
                 
                 # Update transaction status
                 await db.billing_transactions.update_one(
@@ -2255,6 +2259,8 @@ async def update_condominium_billing(
         update_data["stripe_subscription_id"] = stripe_subscription_id
     
     await db.condominiums.update_one({"id": condo_id}, {"$set": update_data})
+    if billing_status is not None:
+        refresh_billing_state(condo_id, billing_status)
     
     await log_billing_event(
         "billing_updated_by_superadmin",
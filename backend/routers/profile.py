@@ -99,6 +99,7 @@ async def update_profile(profile_data: ProfileUpdate, current_user = Depends(get
         {"id": current_user["id"]},
         {"$set": update_fields}
     )
+    invalidate_principal(current_user["id"])
     
     # Fetch updated user - exclude sensitive fields
     updated_user = await db.users.find_one({"id": current_user["id"]}, {"_id": 0, "hashed_password": 0})
@@ -135,6 +136,7 @@ async def update_language(language_data: LanguageUpdate, current_user = Depends(
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    invalidate_principal(current_user["id"])
     
     await log_audit_event(
         AuditEventType.USER_UPDATED, current_user["id"], "profile",
@@ -189,7 +191,7 @@ async def delete_own_account(
         {"_id": 0, "hashed_password": 1}
     )
     
-    if not user_with_password or not verify_password(delete_request.password, user_with_password["hashed_password"]):
+    if not user_with_password or not await verify_password_async(delete_request.password, user_with_password["hashed_password"]):
         raise HTTPException(status_code=401, detail="Contraseña incorrecta")
     
     # If user is an Admin, check they're not the last admin
@@ -237,6 +239,8 @@ async def delete_own_account(
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=500, detail="Error al eliminar la cuenta")
+        invalidate_principal(user_id)
+        await refresh_push_directory_user(user_id)
         
         # Log successful deletion
         logger.info(f"[ACCOUNT-DELETE] Successfully deleted user {user_email}")
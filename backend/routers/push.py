@@ -150,6 +150,7 @@ async def subscribe_to_push(
                 "updated_at": now
             }}
         )
+        await refresh_push_directory_user(user_id)
         logger.info(f"[PUSH-SUBSCRIBE-DEBUG] Subscription UPDATED for user {user_id[:12]}... (role={primary_role})")
         logger.info(f"[PUSH-SUBSCRIBE-DEBUG] ======= REQUEST SUCCESS =======")
         return {
@@ -174,6 +175,7 @@ async def subscribe_to_push(
     }
     
     await db.push_subscriptions.insert_one(sub_doc)
+    await refresh_push_directory_user(user_id)
     
     logger.info(f"[PUSH-SUBSCRIBE-DEBUG] Subscription CREATED for user {user_id[:12]}... (role={primary_role}, condo={condo_id[:8] if condo_id else 'N/A'}...)")
     logger.info(f"[PUSH-SUBSCRIBE-DEBUG] ======= REQUEST SUCCESS =======")
@@ -211,6 +213,7 @@ async def unsubscribe_from_push(
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Suscripción no encontrada")
+    await refresh_push_directory_user(user_id)
     
     logger.info(f"[PUSH] Subscription REMOVED for user {user_id}")
     await log_audit_event(
@@ -235,6 +238,7 @@ async def unsubscribe_all_push(current_user = Depends(get_current_user)):
     result = await db.push_subscriptions.delete_many({
         "user_id": user_id
     })
+    await refresh_push_directory_user(user_id)
     
     logger.info(f"[PUSH] ALL subscriptions REMOVED for user {user_id}: {result.deleted_count} deleted")
     await log_audit_event(
@@ -252,22 +256,72 @@ async def unsubscribe_all_push(current_user = Depends(get_current_user)):
 
 
 @router.get("/push/status")
-async def get_push_status(current_user = Depends(get_current_user)):
-    """Get current user's push notification subscription status"""
+async def get_push_status(
+    source_id: Optional[str] = None,
+    current_user = Depends(get_current_user)
+):
+    """
+    Get current user's push notification subscription status and
+    delivery state of recent pushes (from push_outbox).
+    
+    source_id: Optional business reference (e.g. panic event id). Guards,
+    admins and supervisors see all deliveries for it in their condominium;
+    other users only their own.
+    """
     user_id = current_user.get("id")
+    user_roles = current_user.get("roles", [])
     
     subscriptions = await db.push_subscriptions.find({
         "user_id": user_id,
         "is_active": True
     }, {"_id": 0, "id": 1, "endpoint": 1, "role": 1, "created_at": 1}).to_list(None)
     
+    if source_id:
+        delivery_query = {"source_id": source_id}
+        if "SuperAdmin" in user_roles:
+            pass
+        elif any(role in user_roles for role in ["Administrador", "Supervisor", "Guarda"]):
+            delivery_query["condominium_id"] = current_user.get("condominium_id")
+        else:
+            delivery_query["user_id"] = user_id
+        deliveries = await get_push_deliveries(delivery_query, limit=200)
+    else:
+        deliveries = await get_push_deliveries({"user_id": user_id}, limit=20)
+    
+    delivery_summary = {}
+    for delivery in deliveries:
+        delivery_summary[delivery["state"]] = delivery_summary.get(delivery["state"], 0) + 1
+    
     return {
         "is_subscribed": len(subscriptions) > 0,
         "subscription_count": len(subscriptions),
-        "subscriptions": subscriptions
+        "subscriptions": subscriptions,
+        "deliveries": deliveries,
+        "delivery_summary": delivery_summary
     }
 
 
+@router.get("/push/metrics")
+async def get_push_delivery_metrics(
+    reset: bool = False,
+    current_user = Depends(require_role(RoleEnum.SUPER_ADMIN))
+):
+    """
+    [SUPERADMIN ONLY] Push delivery telemetry for this worker process.
+    
+    - series: latency histogram and status counters per push service host
+      and notification type
+    - panic_end_to_end: panic request -> first/all guard deliveries, and
+      deliveries made by outbox retries
+    
+    reset=true returns the current values and starts a new window.
+    """
+    metrics = {"pid": os.getpid(), **get_push_metrics()}
+    if reset:
+        reset_push_metrics()
+    return metrics
+
+
 @router.post("/push/cleanup")
 async def cleanup_invalid_subscriptions(current_user = Depends(require_role(RoleEnum.SUPER_ADMIN))):
     """
@@ -323,6 +377,8 @@ async def cleanup_invalid_subscriptions(current_user = Depends(require_role(Role
         deleted_counts["user_inactive"] = result.deleted_count
     
     total_deleted = sum(deleted_counts.values())
+    if total_deleted:
+        await load_push_directory()
     
     logger.info(f"[PUSH-CLEANUP] Cleanup completed: {total_deleted} subscriptions removed - {deleted_counts}")
     
@@ -341,149 +397,65 @@ async def validate_and_cleanup_subscriptions(
     """
     [SUPERADMIN ONLY] Validate push subscriptions by sending test notifications.
     
-    This endpoint:
-    1. Fetches all push subscriptions from the database
-    2. Sends a silent/test push to each one
-    3. Deletes subscriptions that return 404/410 (permanently invalid)
-    4. Reports results
+    dry_run=false starts (or returns the already running) background job
+    (services/push_validation.py) that:
+    1. Streams push subscriptions in batches by _id
+    2. Sends a silent push to each batch concurrently
+    3. Bulk-deletes subscriptions that return 404/410 (permanently invalid)
+    4. Checkpoints progress, resuming after a restart
+    
+    Progress: GET /push/validate-subscriptions/status
     
     Parameters:
-    - dry_run: If True (default), only validates without sending or deleting.
+    - dry_run: If True (default), only counts without sending or deleting.
                Set to False to actually test and clean invalid subscriptions.
     
     This is the DEFINITIVE solution for cleaning expired FCM subscriptions.
     """
-    logger.info(f"[PUSH-VALIDATE] ========== VALIDATION START (dry_run={dry_run}) ==========")
-    
-    # Get all subscriptions
-    all_subscriptions = await db.push_subscriptions.find({}).to_list(None)
-    total_count = len(all_subscriptions)
-    
-    if total_count == 0:
+    if dry_run:
+        # Counts only - nothing is sent, so nothing can be classified beyond missing endpoints
+        total_count = await db.push_subscriptions.count_documents({})
+        missing_endpoint = await db.push_subscriptions.count_documents(
+            {"$or": [{"endpoint": None}, {"endpoint": ""}, {"endpoint": {"$exists": False}}]}
+        )
         return {
-            "message": "No hay suscripciones para validar",
-            "dry_run": dry_run,
-            "total": 0,
-            "valid": 0,
-            "invalid": 0,
-            "deleted": 0
+            "message": f"Validación simulada: {missing_endpoint} suscripciones inválidas detectadas",
+            "dry_run": True,
+            "total": total_count,
+            "valid": total_count - missing_endpoint,
+            "invalid": missing_endpoint,
+            "deleted": 0,
+            "errors_detail": []
         }
     
-    logger.info(f"[PUSH-VALIDATE] Found {total_count} subscriptions to validate")
-    
-    valid_count = 0
-    invalid_count = 0
-    deleted_count = 0
-    errors_detail = []
-    
-    # Test payload - silent notification (won't show to users)
-    test_payload = {
-        "title": "GENTURIX System Check",
-        "body": "Validación de suscripción",
-        "silent": True,
-        "tag": "system-validation",
-        "data": {"type": "validation", "timestamp": datetime.now(timezone.utc).isoformat()}
-    }
-    
-    for sub in all_subscriptions:
-        endpoint = sub.get("endpoint", "")
-        endpoint_short = endpoint[-30:] if len(endpoint) > 30 else endpoint
-        user_id = sub.get("user_id", "unknown")
-        sub_id = sub.get("_id")
-        
-        if not endpoint:
-            # Invalid subscription without endpoint
-            invalid_count += 1
-            if not dry_run:
-                await db.push_subscriptions.delete_one({"_id": sub_id})
-                deleted_count += 1
-            errors_detail.append({
-                "endpoint": "MISSING",
-                "user_id": user_id[:12] if user_id else "N/A",
-                "error": "No endpoint"
-            })
-            continue
-        
-        if dry_run:
-            # In dry run mode, just count as "to be validated"
-            valid_count += 1
-            continue
-        
-        # Build subscription_info for webpush
-        subscription_info = {
-            "endpoint": endpoint,
-            "keys": {
-                "p256dh": sub.get("p256dh", ""),
-                "auth": sub.get("auth", "")
-            }
-        }
-        
-        # Validate keys exist
-        if not subscription_info["keys"]["p256dh"] or not subscription_info["keys"]["auth"]:
-            invalid_count += 1
-            await db.push_subscriptions.delete_one({"_id": sub_id})
-            deleted_count += 1
-            errors_detail.append({
-                "endpoint": endpoint_short,
-                "user_id": user_id[:12] if user_id else "N/A",
-                "error": "Missing keys"
-            })
-            continue
-        
-        # Try to send test push
-        try:
-            webpush(
-                subscription_info=subscription_info,
-                data=json.dumps(test_payload),
-                vapid_private_key=VAPID_PRIVATE_KEY,
-                vapid_claims={"sub": f"mailto:{VAPID_CLAIMS_EMAIL}"}
-            )
-            # Success - subscription is valid
-            valid_count += 1
-            logger.debug(f"[PUSH-VALIDATE] ✅ Valid: {endpoint_short}")
-            
-        except WebPushException as e:
-            status_code = e.response.status_code if e.response else 0
-            
-            if status_code in [404, 410]:
-                # Subscription is PERMANENTLY invalid - delete it
-                invalid_count += 1
-                await db.push_subscriptions.delete_one({"_id": sub_id})
-                deleted_count += 1
-                errors_detail.append({
-                    "endpoint": endpoint_short,
-                    "user_id": user_id[:12] if user_id else "N/A",
-                    "error": f"HTTP {status_code} - Expired/Gone"
-                })
-                logger.info(f"[PUSH-VALIDATE] ❌ Invalid (deleted): {endpoint_short} - HTTP {status_code}")
-            else:
-                # Temporary error - keep subscription
-                valid_count += 1
-                logger.warning(f"[PUSH-VALIDATE] ⚠️ Temp error (kept): {endpoint_short} - HTTP {status_code}")
-                
-        except Exception as e:
-            # Network or other error - keep subscription (might be temporary)
-            valid_count += 1
-            logger.warning(f"[PUSH-VALIDATE] ⚠️ Unknown error (kept): {endpoint_short} - {str(e)[:50]}")
-    
-    logger.info(f"[PUSH-VALIDATE] ========== VALIDATION COMPLETE ==========")
-    logger.info(f"[PUSH-VALIDATE] Total: {total_count} | Valid: {valid_count} | Invalid: {invalid_count} | Deleted: {deleted_count}")
-    
-    # Log with requested format for monitoring
-    remaining = total_count - deleted_count
-    logger.info(f"[PUSH CLEANUP] deleted_subscriptions={deleted_count} remaining={remaining}")
+    job = push_validation_job_snapshot(await start_push_validation_job(started_by=current_user.get("id")))
+    logger.info(f"[PUSH-VALIDATE] Validation job {job['id'][:8]} status={job['status']} requested by {current_user.get('email')}")
     
     return {
-        "message": f"Validación {'simulada' if dry_run else 'completada'}: {invalid_count} suscripciones inválidas {'detectadas' if dry_run else 'eliminadas'}",
-        "dry_run": dry_run,
-        "total": total_count,
-        "valid": valid_count,
-        "invalid": invalid_count,
-        "deleted": deleted_count,
-        "errors_detail": errors_detail[:20] if errors_detail else []  # Limit to 20 for response size
+        "message": f"Validación en curso: {job['scanned']} de ~{job['total_estimate']} suscripciones revisadas",
+        "job_id": job["id"],
+        "status": job["status"],
+        "dry_run": False,
+        "total": job["total_estimate"],
+        "valid": job["valid"],
+        "invalid": job["invalid"],
+        "deleted": job["deleted"],
+        "errors_detail": job["errors_detail"]
     }
 
 
+@router.get("/push/validate-subscriptions/status")
+async def get_validation_job_status(
+    job_id: Optional[str] = None,
+    current_user = Depends(require_role(RoleEnum.SUPER_ADMIN))
+):
+    """[SUPERADMIN ONLY] Progress of a validation job (default: the most recent one)."""
+    job = push_validation_job_snapshot(await get_push_validation_job(job_id))
+    if not job:
+        raise HTTPException(status_code=404, detail="No hay trabajos de validación")
+    return job
+
+
 @router.get("/push/validate-user-subscription")
 async def validate_user_subscription(current_user = Depends(get_current_user)):
     """
@@ -550,51 +522,46 @@ async def validate_user_subscription(current_user = Depends(get_current_user)):
         "data": {"type": "validation"}
     }
     
-    try:
-        webpush(
-            subscription_info=subscription_info,
-            data=json.dumps(test_payload),
-            vapid_private_key=VAPID_PRIVATE_KEY,
-            vapid_claims={"sub": f"mailto:{VAPID_CLAIMS_EMAIL}"}
-        )
+    response = await send_web_push(subscription_info, test_payload)
+    status_code = response["status_code"]
+    
+    if response["success"]:
         return {
             "has_subscription": True,
             "is_valid": True,
             "subscription_count": len(subscriptions),
             "message": "Suscripción válida"
         }
+    
+    if status_code in [404, 410]:
+        # Subscription expired - delete it
+        await db.push_subscriptions.delete_one({"endpoint": endpoint})
+        remove_push_directory_endpoint(endpoint)
         
-    except WebPushException as e:
-        status_code = e.response.status_code if e.response else 0
-        
-        if status_code in [404, 410]:
-            # Subscription expired - delete it
-            await db.push_subscriptions.delete_one({"endpoint": endpoint})
-            
-            return {
-                "has_subscription": True,
-                "is_valid": False,
-                "subscription_count": len(subscriptions) - 1,
-                "message": "Tu suscripción push ha expirado. Por favor, reactiva las notificaciones.",
-                "action_required": "resubscribe"
-            }
-        else:
-            # Temporary error - assume valid
-            return {
-                "has_subscription": True,
-                "is_valid": True,
-                "subscription_count": len(subscriptions),
-                "message": "Suscripción posiblemente válida (error temporal)"
-            }
-            
-    except Exception as e:
-        logger.warning(f"[PUSH-VALIDATE-USER] Error validating subscription for {user_id}: {str(e)}")
         return {
             "has_subscription": True,
-            "is_valid": True,  # Assume valid on network errors
+            "is_valid": False,
+            "subscription_count": len(subscriptions) - 1,
+            "message": "Tu suscripción push ha expirado. Por favor, reactiva las notificaciones.",
+            "action_required": "resubscribe"
+        }
+    
+    if status_code is not None:
+        # Temporary error - assume valid
+        return {
+            "has_subscription": True,
+            "is_valid": True,
             "subscription_count": len(subscriptions),
-            "message": "No se pudo validar (error de red)"
+            "message": "Suscripción posiblemente válida (error temporal)"
         }
+    
+    logger.warning(f"[PUSH-VALIDATE-USER] Error validating subscription for {user_id}: {response['error']}")
+    return {
+        "has_subscription": True,
+        "is_valid": True,  # Assume valid on network errors
+        "subscription_count": len(subscriptions),
+        "message": "No se pudo validar (error de red)"
+    }
 
 
 # ============================================================
@@ -650,6 +617,7 @@ async def cleanup_legacy_push_subscriptions(
         # Actually delete the documents
         result = await db.push_subscriptions.delete_many(cleanup_query)
         deleted_count = result.deleted_count
+        await load_push_directory()
         logger.info(f"[PUSH-CLEANUP-LEGACY] Deleted {deleted_count} legacy subscriptions")
     
     # Count remaining subscriptions
@@ -706,7 +674,9 @@ async def debug_push_subscriptions(current_user = Depends(get_current_user)):
             "user_id": user_id,
             "subscriptions_count": len(subscriptions),
             "subscriptions": safe_subs,
-            "vapid_configured": bool(VAPID_PUBLIC_KEY and VAPID_PRIVATE_KEY)
+            "vapid_configured": bool(VAPID_PUBLIC_KEY and VAPID_PRIVATE_KEY),
+            # Per push service host, this worker process (full data: GET /push/metrics)
+            "delivery_metrics": get_push_metrics_summary()
         }
         
     except Exception as e:
@@ -769,8 +739,10 @@ async def test_push_notification(current_user = Depends(get_current_user)):
             "status": "sent",
             "user_id": user_id,
             "subscriptions_attempted": result.get("total", sub_count),
-            "successful": result.get("success", 0),
+            "successful": result.get("sent", 0),
             "failed": result.get("failed", 0),
+            "elapsed_ms": result.get("elapsed_ms", 0.0),
+            "recipients": result.get("recipients", []),
             "message": "Notificación de prueba enviada. Debería aparecer en unos segundos."
         }
         
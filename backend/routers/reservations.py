@@ -16,20 +16,12 @@ router = APIRouter()
 
 async def check_module_enabled(condo_id: str, module_name: str):
     """Helper to check if a module is enabled for a condominium"""
-    condo = await db.condominiums.find_one({"id": condo_id}, {"_id": 0, "modules": 1})
-    if not condo:
+    modules = await get_condominium_modules(condo_id)
+    if modules is None:
         raise HTTPException(status_code=404, detail="Condominio no encontrado")
-    modules = condo.get("modules", {})
-    module_config = modules.get(module_name, False)
     
-    # Handle both boolean and dict formats
-    is_enabled = False
-    if isinstance(module_config, bool):
-        is_enabled = module_config
-    elif isinstance(module_config, dict):
-        is_enabled = module_config.get("enabled", False)
-    
-    if not is_enabled:
+    # Unlike require_module, an unconfigured module is treated as disabled here
+    if not is_module_enabled(modules, module_name, default=False):
         raise HTTPException(status_code=403, detail=f"Módulo '{module_name}' no está habilitado para este condominio")
     return True
 
@@ -16,6 +16,8 @@ router = APIRouter()
 @router.post("/security/panic")
 async def trigger_panic(event: PanicEventCreate, request: Request, current_user = Depends(get_current_user)):
     """Trigger panic alert - scoped to user's condominium, only notifies guards in same condo"""
+    # End-to-end push telemetry: trigger -> guard delivery
+    trigger_started = perf_counter()
     
     # ========== DIAGNÓSTICO P0 ==========
     user_id = current_user.get("id", "UNKNOWN")
@@ -41,21 +43,8 @@ async def trigger_panic(event: PanicEventCreate, request: Request, current_user
             detail="Usuario no asignado a un condominio. Contacta al administrador."
         )
     
-    # Validar que el usuario existe y está activo
-    db_user = await db.users.find_one({"id": user_id}, {"_id": 0, "is_active": 1})
-    if not db_user:
-        logger.error(f"[PANIC-DIAG] ERROR: User {user_id} not found in database")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Usuario no encontrado. Sesión inválida."
-        )
-    
-    if not db_user.get("is_active", True):
-        logger.error(f"[PANIC-DIAG] ERROR: User {user_id} is inactive")
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Cuenta desactivada. Contacta al administrador."
-        )
+    # User existence / is_active / status are enforced by get_current_user
+    # (principal cache, invalidated on every status change) - no extra read here
     
     # Log GPS status
     has_gps = event.latitude is not None and event.longitude is not None
@@ -82,6 +71,19 @@ async def trigger_panic(event: PanicEventCreate, request: Request, current_user
     role_data = current_user.get("role_data", {})
     apartment = role_data.get("apartment_number", "N/A")
     
+    # ========== FAST PATH ==========
+    # Before responding: one read (guards) and the event + guard notification
+    # writes issued together. Push, admin emails and the audit record run in
+    # a supervised background task.
+    now_iso = datetime.now(timezone.utc).isoformat()
+    panic_type_label = panic_type_labels.get(event.panic_type.value, "Emergencia")
+    
+    # Notify ONLY guards in the same condominium
+    active_guards = await db.guards.find(
+        {"status": "active", "condominium_id": condo_id},
+        {"_id": 0, "id": 1, "user_id": 1}
+    ).to_list(100)
+    
     panic_event = {
         "id": str(uuid.uuid4()),
         "user_id": current_user["id"],
@@ -89,7 +91,7 @@ async def trigger_panic(event: PanicEventCreate, request: Request, current_user
         "user_email": current_user["email"],
         "condominium_id": condo_id,  # CRITICAL: Multi-tenant filter
         "panic_type": event.panic_type.value,
-        "panic_type_label": panic_type_labels.get(event.panic_type.value, "Emergencia"),
+        "panic_type_label": panic_type_label,
         "location": event.location,
         "latitude": event.latitude,
         "longitude": event.longitude,
@@ -97,128 +99,170 @@ async def trigger_panic(event: PanicEventCreate, request: Request, current_user
         "apartment": apartment,
         "status": "active",
         "is_test": False,  # Mark as real data
-        "notified_guards": [],
-        "created_at": datetime.now(timezone.utc).isoformat(),
+        "notified_guards": [guard["id"] for guard in active_guards],
+        "created_at": now_iso,
         "resolved_at": None,
         "resolved_by": None
     }
     
-    await db.panic_events.insert_one(panic_event)
-    
-    # Notify ONLY guards in the same condominium
-    guard_query = {"status": "active"}
-    if condo_id:
-        guard_query["condominium_id"] = condo_id
-    
-    active_guards = await db.guards.find(guard_query, {"_id": 0}).to_list(100)
-    for guard in active_guards:
-        notification = {
-            "id": str(uuid.uuid4()),
-            "guard_id": guard["id"],
-            "guard_user_id": guard.get("user_id"),
-            "panic_event_id": panic_event["id"],
-            "condominium_id": condo_id,
-            "panic_type": event.panic_type.value,
-            "panic_type_label": panic_type_labels.get(event.panic_type.value, "Emergencia"),
-            "resident_name": current_user["full_name"],
-            "location": event.location,
-            "latitude": event.latitude,
-            "longitude": event.longitude,
-            "read": False,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        await db.guard_notifications.insert_one(notification)
-        panic_event["notified_guards"].append(guard["id"])
-    
-    # Update panic event with notified guards
-    await db.panic_events.update_one(
-        {"id": panic_event["id"]},
-        {"$set": {"notified_guards": panic_event["notified_guards"]}}
+    notifications = [{
+        "id": str(uuid.uuid4()),
+        "guard_id": guard["id"],
+        "guard_user_id": guard.get("user_id"),
+        "panic_event_id": panic_event["id"],
+        "condominium_id": condo_id,
+        "panic_type": event.panic_type.value,
+        "panic_type_label": panic_type_label,
+        "resident_name": current_user["full_name"],
+        "location": event.location,
+        "latitude": event.latitude,
+        "longitude": event.longitude,
+        "read": False,
+        "created_at": now_iso
+    } for guard in active_guards]
+    
+    writes = [db.panic_events.insert_one(panic_event)]
+    if notifications:
+        writes.append(db.guard_notifications.insert_many(notifications, ordered=False))
+    results = await asyncio.gather(*writes, return_exceptions=True)
+    if isinstance(results[0], Exception):
+        # No event -> no orphan notifications
+        if notifications:
+            await db.guard_notifications.delete_many({"panic_event_id": panic_event["id"]})
+        raise results[0]
+    if len(results) > 1 and isinstance(results[1], Exception):
+        logger.error(f"[PANIC] Guard notification insert failed for {panic_event['id']}: {results[1]}")
+        # Only guards whose notification was actually written count as notified
+        try:
+            notified = await db.guard_notifications.distinct("guard_id", {"panic_event_id": panic_event["id"]})
+        except Exception as e:
+            logger.error(f"[PANIC] Could not read back guard notifications for {panic_event['id']}: {e}")
+            notified = []
+        panic_event["notified_guards"] = [guard["id"] for guard in active_guards if guard["id"] in notified]
+        try:
+            await db.panic_events.update_one(
+                {"id": panic_event["id"]},
+                {"$set": {"notified_guards": panic_event["notified_guards"]}}
+            )
+        except Exception as e:
+            logger.error(f"[PANIC] Could not update notified_guards of {panic_event['id']}: {e}")
+    notified_count = len(panic_event["notified_guards"])
+    
+    spawn_supervised(
+        _dispatch_panic_alert(
+            panic_event=panic_event,
+            panic_type_display=panic_type_display_map.get(event.panic_type.value, "general"),
+            trigger_started=trigger_started,
+            client_ip=request.client.host if request.client else "unknown",
+            user_agent=request.headers.get("user-agent", "unknown")
+        ),
+        name=f"panic-dispatch:{panic_event['id']}"
     )
     
+    # Log flow event
+    print(f"[FLOW] panic_alert_triggered | event_id={panic_event['id']} type={event.panic_type.value} condo={condo_id[:8]} guards_notified={notified_count}")
+    logger.info(f"[PANIC-DIAG] SUCCESS: Alert {panic_event['id']} created, {notified_count} guards notified (push/email dispatching)")
+    
+    return {
+        "message": "Alerta enviada exitosamente",
+        "event_id": panic_event["id"],
+        "panic_type": event.panic_type.value,
+        "notified_guards": notified_count,
+        # Push is sent after the response; per-message delivery state:
+        # GET /api/push/status?source_id=<event_id>
+        "push_notifications": {"status": "dispatching", "sent": 0, "failed": 0, "total": 0}
+    }
+
+
+async def _dispatch_panic_alert(
+    panic_event: dict,
+    panic_type_display: str,
+    trigger_started: float,
+    client_ip: str,
+    user_agent: str
+):
+    """Background part of trigger_panic: guard push, admin emails, audit record."""
+    condo_id = panic_event["condominium_id"]
+    
     # Send PUSH NOTIFICATIONS to all subscribed guards in this condominium
     # SECURITY: Backend decides who receives - ONLY guards in same condo, excluding sender
-    push_result = await notify_guards_of_panic(
-        condominium_id=condo_id,
-        panic_data={
-            "event_id": panic_event["id"],
-            "panic_type": panic_type_display_map.get(event.panic_type.value, "general"),
-            "resident_name": current_user["full_name"],
-            "apartment": apartment,
-            "timestamp": panic_event["created_at"]
-        },
-        sender_id=current_user["id"]  # Exclude sender from notifications
+    push_result, _ = await asyncio.gather(
+        notify_guards_of_panic(
+            condominium_id=condo_id,
+            panic_data={
+                "event_id": panic_event["id"],
+                "panic_type": panic_type_display,
+                "resident_name": panic_event["user_name"],
+                "apartment": panic_event["apartment"],
+                "timestamp": panic_event["created_at"],
+                "trigger_started": trigger_started
+            },
+            sender_id=panic_event["user_id"]  # Exclude sender from notifications
+        ),
+        _queue_panic_admin_emails(panic_event)
     )
     
-    # === SEND EMAIL ALERT TO ADMINISTRATORS (fail-safe) ===
-    try:
-        # Get condominium info for email
-        condo_info = await db.condominiums.find_one(
-            {"id": condo_id}, 
-            {"_id": 0, "name": 1, "contact_email": 1}
-        )
-        condo_name = condo_info.get("name", "Condominio") if condo_info else "Condominio"
-        
-        # Get admin users for this condominium
-        admin_users = await db.users.find(
-            {"condominium_id": condo_id, "roles": {"$in": ["Administrador"]}, "is_active": True},
-            {"_id": 0, "email": 1, "full_name": 1}
-        ).to_list(10)
-        
-        # Send email to each admin
-        for admin in admin_users:
-            admin_email = admin.get("email")
-            if admin_email:
-                try:
-                    alert_html = get_emergency_alert_email_html(
-                        resident_name=current_user["full_name"],
-                        alert_type=panic_type_labels.get(event.panic_type.value, "Emergencia"),
-                        location=event.location or apartment,
-                        timestamp=datetime.now(timezone.utc).strftime("%d/%m/%Y %H:%M:%S UTC"),
-                        condominium_name=condo_name
-                    )
-                    await send_email(
-                        to=admin_email,
-                        subject=f"🚨 ALERTA DE EMERGENCIA - {condo_name}",
-                        html=alert_html
-                    )
-                except Exception as admin_email_error:
-                    logger.warning(f"[EMAIL] Failed to send emergency alert to admin {admin_email}: {admin_email_error}")
-    except Exception as email_error:
-        logger.warning(f"[EMAIL] Failed to send emergency alert emails: {email_error}")
-        # Continue - don't break API flow
-    
     # Log to audit
     await log_audit_event(
         AuditEventType.PANIC_BUTTON,
-        current_user["id"],
+        panic_event["user_id"],
         "security",
         {
-            "panic_type": event.panic_type.value,
-            "location": event.location,
-            "latitude": event.latitude,
-            "longitude": event.longitude,
-            "description": event.description,
-            "notified_guards_count": len(active_guards),
-            "push_notifications": push_result
+            "panic_type": panic_event["panic_type"],
+            "location": panic_event["location"],
+            "latitude": panic_event["latitude"],
+            "longitude": panic_event["longitude"],
+            "description": panic_event["description"],
+            "notified_guards_count": len(panic_event["notified_guards"]),
+            "push_notifications": push_result,
+            # Per-message delivery state: GET /api/push/status?source_id=<event_id>
+            "push_delivery_source_id": panic_event["id"]
         },
-        request.client.host if request.client else "unknown",
-        request.headers.get("user-agent", "unknown"),
+        client_ip,
+        user_agent,
         condominium_id=condo_id,
-        user_email=user_email
+        user_email=panic_event["user_email"]
     )
-    
-    # Log flow event
-    print(f"[FLOW] panic_alert_triggered | event_id={panic_event['id']} type={event.panic_type.value} condo={condo_id[:8]} guards_notified={len(active_guards)}")
-    logger.info(f"[PANIC-DIAG] SUCCESS: Alert {panic_event['id']} created, {len(active_guards)} guards notified")
-    
-    return {
-        "message": "Alerta enviada exitosamente",
-        "event_id": panic_event["id"],
-        "panic_type": event.panic_type.value,
-        "notified_guards": len(active_guards),
-        "push_notifications": push_result
-    }
+    logger.info(f"[PANIC] Alert {panic_event['id']} dispatched | push={push_result}")
+
+
+async def _queue_panic_admin_emails(panic_event: dict):
+    """Queue the emergency alert email for each administrator (fail-safe)."""
+    condo_id = panic_event["condominium_id"]
+    try:
+        condo_info, admin_users = await asyncio.gather(
+            db.condominiums.find_one({"id": condo_id}, {"_id": 0, "name": 1}),
+            db.users.find(
+                {"condominium_id": condo_id, "roles": {"$in": ["Administrador"]}, "is_active": True},
+                {"_id": 0, "email": 1, "full_name": 1}
+            ).to_list(10)
+        )
+        condo_name = condo_info.get("name", "Condominio") if condo_info else "Condominio"
+        
+        admin_emails = {admin["email"] for admin in admin_users if admin.get("email")}
+        if not admin_emails:
+            return
+        
+        # Queue one email per admin (delivered by the email outbox worker)
+        alert_html = get_emergency_alert_email_html(
+            resident_name=panic_event["user_name"],
+            alert_type=panic_event["panic_type_label"],
+            location=panic_event["location"] or panic_event["apartment"],
+            timestamp=datetime.fromisoformat(panic_event["created_at"]).strftime("%d/%m/%Y %H:%M:%S UTC"),
+            condominium_name=condo_name
+        )
+        await enqueue_emails(
+            [{
+                "to": admin_email,
+                "subject": f"🚨 ALERTA DE EMERGENCIA - {condo_name}",
+                "html": alert_html,
+                "idempotency_key": f"panic_alert:{panic_event['id']}:{admin_email}"
+            } for admin_email in sorted(admin_emails)],
+            email_type="panic_alert",
+            condominium_id=condo_id
+        )
+    except Exception as email_error:
+        logger.warning(f"[EMAIL] Failed to queue emergency alert emails: {email_error}")
 
 @router.get("/resident/my-alerts")
 async def get_resident_alerts(current_user = Depends(get_current_user)):
@@ -421,7 +465,7 @@ async def get_access_logs(
     
     # Include visitor entries (actual check-ins)
     if include_visitor_entries:
-        entries = await db.visitor_entries.find(query, {"_id": 0}).sort("entry_at", -1).to_list(limit)
+        entries = await db.visitor_entries.find(query, {"_id": 0, "search_keys": 0}).sort("entry_at", -1).to_list(limit)
         
         for entry in entries:
             unified_logs.append({
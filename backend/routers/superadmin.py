@@ -57,6 +57,77 @@ async def get_platform_stats(
         }
     }
 
+@router.get("/super-admin/cache-stats")
+async def get_cache_stats_endpoint(
+    current_user = Depends(require_role(RoleEnum.SUPER_ADMIN))
+):
+    """
+    In-process cache counters (hit/miss/evictions), bcrypt pool
+    queue depth, login limiter, push sender (incl. VAPID signatures
+    saved), push subscription directory and supervised background
+    task counters for monitoring.
+    NOTE: Values are per worker process.
+    """
+    return {
+        "pid": os.getpid(),
+        "caches": get_cache_stats(),
+        "password_hasher": password_hasher.stats(),
+        "login_rate_limiter": login_rate_limiter.stats(),
+        "push_sender": get_push_sender_stats(),
+        "push_directory": get_push_directory_stats(),
+        "background_tasks": get_background_task_stats()
+    }
+
+@router.get("/super-admin/email-outbox")
+async def get_email_outbox_stats_endpoint(
+    current_user = Depends(require_role(RoleEnum.SUPER_ADMIN))
+):
+    """
+    Email outbox throughput per email type (enqueued/sent/failed/retries,
+    send latency, queue delay) and the queued messages by type and state.
+    NOTE: metrics are per worker process, backlog is global.
+    """
+    return {
+        "pid": os.getpid(),
+        "metrics": get_email_outbox_metrics(),
+        "backlog": await get_email_outbox_backlog()
+    }
+
+@router.get("/super-admin/visitor-occupancy")
+async def get_visitor_occupancy_stats_endpoint(
+    current_user = Depends(require_role(RoleEnum.SUPER_ADMIN))
+):
+    """
+    Visitors inside (from visitor_occupancy) and the last reconciliation
+    against visitor_entries. NOTE: last_reconcile is per worker process.
+    """
+    return {
+        "pid": os.getpid(),
+        "inside": await count_inside(),
+        **get_occupancy_stats()
+    }
+
+@router.post("/super-admin/visitor-occupancy/reconcile")
+async def reconcile_visitor_occupancy_endpoint(
+    current_user = Depends(require_role(RoleEnum.SUPER_ADMIN))
+):
+    """Repair visitor_occupancy drift now instead of waiting for the periodic job."""
+    return await reconcile_occupancy()
+
+@router.get("/super-admin/search-keys-backfill")
+async def get_search_keys_backfill_stats_endpoint(
+    current_user = Depends(require_role(RoleEnum.SUPER_ADMIN))
+):
+    """
+    Visitor search_keys backfill job (checkpoints, counters, status). While
+    pending, visitor searches also regex-match documents without keys.
+    NOTE: pending is per worker process.
+    """
+    return {
+        "pid": os.getpid(),
+        **await get_search_keys_backfill_stats()
+    }
+
 @router.get("/super-admin/users")
 async def get_all_users_global(
     condo_id: Optional[str] = None,
@@ -95,6 +166,8 @@ async def lock_user(
         {"id": user_id},
         {"$set": {"is_active": False, "locked_by": current_user["id"], "locked_at": datetime.now(timezone.utc).isoformat()}}
     )
+    invalidate_principal(user_id)
+    await refresh_push_directory_user(user_id)
     
     await log_audit_event(
         AuditEventType.USER_LOCKED,
@@ -122,6 +195,8 @@ async def unlock_user(
         {"id": user_id},
         {"$set": {"is_active": True, "locked_by": None, "locked_at": None}}
     )
+    invalidate_principal(user_id)
+    await refresh_push_directory_user(user_id)
     
     await log_audit_event(
         AuditEventType.USER_UNLOCKED,
@@ -155,6 +230,7 @@ async def make_demo_condominium(
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Condominium not found")
+    invalidate_billing_state(condo_id)
     
     await log_audit_event(
         AuditEventType.SECURITY_ALERT, current_user["id"], "condominiums",
@@ -387,6 +463,8 @@ async def update_condo_status(
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Condominium not found")
+    invalidate_billing_state(condo_id)
+    await refresh_push_directory_condominium(condo_id)
     
     await log_audit_event(
         AuditEventType.CONDO_UPDATED,
@@ -522,7 +600,7 @@ async def permanently_delete_condominium(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    if not verify_password(delete_request.password, user["hashed_password"]):
+    if not await verify_password_async(delete_request.password, user["hashed_password"]):
         raise HTTPException(status_code=403, detail="Contraseña incorrecta")
     
     # Step 2: Verify condominium exists
@@ -550,6 +628,8 @@ async def permanently_delete_condominium(
     # Delete users
     users_result = await db.users.delete_many({"condominium_id": condo_id})
     deletion_stats["users_deleted"] = users_result.deleted_count
+    invalidate_all_principals()
+    await load_push_directory()
     
     # Delete panic events
     panic_result = await db.panic_events.delete_many({"condominium_id": condo_id})
@@ -594,6 +674,9 @@ async def permanently_delete_condominium(
     
     # Step 4: Delete the condominium itself
     await db.condominiums.delete_one({"id": condo_id})
+    invalidate_module_config(condo_id)
+    invalidate_billing_state(condo_id)
+    await refresh_push_directory_condominium(condo_id)
     
     # Step 5: Log the deletion (this log persists for Super Admin audit trail)
     await log_audit_event(
@@ -668,6 +751,8 @@ async def fix_orphan_users(
         orphan_query,
         {"$set": {"condominium_id": demo_condo_id}}
     )
+    invalidate_all_principals()
+    await load_push_directory()
     
     # Also fix guards without condominium_id
     guard_result = await db.guards.update_many(
@@ -727,7 +812,7 @@ async def create_condominium_admin(
     user_doc = {
         "id": user_id,
         "email": admin_data.email,
-        "hashed_password": hash_password(admin_data.password),
+        "hashed_password": await hash_password_async(admin_data.password),
         "full_name": admin_data.full_name,
         "roles": [RoleEnum.ADMINISTRADOR.value],
         "condominium_id": condo_id,  # Associate with the condominium
@@ -932,6 +1017,7 @@ async def onboarding_create_condominium(
         condo_doc["price_per_seat"] = billing_preview["price_per_seat"]
         
         await db.condominiums.insert_one(condo_doc)
+        invalidate_module_config(condo_id)
         
         # BILLING ENGINE: Log creation event
         await log_billing_engine_event(
@@ -974,7 +1060,7 @@ async def onboarding_create_condominium(
         admin_doc = {
             "id": admin_user_id,
             "email": normalized_admin_email,  # Use normalized email
-            "hashed_password": hash_password(admin_password),
+            "hashed_password": await hash_password_async(admin_password),
             "full_name": wizard_data.admin.full_name,
             "roles": [RoleEnum.ADMINISTRADOR.value],
             "condominium_id": condo_id,
@@ -1076,6 +1162,7 @@ async def onboarding_create_condominium(
         
         # Delete any created documents
         await db.condominiums.delete_one({"id": condo_id})
+        invalidate_module_config(condo_id)
         await db.users.delete_one({"id": admin_user_id})
         await db.reservation_areas.delete_many({"condominium_id": condo_id})
         
@@ -1219,7 +1306,7 @@ async def seed_demo_data():
             "id": user_id,
             "email": user_data["email"],
             "full_name": user_data["full_name"],
-            "hashed_password": hash_password(user_data["password"]),
+            "hashed_password": await hash_password_async(user_data["password"]),
             "roles": user_data["roles"],
             "condominium_id": user_data["condo"],
             "is_active": True,
@@ -2024,6 +2111,10 @@ async def reset_all_data(
         "email": {"$ne": superadmin_email}
     })
     deleted_counts["users"] = users_deleted.deleted_count
+    invalidate_all_principals()
+    await load_push_directory()
+    module_config_cache.clear()
+    billing_state_cache.clear()
     
     # Clear system config except email_settings
     await db.system_config.delete_many({"key": {"$ne": "email_settings"}})
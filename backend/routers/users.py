@@ -41,6 +41,8 @@ async def update_user_roles(user_id: str, roles: List[str], current_user = Depen
     )
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    invalidate_principal(user_id)
+    await refresh_push_directory_user(user_id)
     await log_audit_event(
         AuditEventType.SECURITY_ALERT, current_user["id"], "users",
         {"action": "roles_updated", "target_user_id": user_id, "new_roles": role_data.roles},
@@ -229,6 +231,9 @@ async def update_user_status_v2(
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="No se pudo actualizar el usuario")
     
+    invalidate_principal(user_id)
+    await refresh_push_directory_user(user_id)
+    
     # Update active user count
     if condo_id:
         await update_active_user_count(condo_id)
@@ -311,6 +316,9 @@ async def delete_user(
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="No se pudo eliminar el usuario")
     
+    invalidate_principal(user_id)
+    await refresh_push_directory_user(user_id)
+    
     # Update active user count (releases the seat)
     if condo_id:
         await update_active_user_count(condo_id)
@@ -371,6 +379,9 @@ async def update_user_status(
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="No se pudo actualizar el usuario")
     
+    invalidate_principal(user_id)
+    await refresh_push_directory_user(user_id)
+    
     # ==================== UPDATE ACTIVE USER COUNT ====================
     condo_id = target_user.get("condominium_id")
     if condo_id:
@@ -463,6 +474,7 @@ async def admin_reset_user_password(
             }
         }
     )
+    invalidate_principal(user_id)
     
     # ==================== SEND RESET EMAIL ====================
     # Build reset link
@@ -553,7 +565,7 @@ async def complete_password_reset(
         {"id": user_id},
         {
             "$set": {
-                "hashed_password": hash_password(new_password),
+                "hashed_password": await hash_password_async(new_password),
                 "password_changed_at": password_changed_at,
                 "password_reset_required": False,
                 "updated_at": password_changed_at
@@ -565,6 +577,7 @@ async def complete_password_reset(
             }
         }
     )
+    invalidate_principal(user_id)
     
     # Log audit event
     await log_audit_event(
@@ -624,6 +637,8 @@ async def update_user_status_legacy(user_id: str, is_active: bool, current_user
     )
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    invalidate_principal(user_id)
+    await refresh_push_directory_user(user_id)
     await log_audit_event(
         AuditEventType.SECURITY_ALERT, current_user["id"], "users",
         {"action": "status_updated_legacy", "target_user_id": user_id, "is_active": is_active},
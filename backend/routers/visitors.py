@@ -2,7 +2,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query, Response, UploadFile, File as FastAPIFile
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime, timezone
 from enum import Enum
 import uuid, io, json, os, re
@@ -292,67 +292,46 @@ def get_color_code_for_type(auth_type: str) -> str:
     }
     return color_map.get(auth_type, "yellow")
 
-def check_authorization_validity(authorization: dict, condominium_timezone: str = None) -> dict:
+def check_authorization_validity(authorization: dict, condominium_timezone: str = None, clock: ValidityClock = None) -> dict:
     """
     Check if an authorization is currently valid.
     Returns: {is_valid: bool, status: str, message: str}
     
     TIMEZONE FIX: Uses condominium timezone for day/time calculations.
     Falls back to UTC if no timezone provided.
+    For lists, use evaluate_authorizations (one clock for the whole list).
     """
-    # Get current time in condominium timezone (or UTC as fallback)
-    if condominium_timezone:
-        try:
-            tz = ZoneInfo(condominium_timezone)
-            now = datetime.now(tz)
-        except Exception as e:
-            logger.warning(f"[AUTH-VALIDITY] Invalid timezone '{condominium_timezone}', falling back to UTC: {e}")
-            now = datetime.now(timezone.utc)
-    else:
-        now = datetime.now(timezone.utc)
-    
-    today_str = now.strftime("%Y-%m-%d")
-    current_time = now.strftime("%H:%M")
-    current_day_es = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"][now.weekday()]
-    
-    auth_type = authorization.get("authorization_type", "temporary")
-    
-    # Check if authorization is active
-    if not authorization.get("is_active", True):
-        return {"is_valid": False, "status": "revoked", "message": "Autorización revocada"}
-    
-    # Permanent: Always valid
-    if auth_type == "permanent":
-        return {"is_valid": True, "status": "authorized", "message": "Autorización permanente"}
-    
-    # Check date range for temporary, extended
-    valid_from = authorization.get("valid_from")
-    valid_to = authorization.get("valid_to")
-    
-    if valid_from and today_str < valid_from:
-        return {"is_valid": False, "status": "not_yet_valid", "message": f"Válido desde {valid_from}"}
-    
-    if valid_to and today_str > valid_to:
-        return {"is_valid": False, "status": "expired", "message": f"Expiró el {valid_to}"}
-    
-    # Check allowed days for recurring
-    if auth_type == "recurring":
-        allowed_days = authorization.get("allowed_days", [])
-        if allowed_days and current_day_es not in allowed_days:
-            return {"is_valid": False, "status": "not_today", "message": f"No autorizado hoy ({current_day_es})"}
-    
-    # Check time windows for extended
-    if auth_type == "extended":
-        hours_from = authorization.get("allowed_hours_from")
-        hours_to = authorization.get("allowed_hours_to")
-        
-        if hours_from and current_time < hours_from:
-            return {"is_valid": False, "status": "too_early", "message": f"Válido desde las {hours_from}"}
-        
-        if hours_to and current_time > hours_to:
-            return {"is_valid": False, "status": "too_late", "message": f"Válido hasta las {hours_to}"}
+    return evaluate_authorizations([authorization], condominium_timezone, clock)[0]
+
+async def get_authorization_entry_summaries(authorization_ids: List[str]) -> Dict[str, dict]:
+    """
+    Usage of many authorizations in one aggregation over visitor_entries
+    (index authorization_id + entry_at), instead of per-authorization queries.
     
-    return {"is_valid": True, "status": "authorized", "message": "Autorización válida"}
+    Returns {authorization_id: summary} for authorizations with at least one
+    entry (missing id = never used). Summary fields:
+      total_uses, has_visitor_inside (any entry with status inside),
+      first_entry_at, first_entry_by, last_entry_at
+    """
+    if not authorization_ids:
+        return {}
+    rows = await db.visitor_entries.aggregate([
+        {"$match": {"authorization_id": {"$in": authorization_ids}}},
+        {"$sort": {"authorization_id": 1, "entry_at": 1}},
+        {"$group": {
+            "_id": "$authorization_id",
+            "total_uses": {"$sum": 1},
+            "has_visitor_inside": {"$max": {"$eq": ["$status", "inside"]}},
+            "first_entry_at": {"$first": "$entry_at"},
+            "first_entry_by": {"$first": {"$ifNull": ["$entry_by_name", "$guard_name"]}},
+            "last_entry_at": {"$last": "$entry_at"}
+        }}
+    ]).to_list(None)
+    return {row.pop("_id"): row for row in rows}
+
+def _search_fallback_fields(fields) -> Optional[tuple]:
+    """Fields matched by regex on documents without search_keys, while the startup backfill is still running."""
+    return tuple(fields[0]) + tuple(fields[1]) if search_keys_backfill_pending() else None
 
 # ===================== RESIDENT AUTHORIZATION ENDPOINTS =====================
 
@@ -412,6 +391,7 @@ async def create_visitor_authorization(
         "company": auth_data.company,
         "service_type": auth_data.service_type
     }
+    auth_doc["search_keys"] = authorization_search_keys(auth_doc)
     
     await db.visitor_authorizations.insert_one(auth_doc)
     
@@ -477,8 +457,10 @@ async def create_visitor_authorization(
         
         # Send push notifications to guards and admins
         try:
-            await send_push_to_guards(condo_id, notification_payload)
-            await send_push_to_admins(condo_id, notification_payload)
+            await asyncio.gather(
+                send_push_to_guards(condo_id, notification_payload),
+                send_push_to_admins(condo_id, notification_payload)
+            )
             logger.info(f"[PREREGISTRATION] Notifications sent for visitor {visitor_name}")
         except Exception as e:
             logger.warning(f"[PREREGISTRATION] Failed to send push notifications: {e}")
@@ -501,33 +483,33 @@ async def create_visitor_authorization(
             
             print(f"[EMAIL DEBUG] Found {len(guard_users_with_email)} guards with email")
             
+            # Queue one email per guard (delivered by the email outbox worker)
+            messages = []
             for guard in guard_users_with_email:
                 guard_email = guard.get("email")
-                guard_name = guard.get("full_name", "Guardia")
                 if guard_email:
-                    try:
-                        preregistration_html = get_visitor_preregistration_email_html(
-                            guard_name=guard_name,
+                    messages.append({
+                        "to": guard_email,
+                        "subject": f"📋 Visitante Preregistrado - {visitor_name}",
+                        "html": get_visitor_preregistration_email_html(
+                            guard_name=guard.get("full_name", "Guardia"),
                             visitor_name=visitor_name,
                             resident_name=resident_name,
                             apartment=apartment or "N/A",
                             valid_from=auth_data.valid_from or "Hoy",
                             valid_to=auth_data.valid_to or "Sin límite",
                             condominium_name=condo_name
-                        )
-                        await send_email(
-                            to=guard_email,
-                            subject=f"📋 Visitante Preregistrado - {visitor_name}",
-                            html=preregistration_html
-                        )
-                    except Exception as guard_email_error:
-                        logger.warning(f"[EMAIL] Failed to send preregistration email to guard {guard_email}: {guard_email_error}")
+                        ),
+                        "idempotency_key": f"visitor_preregistration:{auth_id}:{guard_email}"
+                    })
+            await enqueue_emails(messages, email_type="visitor_preregistration", condominium_id=condo_id)
         except Exception as email_error:
             logger.warning(f"[EMAIL] Failed to send preregistration emails: {email_error}")
             # Continue - don't break API flow
     
     # Return without _id
     auth_doc.pop("_id", None)
+    auth_doc.pop("search_keys", None)
     return auth_doc
 
 @router.get("/authorizations/my")
@@ -564,56 +546,46 @@ async def get_my_authorizations(
         # DEFAULT: Only return active (not deleted) authorizations
         query["is_active"] = True
     
-    authorizations = await db.visitor_authorizations.find(
-        query, {"_id": 0}
-    ).sort("created_at", -1).to_list(100)
+    # Authorizations (index created_by + condominium_id + created_at) and condominium timezone together
+    authorizations, condo = await asyncio.gather(
+        db.visitor_authorizations.find(query, {"_id": 0, "search_keys": 0}).sort("created_at", -1).to_list(100),
+        db.condominiums.find_one({"id": condo_id}, {"_id": 0, "timezone": 1})
+    )
+    condo_timezone = condo.get("timezone") if condo else None
     
     # SECURITY LOG
     logger.info(f"[SECURITY] visit_query_scoped | endpoint=authorizations/my | user_id={user_id[:12]}... | condo_id={condo_id[:12]}... | status={status} | records_returned={len(authorizations)}")
     
-    # Get condominium timezone for validity checks
-    condo_timezone = None
-    condo_id = current_user.get("condominium_id")
-    if condo_id:
-        condo = await db.condominiums.find_one({"id": condo_id}, {"timezone": 1})
-        condo_timezone = condo.get("timezone") if condo else None
+    # Usage of every authorization on the page in one aggregation
+    usage = await get_authorization_entry_summaries([auth["id"] for auth in authorizations if auth.get("id")])
     
-    # Enrich with validity status and usage info
-    for auth in authorizations:
-        validity = check_authorization_validity(auth, condo_timezone)
-        auth["validity_status"] = validity["status"]
-        auth["validity_message"] = validity["message"]
-        auth["is_currently_valid"] = validity["is_valid"]
+    # Enrich with validity status (one clock for the page) and usage info
+    validities = evaluate_authorizations(authorizations, condo_timezone)
+    for auth, validity in zip(authorizations, validities):
+        apply_validity(auth, validity)
+        
+        summary = usage.get(auth.get("id"))
         
         # P0 FIX: Check if there's a visitor currently INSIDE using this authorization
         # This prevents residents from deleting authorizations while visitor is inside
-        active_inside = await db.visitor_entries.find_one({
-            "authorization_id": auth.get("id"),
-            "status": "inside"
-        }, {"_id": 0, "id": 1})
-        auth["has_visitor_inside"] = active_inside is not None
+        auth["has_visitor_inside"] = bool(summary and summary["has_visitor_inside"])
         
         # Check if authorization has been used (has entry record)
         auth_type = auth.get("authorization_type")
         if auth_type in ["temporary", "extended"]:
             # For one-time use authorizations, check if already used
-            entry_exists = await db.visitor_entries.find_one({"authorization_id": auth.get("id")})
-            if entry_exists:
+            if summary:
                 auth["status"] = "used"
                 auth["was_used"] = True
-                auth["used_at"] = entry_exists.get("entry_at")
-                auth["used_by_guard"] = entry_exists.get("entry_by_name") or entry_exists.get("guard_name")
+                auth["used_at"] = summary["first_entry_at"]
+                auth["used_by_guard"] = summary["first_entry_by"]
             else:
                 auth["was_used"] = False
         else:
             # For permanent/recurring, check last usage
-            last_entry = await db.visitor_entries.find_one(
-                {"authorization_id": auth.get("id")},
-                sort=[("entry_at", -1)]
-            )
-            if last_entry:
-                auth["last_used_at"] = last_entry.get("entry_at")
-                auth["total_uses"] = await db.visitor_entries.count_documents({"authorization_id": auth.get("id")})
+            if summary:
+                auth["last_used_at"] = summary["last_entry_at"]
+                auth["total_uses"] = summary["total_uses"]
             else:
                 auth["total_uses"] = 0
     
@@ -629,11 +601,14 @@ async def get_authorization_history(
     visitor_name: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
+    search: Optional[str] = None,
     current_user = Depends(require_role("Administrador", "Supervisor", "Guarda"))
 ):
     """
     Get visitor entry/exit history for audit.
     Filterable by authorization, resident, visitor name, date range.
+    `search` matches name, ID number or plate by word prefix (indexed) and
+    returns the best matches first, newest first within the same match.
     """
     # Build extra filters
     extra = {}
@@ -641,8 +616,10 @@ async def get_authorization_history(
         extra["authorization_id"] = auth_id
     if resident_id:
         extra["resident_id"] = resident_id
-    if visitor_name:
-        extra["visitor_name"] = {"$regex": visitor_name, "$options": "i"}
+    # Name / free-text search: indexed prefix match on search_keys
+    keys_filter = search_filter(" ".join(filter(None, [visitor_name, search])), _search_fallback_fields(ENTRY_SEARCH_FIELDS))
+    if keys_filter:
+        extra.update(keys_filter)
     
     # Date filtering
     if date_from or date_to:
@@ -657,7 +634,9 @@ async def get_authorization_history(
     # Use tenant_filter for multi-tenant scoping
     query = tenant_filter(current_user, extra if extra else None)
     
-    entries = await db.visitor_entries.find(query, {"_id": 0}).sort("entry_at", -1).to_list(500)
+    entries = await db.visitor_entries.find(query, {"_id": 0, "search_keys": 0}).sort("entry_at", -1).to_list(500)
+    if search:
+        entries = rank_search_results(entries, search, *ENTRY_SEARCH_FIELDS)
     return entries
 
 @router.get("/authorizations/stats")
@@ -686,11 +665,8 @@ async def get_authorization_stats(
         "entry_at": {"$gte": f"{today}T00:00:00"}
     })
     
-    # Count visitors currently inside
-    inside_count = await db.visitor_entries.count_documents({
-        **query,
-        "status": "inside"
-    })
+    # Count visitors currently inside (materialized occupancy)
+    inside_count = await count_inside(query.get("condominium_id"))
     
     # Total authorizations
     total_auths = await db.visitor_authorizations.count_documents({**query, "is_active": True})
@@ -718,10 +694,7 @@ async def get_authorization(
         condo = await db.condominiums.find_one({"id": condo_id}, {"timezone": 1})
         condo_timezone = condo.get("timezone") if condo else None
     
-    validity = check_authorization_validity(auth, condo_timezone)
-    auth["validity_status"] = validity["status"]
-    auth["validity_message"] = validity["message"]
-    auth["is_currently_valid"] = validity["is_valid"]
+    apply_validity(auth, check_authorization_validity(auth, condo_timezone))
     
     return auth
 
@@ -773,6 +746,9 @@ async def update_authorization(
         update_fields["company"] = auth_data.company
     if auth_data.service_type is not None:
         update_fields["service_type"] = auth_data.service_type
+    # Keep search keys in step with the searchable fields
+    if {"visitor_name", "identification_number", "vehicle_plate"} & update_fields.keys():
+        update_fields["search_keys"] = authorization_search_keys({**auth, **update_fields})
     
     await db.visitor_authorizations.update_one(
         {"id": auth_id},
@@ -783,13 +759,13 @@ async def update_authorization(
         AuditEventType.AUTHORIZATION_UPDATED,
         current_user["id"],
         "visitor_authorizations",
-        {"authorization_id": auth_id, "changes": list(update_fields.keys())},
+        {"authorization_id": auth_id, "changes": [k for k in update_fields if k != "search_keys"]},
         request.client.host if request.client else "unknown",
         request.headers.get("user-agent", "unknown")
     )
     
     # Fetch and return updated
-    updated = await db.visitor_authorizations.find_one({"id": auth_id}, {"_id": 0})
+    updated = await db.visitor_authorizations.find_one({"id": auth_id}, {"_id": 0, "search_keys": 0})
     return updated
 
 @router.delete("/authorizations/{auth_id}")
@@ -820,11 +796,8 @@ async def deactivate_authorization(
     is_resident = "Residente" in user_roles and not any(r in user_roles for r in ["Administrador", "SuperAdmin", "Guarda", "Supervisor", "RRHH"])
     
     if is_resident:
-        # Check for active visitor entries using this authorization
-        active_entry = await db.visitor_entries.find_one({
-            "authorization_id": auth_id,
-            "status": "inside"
-        }, {"_id": 0, "id": 1, "visitor_name": 1})
+        # Check for a visitor inside on this authorization
+        active_entry = await find_occupant(authorization_id=auth_id)
         
         if active_entry:
             raise HTTPException(
@@ -861,6 +834,7 @@ async def get_authorizations_for_guard(
     Guard gets list of active authorizations for validation.
     Supports search by visitor name, ID, or vehicle plate.
     By default, only returns PENDING authorizations (not yet used).
+    Read-only: three queries regardless of the number of authorizations.
     """
     condo_id = current_user.get("condominium_id")
     
@@ -876,86 +850,62 @@ async def get_authorizations_for_guard(
         else:
             return []
     
-    authorizations = await db.visitor_authorizations.find(query, {"_id": 0}).to_list(500)
+    # Search: indexed prefix match on search_keys (name, ID, plate, resident)
+    if search:
+        keys_filter = search_filter(search, _search_fallback_fields(AUTHORIZATION_SEARCH_FIELDS))
+        if keys_filter:
+            query.update(keys_filter)
+    
+    # Authorizations and condominium timezone together
+    authorizations, condo = await asyncio.gather(
+        db.visitor_authorizations.find(query, {"_id": 0, "search_keys": 0}).to_list(500),
+        db.condominiums.find_one({"id": condo_id}, {"_id": 0, "timezone": 1}) if condo_id else asyncio.sleep(0)
+    )
+    condo_timezone = condo.get("timezone") if condo else None
     
-    # ==================== FILTER OUT ALREADY CHECKED-IN (for temporary/extended) ====================
-    # This handles legacy data where status wasn't set to 'used'
-    # Check multiple indicators: checked_in_at, total_visits, or actual entry in visitor_entries
-    filtered_authorizations = []
+    if search:
+        authorizations = rank_search_results(authorizations, search, *AUTHORIZATION_SEARCH_FIELDS)
+    
+    # ==================== ENTRY LOOKUP (one query each for all authorizations) ====================
+    # - one-time (temporary/extended): any entry means already used. Legacy
+    #   documents may still say "pending"; scripts/migrate_authorization_used_status.py
+    #   fixes them, this endpoint only reads.
+    # - all: the visitor inside (visitor_occupancy), for the is_visitor_inside flag
+    one_time_ids = [a["id"] for a in authorizations if a.get("authorization_type", "temporary") in ["temporary", "extended"]]
+    used_ids, open_entries = await asyncio.gather(
+        db.visitor_entries.distinct("authorization_id", {"authorization_id": {"$in": one_time_ids}}) if one_time_ids else asyncio.sleep(0, []),
+        get_occupancy_by_authorization([a["id"] for a in authorizations])
+    )
+    used_ids = set(used_ids)
     
+    clock = validity_clock(condo_timezone)
+    enriched = []
     for auth in authorizations:
-        auth_type = auth.get("authorization_type", "temporary")
         auth_id = auth.get("id")
         
         # Only filter temporary and extended (permanent/recurring can be reused)
-        if auth_type not in ["temporary", "extended"]:
-            filtered_authorizations.append(auth)
-            continue
-        
-        # For temporary/extended, ALWAYS check if there's an entry in visitor_entries
-        # This is the most reliable indicator that the authorization was used
-        entry_exists = await db.visitor_entries.find_one({"authorization_id": auth_id})
-        
-        # Also check other indicators
-        checked_in_at = auth.get("checked_in_at")
-        total_visits = auth.get("total_visits", 0)
-        
-        already_used = entry_exists or checked_in_at or total_visits > 0
+        if auth.get("authorization_type", "temporary") in ["temporary", "extended"]:
+            already_used = auth_id in used_ids or auth.get("checked_in_at") or auth.get("total_visits", 0) > 0
+            if already_used:
+                if not include_used:
+                    continue  # Skip from results
+                auth["status"] = "used"
         
-        if already_used:
-            # Fix legacy data: update status to 'used'
-            result = await db.visitor_authorizations.update_one(
-                {"id": auth_id, "status": {"$in": ["pending", None]}},
-                {"$set": {"status": "used"}}
-            )
-            if result.modified_count > 0:
-                logger.info(f"[guard/authorizations] Auto-fixed auth {auth_id[:8]} to status=used (entry_exists={bool(entry_exists)}, checked_in_at={bool(checked_in_at)}, visits={total_visits})")
-            
-            if not include_used:
-                continue  # Skip from results
-        
-        filtered_authorizations.append(auth)
-    
-    authorizations = filtered_authorizations
-    # ================================================================================================
-    
-    # Get condominium timezone for validity checks
-    condo_timezone = None
-    if condo_id:
-        condo = await db.condominiums.find_one({"id": condo_id}, {"timezone": 1})
-        condo_timezone = condo.get("timezone") if condo else None
-    
-    # Enrich with validity status
-    for auth in authorizations:
-        validity = check_authorization_validity(auth, condo_timezone)
-        auth["validity_status"] = validity["status"]
-        auth["validity_message"] = validity["message"]
-        auth["is_currently_valid"] = validity["is_valid"]
+        # Enrich with validity status
+        apply_validity(auth, check_authorization_validity(auth, clock=clock))
         
         # PHASE 3: Add is_visitor_inside flag for frontend
-        active_entry = await db.visitor_entries.find_one({
-            "authorization_id": auth.get("id"),
-            "status": "inside",
-            "exit_at": None
-        }, {"_id": 0, "id": 1, "entry_at": 1})
+        active_entry = open_entries.get(auth_id)
         auth["is_visitor_inside"] = active_entry is not None
         if active_entry:
-            auth["active_entry_id"] = active_entry.get("id")
+            auth["active_entry_id"] = active_entry["_id"]
             auth["entry_at"] = active_entry.get("entry_at")
+        
+        enriched.append(auth)
+    authorizations = enriched
     
-    # Filter by search if provided
-    if search:
-        search_lower = search.lower().strip()
-        authorizations = [
-            a for a in authorizations
-            if search_lower in a.get("visitor_name", "").lower() or
-               search_lower in (a.get("identification_number") or "").lower() or
-               search_lower in (a.get("vehicle_plate") or "").lower() or
-               search_lower in (a.get("created_by_name") or "").lower()
-        ]
-    
-    # Sort: valid first, then by name
-    authorizations.sort(key=lambda x: (not x.get("is_currently_valid", False), x.get("visitor_name", "").lower()))
+    # Sort: best search match first (when searching), then valid first, then by name
+    authorizations.sort(key=lambda x: (-x.get("search_score", 0), not x.get("is_currently_valid", False), x.get("visitor_name", "").lower()))
     
     return authorizations
 
@@ -988,11 +938,7 @@ async def fast_checkin(
     # ==================== PHASE 1: PREVENT DUPLICATE ENTRIES (AUTHORIZATION) ====================
     # Check if visitor with this authorization is already inside
     if checkin_data.authorization_id:
-        existing_inside = await db.visitor_entries.find_one({
-            "authorization_id": checkin_data.authorization_id,
-            "status": "inside",
-            "exit_at": None
-        })
+        existing_inside = await find_occupant(authorization_id=checkin_data.authorization_id)
         if existing_inside:
             logger.warning(
                 f"[check-in] BLOCKED - Visitor already inside with auth {checkin_data.authorization_id[:8]}"
@@ -1005,18 +951,8 @@ async def fast_checkin(
     # ==================== PHASE 2: PREVENT DUPLICATE ENTRIES (MANUAL) ====================
     # For manual entries, check by visitor_name + condominium to prevent duplicates
     if checkin_data.visitor_name and not checkin_data.authorization_id:
-        # Normalize visitor name for comparison
-        normalized_name = checkin_data.visitor_name.strip().lower()
-        
-        # Check if same visitor name is already inside this condo (case-insensitive)
-        # Use regex for case-insensitive match on visitor_name
-        existing_manual = await db.visitor_entries.find_one({
-            "condominium_id": condo_id,
-            "status": "inside",
-            "exit_at": None,
-            "authorization_id": None,  # Only manual entries
-            "visitor_name": {"$regex": f"^{re.escape(normalized_name)}$", "$options": "i"}
-        })
+        # Same normalized name (case and accent insensitive) already inside this condo
+        existing_manual = await find_occupant(condominium_id=condo_id, visitor_name=checkin_data.visitor_name)
         
         if existing_manual:
             logger.warning(
@@ -1133,8 +1069,21 @@ async def fast_checkin(
         "condominium_id": condo_id,
         "created_at": now_iso
     }
-    
-    await db.visitor_entries.insert_one(entry_doc)
+    entry_doc["search_keys"] = entry_search_keys(entry_doc)
+    
+    # Claim the occupancy slot first: the unique claim makes concurrent
+    # check-ins of the same authorization / manual visitor fail here
+    if not await occupy(entry_doc, claim=bool(checkin_data.authorization_id or checkin_data.visitor_name)):
+        logger.warning(f"[check-in] BLOCKED concurrent duplicate check-in (auth={checkin_data.authorization_id}, visitor={visitor_name})")
+        raise HTTPException(
+            status_code=400,
+            detail="El visitante ya se encuentra dentro del condominio. Debe registrar su salida antes de un nuevo ingreso."
+        )
+    try:
+        await db.visitor_entries.insert_one(entry_doc)
+    except Exception:
+        await vacate(entry_id)
+        raise
     
     # Update authorization stats and status
     if authorization:
@@ -1188,26 +1137,9 @@ async def fast_checkin(
                 "entry_at": now_iso,
                 "guard_name": current_user.get("full_name")
             },
-            send_push=False,  # Disable old push, use targeted instead
-            url="/resident?tab=history"
-        )
-        
-        # PHASE 1: Send targeted push notification to resident owner
-        await send_targeted_push_notification(
-            condominium_id=condo_id,
-            title="🚪 Tu visitante ha llegado",
-            body=f"{visitor_name} ha ingresado al condominio",
-            target_user_ids=[resident_id],
-            exclude_user_ids=[current_user["id"]],
-            data={
-                "type": "visitor_arrival",
-                "entry_id": entry_id,
-                "visitor_name": visitor_name,
-                "entry_at": now_iso,
-                "guard_name": current_user.get("full_name"),
-                "url": "/resident?tab=history"
-            },
-            tag=f"checkin-{entry_id[:8]}"
+            send_push=True,  # Tenant-scoped push; bursts coalesce into one summary
+            url="/resident?tab=history",
+            exclude_user_ids=[current_user["id"]]
         )
         
         await log_audit_event(
@@ -1237,6 +1169,7 @@ async def fast_checkin(
     print(f"[FLOW] visitor_entry_registered | entry_id={entry_id} visitor={visitor_name} authorized={is_authorized} condo={condo_id[:8]}")
     
     entry_doc.pop("_id", None)
+    entry_doc.pop("search_keys", None)
     return {
         "success": True,
         "entry": entry_doc,
@@ -1266,7 +1199,7 @@ async def get_entries_today(
             "condominium_id": condo_id,
             "entry_at": {"$gte": today_start}
         },
-        {"_id": 0}
+        {"_id": 0, "search_keys": 0}
     ).sort("entry_at", -1).to_list(100)
     
     return entries
@@ -1308,9 +1241,9 @@ async def fast_checkout(
         except ValueError:
             pass
     
-    # Update entry
-    await db.visitor_entries.update_one(
-        {"id": entry_id},
+    # Update entry (only if still inside: a concurrent check-out wins once)
+    result = await db.visitor_entries.update_one(
+        {"id": entry_id, "status": "inside"},
         {"$set": {
             "exit_at": now_iso,
             "exit_by": current_user["id"],
@@ -1320,6 +1253,14 @@ async def fast_checkout(
             "duration_minutes": duration_minutes
         }}
     )
+    if result.modified_count == 0:
+        raise HTTPException(status_code=404, detail="Registro de entrada no encontrado o ya salió")
+    # The exit is recorded; a leftover occupancy document is released by the
+    # next check-in of this visitor (or by reconciliation), so don't fail here
+    try:
+        await vacate(entry_id)
+    except Exception as e:
+        logger.error(f"[check-out] Failed to remove occupancy of entry {entry_id[:8]}: {e}")
     
     # Create notification AND send push to resident (optional for exit)
     resident_id = entry.get("resident_id")
@@ -1347,27 +1288,9 @@ async def fast_checkout(
                 "duration_minutes": duration_minutes,
                 "guard_name": current_user.get("full_name")
             },
-            send_push=False,  # Disable old push, use targeted instead
-            url="/resident?tab=history"
-        )
-        
-        # PHASE 2: Send targeted push notification to resident owner
-        await send_targeted_push_notification(
-            condominium_id=condo_id,
-            title="👋 Tu visitante ha salido",
-            body=f"{entry.get('visitor_name')} ha salido del condominio{duration_text}",
-            target_user_ids=[resident_id],
-            exclude_user_ids=[current_user["id"]],
-            data={
-                "type": "visitor_exit",
-                "entry_id": entry_id,
-                "visitor_name": entry.get("visitor_name"),
-                "exit_at": now_iso,
-                "duration_minutes": duration_minutes,
-                "guard_name": current_user.get("full_name"),
-                "url": "/resident?tab=history"
-            },
-            tag=f"checkout-{entry_id[:8]}"
+            send_push=True,  # Tenant-scoped push; bursts coalesce into one summary
+            url="/resident?tab=history",
+            exclude_user_ids=[current_user["id"]]
         )
         
         await log_audit_event(
@@ -1422,18 +1345,15 @@ async def fast_checkout(
 async def get_visitors_inside(
     current_user = Depends(require_role("Administrador", "Supervisor", "Guarda"))
 ):
-    """Get all visitors currently inside the condominium"""
+    """Get all visitors currently inside the condominium (from visitor_occupancy)"""
     condo_id = current_user.get("condominium_id")
     
-    query = {"status": "inside"}
     if "SuperAdmin" not in current_user.get("roles", []):
-        if condo_id:
-            query["condominium_id"] = condo_id
-        else:
+        if not condo_id:
             return []
+        return await get_inside_entries(condo_id)
     
-    entries = await db.visitor_entries.find(query, {"_id": 0}).sort("entry_at", -1).to_list(200)
-    return entries
+    return await get_inside_entries()
 
 @router.get("/guard/visits-summary")
 async def get_visits_summary(
@@ -1459,7 +1379,7 @@ async def get_visits_summary(
         "is_active": True,
         "status": "pending"
     }
-    pending_auths = await db.visitor_authorizations.find(pending_query, {"_id": 0}).sort("created_at", -1).to_list(100)
+    pending_auths = await db.visitor_authorizations.find(pending_query, {"_id": 0, "search_keys": 0}).sort("created_at", -1).to_list(100)
     
     # Get condominium timezone for validity checks
     condo_timezone = None
@@ -1468,21 +1388,14 @@ async def get_visits_summary(
         condo_timezone = condo.get("timezone") if condo else None
     
     # Filter and enrich pending authorizations with validity
-    enriched_pending = []
-    for auth in pending_auths:
-        validity = check_authorization_validity(auth, condo_timezone)
-        if validity.get("is_valid"):
-            auth["validity_status"] = validity["status"]
-            auth["validity_message"] = validity["message"]
-            auth["is_currently_valid"] = True
-            enriched_pending.append(auth)
-    
-    # 2. Get visitors currently inside
-    inside_query = {
-        **base_query,
-        "status": "inside"
-    }
-    inside_entries = await db.visitor_entries.find(inside_query, {"_id": 0}).sort("entry_at", -1).to_list(200)
+    enriched_pending = [
+        apply_validity(auth, validity)
+        for auth, validity in zip(pending_auths, evaluate_authorizations(pending_auths, condo_timezone))
+        if validity["is_valid"]
+    ]
+    
+    # 2. Get visitors currently inside (materialized occupancy)
+    inside_entries = await get_inside_entries(base_query.get("condominium_id"))
     
     # 3. Get today's exits (completed visits)
     exits_query = {
@@ -1490,7 +1403,7 @@ async def get_visits_summary(
         "status": {"$in": ["exited", "completed"]},  # Support both status values
         "exit_at": {"$gte": f"{today}T00:00:00"}
     }
-    today_exits = await db.visitor_entries.find(exits_query, {"_id": 0}).sort("exit_at", -1).to_list(100)
+    today_exits = await db.visitor_entries.find(exits_query, {"_id": 0, "search_keys": 0}).sort("exit_at", -1).to_list(100)
     
     return {
         "pending": enriched_pending,
@@ -1657,16 +1570,12 @@ async def get_resident_visit_history(
     if status:
         query["status"] = status
     
-    # Search filter (name, document, plate)
+    # Search filter (name, document, plate): indexed prefix match on search_keys
     if search:
-        search_regex = {"$regex": search, "$options": "i"}
-        query["$and"] = query.get("$and", []) + [{
-            "$or": [
-                {"visitor_name": search_regex},
-                {"document_number": search_regex},
-                {"vehicle_plate": search_regex}
-            ]
-        }]
+        keys_filter = search_filter(search, _search_fallback_fields(ENTRY_SEARCH_FIELDS))
+        if keys_filter:
+            # query already has the resident $or
+            query["$and"] = [keys_filter]
     
     # Get total count for pagination
     total_count = await db.visitor_entries.count_documents(query)
@@ -1678,7 +1587,7 @@ async def get_resident_visit_history(
     # Fetch entries with pagination
     entries = await db.visitor_entries.find(
         query, 
-        {"_id": 0}
+        {"_id": 0, "search_keys": 0}
     ).sort("entry_at", -1).skip(skip).limit(page_size).to_list(page_size)
     
     # Enrich entries with additional data
@@ -1818,7 +1727,7 @@ async def export_resident_visit_history(
         query["status"] = status
     
     # Fetch entries (limit 500 for export)
-    entries = await db.visitor_entries.find(query, {"_id": 0}).sort("entry_at", -1).to_list(500)
+    entries = await db.visitor_entries.find(query, {"_id": 0, "search_keys": 0}).sort("entry_at", -1).to_list(500)
     
     # Enrich with duration
     for entry in entries:
@@ -1923,7 +1832,7 @@ async def export_resident_visit_history_pdf(
         query["status"] = status
     
     # Fetch entries
-    entries = await db.visitor_entries.find(query, {"_id": 0}).sort("entry_at", -1).to_list(500)
+    entries = await db.visitor_entries.find(query, {"_id": 0, "search_keys": 0}).sort("entry_at", -1).to_list(500)
     
     logger.info(f"[VISIT-PDF-EXPORT] Generating PDF for {resident_name}, entries: {len(entries)}")
     
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+GENTURIX - Visitor Search Keys Backfill Script
+==============================================
+
+Fills in `search_keys` (services/search_keys.py) on visitor_authorizations
+and visitor_entries written before the keys were maintained on write.
+The server runs the same backfill at startup
+(services/search_keys_backfill.py); use this to run it ahead of a deploy
+or with --rebuild, which recomputes keys on every document (e.g. after
+changing the normalization). Safe to run multiple times (idempotent).
+
+Works in batches by _id with one bulk_write per batch.
+
+Usage:
+    cd /app/backend
+    python scripts/backfill_search_keys.py [--batch-size 1000] [--rebuild] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.search_keys_backfill import SEARCH_KEY_COLLECTIONS, backfill_collection
+
+# Configuration
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.get('DB_NAME', 'test_database')
+
+
+def print_progress(name, scanned):
+    print(f"✓  {name}: {scanned} scanned")
+
+
+async def backfill_search_keys(batch_size: int = 1000, rebuild: bool = False, dry_run: bool = False):
+    """
+    Main backfill function.
+    Adds search_keys to every visitor authorization and entry missing them.
+    """
+    print("=" * 60)
+    print("GENTURIX - Visitor Search Keys Backfill")
+    print("=" * 60)
+    print(f"\nConnecting to MongoDB: {MONGO_URL}")
+    print(f"Database: {DB_NAME}")
+    print(f"Batch size: {batch_size}{' (rebuild)' if rebuild else ''}{' (dry run)' if dry_run else ''}\n")
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    stats = {}
+    try:
+        for name, fields, build_keys in SEARCH_KEY_COLLECTIONS:
+            stats[name] = await backfill_collection(db, name, fields, build_keys, batch_size, rebuild, dry_run, print_progress)
+
+        # Print summary
+        print("\n" + "=" * 60)
+        print("BACKFILL SUMMARY")
+        print("=" * 60)
+        for name, (scanned, updated) in stats.items():
+            print(f"\n{name}: scanned {scanned}, updated {updated}{' (dry run, nothing written)' if dry_run else ''}")
+
+        print("\n✅ Backfill completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Backfill failed: {e}")
+        raise
+    finally:
+        client.close()
+
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--rebuild", action="store_true", help="recompute keys on all documents")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+
+    print("\n🚀 Starting Visitor Search Keys Backfill...\n")
+    asyncio.run(backfill_search_keys(args.batch_size, args.rebuild, args.dry_run))
+    print("\n🏁 Backfill script finished.\n")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Authorization Validity Benchmark
+================================
+Evaluates N visitor authorizations (default 1,000; a mix of permanent,
+temporary, recurring and extended, some revoked) and compares:
+
+  per-call       the previous check_authorization_validity: ZoneInfo +
+                 datetime.now + strftime for every authorization
+  engine         services/authorization_validity.evaluate_authorizations:
+                 one clock per list, compiled schedules, single pass
+
+Also checks both give identical results at a spread of times of day and
+weekdays. Pure CPU: no database.
+
+Usage:
+    python scripts/bench_authorization_validity.py [--count 1000] [--rounds 20]
+        [--timezone America/Costa_Rica]
+"""
+
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from time import perf_counter
+from zoneinfo import ZoneInfo
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.authorization_validity import WEEKDAYS_ES, evaluate_authorizations, validity_clock  # noqa: E402
+
+
+def legacy_check(authorization, condominium_timezone=None, now=None):
+    """check_authorization_validity as it was before the engine (`now` added for the equivalence check)."""
+    if condominium_timezone:
+        try:
+            tz = ZoneInfo(condominium_timezone)
+            now = now.astimezone(tz) if now else datetime.now(tz)
+        except Exception:
+            now = now or datetime.now(timezone.utc)
+    else:
+        now = now or datetime.now(timezone.utc)
+
+    today_str = now.strftime("%Y-%m-%d")
+    current_time = now.strftime("%H:%M")
+    current_day_es = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"][now.weekday()]
+
+    auth_type = authorization.get("authorization_type", "temporary")
+    if not authorization.get("is_active", True):
+        return {"is_valid": False, "status": "revoked", "message": "Autorización revocada"}
+    if auth_type == "permanent":
+        return {"is_valid": True, "status": "authorized", "message": "Autorización permanente"}
+    valid_from = authorization.get("valid_from")
+    valid_to = authorization.get("valid_to")
+    if valid_from and today_str < valid_from:
+        return {"is_valid": False, "status": "not_yet_valid", "message": f"Válido desde {valid_from}"}
+    if valid_to and today_str > valid_to:
+        return {"is_valid": False, "status": "expired", "message": f"Expiró el {valid_to}"}
+    if auth_type == "recurring":
+        allowed_days = authorization.get("allowed_days", [])
+        if allowed_days and current_day_es not in allowed_days:
+            return {"is_valid": False, "status": "not_today", "message": f"No autorizado hoy ({current_day_es})"}
+    if auth_type == "extended":
+        hours_from = authorization.get("allowed_hours_from")
+        hours_to = authorization.get("allowed_hours_to")
+        if hours_from and current_time < hours_from:
+            return {"is_valid": False, "status": "too_early", "message": f"Válido desde las {hours_from}"}
+        if hours_to and current_time > hours_to:
+            return {"is_valid": False, "status": "too_late", "message": f"Válido hasta las {hours_to}"}
+    return {"is_valid": True, "status": "authorized", "message": "Autorización válida"}
+
+
+def make_authorizations(count):
+    rng = random.Random(7)
+    today = datetime.now(timezone.utc).date()
+    authorizations = []
+    for i in range(count):
+        auth_type = rng.choice(["permanent", "temporary", "temporary", "recurring", "extended"])
+        start = today + timedelta(days=rng.randint(-10, 5))
+        auth = {
+            "id": f"auth-{i}",
+            "authorization_type": auth_type,
+            "is_active": rng.random() > 0.05,
+            "valid_from": start.isoformat() if auth_type != "permanent" else None,
+            "valid_to": (start + timedelta(days=rng.randint(0, 10))).isoformat() if auth_type != "permanent" else None,
+        }
+        if auth_type == "recurring":
+            auth["allowed_days"] = rng.sample(list(WEEKDAYS_ES), rng.randint(1, 5))
+            auth["valid_from"] = auth["valid_to"] = None
+        if auth_type == "extended":
+            hour = rng.randint(5, 14)
+            auth["allowed_hours_from"] = f"{hour:02d}:00"
+            auth["allowed_hours_to"] = f"{hour + rng.randint(2, 8):02d}:30"
+        authorizations.append(auth)
+    return authorizations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20, help="best of N rounds is reported")
+    parser.add_argument("--timezone", default="America/Costa_Rica")
+    args = parser.parse_args()
+
+    authorizations = make_authorizations(args.count)
+
+    # Same results at every hour over a week
+    base = datetime.now(timezone.utc).replace(minute=15, second=0, microsecond=0)
+    for hour in range(0, 24 * 7, 5):
+        now = base + timedelta(hours=hour)
+        expected = [legacy_check(a, args.timezone, now) for a in authorizations]
+        actual = evaluate_authorizations(authorizations, clock=validity_clock(args.timezone, now))
+        assert actual == expected, f"engine differs from the previous check at {now.isoformat()}"
+
+    def per_call():
+        return [legacy_check(a, args.timezone) for a in authorizations]
+
+    def engine():
+        return evaluate_authorizations(authorizations, args.timezone)
+
+    print(f"{args.count} authorizations, timezone {args.timezone}, best of {args.rounds} rounds\n")
+    print(f"{'evaluator':<14}{'ms/list':>10}{'µs/auth':>10}")
+    results = {}
+    for name, run in (("per-call", per_call), ("engine", engine)):
+        best = float("inf")
+        for _ in range(args.rounds):
+            start = perf_counter()
+            run()
+            best = min(best, perf_counter() - start)
+        results[name] = best
+        print(f"{name:<14}{best * 1000:>10.2f}{best * 1e6 / args.count:>10.2f}")
+    print(f"\nspeedup: {results['per-call'] / results['engine']:.1f}x | results identical: True")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+GET /authorizations/my Benchmark
+================================
+A resident holding 100 permanent authorizations (default), each with a
+history of visitor entries. Compares the per-authorization enrichment the
+endpoint used to do (find_one inside entry + sorted find_one +
+count_documents per authorization) with the current handler
+(routers/visitors.get_my_authorizations: one aggregation over
+visitor_entries via get_authorization_entry_summaries), and reports
+latency (p50/p99) and MongoDB commands per request.
+
+Seeds a throw-away condominium, resident, authorizations and entries in a
+scratch database (DB_NAME + "_auth_bench" unless --db is given) and
+deletes them afterwards. Requires MONGO_URL. Creates the endpoint's
+indexes on the scratch collections first.
+
+Usage:
+    python scripts/bench_authorizations_my.py [--authorizations 100]
+        [--entries 20] [--inside 5] [--requests 50] [--type permanent]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from time import perf_counter
+
+from dotenv import load_dotenv
+from pymongo import monitoring
+
+BACKEND_DIR = Path(__file__).parent.parent
+load_dotenv(BACKEND_DIR / '.env')
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts MongoDB commands sent by this process (registered before the client is created)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def legacy_enrichment(db, visitors, authorizations, condo_timezone):
+    """The per-authorization loop GET /authorizations/my used before the aggregation."""
+    for auth in authorizations:
+        validity = visitors.check_authorization_validity(auth, condo_timezone)
+        auth["validity_status"] = validity["status"]
+        auth["is_currently_valid"] = validity["is_valid"]
+        active_inside = await db.visitor_entries.find_one(
+            {"authorization_id": auth.get("id"), "status": "inside"}, {"_id": 0, "id": 1}
+        )
+        auth["has_visitor_inside"] = active_inside is not None
+        if auth.get("authorization_type") in ["temporary", "extended"]:
+            entry_exists = await db.visitor_entries.find_one({"authorization_id": auth.get("id")})
+            auth["was_used"] = bool(entry_exists)
+        else:
+            last_entry = await db.visitor_entries.find_one(
+                {"authorization_id": auth.get("id")}, sort=[("entry_at", -1)]
+            )
+            if last_entry:
+                auth["last_used_at"] = last_entry.get("entry_at")
+                auth["total_uses"] = await db.visitor_entries.count_documents({"authorization_id": auth.get("id")})
+            else:
+                auth["total_uses"] = 0
+    return authorizations
+
+
+async def legacy_handler(db, visitors, user):
+    authorizations = await db.visitor_authorizations.find(
+        {"created_by": user["id"], "condominium_id": user["condominium_id"], "is_active": True}, {"_id": 0}
+    ).sort("created_at", -1).to_list(100)
+    condo = await db.condominiums.find_one({"id": user["condominium_id"]}, {"timezone": 1})
+    return await legacy_enrichment(db, visitors, authorizations, condo.get("timezone") if condo else None)
+
+
+async def seed(db, args):
+    now = datetime.now(timezone.utc)
+    condo_id = str(uuid.uuid4())
+    user = {
+        "id": str(uuid.uuid4()),
+        "email": "bench-resident@genturix.bench",
+        "full_name": "Bench Resident",
+        "roles": ["Residente"],
+        "condominium_id": condo_id,
+        "is_active": True,
+    }
+    await db.condominiums.insert_one({"id": condo_id, "name": "Bench Authorizations", "timezone": "America/Costa_Rica"})
+    authorizations = [{
+        "id": str(uuid.uuid4()),
+        "condominium_id": condo_id,
+        "created_by": user["id"],
+        "created_by_name": user["full_name"],
+        "visitor_name": f"Visitante {i}",
+        "authorization_type": args.type,
+        "allowed_days": ["Lunes", "Miércoles", "Viernes"] if args.type == "recurring" else [],
+        "is_active": True,
+        "status": "pending",
+        "created_at": (now - timedelta(minutes=i)).isoformat(),
+    } for i in range(args.authorizations)]
+    await db.visitor_authorizations.insert_many(authorizations)
+    entries = []
+    for index, auth in enumerate(authorizations):
+        for n in range(args.entries):
+            inside = index < args.inside and n == args.entries - 1
+            entries.append({
+                "id": str(uuid.uuid4()),
+                "authorization_id": auth["id"],
+                "condominium_id": condo_id,
+                "visitor_name": auth["visitor_name"],
+                "entry_at": (now - timedelta(days=args.entries - n)).isoformat(),
+                "entry_by_name": "Bench Guard",
+                "status": "inside" if inside else "completed",
+                "exit_at": None if inside else (now - timedelta(days=args.entries - n, hours=-1)).isoformat(),
+            })
+    if entries:
+        await db.visitor_entries.insert_many(entries)
+    return condo_id, user
+
+
+async def measure(name, counter, requests, call):
+    latencies = []
+    commands = []
+    result = None
+    for _ in range(requests):
+        before = counter.count
+        started = perf_counter()
+        result = await call()
+        latencies.append((perf_counter() - started) * 1000)
+        commands.append(counter.count - before)
+    print(f"{name:<34}{percentile(latencies, 0.5):>9.1f}{percentile(latencies, 0.99):>9.1f}"
+          f"{sum(commands) / len(commands):>12.1f}")
+    return result
+
+
+async def main_async(args):
+    # Scratch database must be in the environment before `core` is imported
+    os.environ["DB_NAME"] = args.db or f"{os.environ.get('DB_NAME', 'genturix')}_auth_bench"
+    counter = CommandCounter()
+    monitoring.register(counter)
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    import core
+    from routers import visitors
+
+    logging.getLogger().setLevel(logging.WARNING)
+    db = core.db
+    await db.visitor_authorizations.create_index([("created_by", 1), ("condominium_id", 1), ("created_at", -1)])
+    await db.visitor_entries.create_index([("authorization_id", 1), ("entry_at", 1)])
+
+    condo_id, user = await seed(db, args)
+    try:
+        print(f"database: {os.environ['DB_NAME']} | {args.authorizations} {args.type} authorizations x "
+              f"{args.entries} entries ({args.inside} with a visitor inside) | {args.requests} requests\n")
+        print(f"{'handler':<34}{'p50 ms':>9}{'p99 ms':>9}{'commands':>12}")
+        legacy = await measure("per-authorization queries", counter, args.requests,
+                               lambda: legacy_handler(db, visitors, user))
+        current = await measure("single aggregation (current)", counter, args.requests,
+                                lambda: visitors.get_my_authorizations(status=None, request=None, current_user=user))
+
+        # Same usage info either way
+        by_id = {a["id"]: a for a in legacy}
+        mismatches = [
+            a["id"] for a in current
+            if (a["has_visitor_inside"], a.get("total_uses"), a.get("last_used_at")) !=
+               (by_id[a["id"]]["has_visitor_inside"], by_id[a["id"]].get("total_uses"), by_id[a["id"]].get("last_used_at"))
+        ]
+        print(f"\nresults match: {not mismatches}" + (f" ({len(mismatches)} differ)" if mismatches else ""))
+    finally:
+        await db.visitor_entries.delete_many({"condominium_id": condo_id})
+        await db.visitor_authorizations.delete_many({"condominium_id": condo_id})
+        await db.condominiums.delete_one({"id": condo_id})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--authorizations", type=int, default=100)
+    parser.add_argument("--entries", type=int, default=20, help="entries per authorization")
+    parser.add_argument("--inside", type=int, default=5, help="authorizations with a visitor currently inside")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--type", default="permanent", choices=["permanent", "recurring", "temporary", "extended"])
+    parser.add_argument("--db", help="scratch database name (default: DB_NAME + '_auth_bench')")
+    args = parser.parse_args()
+
+    if not os.environ.get("MONGO_URL"):
+        print("ERROR: MONGO_URL not configured in .env")
+        return 1
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Email Template Render Benchmark
+===============================
+Renders N personalized emails (default 10,000) with every template in the
+email template registry (services/email_templates.py): the
+services/email_service.py templates, BILLING_EMAIL_TEMPLATES and the
+credentials email, and compares against the previous approach of building
+the f-string per send.
+
+Per template:
+  f-string          the template source as an f-string (what each send
+                    used to do; no escaping)
+  f-string+escape   the same with html.escape() on every value (what the
+                    old code would need to be safe)
+  compiled          CompiledTemplate.render() (static parts compiled once,
+                    escaped values)
+
+Each recipient gets its own name/email/password; condominium name, URLs
+and dates are shared, as in a bulk mailing. Pure CPU: no database and no
+email is sent (the modules only need to be importable).
+
+Usage:
+    python scripts/bench_email_templates.py [--count 10000] [--rounds 3]
+        [--template visitor_preregistration]
+"""
+
+import argparse
+import html
+import importlib
+import sys
+from pathlib import Path
+from time import perf_counter
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+SHARED_VALUES = {
+    "condominium_name": "Residencial Los Álamos & Jardines",
+    "condo_name": "Residencial Los Álamos & Jardines",
+    "login_url": "https://app.genturix.com/login?ref=email&lang=es",
+    "reset_url": "https://app.genturix.com/reset?token=abc123&lang=es",
+    "action_url": "https://app.genturix.com/notifications?id=42&tab=all",
+    "action_text": "Ver Detalles",
+    "action_button": "",
+    "role": "Residente",
+    "role_display": "Residente",
+    "alert_type": "Emergencia Médica",
+    "location": "Torre B, Apto 1204",
+    "timestamp": "16/10/2026 08:15:00 UTC",
+    "valid_from": "2026-10-16",
+    "valid_to": "2026-10-20",
+    "due_date": "20/10/2026",
+    "next_due_date": "20/11/2026",
+    "amount": "1,250.00",
+    "seats": 50,
+    "days_overdue": 3,
+    "grace_days": 5,
+    "title": "Mantenimiento programado",
+    "message": "El agua se suspenderá el sábado de 8:00 a 12:00 <Torre A & B>.",
+}
+
+
+def recipient_values(fields, i):
+    """Values for recipient i: personal fields differ per recipient, the rest are shared."""
+    name = f"José María Pérez {i}" if i % 3 else f"Ana O'Neil & Co. {i}"
+    personal = {
+        "user_name": name,
+        "admin_name": name,
+        "guard_name": name,
+        "resident_name": name,
+        "visitor_name": f"Visitante {i} <Proveedor>",
+        "email": f"residente{i}@example.com",
+        "recipient_email": f"residente{i}@example.com",
+        "password": f"Tmp#{i:06d}xQ",
+        "temporary_password": f"Tmp#{i:06d}xQ",
+        "apartment": f"A-{i % 500}",
+    }
+    return {field: personal.get(field, SHARED_VALUES.get(field, f"{field}-{i}")) for field in fields}
+
+
+def fstring_renderer(template):
+    """The template source compiled as an f-string function (the pre-registry code path)."""
+    fields = template.fields
+    source = f"def render({', '.join(fields)}):\n    return f'''{template.source}'''\n"
+    namespace = {}
+    exec(source, namespace)
+    return namespace["render"]
+
+
+def timed(rows, render):
+    start = perf_counter()
+    for values in rows:
+        render(values)
+    return perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=3, help="best of N rounds is reported")
+    parser.add_argument("--template", action="append", help="only these templates (repeatable)")
+    args = parser.parse_args()
+
+    # Only imported for their side effect: each module registers its templates
+    for module in ("services.email_service", "modules.billing.service", "core.helpers"):
+        importlib.import_module(module)
+    from services import email_templates
+
+    names = args.template or list(email_templates.list_templates())
+    print(f"{args.count} personalized emails per template, best of {args.rounds} rounds\n")
+    print(f"{'template':<32}{'f-string':>12}{'+escape':>12}{'compiled':>12}{'emails/sec':>13}{'KB/email':>10}")
+
+    totals = {"f-string": 0.0, "escape": 0.0, "compiled": 0.0}
+    for name in names:
+        template = email_templates.get_template(name)
+        if not template.fields or name.endswith("_subject"):
+            continue
+        rows = [recipient_values(template.fields, i) for i in range(args.count)]
+        fstring = fstring_renderer(template)
+
+        # Same output as the old f-string for values without HTML special characters
+        plain = {field: f"v{index}" for index, field in enumerate(template.fields)}
+        assert template.render(plain) == fstring(**plain), f"{name}: compiled output differs from the f-string"
+
+        results = {}
+        for label, render in (
+            ("f-string", lambda values: fstring(**values)),
+            ("escape", lambda values: fstring(**{k: html.escape(str(v), quote=True) for k, v in values.items()})),
+            ("compiled", template.render),
+        ):
+            results[label] = min(timed(rows, render) for _ in range(args.rounds))
+            totals[label] += results[label]
+
+        size_kb = len(template.render(rows[0]).encode()) / 1024
+        print(f"{name[:31]:<32}{results['f-string'] * 1000:>10.1f}ms{results['escape'] * 1000:>10.1f}ms"
+              f"{results['compiled'] * 1000:>10.1f}ms{args.count / results['compiled']:>13,.0f}{size_kb:>10.1f}")
+
+    print(f"\n{'total':<32}{totals['f-string'] * 1000:>10.1f}ms{totals['escape'] * 1000:>10.1f}ms{totals['compiled'] * 1000:>10.1f}ms")
+    print(f"registry: {email_templates.get_template_cache_stats()}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Request Middleware Micro-Benchmark
+==================================
+Per-request overhead of the request_id / security-header / billing-block
+layers: the former two @app.middleware("http") (BaseHTTPMiddleware) layers
+versus the single pure ASGI RequestContextMiddleware.
+
+Requests are driven straight through the ASGI interface (no server, no
+socket), against a trivial Starlette route, so the numbers isolate the
+middleware cost. No MongoDB or .env is needed: requests carry no token, so
+the billing check never reaches the database in either variant.
+
+Usage:
+    python scripts/bench_middleware.py [--requests 20000]
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import statistics
+import sys
+import uuid
+from pathlib import Path
+from time import perf_counter
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+# Load core/middleware.py on its own: importing the `core` package would
+# boot the whole application (MongoDB client, Stripe, scheduler...).
+_spec = importlib.util.spec_from_file_location(
+    "genturix_core_middleware",
+    Path(__file__).parent.parent / "core" / "middleware.py",
+)
+core_middleware = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(core_middleware)
+RequestContextMiddleware = core_middleware.RequestContextMiddleware
+
+LEGACY_CSP = core_middleware.CONTENT_SECURITY_POLICY
+
+
+# ==================== LEGACY (BaseHTTPMiddleware) ====================
+async def legacy_request_id_middleware(request, call_next):
+    request_id = str(uuid.uuid4())
+    request.state.request_id = request_id
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    response.headers["X-Frame-Options"] = "DENY"
+    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+    response.headers["Content-Security-Policy"] = LEGACY_CSP
+    return response
+
+
+async def legacy_billing_block_middleware(request, call_next):
+    always_allowed = ["/api/auth/", "/api/health", "/api/billing/", "/api/super-admin/", "/api/push/"]
+    path = request.url.path
+    for allowed in always_allowed:
+        if path.startswith(allowed):
+            return await call_next(request)
+    if request.method.upper() not in ["POST", "PUT", "DELETE", "PATCH"]:
+        return await call_next(request)
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header.startswith("Bearer "):
+        return JSONResponse(status_code=402, content={"detail": "unreachable in benchmark"})
+    return await call_next(request)
+
+
+# ==================== PURE ASGI ====================
+async def billing_guard(request):
+    if request.method.upper() not in ("POST", "PUT", "DELETE", "PATCH"):
+        return None
+    if request.url.path.startswith(("/api/auth/", "/api/health", "/api/billing/", "/api/super-admin/", "/api/push/")):
+        return None
+    if request.headers.get("Authorization", "").startswith("Bearer "):
+        return JSONResponse(status_code=402, content={"detail": "unreachable in benchmark"})
+    return None
+
+
+async def endpoint(request):
+    return PlainTextResponse("ok")
+
+
+ROUTES = [Route("/api/bench", endpoint, methods=["GET", "POST"])]
+
+
+def build_apps():
+    return {
+        "no middleware": Starlette(routes=ROUTES),
+        "legacy (2x BaseHTTPMiddleware)": Starlette(routes=ROUTES, middleware=[
+            # Same order as the old decorators: billing outermost
+            Middleware(BaseHTTPMiddleware, dispatch=legacy_billing_block_middleware),
+            Middleware(BaseHTTPMiddleware, dispatch=legacy_request_id_middleware),
+        ]),
+        "pure ASGI RequestContextMiddleware": Starlette(routes=ROUTES, middleware=[
+            Middleware(RequestContextMiddleware, guard=billing_guard),
+        ]),
+    }
+
+
+async def call(app, method):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": "/api/bench",
+        "raw_path": b"/api/bench",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages
+
+
+async def run(app, method, n):
+    # Warm up (route compilation, middleware stack build)
+    for _ in range(200):
+        await call(app, method)
+    samples = []
+    for _ in range(n):
+        start = perf_counter()
+        await call(app, method)
+        samples.append((perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "mean": statistics.fmean(samples),
+        "p50": samples[len(samples) // 2],
+        "p99": samples[int(len(samples) * 0.99) - 1],
+    }
+
+
+async def main(n):
+    apps = build_apps()
+    print(f"Python {sys.version.split()[0]} | {n} requests per case | times in µs/request\n")
+    print(f"{'case':<38}{'method':<8}{'mean':>10}{'p50':>10}{'p99':>10}{'overhead':>12}")
+    for method in ("GET", "POST"):
+        baseline = None
+        for name, app in apps.items():
+            result = await run(app, method, n)
+            if baseline is None:
+                baseline = result["mean"]
+            overhead = result["mean"] - baseline
+            print(f"{name:<38}{method:<8}{result['mean']:>10.1f}{result['p50']:>10.1f}"
+                  f"{result['p99']:>10.1f}{overhead:>+12.1f}")
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
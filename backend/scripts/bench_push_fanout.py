@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Push Fan-out Benchmark
+======================
+Drives notify_guards_of_panic() and send_targeted_push_notification()
+(role-targeted, all guards) against the local fake push service
+(scripts/fake_push_service.py) for 10 / 100 / 1000 subscriptions, and
+reports per-message delivery time (call start -> push service answered,
+p50/p99) and messages/sec.
+
+Everything on the real path runs: recipient lookup (database, or the
+in-memory subscription directory with --directory), payload encryption and
+VAPID signing, the pooled HTTP client, 404/410 cleanup and the push outbox
+records. Subscriptions deleted by 404/410 are restored before each round.
+
+Seeds a throw-away condominium, guards and subscriptions in a scratch
+database (DB_NAME + "_push_bench" unless --db is given) and deletes them
+afterwards. Uses a freshly generated VAPID key, so no push keys are needed
+in .env. Requires MONGO_URL.
+
+The fake push service runs on the same event loop by default; start it
+separately (scripts/fake_push_service.py) and pass --push-url to keep its
+CPU time out of the measurement.
+
+Usage:
+    python scripts/bench_push_fanout.py [--sizes 10,100,1000] [--rounds 3]
+        [--latency-ms 50] [--jitter-ms 20] [--errors 404=0.01,429=0.02]
+        [--directory] [--push-url http://127.0.0.1:8089]
+"""
+
+import argparse
+import asyncio
+import base64
+import importlib.util
+import logging
+import os
+import secrets
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from dotenv import load_dotenv
+
+BACKEND_DIR = Path(__file__).parent.parent
+load_dotenv(BACKEND_DIR / '.env')
+
+_spec = importlib.util.spec_from_file_location("genturix_fake_push_service", Path(__file__).parent / "fake_push_service.py")
+fake_push_service = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(fake_push_service)
+
+
+def b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def public_key_b64(private_key: ec.EllipticCurvePrivateKey) -> str:
+    return b64url(private_key.public_key().public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+    ))
+
+
+def fmt_ms(value):
+    return f"{value:.1f}" if value is not None else "-"
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def seed(db, size, push_url, p256dh, auth):
+    """Condominium with `size` active guards, one subscription each."""
+    now = datetime.now(timezone.utc).isoformat()
+    condo_id = str(uuid.uuid4())
+    await db.condominiums.insert_one({"id": condo_id, "name": f"Bench Push {size}", "is_active": True, "created_at": now})
+    users = [{
+        "id": str(uuid.uuid4()),
+        "email": f"bench-guard-{size}-{i}@genturix.bench",
+        "full_name": f"Bench Guard {i}",
+        "roles": ["Guarda"],
+        "condominium_id": condo_id,
+        "is_active": True,
+        "status": "active",
+        "created_at": now,
+    } for i in range(size)]
+    await db.users.insert_many(users)
+    subscriptions = [{
+        "id": str(uuid.uuid4()),
+        "user_id": user["id"],
+        "role": "Guarda",
+        "condominium_id": condo_id,
+        "endpoint": f"{push_url}/push/{user['id']}",
+        "p256dh": p256dh,
+        "auth": auth,
+        "expiration_time": None,
+        "is_active": True,
+        "created_at": now,
+        "updated_at": now,
+    } for user in users]
+    return condo_id, subscriptions
+
+
+async def restore_subscriptions(db, core, condo_id, subscriptions, use_directory):
+    await db.push_subscriptions.delete_many({"condominium_id": condo_id})
+    await db.push_subscriptions.insert_many([dict(s) for s in subscriptions])
+    if use_directory:
+        await core.load_push_directory()
+
+
+async def run_case(core, db, control, name, send, condo_id, subscriptions, rounds, use_directory):
+    latencies = []
+    messages = 0
+    delivered = 0
+    wall = 0.0
+    for _ in range(rounds):
+        await restore_subscriptions(db, core, condo_id, subscriptions, use_directory)
+        await control.post("/_fake/reset")
+        started_wall = time.time()
+        started = perf_counter()
+        await send(started)
+        elapsed = perf_counter() - started
+        events = (await control.get("/_fake/events", params={"since": started_wall})).json()["events"]
+        wall += elapsed
+        messages += len(events)
+        delivered += sum(1 for _, status in events if 200 <= status < 300)
+        latencies.extend((at - started_wall) * 1000 for at, _ in events)
+    return {
+        "name": name,
+        "messages": messages,
+        "delivered": delivered,
+        "p50": percentile(latencies, 0.50),
+        "p99": percentile(latencies, 0.99),
+        "rate": messages / wall if wall else 0,
+        "call_ms": wall / rounds * 1000,
+    }
+
+
+async def main_async(args):
+    # Scratch database and bench VAPID key must be in the environment before
+    # `core` is imported (it reads them at import time)
+    os.environ["DB_NAME"] = args.db or f"{os.environ.get('DB_NAME', 'genturix')}_push_bench"
+    vapid_key = ec.generate_private_key(ec.SECP256R1())
+    os.environ["VAPID_PRIVATE_KEY"] = b64url(vapid_key.private_numbers().private_value.to_bytes(32, "big"))
+    os.environ["VAPID_PUBLIC_KEY"] = public_key_b64(vapid_key)
+
+    # Subscription keys (one user-agent key pair shared by every subscription)
+    ua_key = ec.generate_private_key(ec.SECP256R1())
+    auth_secret = secrets.token_bytes(16)
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    import core
+
+    logging.getLogger().setLevel(getattr(logging, args.log_level))
+    for name in ("core", "services", "httpx"):
+        logging.getLogger(name).setLevel(getattr(logging, args.log_level))
+
+    db = core.db
+    core.init_push_outbox(database=db, log=core.logger)
+    core.init_push_directory(database=db, log=core.logger)
+
+    server = None
+    push_url = args.push_url
+    if not push_url:
+        server = await fake_push_service.FakePushServer(fake_push_service.FakePushConfig(
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            errors=fake_push_service.parse_error_mix(args.errors),
+            ua_private_key=ua_key if args.decrypt else None,
+            auth_secret=auth_secret,
+            seed=args.seed,
+        )).start()
+        push_url = server.base_url
+
+    print(f"push service: {push_url} | database: {os.environ['DB_NAME']} | "
+          f"recipients: {'directory' if args.directory else 'database'} | "
+          f"send concurrency: {core.PUSH_SEND_CONCURRENCY} (fan-out {core.PUSH_FANOUT_CONCURRENCY})\n")
+    print(f"{'case':<28}{'subs':>6}{'msgs':>7}{'2xx':>7}{'p50 ms':>9}{'p99 ms':>9}{'msgs/sec':>10}{'call ms':>10}")
+
+    condo_ids = []
+    try:
+        async with httpx.AsyncClient(base_url=push_url) as control:
+            for size in args.sizes:
+                condo_id, subscriptions = await seed(db, size, push_url, public_key_b64(ua_key), b64url(auth_secret))
+                condo_ids.append(condo_id)
+
+                async def panic(started, condo_id=condo_id):
+                    await core.notify_guards_of_panic(condo_id, {
+                        "event_id": str(uuid.uuid4()),
+                        "panic_type": "general",
+                        "resident_name": "Bench Resident",
+                        "apartment": "A-101",
+                        "timestamp": datetime.now(timezone.utc).isoformat(),
+                        "trigger_started": started,
+                    })
+
+                async def targeted(started, condo_id=condo_id):
+                    await core.send_targeted_push_notification(
+                        condominium_id=condo_id,
+                        title="Bench",
+                        body="Targeted push benchmark",
+                        target_roles=["Guarda"],
+                        data={"type": "bench_targeted"},
+                        tag=f"bench-{uuid.uuid4().hex[:8]}",
+                    )
+
+                for name, send in (("notify_guards_of_panic", panic), ("send_targeted_push_notification", targeted)):
+                    row = await run_case(core, db, control, name, send, condo_id, subscriptions, args.rounds, args.directory)
+                    print(f"{row['name'][:27]:<28}{size:>6}{row['messages']:>7}{row['delivered']:>7}"
+                          f"{fmt_ms(row['p50']):>9}{fmt_ms(row['p99']):>9}{row['rate']:>10.0f}{row['call_ms']:>10.0f}")
+
+            stats = (await control.get("/_fake/stats")).json()["stats"]
+            rejected = {k: v for k, v in stats.items() if k.startswith("rejected:")}
+            if rejected:
+                print(f"\nWARNING: the push service rejected messages: {rejected}")
+    finally:
+        if condo_ids:
+            scope = {"condominium_id": {"$in": condo_ids}}
+            await db.push_subscriptions.delete_many(scope)
+            await db.push_outbox.delete_many(scope)
+            await db.users.delete_many(scope)
+            await db.condominiums.delete_many({"id": {"$in": condo_ids}})
+        await core.close_push_client()
+        if server is not None:
+            await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[10, 100, 1000])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--errors", default="", help="status=rate list, e.g. 404=0.01,410=0.01,429=0.02,500=0.01")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--directory", action="store_true", help="resolve recipients from the in-memory subscription directory")
+    parser.add_argument("--decrypt", action="store_true", help="fake push service decrypts every payload (costs CPU in this process)")
+    parser.add_argument("--push-url", help="use an already running fake push service instead of an in-process one")
+    parser.add_argument("--db", help="scratch database name (default: DB_NAME + '_push_bench')")
+    parser.add_argument("--log-level", default="WARNING", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    args = parser.parse_args()
+
+    if not os.environ.get("MONGO_URL"):
+        print("ERROR: MONGO_URL not configured in .env")
+        return 1
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Rate Limit Storage Benchmark
+============================
+Checks/sec for the slowapi/limits fixed-window limiter with:
+  - memory://           (per-process, the default RATE_LIMIT_STORAGE)
+  - mongodb://          (`limits` MongoDB storage, RATE_LIMIT_STORAGE=mongo,
+                         shared across workers)
+
+Each check is one limiter.hit(), which is what slowapi does per limit (with
+headers disabled, our default). Every Mongo check is a blocking round trip,
+which slowapi makes on the event loop: the µs/check column is how long each
+rate-limited request stalls its worker. Uses a scratch collection that is
+dropped afterwards.
+
+Usage:
+    python scripts/bench_rate_limit_storage.py [--checks 5000] [--threads 8]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from dotenv import load_dotenv
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+# Load environment
+load_dotenv(Path(__file__).parent.parent / '.env')
+
+MONGO_URL = os.environ.get('MONGO_URL')
+DB_NAME = os.environ.get('DB_NAME', 'genturix')
+BENCH_COLLECTION = "rate_limit_counters_bench"
+
+
+def run(storage, checks, threads, keys=200):
+    limiter = FixedWindowRateLimiter(storage)
+    # High limit so every check takes the normal (allowed) path
+    limit = parse("1000000/minute")
+
+    def check(i):
+        key = f"10.0.{(i % keys) // 256}.{i % 256}"
+        limiter.hit(limit, "bench", key)
+
+    # Warm up (connection pool, first upserts)
+    for i in range(min(100, checks)):
+        check(i)
+
+    start = time.perf_counter()
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(check, range(checks)))
+    else:
+        for i in range(checks):
+            check(i)
+    elapsed = time.perf_counter() - start
+    return checks / elapsed, elapsed / checks * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checks", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    cases = [("memory://", storage_from_string("memory://"))]
+    mongo_storage = None
+    if MONGO_URL:
+        mongo_storage = storage_from_string(
+            MONGO_URL,
+            database_name=DB_NAME,
+            counter_collection_name=BENCH_COLLECTION,
+            window_collection_name=f"{BENCH_COLLECTION}_windows",
+        )
+        cases.append(("mongodb://", mongo_storage))
+    else:
+        print("WARNING: MONGO_URL not configured in .env - only benchmarking memory://\n")
+
+    print(f"{'storage':<22}{'threads':>8}{'checks/sec':>14}{'µs/check':>12}")
+    try:
+        for name, storage in cases:
+            for threads in (1, args.threads):
+                rate, per_check = run(storage, args.checks, threads)
+                print(f"{name:<22}{threads:>8}{rate:>14.0f}{per_check:>12.1f}")
+    finally:
+        if mongo_storage is not None:
+            mongo_storage.counters.drop()
+            mongo_storage.windows.drop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Visitor Search Benchmark
+========================
+A condominium with 50,000 historical visitor entries (default) and a few
+thousand authorizations. Times what a guard typing at the gate hits:
+
+  history   GET /authorizations/history search: the old case-insensitive
+            $regex over name / ID / plate vs the search_keys index
+            (condominium_id, search_keys, entry_at)
+  guard     GET /guard/authorizations search: the old Python filter over
+            the first 500 authorizations vs the (condominium_id,
+            search_keys) index + rank_search_results
+
+for plate, ID and name prefixes, and reports p50/p99 latency and how many
+results each approach finds.
+
+Seeds a throw-away condominium in a scratch database (DB_NAME +
+"_search_bench" unless --db is given) and deletes it afterwards. Requires
+MONGO_URL. Creates the search indexes on the scratch collections first.
+
+Usage:
+    python scripts/bench_visitor_search.py [--entries 50000]
+        [--authorizations 2000] [--requests 50]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import re
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from time import perf_counter
+
+from dotenv import load_dotenv
+
+BACKEND_DIR = Path(__file__).parent.parent
+load_dotenv(BACKEND_DIR / '.env')
+
+FIRST_NAMES = ["José", "María", "Ana", "Luis", "Sofía", "Carlos", "Andrés", "Lucía", "Jorge", "Valeria"]
+LAST_NAMES = ["Pérez", "González", "Rodríguez", "Jiménez", "Núñez", "Vargas", "Mora", "Castro", "Solís", "Araya"]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def visitor(rng, i):
+    return {
+        "visitor_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}",
+        "identification_number": f"{rng.randint(1, 9)}-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}",
+        "vehicle_plate": f"{''.join(rng.choice('BCDFGHJKLMNPRSTVWXYZ') for _ in range(3))}-{i % 1000:03d}" if i % 3 else None,
+    }
+
+
+async def seed(db, search, args):
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    condo_id = str(uuid.uuid4())
+    people = [visitor(rng, i) for i in range(args.authorizations)]
+
+    authorizations = []
+    for i, person in enumerate(people):
+        doc = {"id": str(uuid.uuid4()), "condominium_id": condo_id, "is_active": True, "status": "pending",
+               "authorization_type": "permanent", "created_by_name": f"Residente {i % 300}",
+               "created_at": (now - timedelta(minutes=i)).isoformat(), **person}
+        doc["search_keys"] = search.authorization_search_keys(doc)
+        authorizations.append(doc)
+    await db.visitor_authorizations.insert_many(authorizations)
+
+    entries = []
+    for n in range(args.entries):
+        auth = authorizations[rng.randrange(len(authorizations))]
+        doc = {"id": str(uuid.uuid4()), "condominium_id": condo_id, "authorization_id": auth["id"],
+               "visitor_name": auth["visitor_name"], "identification_number": auth["identification_number"],
+               "vehicle_plate": auth["vehicle_plate"], "status": "completed",
+               "entry_at": (now - timedelta(minutes=10 * n)).isoformat()}
+        doc["search_keys"] = search.entry_search_keys(doc)
+        entries.append(doc)
+        if len(entries) == 5000:
+            await db.visitor_entries.insert_many(entries)
+            entries = []
+    if entries:
+        await db.visitor_entries.insert_many(entries)
+
+    # What a guard would type: part of a plate, an ID, a name
+    with_plate = [p for p in people if p["vehicle_plate"]]
+    queries = {
+        "plate": [p["vehicle_plate"][:5] for p in rng.sample(with_plate, 20)],
+        "id": [p["identification_number"][:6] for p in rng.sample(people, 20)],
+        "name": [p["visitor_name"].split()[1][:4] for p in rng.sample(people, 20)],
+    }
+    return condo_id, queries
+
+
+async def history_regex(db, condo_id, q):
+    regex = {"$regex": re.escape(q), "$options": "i"}
+    return await db.visitor_entries.find(
+        {"condominium_id": condo_id, "$or": [{"visitor_name": regex}, {"identification_number": regex}, {"vehicle_plate": regex}]},
+        {"_id": 0, "search_keys": 0}
+    ).sort("entry_at", -1).to_list(500)
+
+
+async def history_keys(db, search, condo_id, q):
+    entries = await db.visitor_entries.find(
+        {"condominium_id": condo_id, **search.search_filter(q)}, {"_id": 0, "search_keys": 0}
+    ).sort("entry_at", -1).to_list(500)
+    return search.rank_search_results(entries, q, *search.ENTRY_SEARCH_FIELDS)
+
+
+async def guard_python(db, condo_id, q):
+    authorizations = await db.visitor_authorizations.find(
+        {"condominium_id": condo_id, "is_active": True, "status": {"$in": ["pending", None]}}, {"_id": 0, "search_keys": 0}
+    ).to_list(500)
+    q = q.lower().strip()
+    return [a for a in authorizations if any(q in (a.get(f) or "").lower() for f in
+                                             ("visitor_name", "identification_number", "vehicle_plate", "created_by_name"))]
+
+
+async def guard_keys(db, search, condo_id, q):
+    authorizations = await db.visitor_authorizations.find(
+        {"condominium_id": condo_id, "is_active": True, "status": {"$in": ["pending", None]}, **search.search_filter(q)},
+        {"_id": 0, "search_keys": 0}
+    ).to_list(500)
+    return search.rank_search_results(authorizations, q, *search.AUTHORIZATION_SEARCH_FIELDS)
+
+
+async def measure(name, queries, requests, call):
+    latencies = []
+    found = []
+    for i in range(requests):
+        q = queries[i % len(queries)]
+        started = perf_counter()
+        results = await call(q)
+        latencies.append((perf_counter() - started) * 1000)
+        found.append(len(results))
+    print(f"{name:<30}{percentile(latencies, 0.5):>9.1f}{percentile(latencies, 0.99):>9.1f}{sum(found) / len(found):>10.1f}")
+
+
+async def main_async(args):
+    # Scratch database must be in the environment before `core` is imported
+    os.environ["DB_NAME"] = args.db or f"{os.environ.get('DB_NAME', 'genturix')}_search_bench"
+    sys.path.insert(0, str(BACKEND_DIR))
+    import core
+    from services import search_keys as search
+
+    logging.getLogger().setLevel(logging.WARNING)
+    db = core.db
+    await db.visitor_authorizations.create_index([("condominium_id", 1), ("search_keys", 1)])
+    await db.visitor_entries.create_index([("condominium_id", 1), ("search_keys", 1), ("entry_at", -1)])
+    await db.visitor_entries.create_index("condominium_id")
+
+    condo_id, queries = await seed(db, search, args)
+    try:
+        print(f"database: {os.environ['DB_NAME']} | {args.entries} entries, {args.authorizations} authorizations | "
+              f"{args.requests} requests per row\n")
+        print(f"{'search':<30}{'p50 ms':>9}{'p99 ms':>9}{'results':>10}")
+        for kind, qs in queries.items():
+            await measure(f"history {kind} $regex", qs, args.requests, lambda q: history_regex(db, condo_id, q))
+            await measure(f"history {kind} search_keys", qs, args.requests, lambda q: history_keys(db, search, condo_id, q))
+            await measure(f"guard {kind} python filter", qs, args.requests, lambda q: guard_python(db, condo_id, q))
+            await measure(f"guard {kind} search_keys", qs, args.requests, lambda q: guard_keys(db, search, condo_id, q))
+            print()
+        print("Note: $regex / python filter match substrings anywhere, search_keys match word prefixes;\n"
+              "python filter only sees the first 500 authorizations.")
+    finally:
+        await db.visitor_entries.delete_many({"condominium_id": condo_id})
+        await db.visitor_authorizations.delete_many({"condominium_id": condo_id})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=50000)
+    parser.add_argument("--authorizations", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--db", help="scratch database name (default: DB_NAME + '_search_bench')")
+    args = parser.parse_args()
+
+    if not os.environ.get("MONGO_URL"):
+        print("ERROR: MONGO_URL not configured in .env")
+        return 1
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -89,8 +89,8 @@ async def create_indexes():
         {
             "collection": "billing_email_log",
             "keys": [("condominium_id", 1), ("email_type", 1), ("sent_date", 1)],
-            "options": {"background": True},
-            "reason": "Optimizes email deduplication checks"
+            "options": {"unique": True, "background": True},
+            "reason": "Email deduplication (scheduler claims each email with a unique insert)"
         },
         
         # ==================== GUARDS & SHIFTS ====================
@@ -146,6 +146,54 @@ async def create_indexes():
             "options": {"background": True},
             "reason": "Optimizes active visit queries"
         },
+        {
+            "collection": "visitor_authorizations",
+            "keys": [("created_by", 1), ("condominium_id", 1), ("created_at", -1)],
+            "options": {"background": True},
+            "reason": "Optimizes resident authorization list (GET /authorizations/my)"
+        },
+        {
+            "collection": "visitor_entries",
+            "keys": [("authorization_id", 1), ("entry_at", 1)],
+            "options": {"background": True},
+            "reason": "Optimizes per-authorization usage aggregation"
+        },
+        {
+            "collection": "visitor_authorizations",
+            "keys": [("condominium_id", 1), ("search_keys", 1)],
+            "options": {"background": True},
+            "reason": "Indexed prefix search by visitor name, ID and plate (GET /guard/authorizations)"
+        },
+        {
+            "collection": "visitor_entries",
+            "keys": [("condominium_id", 1), ("search_keys", 1), ("entry_at", -1)],
+            "options": {"background": True},
+            "reason": "Indexed prefix search of entry history, newest first"
+        },
+        {
+            "collection": "visitor_entries",
+            "keys": [("condominium_id", 1), ("status", 1)],
+            "options": {"background": True},
+            "reason": "Optimizes visitors-inside lookups (duplicate manual check-in)"
+        },
+        {
+            "collection": "visitor_occupancy",
+            "keys": [("claim_key", 1)],
+            "options": {"unique": True, "partialFilterExpression": {"claim_key": {"$type": "string"}}},
+            "reason": "One inside visitor per authorization / manual name (atomic duplicate check-in guard)"
+        },
+        {
+            "collection": "visitor_occupancy",
+            "keys": [("condominium_id", 1), ("entry_at", -1)],
+            "options": {"background": True},
+            "reason": "Inside counts and visitors-inside list per condo"
+        },
+        {
+            "collection": "visitor_occupancy",
+            "keys": [("authorization_id", 1)],
+            "options": {"background": True},
+            "reason": "Is this authorization's visitor inside?"
+        },
         
         # ==================== ALERTS (SECURITY CRITICAL) ====================
         {
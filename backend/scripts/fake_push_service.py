@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Local Fake Web Push Service
+===========================
+HTTP stand-in for FCM / Mozilla / Apple push services, so push fan-out can
+be exercised and measured without real browsers.
+
+Every POST /push/{subscription_id} is checked the way a push service would:
+  - TTL header present (RFC 8030)
+  - Content-Encoding: aes128gcm and a well-formed RFC 8188 record with a
+    65-byte P-256 key id (RFC 8291), max 4096 bytes
+  - VAPID Authorization (RFC 8292 "vapid t=..,k=.." or the draft
+    "WebPush <t>" + Crypto-Key: p256ecdsa=..): audience must be this
+    origin, not expired, ES256 signature valid for the given key
+  - Optionally, the payload is decrypted with the subscription's private
+    key (--ua-private-key / --auth-secret)
+
+Then, after a configurable latency, it answers 201 or an error picked from
+the configured mix (404/410/429/500/...). 404 and 410 are sticky per
+subscription, like a real expired endpoint; 429 carries Retry-After.
+
+Control endpoints (used by scripts/bench_push_fanout.py):
+  GET  /_fake/stats           counters by status
+  GET  /_fake/events?since=t  (time.time() of the response, status) per message
+  POST /_fake/reset           clear counters, events and gone subscriptions
+
+Usage:
+    python scripts/fake_push_service.py [--port 8089] [--latency-ms 50]
+        [--jitter-ms 20] [--errors 404=0.01,410=0.01,429=0.02,500=0.01]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import http_ece
+import uvicorn
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+# RFC 8188 header: salt(16) + rs(4) + idlen(1) + keyid(65 for Web Push)
+AES128GCM_HEADER_BYTES = 16 + 4 + 1 + 65
+# Smallest record: header + 1 padding delimiter byte + 16-byte GCM tag
+AES128GCM_MIN_BYTES = AES128GCM_HEADER_BYTES + 1 + 16
+MAX_MESSAGE_BYTES = 4096
+
+
+def b64url_decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def parse_error_mix(spec: str) -> Dict[int, float]:
+    """'404=0.01,429=0.05' -> {404: 0.01, 429: 0.05}"""
+    mix = {}
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        status, _, rate = part.partition("=")
+        mix[int(status)] = float(rate)
+    if sum(mix.values()) > 1:
+        raise ValueError("error rates add up to more than 1")
+    return mix
+
+
+@dataclass
+class FakePushConfig:
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    errors: Dict[int, float] = field(default_factory=dict)
+    retry_after: int = 5
+    verify_vapid: bool = True
+    # Decrypt payloads with this user-agent key (same key for every subscription)
+    ua_private_key: Optional[ec.EllipticCurvePrivateKey] = None
+    auth_secret: Optional[bytes] = None
+    seed: Optional[int] = None
+
+
+class FakePushService:
+    """Request handling and counters. Build the ASGI app with .app()."""
+
+    def __init__(self, config: FakePushConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.gone: Dict[str, int] = {}
+        self.stats: Dict[str, int] = {}
+        self.events: List[Tuple[float, int]] = []
+
+    def reset(self) -> None:
+        self.gone.clear()
+        self.stats.clear()
+        self.events.clear()
+
+    def _count(self, key: str) -> None:
+        self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _check_vapid(self, request: Request) -> Optional[str]:
+        """None if the VAPID credentials are acceptable, else the reason."""
+        authorization = request.headers.get("authorization", "")
+        scheme, _, params = authorization.partition(" ")
+        if scheme.lower() == "vapid":
+            fields = dict(p.strip().split("=", 1) for p in params.split(",") if "=" in p)
+            token, key = fields.get("t"), fields.get("k")
+        elif scheme.lower() == "webpush":
+            token = params.strip()
+            crypto_key = dict(
+                p.strip().split("=", 1) for p in request.headers.get("crypto-key", "").split(";") if "=" in p
+            )
+            key = crypto_key.get("p256ecdsa")
+        else:
+            return "missing VAPID authorization"
+        if not token or not key:
+            return "incomplete VAPID authorization"
+
+        try:
+            header_b64, claims_b64, signature_b64 = token.split(".")
+            claims = json.loads(b64url_decode(claims_b64))
+        except ValueError:
+            return "malformed VAPID token"
+        origin = f"{request.url.scheme}://{request.headers.get('host', '')}"
+        if claims.get("aud") != origin:
+            return f"audience {claims.get('aud')} != {origin}"
+        if claims.get("exp", 0) < time.time():
+            return "VAPID token expired"
+
+        try:
+            public_key = ec.EllipticCurvePublicKey.from_encoded_point(ec.SECP256R1(), b64url_decode(key))
+            signature = b64url_decode(signature_b64)
+            public_key.verify(
+                encode_dss_signature(int.from_bytes(signature[:32], "big"), int.from_bytes(signature[32:], "big")),
+                f"{header_b64}.{claims_b64}".encode(),
+                ec.ECDSA(hashes.SHA256()),
+            )
+        except (ValueError, InvalidSignature):
+            return "invalid VAPID signature"
+        return None
+
+    def _check_message(self, request: Request, body: bytes) -> Optional[Tuple[int, str]]:
+        if "ttl" not in request.headers:
+            return 400, "missing TTL header"
+        if request.headers.get("content-encoding", "").lower() != "aes128gcm":
+            return 400, "Content-Encoding must be aes128gcm"
+        if len(body) > MAX_MESSAGE_BYTES:
+            return 413, "payload too large"
+        if len(body) < AES128GCM_MIN_BYTES or body[20] != 65:
+            return 400, "malformed aes128gcm record"
+        if self.config.verify_vapid:
+            error = self._check_vapid(request)
+            if error:
+                return 401, error
+        if self.config.ua_private_key is not None:
+            try:
+                http_ece.decrypt(
+                    body,
+                    private_key=self.config.ua_private_key,
+                    auth_secret=self.config.auth_secret,
+                    version="aes128gcm",
+                )
+            except Exception as e:
+                return 400, f"decryption failed: {type(e).__name__}"
+        return None
+
+    def _pick_status(self, subscription_id: str) -> int:
+        if subscription_id in self.gone:
+            return self.gone[subscription_id]
+        roll = self.random.random()
+        for status, rate in self.config.errors.items():
+            if roll < rate:
+                if status in (404, 410):
+                    self.gone[subscription_id] = status
+                return status
+            roll -= rate
+        return 201
+
+    async def push(self, request: Request) -> Response:
+        subscription_id = request.path_params["subscription_id"]
+        body = await request.body()
+
+        rejected = self._check_message(request, body)
+        if rejected is None:
+            delay = self.config.latency_ms + self.random.uniform(-1, 1) * self.config.jitter_ms
+            if delay > 0:
+                await asyncio.sleep(delay / 1000)
+            status = self._pick_status(subscription_id)
+            response = Response(status_code=status)
+            if status == 201:
+                response.headers["Location"] = f"/message/{subscription_id}/{len(self.events)}"
+            elif status == 429:
+                response.headers["Retry-After"] = str(self.config.retry_after)
+        else:
+            status, reason = rejected
+            response = Response(reason, status_code=status)
+            self._count(f"rejected:{reason}")
+
+        self._count(str(status))
+        self.events.append((time.time(), status))
+        return response
+
+    async def get_stats(self, request: Request) -> Response:
+        return JSONResponse({"stats": self.stats, "messages": len(self.events), "gone": len(self.gone)})
+
+    async def get_events(self, request: Request) -> Response:
+        since = float(request.query_params.get("since", 0))
+        return JSONResponse({"events": [e for e in self.events if e[0] >= since]})
+
+    async def post_reset(self, request: Request) -> Response:
+        self.reset()
+        return JSONResponse({"reset": True})
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/push/{subscription_id}", self.push, methods=["POST"]),
+            Route("/_fake/stats", self.get_stats, methods=["GET"]),
+            Route("/_fake/events", self.get_events, methods=["GET"]),
+            Route("/_fake/reset", self.post_reset, methods=["POST"]),
+        ])
+
+
+class FakePushServer:
+    """Runs a FakePushService on the current event loop (port 0 = any free port)."""
+
+    def __init__(self, config: FakePushConfig, host: str = "127.0.0.1", port: int = 0):
+        self.service = FakePushService(config)
+        self.server = uvicorn.Server(uvicorn.Config(
+            self.service.app(), host=host, port=port, log_level="warning", lifespan="off",
+            backlog=4096,
+        ))
+        self.host = host
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def base_url(self) -> str:
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        return f"http://{self.host}:{port}"
+
+    async def start(self) -> "FakePushServer":
+        self._task = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            if self._task.done():
+                self._task.result()
+            await asyncio.sleep(0.01)
+        return self
+
+    async def stop(self) -> None:
+        self.server.should_exit = True
+        if self._task is not None:
+            await self._task
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--errors", default="", help="status=rate list, e.g. 404=0.01,410=0.01,429=0.02,500=0.01")
+    parser.add_argument("--retry-after", type=int, default=5)
+    parser.add_argument("--no-verify-vapid", action="store_true")
+    parser.add_argument("--ua-private-key", help="base64url raw P-256 private key of the subscriptions (enables decryption)")
+    parser.add_argument("--auth-secret", help="base64url auth secret of the subscriptions")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    ua_private_key = None
+    if args.ua_private_key:
+        ua_private_key = ec.derive_private_key(int.from_bytes(b64url_decode(args.ua_private_key), "big"), ec.SECP256R1())
+    config = FakePushConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        errors=parse_error_mix(args.errors),
+        retry_after=args.retry_after,
+        verify_vapid=not args.no_verify_vapid,
+        ua_private_key=ua_private_key,
+        auth_secret=b64url_decode(args.auth_secret) if args.auth_secret else None,
+        seed=args.seed,
+    )
+    print(f"Fake push service on http://{args.host}:{args.port}/push/<id> "
+          f"(latency {config.latency_ms}±{config.jitter_ms} ms, errors {config.errors or 'none'})")
+    uvicorn.run(FakePushService(config).app(), host=args.host, port=args.port, log_level="warning", backlog=4096)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Local Fake Resend API
+=====================
+HTTP stand-in for api.resend.com, so email sending can be tested and
+benchmarked without a Resend account. Point the SDK at it with
+RESEND_API_URL=http://127.0.0.1:8090 (or resend.api_url in-process).
+
+Implements what services/email_service.py uses:
+  POST /emails         one email   -> 200 {"id"}
+  POST /emails/batch   up to 100   -> 200 {"data": [{"id"}, ...]}
+
+Like Resend it requires a Bearer API key, validates from/to/subject and
+html/text, rejects the whole batch if any email is invalid (422), and
+answers 429 rate_limit_exceeded beyond --rate-limit requests per second.
+Recipients at --invalid-domain (default "invalid.test") are rejected as
+invalid addresses. Errors use Resend's body format
+({"statusCode", "name", "message"}).
+
+Control endpoints:
+  GET  /_fake/emails   accepted emails (to, subject, id)
+  GET  /_fake/stats    request counters
+  POST /_fake/reset    clear emails and counters
+
+Usage:
+    python scripts/fake_resend_service.py [--port 8090] [--latency-ms 80]
+        [--rate-limit 2] [--invalid-domain invalid.test]
+"""
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+BATCH_MAX_SIZE = 100
+
+
+@dataclass
+class FakeResendConfig:
+    latency_ms: float = 80.0
+    # Requests per second (sliding 1s window); 0 disables rate limiting
+    rate_limit: float = 2.0
+    invalid_domain: str = "invalid.test"
+
+
+def _error(status: int, name: str, message: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse({"statusCode": status, "name": name, "message": message}, status_code=status, headers=headers)
+
+
+class FakeResendService:
+    """Request handling and recorded emails. Build the ASGI app with .app()."""
+
+    def __init__(self, config: FakeResendConfig):
+        self.config = config
+        self.emails: List[dict] = []
+        self.stats: Dict[str, int] = {}
+        self._recent = deque()
+
+    def reset(self) -> None:
+        self.emails.clear()
+        self.stats.clear()
+        self._recent.clear()
+
+    def _count(self, key: str) -> None:
+        self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _rate_limited(self) -> bool:
+        if self.config.rate_limit <= 0:
+            return False
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] >= 1:
+            self._recent.popleft()
+        if len(self._recent) >= self.config.rate_limit:
+            return True
+        self._recent.append(now)
+        return False
+
+    def _validate(self, email) -> Optional[str]:
+        if not isinstance(email, dict):
+            return "Invalid email object"
+        for field in ("from", "to", "subject"):
+            if not email.get(field):
+                return f"Missing `{field}` field."
+        if not email.get("html") and not email.get("text"):
+            return "Missing `html` or `text` field."
+        to = email["to"] if isinstance(email["to"], list) else [email["to"]]
+        for address in to:
+            if "@" not in address or address.rsplit("@", 1)[1] == self.config.invalid_domain:
+                return f"Invalid `to` field. The email address needs to follow the `email@example.com` format: {address}"
+        return None
+
+    def _accept(self, email: dict) -> str:
+        email_id = str(uuid.uuid4())
+        self.emails.append({"id": email_id, "to": email["to"], "subject": email["subject"], "from": email["from"]})
+        return email_id
+
+    async def _precheck(self, request: Request, endpoint: str) -> Optional[JSONResponse]:
+        self._count(f"requests:{endpoint}")
+        if not request.headers.get("authorization", "").startswith("Bearer "):
+            self._count("401")
+            return _error(401, "missing_api_key", "Missing API key in the authorization header.")
+        if self._rate_limited():
+            self._count("429")
+            return _error(
+                429, "rate_limit_exceeded",
+                f"Too many requests. You can only make {self.config.rate_limit:g} requests per second.",
+                {"retry-after": "1", "ratelimit-limit": str(int(self.config.rate_limit))},
+            )
+        if self.config.latency_ms > 0:
+            await asyncio.sleep(self.config.latency_ms / 1000)
+        return None
+
+    async def send(self, request: Request) -> JSONResponse:
+        rejected = await self._precheck(request, "emails")
+        if rejected is not None:
+            return rejected
+        email = await request.json()
+        error = self._validate(email)
+        if error:
+            self._count("422")
+            return _error(422, "validation_error", error)
+        self._count("200")
+        return JSONResponse({"id": self._accept(email)})
+
+    async def send_batch(self, request: Request) -> JSONResponse:
+        rejected = await self._precheck(request, "emails/batch")
+        if rejected is not None:
+            return rejected
+        emails = await request.json()
+        if not isinstance(emails, list) or not emails:
+            self._count("422")
+            return _error(422, "validation_error", "Batch must be a non-empty array of emails.")
+        if len(emails) > BATCH_MAX_SIZE:
+            self._count("422")
+            return _error(422, "validation_error", f"Batch exceeds the maximum of {BATCH_MAX_SIZE} emails.")
+        for index, email in enumerate(emails):
+            error = self._validate(email)
+            if error:
+                self._count("422")
+                return _error(422, "validation_error", f"emails[{index}]: {error}")
+        self._count("200")
+        return JSONResponse({"data": [{"id": self._accept(email)} for email in emails]})
+
+    async def get_emails(self, request: Request) -> JSONResponse:
+        return JSONResponse({"emails": self.emails})
+
+    async def get_stats(self, request: Request) -> JSONResponse:
+        return JSONResponse({"stats": self.stats, "emails": len(self.emails)})
+
+    async def post_reset(self, request: Request) -> JSONResponse:
+        self.reset()
+        return JSONResponse({"reset": True})
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/emails", self.send, methods=["POST"]),
+            Route("/emails/batch", self.send_batch, methods=["POST"]),
+            Route("/_fake/emails", self.get_emails, methods=["GET"]),
+            Route("/_fake/stats", self.get_stats, methods=["GET"]),
+            Route("/_fake/reset", self.post_reset, methods=["POST"]),
+        ])
+
+
+class FakeResendServer:
+    """Runs a FakeResendService in a background thread (port 0 = any free port)."""
+
+    def __init__(self, config: FakeResendConfig, host: str = "127.0.0.1", port: int = 0):
+        self.service = FakeResendService(config)
+        self.server = uvicorn.Server(uvicorn.Config(
+            self.service.app(), host=host, port=port, log_level="warning", lifespan="off",
+        ))
+        self.host = host
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        return f"http://{self.host}:{port}"
+
+    def start(self) -> "FakeResendServer":
+        self._thread = threading.Thread(target=self.server.run, name="fake-resend", daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("fake Resend service failed to start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--rate-limit", type=float, default=2.0, help="requests per second, 0 = unlimited")
+    parser.add_argument("--invalid-domain", default="invalid.test")
+    args = parser.parse_args()
+
+    config = FakeResendConfig(latency_ms=args.latency_ms, rate_limit=args.rate_limit, invalid_domain=args.invalid_domain)
+    print(f"Fake Resend API on http://{args.host}:{args.port} "
+          f"(latency {config.latency_ms} ms, {config.rate_limit or 'unlimited'} req/s)")
+    uvicorn.run(FakeResendService(config).app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+GENTURIX - Authorization Used-Status Migration Script
+=====================================================
+
+One-time backfill of status="used" on legacy one-time authorizations.
+
+Temporary/extended authorizations created before check-in marked them as
+used may still be "pending" (or have no status) even though the visitor
+already entered. GET /guard/authorizations used to fix these one by one on
+every poll; it is now read-only and hides them itself, and this script
+fixes the stored documents once.
+
+An authorization is considered used when any of:
+    - a visitor_entries document references it
+    - checked_in_at is set
+    - total_visits > 0
+
+Works in batches (one visitor_entries lookup and one update_many per
+batch). Safe to run multiple times (idempotent).
+
+Usage:
+    cd /app/backend
+    python scripts/migrate_authorization_used_status.py [--batch-size 500] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Configuration
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.get('DB_NAME', 'test_database')
+
+# Authorizations that still look unused
+LEGACY_QUERY = {
+    "authorization_type": {"$in": ["temporary", "extended", None]},
+    "status": {"$in": ["pending", None]},
+}
+
+
+async def migrate_authorization_used_status(batch_size: int = 500, dry_run: bool = False):
+    """
+    Main migration function.
+    Walks pending one-time authorizations by _id and marks the used ones.
+    """
+    print("=" * 60)
+    print("GENTURIX - Authorization Used-Status Migration")
+    print("=" * 60)
+    print(f"\nConnecting to MongoDB: {MONGO_URL}")
+    print(f"Database: {DB_NAME}")
+    print(f"Batch size: {batch_size}{' (dry run)' if dry_run else ''}")
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    # Statistics
+    stats = {
+        "scanned": 0,
+        "batches": 0,
+        "used_found": 0,
+        "updated": 0,
+        "errors": []
+    }
+
+    try:
+        last_id = None
+        while True:
+            query = dict(LEGACY_QUERY)
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+
+            batch = await db.visitor_authorizations.find(
+                query,
+                {"_id": 1, "id": 1, "checked_in_at": 1, "total_visits": 1}
+            ).sort("_id", 1).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+
+            last_id = batch[-1]["_id"]
+            stats["batches"] += 1
+            stats["scanned"] += len(batch)
+
+            # One lookup for the whole batch
+            batch_ids = [a["id"] for a in batch if a.get("id")]
+            with_entries = set(await db.visitor_entries.distinct(
+                "authorization_id", {"authorization_id": {"$in": batch_ids}}
+            ))
+            used_ids = [
+                a["id"] for a in batch
+                if a.get("id") and (
+                    a["id"] in with_entries or a.get("checked_in_at") or (a.get("total_visits") or 0) > 0
+                )
+            ]
+            stats["used_found"] += len(used_ids)
+
+            if used_ids and not dry_run:
+                try:
+                    # Status re-checked so a concurrent check-in/revoke is never overwritten
+                    result = await db.visitor_authorizations.update_many(
+                        {"id": {"$in": used_ids}, "status": {"$in": ["pending", None]}},
+                        {"$set": {"status": "used"}}
+                    )
+                    stats["updated"] += result.modified_count
+                except Exception as e:
+                    stats["errors"].append(f"batch {stats['batches']}: {str(e)}")
+                    print(f"❌ Error updating batch {stats['batches']}: {e}")
+
+            print(f"✓  Batch {stats['batches']}: scanned {len(batch)}, used {len(used_ids)}")
+
+        # Print summary
+        print("\n" + "=" * 60)
+        print("MIGRATION SUMMARY")
+        print("=" * 60)
+        print(f"\nAuthorizations scanned: {stats['scanned']}")
+        print(f"Batches: {stats['batches']}")
+        print(f"Already used (legacy status): {stats['used_found']}")
+        print(f"Updated to status=used: {stats['updated']}{' (dry run, nothing written)' if dry_run else ''}")
+        print(f"Errors: {len(stats['errors'])}")
+
+        if stats["errors"]:
+            print("\nErrors encountered:")
+            for error in stats["errors"]:
+                print(f"  - {error}")
+
+        print("\n✅ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Migration failed: {e}")
+        raise
+    finally:
+        client.close()
+
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+
+    print("\n🚀 Starting Authorization Used-Status Migration...\n")
+    asyncio.run(migrate_authorization_used_status(args.batch_size, args.dry_run))
+    print("\n🏁 Migration script finished.\n")
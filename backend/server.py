@@ -9,7 +9,16 @@ from core import (
     CORSMiddleware, FRONTEND_URL, ENVIRONMENT,
     RESEND_API_KEY, SENDER_EMAIL,
     init_billing_service, init_billing_scheduler, start_billing_scheduler, stop_billing_scheduler,
+    ensure_billing_email_log_index,
     set_users_db, set_users_logger,
+    close_push_client, init_push_outbox, start_push_outbox_worker, stop_push_outbox_worker,
+    init_push_directory, start_push_directory, stop_push_directory,
+    init_push_validation, resume_push_validation_jobs, stop_push_validation_job,
+    init_email_outbox, start_email_outbox_worker, stop_email_outbox_worker,
+    init_visitor_occupancy, start_occupancy_reconciler, stop_occupancy_reconciler,
+    init_search_keys_backfill, start_search_keys_backfill, stop_search_keys_backfill,
+    drain_background_tasks,
+    start_notification_coalesce_flusher, stop_notification_coalesce_flusher,
 )
 
 # Import ALL router modules
@@ -117,7 +126,7 @@ async def initialize_indexes():
         (db.condominiums, "id", {"unique": True, "background": True}),
         (db.seat_upgrade_requests, [("condominium_id", 1), ("status", 1)], {"background": True}),
         (db.billing_scheduler_runs, "run_date", {"background": True}),
-        (db.billing_email_log, [("condominium_id", 1), ("email_type", 1), ("sent_date", 1)], {"background": True}),
+        (db.billing_email_log, [("condominium_id", 1), ("email_type", 1), ("sent_date", 1)], {"unique": True, "background": True}),
         (db.guards, "condominium_id", {"background": True}),
         (db.shifts, [("condominium_id", 1), ("guard_id", 1)], {"background": True}),
         (db.shifts, [("condominium_id", 1), ("start_time", -1)], {"background": True}),
@@ -125,11 +134,33 @@ async def initialize_indexes():
         (db.push_subscriptions, "condominium_id", {"background": True}),
         (db.audit_logs, "user_id", {"background": True}),
         (db.audit_logs, "created_at", {"background": True, "expireAfterSeconds": 60*60*24*90}),
+        (db.login_rate_limits, "expires_at", {"background": True, "expireAfterSeconds": 0}),
+        (db.push_outbox, [("state", 1), ("next_attempt_at", 1)], {"background": True}),
+        (db.push_outbox, [("tag", 1), ("endpoint", 1), ("state", 1)], {"background": True}),
+        (db.push_outbox, "source_id", {"background": True}),
+        (db.push_outbox, [("user_id", 1), ("created_at", -1)], {"background": True}),
+        (db.push_outbox, "expires_at", {"background": True, "expireAfterSeconds": 0}),
+        (db.push_validation_jobs, "id", {"unique": True, "background": True}),
+        (db.push_validation_jobs, "status", {"unique": True, "partialFilterExpression": {"status": "running"}}),
+        (db.push_validation_jobs, "created_at", {"background": True}),
+        (db.resident_notifications, [("user_id", 1), ("type", 1), ("coalesce_until", 1)], {"background": True}),
+        (db.resident_notifications, [("pending_push", 1), ("coalesce_until", 1)], {"partialFilterExpression": {"pending_push": True}}),
+        (db.email_outbox, [("state", 1), ("next_attempt_at", 1)], {"background": True}),
+        (db.email_outbox, "idempotency_key", {"unique": True, "partialFilterExpression": {"idempotency_key": {"$type": "string"}}}),
+        (db.email_outbox, "expires_at", {"background": True, "expireAfterSeconds": 0}),
         (db.reservations, "condominium_id", {"background": True}),
         (db.reservations, "start_time", {"background": True}),
         (db.visitor_authorizations, "condominium_id", {"background": True}),
         (db.visitor_authorizations, "created_by", {"background": True}),
+        (db.visitor_authorizations, [("created_by", 1), ("condominium_id", 1), ("created_at", -1)], {"background": True}),
         (db.visitor_entries, "condominium_id", {"background": True}),
+        (db.visitor_entries, [("authorization_id", 1), ("entry_at", 1)], {"background": True}),
+        (db.visitor_authorizations, [("condominium_id", 1), ("search_keys", 1)], {"background": True}),
+        (db.visitor_entries, [("condominium_id", 1), ("search_keys", 1), ("entry_at", -1)], {"background": True}),
+        (db.visitor_entries, [("condominium_id", 1), ("status", 1)], {"background": True}),
+        (db.visitor_occupancy, "claim_key", {"unique": True, "partialFilterExpression": {"claim_key": {"$type": "string"}}}),
+        (db.visitor_occupancy, [("condominium_id", 1), ("entry_at", -1)], {"background": True}),
+        (db.visitor_occupancy, "authorization_id", {"background": True}),
         (db.casos, "condominium_id", {"background": True}),
         (db.casos, "created_by", {"background": True}),
         (db.casos, "status", {"background": True}),
@@ -147,6 +178,12 @@ async def initialize_indexes():
         (db.unit_accounts, "unit_id", {"background": True}),
     ]
 
+    # billing_email_log dedup key used to be non-unique; migrate it first
+    try:
+        await ensure_billing_email_log_index(db)
+    except Exception as e:
+        logger.warning(f"[DB-INDEX] billing_email_log unique index migration failed: {e}")
+
     success_count = 0
     for collection, keys, options in indexes_to_create:
         collection_name = collection.name
@@ -211,6 +248,53 @@ async def startup_event():
     except Exception as e:
         logger.error(f"[STARTUP] Billing scheduler failed to start: {e}")
 
+    try:
+        init_push_outbox(database=db, log=logger)
+        start_push_outbox_worker()
+        logger.info("[STARTUP] Push outbox worker started successfully")
+    except Exception as e:
+        logger.error(f"[STARTUP] Push outbox worker failed to start: {e}")
+
+    try:
+        init_email_outbox(database=db, log=logger)
+        start_email_outbox_worker()
+        logger.info("[STARTUP] Email outbox worker started successfully")
+    except Exception as e:
+        logger.error(f"[STARTUP] Email outbox worker failed to start: {e}")
+
+    try:
+        init_visitor_occupancy(database=db, log=logger)
+        start_occupancy_reconciler()
+        logger.info("[STARTUP] Visitor occupancy reconciler started successfully")
+    except Exception as e:
+        logger.error(f"[STARTUP] Visitor occupancy reconciler failed to start: {e}")
+
+    try:
+        init_search_keys_backfill(database=db, log=logger)
+        start_search_keys_backfill()
+        logger.info("[STARTUP] Visitor search keys backfill started successfully")
+    except Exception as e:
+        logger.error(f"[STARTUP] Visitor search keys backfill failed to start: {e}")
+
+    try:
+        start_notification_coalesce_flusher()
+        logger.info("[STARTUP] Notification summary push sweep started successfully")
+    except Exception as e:
+        logger.error(f"[STARTUP] Notification summary push sweep failed to start: {e}")
+
+    try:
+        init_push_directory(database=db, log=logger)
+        await start_push_directory()
+        logger.info("[STARTUP] Push subscription directory loaded successfully")
+    except Exception as e:
+        logger.error(f"[STARTUP] Push subscription directory failed to load: {e}")
+
+    try:
+        init_push_validation(database=db, log=logger)
+        await resume_push_validation_jobs()
+    except Exception as e:
+        logger.error(f"[STARTUP] Push validation job resume failed: {e}")
+
     try:
         from routers.documentos import _init_doc_storage
         await _init_doc_storage()
@@ -222,6 +306,16 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_db_client():
     stop_billing_scheduler()
+    # In-flight panic dispatches still need the push client and the database
+    await drain_background_tasks()
+    await stop_push_outbox_worker()
+    await stop_email_outbox_worker()
+    await stop_occupancy_reconciler()
+    await stop_search_keys_backfill()
+    await stop_notification_coalesce_flusher()
+    await stop_push_validation_job()
+    await stop_push_directory()
+    await close_push_client()
     client.close()
 
 
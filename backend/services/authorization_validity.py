@@ -0,0 +1,125 @@
+"""
+GENTURIX - Authorization Validity Engine
+========================================
+Decides whether visitor authorizations are valid right now, for lists of
+authorizations at a time.
+
+The condominium-local clock (date, HH:MM, Spanish weekday) is computed
+once per request as a ValidityClock instead of once per authorization;
+ZoneInfo objects are cached per timezone name. Each authorization's
+schedule (type, date range, allowed days, time window) is compiled into a
+compact tuple and checked with plain string/set comparisons, so a list is
+evaluated in one pass with no datetime work per item.
+
+Rules (same as check_authorization_validity always had):
+    - inactive                   -> revoked
+    - permanent                  -> always valid
+    - any other type             -> today must be within valid_from/valid_to
+    - recurring                  -> today must be one of allowed_days
+    - extended                   -> now must be within allowed_hours_from/to
+"""
+
+import logging
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS_ES = ("Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo")
+
+# Schedule kinds (first element of a compiled schedule)
+_INACTIVE, _PERMANENT, _DATED, _RECURRING, _EXTENDED = range(5)
+
+# (kind, valid_from, valid_to, allowed_days, hours_from, hours_to)
+Schedule = Tuple[int, Optional[str], Optional[str], frozenset, Optional[str], Optional[str]]
+
+
+class ValidityClock(NamedTuple):
+    """The condominium-local "now" the rules compare against."""
+    today: str         # YYYY-MM-DD
+    time: str          # HH:MM
+    weekday: str       # Spanish day name, as stored in allowed_days
+
+
+@lru_cache(maxsize=256)
+def get_zone(condominium_timezone: Optional[str]):
+    """ZoneInfo for a timezone name, cached; UTC for no or an invalid name."""
+    if not condominium_timezone:
+        return timezone.utc
+    try:
+        return ZoneInfo(condominium_timezone)
+    except Exception as e:
+        logger.warning(f"[AUTH-VALIDITY] Invalid timezone '{condominium_timezone}', falling back to UTC: {e}")
+        return timezone.utc
+
+
+def validity_clock(condominium_timezone: Optional[str] = None, now: Optional[datetime] = None) -> ValidityClock:
+    """
+    The clock for one request, in the condominium timezone (UTC fallback).
+    `now` (aware) is for tests and benchmarks; defaults to the current time.
+    """
+    tz = get_zone(condominium_timezone)
+    local = now.astimezone(tz) if now else datetime.now(tz)
+    return ValidityClock(local.strftime("%Y-%m-%d"), local.strftime("%H:%M"), WEEKDAYS_ES[local.weekday()])
+
+
+def compile_schedule(authorization: Dict[str, Any]) -> Schedule:
+    """Compact form of the fields of an authorization the rules look at."""
+    if not authorization.get("is_active", True):
+        return (_INACTIVE, None, None, frozenset(), None, None)
+    auth_type = authorization.get("authorization_type", "temporary")
+    if auth_type == "permanent":
+        return (_PERMANENT, None, None, frozenset(), None, None)
+    valid_from = authorization.get("valid_from") or None
+    valid_to = authorization.get("valid_to") or None
+    if auth_type == "recurring":
+        return (_RECURRING, valid_from, valid_to, frozenset(authorization.get("allowed_days") or ()), None, None)
+    if auth_type == "extended":
+        return (_EXTENDED, valid_from, valid_to, frozenset(),
+                authorization.get("allowed_hours_from") or None, authorization.get("allowed_hours_to") or None)
+    return (_DATED, valid_from, valid_to, frozenset(), None, None)
+
+
+def evaluate_schedule(schedule: Schedule, clock: ValidityClock) -> Dict[str, Any]:
+    """Validity of one compiled schedule: {is_valid, status, message}."""
+    kind, valid_from, valid_to, allowed_days, hours_from, hours_to = schedule
+    if kind == _INACTIVE:
+        return {"is_valid": False, "status": "revoked", "message": "Autorización revocada"}
+    if kind == _PERMANENT:
+        return {"is_valid": True, "status": "authorized", "message": "Autorización permanente"}
+
+    if valid_from and clock.today < valid_from:
+        return {"is_valid": False, "status": "not_yet_valid", "message": f"Válido desde {valid_from}"}
+    if valid_to and clock.today > valid_to:
+        return {"is_valid": False, "status": "expired", "message": f"Expiró el {valid_to}"}
+
+    if kind == _RECURRING and allowed_days and clock.weekday not in allowed_days:
+        return {"is_valid": False, "status": "not_today", "message": f"No autorizado hoy ({clock.weekday})"}
+
+    if kind == _EXTENDED:
+        if hours_from and clock.time < hours_from:
+            return {"is_valid": False, "status": "too_early", "message": f"Válido desde las {hours_from}"}
+        if hours_to and clock.time > hours_to:
+            return {"is_valid": False, "status": "too_late", "message": f"Válido hasta las {hours_to}"}
+
+    return {"is_valid": True, "status": "authorized", "message": "Autorización válida"}
+
+
+def evaluate_authorizations(
+    authorizations: Iterable[Dict[str, Any]],
+    condominium_timezone: Optional[str] = None,
+    clock: Optional[ValidityClock] = None,
+) -> List[Dict[str, Any]]:
+    """Validity of every authorization (same order), against one clock."""
+    clock = clock or validity_clock(condominium_timezone)
+    return [evaluate_schedule(compile_schedule(auth), clock) for auth in authorizations]
+
+
+def apply_validity(authorization: Dict[str, Any], validity: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a validity result onto an authorization as the API fields."""
+    authorization["validity_status"] = validity["status"]
+    authorization["validity_message"] = validity["message"]
+    authorization["is_currently_valid"] = validity["is_valid"]
+    return authorization
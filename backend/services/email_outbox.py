@@ -0,0 +1,386 @@
+"""
+GENTURIX - Email Outbox
+=======================
+Durable, asynchronous email delivery. Request handlers and the billing
+scheduler enqueue emails in `email_outbox` (one insert) and return; a
+background worker sends them through services/email_service.send_email.
+
+- Idempotency keys: a unique index on idempotency_key makes enqueueing the
+  same logical email twice (retried request, second scheduler run, two
+  uvicorn workers) a no-op.
+- Retries: transient failures (Resend 429/5xx, network) are retried with
+  exponential backoff up to EMAIL_OUTBOX_MAX_ATTEMPTS / MAX_AGE; permanent
+  errors (validation) fail immediately.
+- Messages are claimed with a lease, so several worker processes can run.
+- Per-type metrics (enqueued, duplicates, sent, failed, retries, send
+  latency, queue delay, sent in the last minute) are kept per process.
+
+States: pending | sent | failed. The HTML body is removed once a message
+reaches a final state (credentials emails contain temporary passwords);
+documents expire via a TTL index on expires_at.
+
+Callers that need to know the outcome (e.g. credentials emails, whose
+sender only learns "queued") store a `context` dict with the message and
+register a final-state hook for the email type; the worker calls it once
+when the message becomes sent or failed.
+"""
+
+import os
+import uuid
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timezone, timedelta
+from typing import Optional, List, Dict, Any, Callable, Awaitable
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from .email_service import send_email, is_email_configured, EMAIL_SEND_CONCURRENCY
+from .push_metrics import LatencyHistogram
+
+# These will be set by the main app on initialization
+db = None
+logger = logging.getLogger(__name__)
+
+EMAIL_OUTBOX_POLL_SECONDS = float(os.environ.get("EMAIL_OUTBOX_POLL_SECONDS", 2))
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get("EMAIL_OUTBOX_BATCH_SIZE", 20))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("EMAIL_OUTBOX_MAX_ATTEMPTS", 6))
+EMAIL_OUTBOX_MAX_AGE_SECONDS = int(os.environ.get("EMAIL_OUTBOX_MAX_AGE_SECONDS", 24 * 60 * 60))
+EMAIL_OUTBOX_RETENTION_DAYS = int(os.environ.get("EMAIL_OUTBOX_RETENTION_DAYS", 30))
+EMAIL_OUTBOX_BASE_DELAY_SECONDS = 5.0
+EMAIL_OUTBOX_MAX_DELAY_SECONDS = 15 * 60.0
+EMAIL_OUTBOX_LEASE_SECONDS = 120
+
+# Queue delay / send latency buckets (ms)
+EMAIL_LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 300000)
+
+_worker_task: Optional[asyncio.Task] = None
+_wakeup: Optional[asyncio.Event] = None
+
+# email_type -> counters and histograms
+_metrics: Dict[str, dict] = {}
+# email_type -> async hook(message, state, error) called when a message becomes final
+_final_state_hooks: Dict[str, Callable[[dict, str, Optional[str]], Awaitable[None]]] = {}
+_started_at = datetime.now(timezone.utc).isoformat()
+
+
+def init_email_outbox(database, log=None):
+    """Initialize outbox with dependencies from main app."""
+    global db, logger
+    db = database
+    if log:
+        logger = log
+
+
+def register_final_state_hook(email_type: str, hook: Callable[[dict, str, Optional[str]], Awaitable[None]]) -> None:
+    """Call `await hook(message, state, error)` when a message of this type is sent or finally failed."""
+    _final_state_hooks[email_type] = hook
+
+
+def _type_metrics(email_type: str) -> dict:
+    metrics = _metrics.get(email_type)
+    if metrics is None:
+        metrics = _metrics[email_type] = {
+            "enqueued": 0,
+            "duplicates": 0,
+            "sent": 0,
+            "failed": 0,
+            "retries": 0,
+            "send_latency": LatencyHistogram(EMAIL_LATENCY_BUCKETS_MS),
+            "queue_delay": LatencyHistogram(EMAIL_LATENCY_BUCKETS_MS),
+            "recent_sent": deque(),
+        }
+    return metrics
+
+
+def _new_message(
+    to: str,
+    subject: str,
+    html: str,
+    email_type: str,
+    idempotency_key: Optional[str],
+    sender: Optional[str],
+    condominium_id: Optional[str],
+    now: datetime,
+    context: Optional[dict] = None
+) -> dict:
+    doc = {
+        "id": str(uuid.uuid4()),
+        "email_type": email_type,
+        "to": to,
+        "subject": subject,
+        "html": html,
+        "sender": sender,
+        "condominium_id": condominium_id,
+        "state": "pending",
+        "attempts": 0,
+        "last_error": None,
+        "email_id": None,
+        "created_at": now.isoformat(),
+        "updated_at": now.isoformat(),
+        "sent_at": None,
+        "next_attempt_at": now,
+        "lease_until": now,
+        "give_up_at": now + timedelta(seconds=EMAIL_OUTBOX_MAX_AGE_SECONDS),
+        "expires_at": now + timedelta(days=EMAIL_OUTBOX_RETENTION_DAYS),
+    }
+    if context:
+        doc["context"] = context
+    # Only set when given: the unique index ignores documents without a key
+    if idempotency_key:
+        doc["idempotency_key"] = idempotency_key
+    return doc
+
+
+def _wake_worker():
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def enqueue_email(
+    to: str,
+    subject: str,
+    html: str,
+    email_type: str,
+    idempotency_key: Optional[str] = None,
+    sender: Optional[str] = None,
+    condominium_id: Optional[str] = None,
+    context: Optional[dict] = None
+) -> Dict[str, Any]:
+    """
+    Queue one email for delivery by the outbox worker. `context` is stored
+    with the message and passed to the final-state hook of email_type.
+
+    Returns:
+        {"queued": True, "id"} | {"queued": False, "duplicate": True} when
+        idempotency_key was already used | {"queued": False, "reason"}
+    """
+    if not is_email_configured():
+        logger.warning(f"[EMAIL-OUTBOX] Email service not configured - {email_type} to {to} not queued")
+        return {"queued": False, "reason": "Email service not configured"}
+
+    doc = _new_message(to, subject, html, email_type, idempotency_key, sender, condominium_id,
+                       datetime.now(timezone.utc), context=context)
+    try:
+        await db.email_outbox.insert_one(doc)
+    except DuplicateKeyError:
+        _type_metrics(email_type)["duplicates"] += 1
+        logger.info(f"[EMAIL-OUTBOX] Duplicate {email_type} skipped: {idempotency_key}")
+        return {"queued": False, "duplicate": True}
+
+    _type_metrics(email_type)["enqueued"] += 1
+    _wake_worker()
+    return {"queued": True, "id": doc["id"]}
+
+
+async def enqueue_emails(messages: List[dict], email_type: str, condominium_id: Optional[str] = None) -> Dict[str, int]:
+    """
+    Queue several emails of one type with a single insert_many.
+
+    Args:
+        messages: [{"to", "subject", "html", "idempotency_key"?, "sender"?}]
+
+    Returns:
+        {"queued": n, "duplicates": n}
+    """
+    counts = {"queued": 0, "duplicates": 0}
+    if not messages:
+        return counts
+    if not is_email_configured():
+        logger.warning(f"[EMAIL-OUTBOX] Email service not configured - {len(messages)} {email_type} emails not queued")
+        return counts
+
+    now = datetime.now(timezone.utc)
+    docs = [
+        _new_message(m["to"], m["subject"], m["html"], email_type, m.get("idempotency_key"), m.get("sender"), condominium_id, now)
+        for m in messages
+    ]
+    try:
+        await db.email_outbox.insert_many(docs, ordered=False)
+        counts["queued"] = len(docs)
+    except BulkWriteError as e:
+        counts["duplicates"] = sum(1 for err in e.details.get("writeErrors", []) if err.get("code") == 11000)
+        counts["queued"] = e.details.get("nInserted", 0)
+        if counts["queued"] + counts["duplicates"] < len(docs):
+            raise
+
+    metrics = _type_metrics(email_type)
+    metrics["enqueued"] += counts["queued"]
+    metrics["duplicates"] += counts["duplicates"]
+    if counts["queued"]:
+        _wake_worker()
+    return counts
+
+
+def next_retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter."""
+    delay = min(EMAIL_OUTBOX_MAX_DELAY_SECONDS, EMAIL_OUTBOX_BASE_DELAY_SECONDS * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+async def _claim_due_messages(limit: int) -> List[dict]:
+    """Lease up to `limit` due messages so no other worker process sends them concurrently."""
+    now = datetime.now(timezone.utc)
+    claimed = []
+    for _ in range(limit):
+        doc = await db.email_outbox.find_one_and_update(
+            {"state": "pending", "next_attempt_at": {"$lte": now}, "lease_until": {"$lte": now}},
+            {"$set": {"lease_until": now + timedelta(seconds=EMAIL_OUTBOX_LEASE_SECONDS)}},
+            sort=[("next_attempt_at", 1)],
+            projection={"_id": 0}
+        )
+        if not doc:
+            break
+        claimed.append(doc)
+    return claimed
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def _deliver(doc: dict, slots: asyncio.Semaphore) -> str:
+    now = datetime.now(timezone.utc)
+    metrics = _type_metrics(doc["email_type"])
+    attempts = doc.get("attempts", 0) + 1
+
+    start = time.perf_counter()
+    async with slots:
+        result = await send_email(to=doc["to"], subject=doc["subject"], html=doc["html"], sender=doc.get("sender"))
+    metrics["send_latency"].observe((time.perf_counter() - start) * 1000)
+
+    finished = datetime.now(timezone.utc)
+    update = {"attempts": attempts, "updated_at": finished.isoformat(), "lease_until": finished}
+    final = True
+    if result.get("success"):
+        state = "sent"
+        update.update({"state": state, "email_id": result.get("email_id"), "sent_at": finished.isoformat(), "last_error": None})
+        metrics["sent"] += 1
+        metrics["recent_sent"].append(time.monotonic())
+        created_at = datetime.fromisoformat(doc["created_at"])
+        metrics["queue_delay"].observe((finished - created_at).total_seconds() * 1000)
+    elif (
+        result.get("retryable")
+        and attempts < EMAIL_OUTBOX_MAX_ATTEMPTS
+        and _as_utc(doc["give_up_at"]) > now
+    ):
+        state = "pending"
+        final = False
+        update.update({
+            "last_error": result.get("error"),
+            "next_attempt_at": now + timedelta(seconds=next_retry_delay(attempts)),
+        })
+        metrics["retries"] += 1
+    else:
+        state = "failed"
+        update.update({"state": state, "last_error": result.get("error")})
+        metrics["failed"] += 1
+        logger.warning(f"[EMAIL-OUTBOX] {doc['email_type']} to {doc['to']} failed after {attempts} attempts: {result.get('error')}")
+
+    operation = {"$set": update}
+    if final:
+        operation["$unset"] = {"html": ""}
+    result = await db.email_outbox.update_one({"id": doc["id"], "state": "pending"}, operation)
+
+    # Only the delivery that moved the message to its final state reports it
+    hook = _final_state_hooks.get(doc["email_type"])
+    if final and hook is not None and result.modified_count:
+        try:
+            await hook(doc, state, update.get("last_error"))
+        except Exception as e:
+            logger.error(f"[EMAIL-OUTBOX] Final-state hook for {doc['email_type']} {doc['id']} failed: {e}")
+    return state
+
+
+async def process_due_messages(limit: int = EMAIL_OUTBOX_BATCH_SIZE) -> Dict[str, int]:
+    """Send one batch of due messages. Returns counts per resulting state."""
+    counts: Dict[str, int] = {}
+    if db is None:
+        return counts
+    docs = await _claim_due_messages(limit)
+    if not docs:
+        return counts
+    slots = asyncio.Semaphore(max(1, EMAIL_SEND_CONCURRENCY))
+    results = await asyncio.gather(*[_deliver(doc, slots) for doc in docs], return_exceptions=True)
+    for res in results:
+        key = res if isinstance(res, str) else "error"
+        if not isinstance(res, str):
+            logger.error(f"[EMAIL-OUTBOX] Delivery error: {res}")
+        counts[key] = counts.get(key, 0) + 1
+    logger.info(f"[EMAIL-OUTBOX] Processed {len(docs)} messages: {counts}")
+    return counts
+
+
+async def _worker_loop():
+    logger.info("[EMAIL-OUTBOX] Worker started")
+    while True:
+        try:
+            counts = await process_due_messages()
+            if sum(counts.values()) >= EMAIL_OUTBOX_BATCH_SIZE:
+                continue  # More may be due - don't sleep
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[EMAIL-OUTBOX] Worker error: {e}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=EMAIL_OUTBOX_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+
+def start_email_outbox_worker():
+    """Start the delivery worker in the running event loop (app startup)."""
+    global _worker_task, _wakeup
+    if _worker_task is not None and not _worker_task.done():
+        return
+    _wakeup = asyncio.Event()
+    _worker_task = asyncio.create_task(_worker_loop())
+
+
+async def stop_email_outbox_worker():
+    """Cancel the delivery worker (app shutdown). Queued emails stay in the collection."""
+    global _worker_task
+    if _worker_task is None:
+        return
+    _worker_task.cancel()
+    try:
+        await _worker_task
+    except asyncio.CancelledError:
+        pass
+    _worker_task = None
+    logger.info("[EMAIL-OUTBOX] Worker stopped")
+
+
+def get_email_outbox_metrics() -> dict:
+    """Per email type counters, latency/queue-delay histograms and sent in the last minute (per worker process)."""
+    now = time.monotonic()
+    by_type = {}
+    for email_type, metrics in sorted(_metrics.items()):
+        recent = metrics["recent_sent"]
+        while recent and now - recent[0] > 60:
+            recent.popleft()
+        by_type[email_type] = {
+            "enqueued": metrics["enqueued"],
+            "duplicates": metrics["duplicates"],
+            "sent": metrics["sent"],
+            "failed": metrics["failed"],
+            "retries": metrics["retries"],
+            "sent_last_minute": len(recent),
+            "send_latency": metrics["send_latency"].snapshot(),
+            "queue_delay": metrics["queue_delay"].snapshot(),
+        }
+    return {"since": _started_at, "by_type": by_type}
+
+
+async def get_email_outbox_backlog() -> List[dict]:
+    """Messages per type and state in the collection (all processes)."""
+    if db is None:
+        return []
+    rows = await db.email_outbox.aggregate([
+        {"$group": {"_id": {"email_type": "$email_type", "state": "$state"}, "count": {"$sum": 1}}},
+        {"$sort": {"_id.email_type": 1, "_id.state": 1}}
+    ]).to_list(None)
+    return [{"email_type": r["_id"]["email_type"], "state": r["_id"]["state"], "count": r["count"]} for r in rows]
@@ -5,9 +5,20 @@ Production email sending using Resend.
 All outgoing emails should go through this service.
 
 Sender: Genturix Security <no-reply@gentrix.com>
+
+Requests to Resend are paced to RESEND_REQUESTS_PER_SECOND (the provider's
+per-team rate limit) and retried with backoff when Resend answers 429.
+Bulk mailings use the batch endpoint (up to 100 emails per request).
+
+HTML templates are compiled once into the template registry
+(services/email_templates.py) and rendered with escaped values.
+
+Set RESEND_API_URL to point the SDK at a local stand-in
+(scripts/fake_resend_service.py) for tests and benchmarks.
 """
 
 import os
+import time
 import asyncio
 import logging
 from pathlib import Path
@@ -16,6 +27,8 @@ from dotenv import load_dotenv
 
 import resend
 
+from .email_templates import register_template, compile_template
+
 logger = logging.getLogger(__name__)
 
 # Load environment variables from backend/.env
@@ -33,6 +46,17 @@ DEFAULT_SENDER = "Genturix Security <no-reply@genturix.com>"
 # Fallback sender for testing (Resend sandbox) - NOT USED IN PRODUCTION
 FALLBACK_SENDER = "Genturix <onboarding@resend.dev>"
 
+# Resend limits: 100 emails per batch request, 2 requests/second per team by default
+RESEND_BATCH_MAX_SIZE = 100
+RESEND_BATCH_SIZE = min(int(os.environ.get("RESEND_BATCH_SIZE", RESEND_BATCH_MAX_SIZE)), RESEND_BATCH_MAX_SIZE)
+RESEND_REQUESTS_PER_SECOND = float(os.environ.get("RESEND_REQUESTS_PER_SECOND", 2))
+RESEND_MAX_RETRIES = int(os.environ.get("RESEND_MAX_RETRIES", 3))
+# Max simultaneous single sends when a bulk mailing cannot use the batch endpoint
+EMAIL_SEND_CONCURRENCY = int(os.environ.get("EMAIL_SEND_CONCURRENCY", 4))
+
+# Start time reserved for the next Resend request (time.monotonic())
+_next_request_at = 0.0
+
 
 def get_sender() -> str:
     """
@@ -52,6 +76,63 @@ def get_sender() -> str:
     return sender
 
 
+def _is_rate_limited(error: Exception) -> bool:
+    """True for Resend 429 responses (rate limit or quota)."""
+    return str(getattr(error, "code", "")) == "429" or type(error).__name__ == "RateLimitError"
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Transient failures worth retrying later: rate limit, Resend 5xx, network errors."""
+    if _is_rate_limited(error):
+        return True
+    try:
+        return int(getattr(error, "code", None)) >= 500
+    except (TypeError, ValueError):
+        pass
+    # requests' ConnectionError / Timeout derive from OSError
+    return isinstance(error, OSError)
+
+
+def _is_rejected(error: Exception) -> bool:
+    """True when Resend refused the request as invalid (400/422): nothing was sent."""
+    return str(getattr(error, "code", "")) in ("400", "422") or type(error).__name__ in (
+        "ValidationError", "MissingRequiredFieldsError"
+    )
+
+
+async def _wait_for_request_slot() -> None:
+    """Space Resend requests of this process RESEND_REQUESTS_PER_SECOND apart."""
+    global _next_request_at
+    if RESEND_REQUESTS_PER_SECOND <= 0:
+        return
+    # No await between read and update: slot reservation is atomic on the event loop
+    now = time.monotonic()
+    wait = _next_request_at - now
+    _next_request_at = max(now, _next_request_at) + 1 / RESEND_REQUESTS_PER_SECOND
+    if wait > 0:
+        await asyncio.sleep(wait)
+
+
+async def _call_resend(send, params):
+    """
+    Run a (blocking) Resend SDK call in a thread, paced to the provider rate
+    limit. 429 responses are retried with exponential backoff (1s, 2s, 4s...);
+    any other error is raised.
+    """
+    attempt = 0
+    while True:
+        await _wait_for_request_slot()
+        try:
+            return await asyncio.to_thread(send, params)
+        except Exception as e:
+            if not _is_rate_limited(e) or attempt >= RESEND_MAX_RETRIES:
+                raise
+            delay = 2 ** attempt
+            attempt += 1
+            logger.warning(f"[EMAIL] Resend rate limit hit, retry {attempt}/{RESEND_MAX_RETRIES} in {delay}s")
+            await asyncio.sleep(delay)
+
+
 def send_email_sync(
     to: str,
     subject: str,
@@ -120,7 +201,8 @@ async def send_email(
         sender: Optional custom sender (defaults to DEFAULT_SENDER)
     
     Returns:
-        Dict with success status and email_id or error
+        Dict with success status and email_id or error (with retryable:
+        True for rate limit, Resend 5xx and network errors)
     """
     if not RESEND_API_KEY:
         logger.warning("[EMAIL] RESEND_API_KEY not configured - email not sent")
@@ -134,8 +216,8 @@ async def send_email(
             "html": html
         }
         
-        # Run in thread to avoid blocking
-        response = await asyncio.to_thread(resend.Emails.send, params)
+        # Run in thread to avoid blocking (paced, retried on 429)
+        response = await _call_resend(resend.Emails.send, params)
         email_id = response.get("id", "unknown")
         
         # Production logging
@@ -153,65 +235,149 @@ async def send_email(
         return {
             "success": False,
             "error": str(e),
+            "retryable": _is_retryable(e),
             "recipient": to
         }
 
 
+async def _send_batch(chunk: List[tuple]) -> List[Dict[str, Any]]:
+    """One Resend batch request. Returns per-recipient results in chunk order."""
+    response = await _call_resend(resend.Batch.send, [params for _, params in chunk])
+    data = response.get("data", []) if isinstance(response, dict) else response
+    results = []
+    for (email, _), item in zip(chunk, data or []):
+        results.append({"success": True, "email_id": item.get("id", "unknown"), "recipient": email})
+    if len(results) != len(chunk):
+        raise RuntimeError(f"Batch response has {len(results)} ids for {len(chunk)} emails")
+    return results
+
+
 async def send_bulk_emails(
     recipients: List[Dict[str, str]],
     subject: str,
     html_template: str,
-    personalize: bool = False
+    personalize: bool = False,
+    sender: Optional[str] = None,
+    use_batch: bool = True
 ) -> Dict[str, Any]:
     """
     Send emails to multiple recipients.
     
+    Emails go out through Resend's batch endpoint in chunks of
+    RESEND_BATCH_SIZE. A chunk the batch endpoint rejects as invalid (400/
+    422, e.g. one invalid address fails the whole request) is re-sent as
+    single emails with at most EMAIL_SEND_CONCURRENCY in flight, so each
+    recipient gets its own result. Any other batch failure (timeout, 5xx,
+    429 after retries, unexpected response) may have been delivered, so
+    the chunk is not re-sent: every recipient in it is reported failed
+    (retryable where the error is transient). All requests respect the
+    Resend rate limit.
+    
     Args:
         recipients: List of dicts with 'email' and optionally 'name'
         subject: Email subject
         html_template: HTML template (can contain {name} placeholder)
-        personalize: Whether to personalize with recipient name
+        personalize: Whether to personalize with recipient name (escaped)
+        sender: Optional custom sender (defaults to DEFAULT_SENDER)
+        use_batch: False to send every email individually
     
     Returns:
-        Dict with summary of sent/failed emails
+        Dict with summary of sent/failed emails and per-recipient details
+        (same order as recipients; recipients without email are skipped)
     """
+    start = time.perf_counter()
     results = {
         "total": len(recipients),
         "sent": 0,
         "failed": 0,
+        "skipped": 0,
+        "batches": 0,
+        "fallbacks": 0,
+        "failed_batches": 0,
+        "elapsed_ms": 0.0,
         "details": []
     }
     
+    # Compiled once per mailing; only {name} is substituted (HTML-escaped)
+    template = compile_template(html_template, fields=("name",)) if personalize else None
+    messages = []
     for recipient in recipients:
         email = recipient.get("email")
         name = recipient.get("name", "Usuario")
         
         if not email:
+            results["skipped"] += 1
             continue
         
-        html = html_template
-        if personalize and "{name}" in html:
-            html = html.replace("{name}", name)
-        
-        result = await send_email(to=email, subject=subject, html=html)
-        
-        if result.get("success"):
-            results["sent"] += 1
-        else:
-            results["failed"] += 1
-        
-        results["details"].append(result)
+        html = template.render(name=name) if template is not None else html_template
+        messages.append((email, {"to": [email], "subject": subject, "html": html}))
+    
+    if not messages:
+        return results
+    
+    if not RESEND_API_KEY:
+        logger.warning("[EMAIL] RESEND_API_KEY not configured - bulk email not sent")
+        results["failed"] = len(messages)
+        results["details"] = [
+            {"success": False, "error": "Email service not configured", "recipient": email}
+            for email, _ in messages
+        ]
+        return results
+    
+    sender = sender or get_sender()
+    for _, params in messages:
+        params["from"] = sender
     
+    slots = asyncio.Semaphore(max(1, EMAIL_SEND_CONCURRENCY))
+    
+    async def send_single(email: str, params: dict) -> Dict[str, Any]:
+        async with slots:
+            return await send_email(to=email, subject=params["subject"], html=params["html"], sender=sender)
+    
+    async def send_chunk(chunk: List[tuple]) -> List[Dict[str, Any]]:
+        if use_batch and len(chunk) > 1:
+            try:
+                chunk_results = await _send_batch(chunk)
+                results["batches"] += 1
+                return chunk_results
+            except Exception as e:
+                if not _is_rejected(e):
+                    # May already be delivered: re-sending could email everyone twice
+                    results["failed_batches"] += 1
+                    logger.error(f"[EMAIL] Batch of {len(chunk)} failed, not re-sent: {str(e)[:100]}")
+                    retryable = _is_retryable(e)
+                    return [
+                        {"success": False, "error": str(e), "retryable": retryable, "recipient": email}
+                        for email, _ in chunk
+                    ]
+                results["fallbacks"] += 1
+                logger.warning(f"[EMAIL] Batch of {len(chunk)} rejected, sending individually: {str(e)[:100]}")
+        return await asyncio.gather(*[send_single(email, params) for email, params in chunk])
+    
+    chunk_size = RESEND_BATCH_SIZE if use_batch else len(messages)
+    chunks = [messages[i:i + chunk_size] for i in range(0, len(messages), chunk_size)]
+    for chunk_results in await asyncio.gather(*[send_chunk(chunk) for chunk in chunks]):
+        results["details"].extend(chunk_results)
+    
+    results["sent"] = sum(1 for r in results["details"] if r.get("success"))
+    results["failed"] = len(results["details"]) - results["sent"]
+    results["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    
+    logger.info(
+        f"[EMAIL] Bulk send | sent={results['sent']} | failed={results['failed']} | "
+        f"batches={results['batches']} | fallbacks={results['fallbacks']} | "
+        f"failed_batches={results['failed_batches']} | elapsed_ms={results['elapsed_ms']}"
+    )
     return results
 
 
 # =============================================================================
 # Email Templates
 # =============================================================================
+# Compiled once into the template registry (services/email_templates.py);
+# values are HTML-escaped on render.
 
-def get_welcome_email_html(user_name: str, email: str, password: str, login_url: str) -> str:
-    """Generate welcome email with credentials."""
-    return f"""
+_WELCOME_EMAIL_TEMPLATE = register_template("welcome", """
     <!DOCTYPE html>
     <html>
     <head>
@@ -248,12 +414,15 @@ def get_welcome_email_html(user_name: str, email: str, password: str, login_url:
         </div>
     </body>
     </html>
-    """
+    """)
 
 
-def get_password_reset_email_html(user_name: str, reset_url: str) -> str:
-    """Generate password reset email."""
-    return f"""
+def get_welcome_email_html(user_name: str, email: str, password: str, login_url: str) -> str:
+    """Generate welcome email with credentials."""
+    return _WELCOME_EMAIL_TEMPLATE.render(user_name=user_name, email=email, password=password, login_url=login_url)
+
+
+_PASSWORD_RESET_EMAIL_TEMPLATE = register_template("password_reset", """
     <!DOCTYPE html>
     <html>
     <head>
@@ -285,22 +454,23 @@ def get_password_reset_email_html(user_name: str, reset_url: str) -> str:
         </div>
     </body>
     </html>
-    """
+    """)
 
 
-def get_notification_email_html(title: str, message: str, action_url: Optional[str] = None, action_text: str = "Ver Detalles") -> str:
-    """Generate generic notification email."""
-    action_button = ""
-    if action_url:
-        action_button = f"""
+def get_password_reset_email_html(user_name: str, reset_url: str) -> str:
+    """Generate password reset email."""
+    return _PASSWORD_RESET_EMAIL_TEMPLATE.render(user_name=user_name, reset_url=reset_url)
+
+
+_NOTIFICATION_ACTION_TEMPLATE = register_template("notification_action", """
         <div style="text-align: center; margin: 30px 0;">
             <a href="{action_url}" style="background: #00d4ff; color: #1a1a2e; padding: 12px 30px; text-decoration: none; border-radius: 25px; font-weight: bold; display: inline-block;">
                 {action_text}
             </a>
         </div>
-        """
-    
-    return f"""
+        """)
+
+_NOTIFICATION_EMAIL_TEMPLATE = register_template("notification", """
     <!DOCTYPE html>
     <html>
     <head>
@@ -324,18 +494,19 @@ def get_notification_email_html(title: str, message: str, action_url: Optional[s
         </div>
     </body>
     </html>
-    """
+    """, raw_fields=("action_button",))
 
 
-def get_emergency_alert_email_html(
-    resident_name: str,
-    alert_type: str,
-    location: str,
-    timestamp: str,
-    condominium_name: str
-) -> str:
-    """Generate emergency alert email."""
-    return f"""
+def get_notification_email_html(title: str, message: str, action_url: Optional[str] = None, action_text: str = "Ver Detalles") -> str:
+    """Generate generic notification email."""
+    action_button = ""
+    if action_url:
+        action_button = _NOTIFICATION_ACTION_TEMPLATE.render(action_url=action_url, action_text=action_text)
+    
+    return _NOTIFICATION_EMAIL_TEMPLATE.render(title=title, message=message, action_button=action_button)
+
+
+_EMERGENCY_ALERT_EMAIL_TEMPLATE = register_template("emergency_alert", """
     <!DOCTYPE html>
     <html>
     <head>
@@ -380,7 +551,24 @@ def get_emergency_alert_email_html(
         </div>
     </body>
     </html>
-    """
+    """)
+
+
+def get_emergency_alert_email_html(
+    resident_name: str,
+    alert_type: str,
+    location: str,
+    timestamp: str,
+    condominium_name: str
+) -> str:
+    """Generate emergency alert email."""
+    return _EMERGENCY_ALERT_EMAIL_TEMPLATE.render(
+        resident_name=resident_name,
+        alert_type=alert_type,
+        location=location,
+        timestamp=timestamp,
+        condominium_name=condominium_name
+    )
 
 
 # =============================================================================
@@ -406,15 +594,7 @@ def get_email_status() -> Dict[str, Any]:
 # Additional Email Templates for Production Workflows
 # =============================================================================
 
-def get_condominium_welcome_email_html(
-    admin_name: str,
-    condominium_name: str,
-    email: str,
-    password: str,
-    login_url: str
-) -> str:
-    """Generate welcome email for new condominium administrator."""
-    return f"""
+_CONDOMINIUM_WELCOME_EMAIL_TEMPLATE = register_template("condominium_welcome", """
     <!DOCTYPE html>
     <html>
     <head>
@@ -461,20 +641,27 @@ def get_condominium_welcome_email_html(
         </div>
     </body>
     </html>
-    """
+    """)
 
 
-def get_visitor_preregistration_email_html(
-    guard_name: str,
-    visitor_name: str,
-    resident_name: str,
-    apartment: str,
-    valid_from: str,
-    valid_to: str,
-    condominium_name: str
+def get_condominium_welcome_email_html(
+    admin_name: str,
+    condominium_name: str,
+    email: str,
+    password: str,
+    login_url: str
 ) -> str:
-    """Generate email notification for guards when a visitor is preregistered."""
-    return f"""
+    """Generate welcome email for new condominium administrator."""
+    return _CONDOMINIUM_WELCOME_EMAIL_TEMPLATE.render(
+        admin_name=admin_name,
+        condominium_name=condominium_name,
+        email=email,
+        password=password,
+        login_url=login_url
+    )
+
+
+_VISITOR_PREREGISTRATION_EMAIL_TEMPLATE = register_template("visitor_preregistration", """
     <!DOCTYPE html>
     <html>
     <head>
@@ -532,19 +719,31 @@ def get_visitor_preregistration_email_html(
         </div>
     </body>
     </html>
-    """
+    """)
 
 
-def get_user_credentials_email_html(
-    user_name: str,
-    email: str,
-    password: str,
-    role: str,
-    condominium_name: str,
-    login_url: str
+def get_visitor_preregistration_email_html(
+    guard_name: str,
+    visitor_name: str,
+    resident_name: str,
+    apartment: str,
+    valid_from: str,
+    valid_to: str,
+    condominium_name: str
 ) -> str:
-    """Generate credentials email for new user accounts."""
-    return f"""
+    """Generate email notification for guards when a visitor is preregistered."""
+    return _VISITOR_PREREGISTRATION_EMAIL_TEMPLATE.render(
+        guard_name=guard_name,
+        visitor_name=visitor_name,
+        resident_name=resident_name,
+        apartment=apartment,
+        valid_from=valid_from,
+        valid_to=valid_to,
+        condominium_name=condominium_name
+    )
+
+
+_USER_CREDENTIALS_EMAIL_TEMPLATE = register_template("user_credentials", """
     <!DOCTYPE html>
     <html>
     <head>
@@ -583,4 +782,23 @@ def get_user_credentials_email_html(
         </div>
     </body>
     </html>
-    """
+    """)
+
+
+def get_user_credentials_email_html(
+    user_name: str,
+    email: str,
+    password: str,
+    role: str,
+    condominium_name: str,
+    login_url: str
+) -> str:
+    """Generate credentials email for new user accounts."""
+    return _USER_CREDENTIALS_EMAIL_TEMPLATE.render(
+        user_name=user_name,
+        email=email,
+        password=password,
+        role=role,
+        condominium_name=condominium_name,
+        login_url=login_url
+    )
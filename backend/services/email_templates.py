@@ -0,0 +1,136 @@
+"""
+GENTURIX - Email Template Registry
+==================================
+Email HTML templates compiled once at import time and rendered by
+substitution, instead of rebuilding a large f-string per send.
+
+A template is plain text with {field} placeholders (same syntax as the
+old f-strings / str.format). Compiling splits it into its static parts
+and the field slots and generates a render function that joins the
+static parts (code constants) with the substituted values, so a render
+does no parsing and no re-building of the static HTML.
+
+Values are HTML-escaped (html.escape, quotes included) unless the field is
+declared raw (pre-rendered HTML such as an optional button) or the
+template was registered with autoescape=False (subjects).
+
+Braces that are not a {identifier} placeholder are left as they are, so
+inline CSS does not need {{ }} escaping.
+"""
+
+import html
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_PLACEHOLDER = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+_registry: Dict[str, "CompiledTemplate"] = {}
+
+
+def escape_value(value: Any) -> str:
+    """HTML-escape a value for substitution into a template."""
+    return html.escape(str(value), quote=True)
+
+
+class CompiledTemplate:
+    """
+    A template split into static parts and field slots.
+
+    The parts are turned into a generated render function once:
+    "".join(("<static>", escape(str(values["field"])), "<static>", ...)),
+    with the static text as code constants. render(**values) raises
+    KeyError for a missing field, like str.format().
+    """
+
+    __slots__ = ("name", "source", "fields", "_render")
+
+    def __init__(
+        self,
+        source: str,
+        name: Optional[str] = None,
+        raw_fields: Iterable[str] = (),
+        autoescape: bool = True,
+        fields: Optional[Iterable[str]] = None
+    ):
+        """
+        Args:
+            raw_fields: fields substituted without escaping (trusted HTML)
+            autoescape: False for plain-text templates such as subjects
+            fields: only these names are placeholders; any other {x} stays literal
+        """
+        self.name = name
+        self.source = source
+        raw = set(raw_fields)
+        allowed = set(fields) if fields is not None else None
+
+        pieces: List[str] = []
+        names: List[str] = []
+        position = 0
+        for match in _PLACEHOLDER.finditer(source):
+            field = match.group(1)
+            if allowed is not None and field not in allowed:
+                continue
+            if match.start() > position:
+                pieces.append(repr(source[position:match.start()]))
+            value = f"str(values[{field!r}])"
+            pieces.append(f"escape({value})" if autoescape and field not in raw else value)
+            names.append(field)
+            position = match.end()
+        if position < len(source):
+            pieces.append(repr(source[position:]))
+
+        namespace = {"escape": html.escape}
+        exec(f"def render(values):\n    return ''.join(({', '.join(pieces)},))\n", namespace)
+        self._render = namespace["render"]
+        self.fields = tuple(dict.fromkeys(names))
+
+    def render(self, values: Optional[Dict[str, Any]] = None, **kwargs: Any) -> str:
+        if values is None:
+            return self._render(kwargs)
+        return self._render({**values, **kwargs} if kwargs else values)
+
+    def __repr__(self) -> str:
+        return f"<CompiledTemplate {self.name or '?'} fields={list(self.fields)}>"
+
+
+def register_template(
+    name: str,
+    source: str,
+    raw_fields: Iterable[str] = (),
+    autoescape: bool = True
+) -> CompiledTemplate:
+    """Compile a template and add it to the registry (replaces one with the same name)."""
+    template = CompiledTemplate(source, name=name, raw_fields=raw_fields, autoescape=autoescape)
+    _registry[name] = template
+    return template
+
+
+def get_template(name: str) -> CompiledTemplate:
+    """Registered template by name (KeyError if unknown)."""
+    return _registry[name]
+
+
+def render_template(name: str, **values: Any) -> str:
+    """Render a registered template."""
+    return _registry[name].render(**values)
+
+
+def list_templates() -> Dict[str, Tuple[str, ...]]:
+    """Registered template names and their fields."""
+    return {name: template.fields for name, template in sorted(_registry.items())}
+
+
+@lru_cache(maxsize=128)
+def compile_template(source: str, fields: Optional[Tuple[str, ...]] = None, autoescape: bool = True) -> CompiledTemplate:
+    """Compile an ad-hoc template (e.g. a bulk mailing body), cached by source."""
+    return CompiledTemplate(source, autoescape=autoescape, fields=fields)
+
+
+def get_template_cache_stats() -> Dict[str, Any]:
+    """Registry size and ad-hoc compile cache counters."""
+    compiled = compile_template.cache_info()
+    return {
+        "registered": len(_registry),
+        "compile_cache": {"hits": compiled.hits, "misses": compiled.misses, "size": compiled.currsize},
+    }
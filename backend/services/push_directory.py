@@ -0,0 +1,319 @@
+"""
+GENTURIX - Push Subscription Directory
+======================================
+In-memory index of active push subscriptions by (condominium_id, role), so
+role-targeted pushes resolve their recipients without querying users and
+push_subscriptions.
+
+- Warm-loaded at startup with one aggregation (push_subscriptions joined
+  with users) plus the condominium list.
+- Kept consistent in this process by the write paths: /push/subscribe,
+  /push/unsubscribe, 404/410 cleanups, user role/status changes and
+  deletions, condominium status changes.
+- A periodic full reload (PUSH_DIRECTORY_REFRESH_SECONDS) picks up changes
+  made by other uvicorn workers and by scripts.
+
+Because of that reload delay, panic alerts do not use the directory: they
+resolve guards from the database (resolve_push_recipients(...,
+use_directory=False)) so no guard is missed.
+
+Only users with at least one active subscription are indexed. Lookups
+return None until the first load finished, so callers can fall back to
+the database.
+"""
+
+import os
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Set, Tuple, Iterable
+
+# These will be set by the main app on initialization
+db = None
+logger = logging.getLogger(__name__)
+
+PUSH_DIRECTORY_REFRESH_SECONDS = float(os.environ.get("PUSH_DIRECTORY_REFRESH_SECONDS", 60))
+
+# user_id -> {"id", "email", "condominium_id", "roles", "is_active", "status", "subscriptions": {endpoint: sub}}
+_users: Dict[str, dict] = {}
+# (condominium_id, role) -> user ids
+_index: Dict[Tuple[str, str], Set[str]] = {}
+# endpoint -> user_id
+_endpoints: Dict[str, str] = {}
+# condominium_id -> {"id", "name", "is_active"}
+_condominiums: Dict[str, dict] = {}
+
+_loaded = False
+_loading = False
+# Users changed while a full reload was reading the database
+_touched_during_load: Set[str] = set()
+
+_refresh_task: Optional[asyncio.Task] = None
+
+_stats = {
+    "lookups": 0,
+    "fallbacks": 0,
+    "reloads": 0,
+    "user_refreshes": 0,
+    "endpoint_removals": 0,
+    "loaded_at": None,
+}
+
+_USER_FIELDS = {"_id": 0, "id": 1, "email": 1, "condominium_id": 1, "roles": 1, "is_active": 1, "status": 1}
+_SUBSCRIPTION_FIELDS = {"_id": 0, "endpoint": 1, "p256dh": 1, "auth": 1, "condominium_id": 1}
+
+
+def init_push_directory(database, log=None):
+    """Initialize directory with dependencies from main app."""
+    global db, logger
+    db = database
+    if log:
+        logger = log
+
+
+def _unindex_user(user_id: str) -> None:
+    entry = _users.pop(user_id, None)
+    if not entry:
+        return
+    for role in entry["roles"]:
+        user_ids = _index.get((entry["condominium_id"], role))
+        if user_ids is not None:
+            user_ids.discard(user_id)
+            if not user_ids:
+                del _index[(entry["condominium_id"], role)]
+    for endpoint in entry["subscriptions"]:
+        if _endpoints.get(endpoint) == user_id:
+            del _endpoints[endpoint]
+
+
+def _index_user(user: dict, subscriptions: Iterable[dict]) -> None:
+    """Replace a user's entry. Users without subscriptions are not indexed."""
+    user_id = user["id"]
+    _unindex_user(user_id)
+    subs = {s["endpoint"]: s for s in subscriptions if s.get("endpoint")}
+    if not subs:
+        return
+    entry = {
+        "id": user_id,
+        "email": user.get("email"),
+        "condominium_id": user.get("condominium_id"),
+        "roles": tuple(user.get("roles") or []),
+        "is_active": user.get("is_active", True),
+        "status": user.get("status"),
+        "subscriptions": subs,
+    }
+    _users[user_id] = entry
+    for role in entry["roles"]:
+        _index.setdefault((entry["condominium_id"], role), set()).add(user_id)
+    for endpoint in subs:
+        _endpoints[endpoint] = user_id
+
+
+async def load_push_directory() -> Dict[str, int]:
+    """(Re)build the whole directory. Returns user/subscription/condominium counts."""
+    global _users, _index, _endpoints, _condominiums, _loaded, _loading
+    if db is None:
+        return {}
+
+    _loading = True
+    _touched_during_load.clear()
+    try:
+        rows = await db.push_subscriptions.aggregate([
+            {"$match": {"is_active": True, "endpoint": {"$nin": [None, ""]}}},
+            {"$group": {
+                "_id": "$user_id",
+                "subscriptions": {"$push": {
+                    "endpoint": "$endpoint",
+                    "p256dh": "$p256dh",
+                    "auth": "$auth",
+                    "condominium_id": "$condominium_id",
+                }}
+            }},
+            {"$lookup": {"from": "users", "localField": "_id", "foreignField": "id", "as": "user"}},
+            {"$unwind": "$user"},
+            {"$project": {
+                "_id": 0,
+                "subscriptions": 1,
+                **{f"user.{field}": 1 for field in _USER_FIELDS if field != "_id"},
+            }},
+        ]).to_list(None)
+        condominiums = await db.condominiums.find(
+            {}, {"_id": 0, "id": 1, "name": 1, "is_active": 1}
+        ).to_list(None)
+    finally:
+        _loading = False
+
+    previous = (_users, _index, _endpoints)
+    _users, _index, _endpoints = {}, {}, {}
+    try:
+        for row in rows:
+            _index_user(row["user"], row["subscriptions"])
+    except Exception:
+        _users, _index, _endpoints = previous
+        raise
+    _condominiums = {c["id"]: c for c in condominiums}
+    _loaded = True
+    _stats["reloads"] += 1
+    _stats["loaded_at"] = datetime.now(timezone.utc).isoformat()
+
+    # The snapshot may predate writes that happened while it was read
+    touched = list(_touched_during_load)
+    _touched_during_load.clear()
+    for user_id in touched:
+        await refresh_push_directory_user(user_id)
+
+    return {
+        "users": len(_users),
+        "subscriptions": len(_endpoints),
+        "condominiums": len(_condominiums),
+    }
+
+
+async def refresh_push_directory_user(user_id: Optional[str]) -> None:
+    """Reload one user and their active subscriptions (subscribe, unsubscribe, role/status change, delete)."""
+    if db is None or not user_id:
+        return
+    if _loading:
+        _touched_during_load.add(user_id)
+    _stats["user_refreshes"] += 1
+    rows = await db.users.aggregate([
+        {"$match": {"id": user_id}},
+        {"$project": _USER_FIELDS},
+        {"$lookup": {
+            "from": "push_subscriptions",
+            "let": {"user_id": "$id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$user_id", "$$user_id"]}, "is_active": True}},
+                {"$project": _SUBSCRIPTION_FIELDS}
+            ],
+            "as": "subscriptions"
+        }}
+    ]).to_list(1)
+    if not rows:
+        _unindex_user(user_id)
+        return
+    user = rows[0]
+    _index_user(user, user.pop("subscriptions"))
+
+
+def remove_push_directory_endpoint(endpoint: Optional[str]) -> None:
+    """Forget a subscription that was deleted (404/410 cleanup)."""
+    user_id = _endpoints.pop(endpoint, None) if endpoint else None
+    if user_id is None:
+        return
+    if _loading:
+        _touched_during_load.add(user_id)
+    _stats["endpoint_removals"] += 1
+    entry = _users.get(user_id)
+    if entry is None:
+        return
+    entry["subscriptions"].pop(endpoint, None)
+    if not entry["subscriptions"]:
+        _unindex_user(user_id)
+
+
+async def refresh_push_directory_condominium(condominium_id: Optional[str]) -> None:
+    """Reload a condominium's name/is_active (status change, creation, deletion)."""
+    if db is None or not condominium_id:
+        return
+    condo = await db.condominiums.find_one(
+        {"id": condominium_id}, {"_id": 0, "id": 1, "name": 1, "is_active": 1}
+    )
+    if condo:
+        _condominiums[condominium_id] = condo
+    else:
+        _condominiums.pop(condominium_id, None)
+
+
+def get_push_directory_condominium(condominium_id: str) -> Optional[dict]:
+    """Cached condominium {"id", "name", "is_active"}, or None if unknown."""
+    return _condominiums.get(condominium_id) if _loaded else None
+
+
+def get_push_directory_recipients(
+    condominium_id: str,
+    roles: List[str],
+    exclude_user_ids: Optional[List[str]] = None,
+    require_active_status: bool = True
+) -> Optional[List[dict]]:
+    """
+    Active users of a condominium with any of `roles`, with their
+    subscriptions in that condominium. Same shape as
+    core.helpers.find_push_recipients() (users without subscriptions are
+    not included).
+
+    Returns None while the directory is not loaded.
+    """
+    if not _loaded:
+        _stats["fallbacks"] += 1
+        return None
+    _stats["lookups"] += 1
+
+    excluded = set(exclude_user_ids or [])
+    user_ids = set()
+    for role in roles:
+        user_ids.update(_index.get((condominium_id, role), ()))
+
+    recipients = []
+    for user_id in user_ids - excluded:
+        entry = _users[user_id]
+        if not entry["is_active"]:
+            continue
+        if require_active_status and entry["status"] not in ("active", None):
+            continue
+        subscriptions = [
+            {"endpoint": s["endpoint"], "p256dh": s.get("p256dh"), "auth": s.get("auth")}
+            for s in entry["subscriptions"].values()
+            if s.get("condominium_id") == condominium_id
+        ]
+        if subscriptions:
+            recipients.append({"id": user_id, "email": entry["email"], "subscriptions": subscriptions})
+    return recipients
+
+
+async def _refresh_loop():
+    while True:
+        await asyncio.sleep(PUSH_DIRECTORY_REFRESH_SECONDS)
+        try:
+            await load_push_directory()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[PUSH-DIRECTORY] Reload failed (keeping previous snapshot): {e}")
+
+
+async def start_push_directory():
+    """Warm-load the directory and start the periodic reload (app startup)."""
+    global _refresh_task
+    try:
+        counts = await load_push_directory()
+        logger.info(f"[PUSH-DIRECTORY] Loaded {counts}")
+    except Exception as e:
+        logger.error(f"[PUSH-DIRECTORY] Initial load failed, using database lookups until next reload: {e}")
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(_refresh_loop())
+
+
+async def stop_push_directory():
+    """Cancel the periodic reload (app shutdown)."""
+    global _refresh_task
+    if _refresh_task is None:
+        return
+    _refresh_task.cancel()
+    try:
+        await _refresh_task
+    except asyncio.CancelledError:
+        pass
+    _refresh_task = None
+
+
+def get_push_directory_stats() -> dict:
+    """Directory size and lookup counters (per worker process)."""
+    return {
+        **_stats,
+        "loaded": _loaded,
+        "users": len(_users),
+        "subscriptions": len(_endpoints),
+        "condominiums": len(_condominiums),
+        "refresh_seconds": PUSH_DIRECTORY_REFRESH_SECONDS,
+    }
@@ -0,0 +1,191 @@
+"""
+GENTURIX - Push Delivery Metrics
+================================
+In-process telemetry for Web Push delivery, recorded by
+services/push_service.send_web_push for every message:
+
+- Latency histogram and status counters keyed by push service host
+  (fcm.googleapis.com, updates.push.services.mozilla.com,
+  web.push.apple.com, ...) and notification type (payload data.type:
+  panic_alert, visitor_arrival, broadcast_v2, ...)
+- End-to-end panic time: from the panic request to the first and the
+  last guard delivery, and for messages delivered by an outbox retry
+
+Status counters use the HTTP status code, or timeout / network / encoding
+/ error when there was no response.
+
+NOTE: Values are per worker process and reset on restart.
+"""
+
+import bisect
+import threading
+from datetime import datetime, timezone
+from typing import Optional, Dict, Tuple, List
+from urllib.parse import urlparse
+
+# Upper bounds (ms) of the latency buckets; the last bucket is unbounded
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+PANIC_BUCKETS_MS = (100, 250, 500, 1000, 2000, 5000, 10000, 30000, 60000, 300000)
+METRICS_MAX_SERIES = 500
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram. Percentiles are the upper bound of the bucket they fall in (capped at max)."""
+
+    __slots__ = ("bounds", "buckets", "count", "sum_ms", "max_ms")
+
+    def __init__(self, bounds: Tuple[int, ...] = LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.buckets[bisect.bisect_left(self.bounds, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(float(self.bounds[i]), self.max_ms) if i < len(self.bounds) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum_ms / self.count, 1) if self.count else None,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 1),
+            "buckets": {
+                **{f"le_{b}": n for b, n in zip(self.bounds, self.buckets)},
+                "inf": self.buckets[-1],
+            },
+        }
+
+
+_lock = threading.Lock()
+# (host, notification_type) -> {"latency": LatencyHistogram, "status": {code: n}}
+_series: Dict[Tuple[str, str], dict] = {}
+_panic = {
+    "first_delivered": LatencyHistogram(PANIC_BUCKETS_MS),
+    "all_delivered": LatencyHistogram(PANIC_BUCKETS_MS),
+    "retry_delivered": LatencyHistogram(PANIC_BUCKETS_MS),
+}
+_started_at = datetime.now(timezone.utc).isoformat()
+
+
+def push_host(endpoint: Optional[str]) -> str:
+    if not endpoint:
+        return "unknown"
+    return urlparse(endpoint).hostname or "unknown"
+
+
+def _status_key(status_code: Optional[int], error: Optional[str]) -> str:
+    if status_code is not None:
+        return str(status_code)
+    error = error or ""
+    if error == "Timeout":
+        return "timeout"
+    if error.startswith("Connection"):
+        return "network"
+    if error.startswith("Encoding"):
+        return "encoding"
+    return "error"
+
+
+def record_push_send(
+    endpoint: Optional[str],
+    notification_type: Optional[str],
+    status_code: Optional[int],
+    error: Optional[str],
+    elapsed_ms: float
+) -> None:
+    """Record one send_web_push() outcome."""
+    key = (push_host(endpoint), notification_type or "unknown")
+    status = _status_key(status_code, error)
+    with _lock:
+        series = _series.get(key)
+        if series is None:
+            if len(_series) >= METRICS_MAX_SERIES:
+                key = ("other", "other")
+                series = _series.get(key)
+            if series is None:
+                series = _series[key] = {"latency": LatencyHistogram(), "status": {}}
+        series["latency"].observe(elapsed_ms)
+        series["status"][status] = series["status"].get(status, 0) + 1
+
+
+def record_panic_delivery(stage: str, elapsed_ms: float) -> None:
+    """End-to-end panic time. stage: first_delivered | all_delivered | retry_delivered."""
+    with _lock:
+        _panic[stage].observe(elapsed_ms)
+
+
+def get_push_metrics() -> dict:
+    """Full metrics: per host/type series and panic end-to-end histograms."""
+    with _lock:
+        series = [
+            {
+                "host": host,
+                "notification_type": notification_type,
+                "latency": data["latency"].snapshot(),
+                "status": dict(data["status"]),
+            }
+            for (host, notification_type), data in sorted(_series.items())
+        ]
+        panic = {stage: hist.snapshot() for stage, hist in _panic.items()}
+    return {"since": _started_at, "series": series, "panic_end_to_end": panic}
+
+
+def get_push_metrics_summary() -> dict:
+    """Compact per-host view (all notification types merged) for /push/debug."""
+    hosts: Dict[str, dict] = {}
+    with _lock:
+        for (host, _), data in _series.items():
+            merged = hosts.setdefault(host, {"latency": LatencyHistogram(), "status": {}})
+            latency = merged["latency"]
+            latency.buckets = [a + b for a, b in zip(latency.buckets, data["latency"].buckets)]
+            latency.count += data["latency"].count
+            latency.sum_ms += data["latency"].sum_ms
+            latency.max_ms = max(latency.max_ms, data["latency"].max_ms)
+            for code, n in data["status"].items():
+                merged["status"][code] = merged["status"].get(code, 0) + n
+        panic_first = _panic["first_delivered"].percentile(0.95)
+        panic_all = _panic["all_delivered"].percentile(0.95)
+
+    summary: List[dict] = []
+    for host, data in sorted(hosts.items()):
+        latency = data["latency"]
+        ok = sum(n for code, n in data["status"].items() if code.startswith("2"))
+        summary.append({
+            "host": host,
+            "sent": latency.count,
+            "success_rate": round(ok / latency.count, 3) if latency.count else None,
+            "p50_ms": latency.percentile(0.50),
+            "p95_ms": latency.percentile(0.95),
+            "status": data["status"],
+        })
+    return {
+        "hosts": summary,
+        "panic_first_delivered_p95_ms": panic_first,
+        "panic_all_delivered_p95_ms": panic_all,
+    }
+
+
+def reset_push_metrics() -> None:
+    global _started_at
+    with _lock:
+        _series.clear()
+        for stage in _panic:
+            _panic[stage] = LatencyHistogram(PANIC_BUCKETS_MS)
+        _started_at = datetime.now(timezone.utc).isoformat()
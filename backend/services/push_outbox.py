@@ -0,0 +1,339 @@
+"""
+GENTURIX - Push Outbox
+======================
+Durable delivery state and retries for Web Push messages.
+
+Flow:
+- The push helpers make the first delivery attempt inline (one RTT, see
+  services/push_service.py) and record every message in `push_outbox`
+  with record_push_results() - a single insert_many per fan-out.
+- Messages that failed transiently (429, 5xx, 401/403, timeouts, network)
+  are stored as "retrying" with next_attempt_at. The background worker
+  claims due messages with a lease (safe with several uvicorn workers),
+  re-sends them and backs off exponentially, honoring Retry-After.
+- A newer message with the same tag for the same endpoint supersedes a
+  pending retry (e.g. a second visitor update replaces the first).
+
+States: delivered | retrying | superseded | gone (404/410) | cancelled
+(unsubscribed before retry) | failed (permanent error, max attempts or
+max age).
+
+Documents expire via a TTL index on expires_at (server.py:initialize_indexes).
+"""
+
+import os
+import uuid
+import random
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+from email.utils import parsedate_to_datetime
+from typing import Optional, List, Dict
+
+from .push_service import send_web_push
+from .push_directory import remove_push_directory_endpoint
+from .push_metrics import record_panic_delivery
+
+# These will be set by the main app on initialization
+db = None
+logger = logging.getLogger(__name__)
+
+PUSH_OUTBOX_POLL_SECONDS = float(os.environ.get("PUSH_OUTBOX_POLL_SECONDS", 2))
+PUSH_OUTBOX_BATCH_SIZE = int(os.environ.get("PUSH_OUTBOX_BATCH_SIZE", 50))
+PUSH_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("PUSH_OUTBOX_MAX_ATTEMPTS", 6))
+# Stop retrying messages older than this (a panic alert from an hour ago is noise)
+PUSH_OUTBOX_MAX_AGE_SECONDS = int(os.environ.get("PUSH_OUTBOX_MAX_AGE_SECONDS", 60 * 60))
+PUSH_OUTBOX_RETENTION_DAYS = int(os.environ.get("PUSH_OUTBOX_RETENTION_DAYS", 7))
+PUSH_OUTBOX_BASE_DELAY_SECONDS = 2.0
+PUSH_OUTBOX_MAX_DELAY_SECONDS = 300.0
+PUSH_OUTBOX_LEASE_SECONDS = 60
+
+RETRYABLE_STATUS_CODES = {401, 403, 408, 429, 500, 502, 503, 504}
+
+_worker_task: Optional[asyncio.Task] = None
+_wakeup: Optional[asyncio.Event] = None
+
+
+def init_push_outbox(database, log=None):
+    """Initialize outbox with dependencies from main app."""
+    global db, logger
+    db = database
+    if log:
+        logger = log
+
+
+def parse_retry_after(value: Optional[str], now: datetime) -> Optional[float]:
+    """Retry-After header (delta-seconds or HTTP-date) -> seconds from now."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+def next_retry_delay(attempts: int, retry_after_seconds: Optional[float] = None) -> float:
+    """Exponential backoff with jitter; never earlier than Retry-After."""
+    delay = min(PUSH_OUTBOX_MAX_DELAY_SECONDS, PUSH_OUTBOX_BASE_DELAY_SECONDS * (2 ** max(0, attempts - 1)))
+    delay *= random.uniform(0.8, 1.2)
+    if retry_after_seconds is not None:
+        delay = max(delay, retry_after_seconds)
+    return delay
+
+
+def delivery_state(send_result: dict) -> str:
+    """Map a send_web_push-style result to an outbox state."""
+    if send_result.get("success"):
+        return "delivered"
+    status_code = send_result.get("status_code")
+    if status_code in (404, 410):
+        return "gone"
+    if status_code is None:
+        error = send_result.get("error") or ""
+        # Encoding errors (bad keys) will not fix themselves
+        if error.startswith("Encoding") or error == "Missing endpoint" or error == "VAPID not configured":
+            return "failed"
+        return "retrying"
+    if status_code in RETRYABLE_STATUS_CODES:
+        return "retrying"
+    return "failed"
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def record_push_results(
+    results: List[dict],
+    payload: dict,
+    notification_type: Optional[str] = None,
+    source_id: Optional[str] = None,
+    condominium_id: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Store one outbox document per attempted message and schedule retries.
+
+    Args:
+        results: send_push_notification_with_cleanup() results (endpoint,
+                 user_id, success, status_code, retry_after, error)
+        payload: The notification payload (re-sent as-is on retry)
+        notification_type: e.g. panic_alert, visitor_arrival (defaults to payload.data.type)
+        source_id: Business reference to query by (e.g. panic event id)
+        condominium_id: Tenant scope
+
+    Returns:
+        Counts per state ({"delivered": n, "retrying": n, ...})
+    """
+    counts: Dict[str, int] = {}
+    if db is None or not results:
+        return counts
+
+    now = datetime.now(timezone.utc)
+    tag = payload.get("tag")
+    notification_type = notification_type or (payload.get("data") or {}).get("type")
+    docs = []
+    for res in results:
+        if not isinstance(res, dict) or not res.get("endpoint"):
+            continue
+        state = delivery_state(res)
+        counts[state] = counts.get(state, 0) + 1
+        doc = {
+            "id": str(uuid.uuid4()),
+            "endpoint": res["endpoint"],
+            "user_id": res.get("user_id"),
+            "condominium_id": condominium_id,
+            "source_id": source_id,
+            "notification_type": notification_type,
+            "tag": tag,
+            "payload": payload,
+            "urgency": payload.get("urgency"),
+            "state": state,
+            "attempts": 1,
+            "last_status_code": res.get("status_code"),
+            "last_error": res.get("error"),
+            "created_at": now.isoformat(),
+            "updated_at": now.isoformat(),
+            "delivered_at": now.isoformat() if state == "delivered" else None,
+            "give_up_at": now + timedelta(seconds=PUSH_OUTBOX_MAX_AGE_SECONDS),
+            "expires_at": now + timedelta(days=PUSH_OUTBOX_RETENTION_DAYS),
+            "lease_until": now,
+            "next_attempt_at": None,
+        }
+        if state == "retrying":
+            delay = next_retry_delay(1, parse_retry_after(res.get("retry_after"), now))
+            doc["next_attempt_at"] = now + timedelta(seconds=delay)
+        docs.append(doc)
+
+    if not docs:
+        return counts
+
+    try:
+        # Collapse: this message replaces pending retries with the same tag
+        if tag:
+            await db.push_outbox.update_many(
+                {"tag": tag, "endpoint": {"$in": [d["endpoint"] for d in docs]}, "state": "retrying"},
+                {"$set": {"state": "superseded", "updated_at": now.isoformat()}}
+            )
+        await db.push_outbox.insert_many(docs, ordered=False)
+    except Exception as e:
+        logger.error(f"[PUSH-OUTBOX] Failed to record {len(docs)} messages: {e}")
+        return counts
+
+    if counts.get("retrying") and _wakeup is not None:
+        _wakeup.set()
+    return counts
+
+
+async def _claim_due_messages(limit: int) -> List[dict]:
+    """Lease up to `limit` due messages so no other worker process retries them concurrently."""
+    now = datetime.now(timezone.utc)
+    claimed = []
+    for _ in range(limit):
+        doc = await db.push_outbox.find_one_and_update(
+            {"state": "retrying", "next_attempt_at": {"$lte": now}, "lease_until": {"$lte": now}},
+            {"$set": {"lease_until": now + timedelta(seconds=PUSH_OUTBOX_LEASE_SECONDS)}},
+            sort=[("next_attempt_at", 1)],
+            projection={"_id": 0}
+        )
+        if not doc:
+            break
+        claimed.append(doc)
+    return claimed
+
+
+async def _retry_message(doc: dict) -> str:
+    now = datetime.now(timezone.utc)
+    update = {"updated_at": now.isoformat(), "lease_until": now}
+
+    if _as_utc(doc["give_up_at"]) <= now or doc.get("attempts", 0) >= PUSH_OUTBOX_MAX_ATTEMPTS:
+        update.update({"state": "failed", "last_error": doc.get("last_error") or "Max attempts"})
+        await db.push_outbox.update_one({"id": doc["id"], "state": "retrying"}, {"$set": update})
+        return "failed"
+
+    sub = await db.push_subscriptions.find_one(
+        {"endpoint": doc["endpoint"], "is_active": True},
+        {"_id": 0, "endpoint": 1, "p256dh": 1, "auth": 1}
+    )
+    if not sub:
+        update["state"] = "cancelled"
+        await db.push_outbox.update_one({"id": doc["id"], "state": "retrying"}, {"$set": update})
+        return "cancelled"
+
+    subscription_info = {
+        "endpoint": sub["endpoint"],
+        "keys": {"p256dh": sub.get("p256dh"), "auth": sub.get("auth")}
+    }
+    response = await send_web_push(subscription_info, doc["payload"], urgency=doc.get("urgency"))
+    attempts = doc.get("attempts", 0) + 1
+    state = delivery_state(response)
+    update.update({
+        "state": state,
+        "attempts": attempts,
+        "last_status_code": response["status_code"],
+        "last_error": response["error"],
+    })
+
+    if state == "delivered":
+        update["delivered_at"] = now.isoformat()
+        if doc.get("notification_type") == "panic_alert":
+            created_at = datetime.fromisoformat(doc["created_at"])
+            record_panic_delivery("retry_delivered", (now - created_at).total_seconds() * 1000)
+    elif state == "gone":
+        await db.push_subscriptions.delete_one({"endpoint": doc["endpoint"]})
+        remove_push_directory_endpoint(doc["endpoint"])
+        logger.warning(f"[PUSH-CLEANUP] Invalid subscription removed on retry: user_id={doc.get('user_id')}, reason=HTTP_{response['status_code']}")
+    elif state == "retrying":
+        if attempts >= PUSH_OUTBOX_MAX_ATTEMPTS:
+            update["state"] = state = "failed"
+        else:
+            delay = next_retry_delay(attempts, parse_retry_after(response["retry_after"], now))
+            update["next_attempt_at"] = now + timedelta(seconds=delay)
+
+    # Guard on state so a message superseded meanwhile is not resurrected
+    await db.push_outbox.update_one({"id": doc["id"], "state": "retrying"}, {"$set": update})
+    return state
+
+
+async def process_due_messages(limit: int = PUSH_OUTBOX_BATCH_SIZE) -> Dict[str, int]:
+    """Retry one batch of due messages. Returns counts per resulting state."""
+    counts: Dict[str, int] = {}
+    if db is None:
+        return counts
+    docs = await _claim_due_messages(limit)
+    if not docs:
+        return counts
+    results = await asyncio.gather(*[_retry_message(doc) for doc in docs], return_exceptions=True)
+    for res in results:
+        key = res if isinstance(res, str) else "error"
+        counts[key] = counts.get(key, 0) + 1
+    logger.info(f"[PUSH-OUTBOX] Retried {len(docs)} messages: {counts}")
+    return counts
+
+
+async def _worker_loop():
+    logger.info("[PUSH-OUTBOX] Worker started")
+    while True:
+        try:
+            counts = await process_due_messages()
+            if sum(counts.values()) >= PUSH_OUTBOX_BATCH_SIZE:
+                continue  # More may be due - don't sleep
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[PUSH-OUTBOX] Worker error: {e}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=PUSH_OUTBOX_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+
+def start_push_outbox_worker():
+    """Start the retry worker in the running event loop (app startup)."""
+    global _worker_task, _wakeup
+    if _worker_task is not None and not _worker_task.done():
+        return
+    _wakeup = asyncio.Event()
+    _worker_task = asyncio.create_task(_worker_loop())
+
+
+async def stop_push_outbox_worker():
+    """Cancel the retry worker (app shutdown). Pending retries stay in the collection."""
+    global _worker_task
+    if _worker_task is None:
+        return
+    _worker_task.cancel()
+    try:
+        await _worker_task
+    except asyncio.CancelledError:
+        pass
+    _worker_task = None
+    logger.info("[PUSH-OUTBOX] Worker stopped")
+
+
+async def get_push_deliveries(query: dict, limit: int = 50) -> List[dict]:
+    """Delivery state for outbox messages matching `query` (newest first)."""
+    if db is None:
+        return []
+    return await db.push_outbox.find(query, {
+        "_id": 0,
+        "id": 1,
+        "user_id": 1,
+        "source_id": 1,
+        "notification_type": 1,
+        "tag": 1,
+        "state": 1,
+        "attempts": 1,
+        "last_status_code": 1,
+        "last_error": 1,
+        "created_at": 1,
+        "updated_at": 1,
+        "delivered_at": 1,
+        "next_attempt_at": 1,
+    }).sort("created_at", -1).to_list(limit)
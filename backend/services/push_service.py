@@ -0,0 +1,261 @@
+"""
+GENTURIX - Web Push Delivery Service
+====================================
+Non-blocking Web Push sender used by the push helpers in core/helpers.py.
+
+- Payload encryption (RFC 8291, aes128gcm) and VAPID signing (RFC 8292) run
+  on a small thread pool, off the event loop
+- Requests go through one pooled httpx.AsyncClient, so connections to each
+  push service host (FCM, Mozilla, Apple) are kept alive and reused
+- PUSH_SEND_CONCURRENCY bounds in-flight sends for the whole process
+- Signed VAPID headers are cached per push service origin and reused until
+  shortly before they expire (one ECDSA signature per origin, not per message)
+- Every send is recorded in services/push_metrics.py (latency and status by
+  push service host and notification type)
+
+This module only delivers. Callers decide what a response means for the
+subscription (404/410 cleanup, logging, etc.).
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from time import perf_counter
+from typing import Optional, Dict, Any, Tuple
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+
+import httpx
+from py_vapid import Vapid
+from pywebpush import WebPusher
+
+from .push_metrics import record_push_send
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables from backend/.env
+ROOT_DIR = Path(__file__).parent.parent
+load_dotenv(ROOT_DIR / '.env')
+
+VAPID_PUBLIC_KEY = os.environ.get("VAPID_PUBLIC_KEY", "")
+VAPID_PRIVATE_KEY = os.environ.get("VAPID_PRIVATE_KEY", "")
+VAPID_CLAIMS_EMAIL = os.environ.get("VAPID_CLAIMS_EMAIL", "admin@genturix.com")
+
+# Max simultaneous push requests per process
+PUSH_SEND_CONCURRENCY = int(os.environ.get("PUSH_SEND_CONCURRENCY", 50))
+# Max simultaneous sends for a single fan-out (leaves slots free for panic alerts
+# while a large broadcast is in progress)
+PUSH_FANOUT_CONCURRENCY = int(os.environ.get("PUSH_FANOUT_CONCURRENCY", 20))
+# Threads for ECDH/AES-GCM encryption and VAPID signing
+PUSH_CRYPTO_WORKERS = int(os.environ.get("PUSH_CRYPTO_WORKERS", 4))
+PUSH_HTTP_TIMEOUT_SECONDS = float(os.environ.get("PUSH_HTTP_TIMEOUT_SECONDS", 10))
+PUSH_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("PUSH_MAX_KEEPALIVE_CONNECTIONS", 20))
+# Push service message TTL. 0 matches the previous pywebpush default.
+PUSH_DEFAULT_TTL_SECONDS = int(os.environ.get("PUSH_DEFAULT_TTL_SECONDS", 0))
+VAPID_TOKEN_TTL_SECONDS = 12 * 60 * 60
+# Re-sign when a cached VAPID token has less than this left
+VAPID_REFRESH_MARGIN_SECONDS = int(os.environ.get("VAPID_REFRESH_MARGIN_SECONDS", 60 * 60))
+VAPID_CACHE_MAX_ORIGINS = int(os.environ.get("VAPID_CACHE_MAX_ORIGINS", 256))
+
+_crypto_pool = ThreadPoolExecutor(max_workers=PUSH_CRYPTO_WORKERS, thread_name_prefix="push-crypto")
+_send_slots = asyncio.Semaphore(PUSH_SEND_CONCURRENCY)
+_client: Optional[httpx.AsyncClient] = None
+_vapid: Optional[Vapid] = None
+
+# origin -> (token exp, signed headers). Accessed from _crypto_pool threads.
+_vapid_headers_cache: "OrderedDict[str, Tuple[int, Dict[str, str]]]" = OrderedDict()
+_vapid_lock = threading.Lock()
+_vapid_stats = {
+    "signatures_created": 0,
+    "signatures_saved": 0,
+}
+
+_stats = {
+    "sent": 0,
+    "failed": 0,
+    "in_flight": 0,
+    "peak_in_flight": 0,
+}
+
+
+def is_push_configured() -> bool:
+    """True when VAPID keys are available."""
+    return bool(VAPID_PUBLIC_KEY and VAPID_PRIVATE_KEY)
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(PUSH_HTTP_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=PUSH_SEND_CONCURRENCY,
+                max_keepalive_connections=PUSH_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        )
+    return _client
+
+
+def _get_vapid() -> Vapid:
+    global _vapid
+    if _vapid is None:
+        _vapid = Vapid.from_string(private_key=VAPID_PRIVATE_KEY)
+    return _vapid
+
+
+def _push_origin(endpoint: str) -> str:
+    url = urlparse(endpoint)
+    return f"{url.scheme}://{url.netloc}"
+
+
+def _vapid_headers(endpoint: str) -> Dict[str, str]:
+    """Signed VAPID headers for the endpoint's origin, reused until close to expiry."""
+    origin = _push_origin(endpoint)
+    now = int(time.time())
+
+    with _vapid_lock:
+        cached = _vapid_headers_cache.get(origin)
+        if cached is not None and cached[0] - VAPID_REFRESH_MARGIN_SECONDS > now:
+            _vapid_headers_cache.move_to_end(origin)
+            _vapid_stats["signatures_saved"] += 1
+            return dict(cached[1])
+
+    exp = now + VAPID_TOKEN_TTL_SECONDS
+    headers = _get_vapid().sign({
+        "sub": f"mailto:{VAPID_CLAIMS_EMAIL}",
+        "aud": origin,
+        "exp": exp,
+    })
+
+    with _vapid_lock:
+        _vapid_stats["signatures_created"] += 1
+        _vapid_headers_cache[origin] = (exp, headers)
+        _vapid_headers_cache.move_to_end(origin)
+        while len(_vapid_headers_cache) > VAPID_CACHE_MAX_ORIGINS:
+            _vapid_headers_cache.popitem(last=False)
+    return dict(headers)
+
+
+def _drop_vapid_headers(endpoint: str) -> None:
+    with _vapid_lock:
+        _vapid_headers_cache.pop(_push_origin(endpoint), None)
+
+
+def _prepare_request(subscription_info: dict, data: bytes) -> Tuple[bytes, Dict[str, str]]:
+    """Encrypt the payload and build headers. Runs on _crypto_pool."""
+    encoded = WebPusher(subscription_info).encode(data, content_encoding="aes128gcm")
+    headers = {"Content-Encoding": "aes128gcm"}
+    headers.update(_vapid_headers(subscription_info["endpoint"]))
+    return encoded["body"], headers
+
+
+async def send_web_push(
+    subscription_info: dict,
+    payload: dict,
+    ttl: int = PUSH_DEFAULT_TTL_SECONDS,
+    urgency: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Encrypt and deliver one Web Push message.
+
+    Args:
+        subscription_info: {"endpoint": str, "keys": {"p256dh": str, "auth": str}}
+        payload: JSON-serializable notification payload
+        ttl: Seconds the push service may hold the message for an offline device
+        urgency: Optional Urgency header (very-low, low, normal, high)
+
+    Returns:
+        Dict with success, status_code (None on network errors), error,
+        retry_after (raw header), body (error responses only) and elapsed_ms
+    """
+    result = {
+        "success": False,
+        "status_code": None,
+        "error": None,
+        "retry_after": None,
+        "body": "",
+        "elapsed_ms": 0.0,
+    }
+    endpoint = subscription_info.get("endpoint")
+    start = perf_counter()
+
+    async with _send_slots:
+        _stats["in_flight"] += 1
+        _stats["peak_in_flight"] = max(_stats["peak_in_flight"], _stats["in_flight"])
+        try:
+            try:
+                loop = asyncio.get_running_loop()
+                body, headers = await loop.run_in_executor(
+                    _crypto_pool, _prepare_request, subscription_info, json.dumps(payload).encode("utf-8")
+                )
+            except Exception as e:
+                result["error"] = f"Encoding: {type(e).__name__}: {str(e)[:50]}"
+                return result
+
+            headers["TTL"] = str(ttl)
+            if urgency:
+                headers["Urgency"] = urgency
+
+            try:
+                response = await _get_client().post(endpoint, content=body, headers=headers)
+            except httpx.TimeoutException:
+                result["error"] = "Timeout"
+                return result
+            except httpx.TransportError as e:
+                result["error"] = f"Connection: {str(e)[:30]}"
+                return result
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {str(e)[:50]}"
+                return result
+
+            result["status_code"] = response.status_code
+            if 200 <= response.status_code < 300:
+                result["success"] = True
+            else:
+                result["error"] = f"HTTP {response.status_code}"
+                if response.status_code in (401, 403):
+                    # Push service rejected our VAPID token - re-sign next time
+                    _drop_vapid_headers(endpoint)
+                result["retry_after"] = response.headers.get("Retry-After")
+                result["body"] = response.text[:100] if response.text else ""
+            return result
+        finally:
+            _stats["in_flight"] -= 1
+            _stats["sent" if result["success"] else "failed"] += 1
+            result["elapsed_ms"] = round((perf_counter() - start) * 1000, 1)
+            record_push_send(
+                endpoint,
+                (payload.get("data") or {}).get("type"),
+                result["status_code"],
+                result["error"],
+                result["elapsed_ms"],
+            )
+
+
+async def close_push_client():
+    """Close pooled connections (app shutdown)."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+def get_push_sender_stats() -> Dict[str, Any]:
+    """Delivery counters for monitoring (per worker process)."""
+    with _vapid_lock:
+        vapid = {
+            **_vapid_stats,
+            "cached_origins": list(_vapid_headers_cache.keys()),
+        }
+    return {
+        **_stats,
+        "concurrency": PUSH_SEND_CONCURRENCY,
+        "crypto_workers": PUSH_CRYPTO_WORKERS,
+        "vapid": vapid,
+    }
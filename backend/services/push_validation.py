@@ -0,0 +1,282 @@
+"""
+GENTURIX - Push Subscription Validation Job
+===========================================
+Background job behind POST /push/validate-subscriptions?dry_run=false.
+
+- Streams push_subscriptions in batches ordered by _id (never loads the
+  whole collection)
+- Probes each batch concurrently with a silent push
+- Deletes dead subscriptions (404/410, missing endpoint or keys) with one
+  bulk_write per batch
+- Checkpoints the last processed _id and counters in
+  `push_validation_jobs` after every batch, so a job interrupted by a
+  restart is resumed from its checkpoint on the next startup
+
+One job runs at a time (partial unique index on status=running). The
+running process refreshes heartbeat_at; a job whose heartbeat is older
+than PUSH_VALIDATION_LEASE_SECONDS is considered orphaned and can be taken
+over by any worker.
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Optional, List
+
+from pymongo import DeleteOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from .push_service import send_web_push
+from .push_directory import remove_push_directory_endpoint
+
+# These will be set by the main app on initialization
+db = None
+logger = logging.getLogger(__name__)
+
+PUSH_VALIDATION_BATCH_SIZE = int(os.environ.get("PUSH_VALIDATION_BATCH_SIZE", 200))
+PUSH_VALIDATION_CONCURRENCY = int(os.environ.get("PUSH_VALIDATION_CONCURRENCY", 20))
+PUSH_VALIDATION_LEASE_SECONDS = 300
+PUSH_VALIDATION_MAX_ERRORS_DETAIL = 20
+
+# Silent notification (won't show to users)
+VALIDATION_PAYLOAD = {
+    "title": "GENTURIX System Check",
+    "body": "Validación de suscripción",
+    "silent": True,
+    "tag": "system-validation",
+    "data": {"type": "validation"}
+}
+
+_job_task: Optional[asyncio.Task] = None
+
+
+def init_push_validation(database, log=None):
+    """Initialize job runner with dependencies from main app."""
+    global db, logger
+    db = database
+    if log:
+        logger = log
+
+
+def job_snapshot(job: Optional[dict]) -> Optional[dict]:
+    """API view of a job document."""
+    if not job:
+        return None
+    snapshot = {k: v for k, v in job.items() if k not in ("_id", "checkpoint", "heartbeat_at")}
+    snapshot["checkpoint"] = str(job["checkpoint"]) if job.get("checkpoint") else None
+    return snapshot
+
+
+async def _probe(sub: dict, slots: asyncio.Semaphore) -> tuple:
+    """Returns (outcome, error) with outcome in valid | invalid | temp_error."""
+    endpoint = sub.get("endpoint")
+    if not endpoint:
+        return "invalid", "No endpoint"
+    subscription_info = {
+        "endpoint": endpoint,
+        "keys": {
+            "p256dh": sub.get("p256dh", ""),
+            "auth": sub.get("auth", "")
+        }
+    }
+    if not subscription_info["keys"]["p256dh"] or not subscription_info["keys"]["auth"]:
+        return "invalid", "Missing keys"
+
+    async with slots:
+        response = await send_web_push(subscription_info, VALIDATION_PAYLOAD)
+    if response["success"]:
+        return "valid", None
+    if response["status_code"] in (404, 410):
+        return "invalid", f"HTTP {response['status_code']} - Expired/Gone"
+    # Temporary / network errors - keep subscription
+    return "temp_error", response["error"]
+
+
+async def _process_batch(job_id: str, subs: List[dict]) -> None:
+    slots = asyncio.Semaphore(max(1, PUSH_VALIDATION_CONCURRENCY))
+    outcomes = await asyncio.gather(*[_probe(sub, slots) for sub in subs], return_exceptions=True)
+
+    counts = {"scanned": len(subs), "valid": 0, "invalid": 0, "deleted": 0, "temp_errors": 0}
+    deletes = []
+    dead_endpoints = []
+    errors_detail = []
+    for sub, outcome in zip(subs, outcomes):
+        if isinstance(outcome, Exception):
+            outcome = ("temp_error", f"{type(outcome).__name__}: {str(outcome)[:50]}")
+        state, error = outcome
+        if state == "invalid":
+            counts["invalid"] += 1
+            deletes.append(DeleteOne({"_id": sub["_id"]}))
+            dead_endpoints.append(sub.get("endpoint"))
+            endpoint = sub.get("endpoint") or ""
+            user_id = sub.get("user_id")
+            errors_detail.append({
+                "endpoint": (endpoint[-30:] if len(endpoint) > 30 else endpoint) or "MISSING",
+                "user_id": user_id[:12] if user_id else "N/A",
+                "error": error
+            })
+        else:
+            # Temporary errors keep the subscription (counted as valid, like before)
+            counts["valid"] += 1
+            if state == "temp_error":
+                counts["temp_errors"] += 1
+
+    if deletes:
+        result = await db.push_subscriptions.bulk_write(deletes, ordered=False)
+        counts["deleted"] = result.deleted_count
+        for endpoint in dead_endpoints:
+            remove_push_directory_endpoint(endpoint)
+
+    now = datetime.now(timezone.utc)
+    update = {
+        "$set": {"checkpoint": subs[-1]["_id"], "heartbeat_at": now, "updated_at": now.isoformat()},
+        "$inc": {**counts, "batches": 1},
+    }
+    if errors_detail:
+        update["$push"] = {"errors_detail": {"$each": errors_detail, "$slice": -PUSH_VALIDATION_MAX_ERRORS_DETAIL}}
+    await db.push_validation_jobs.update_one({"id": job_id, "status": "running"}, update)
+
+
+async def _run_job(job_id: str) -> None:
+    logger.info(f"[PUSH-VALIDATE] Job {job_id[:8]} running")
+    try:
+        while True:
+            job = await db.push_validation_jobs.find_one({"id": job_id}, {"_id": 0, "status": 1, "checkpoint": 1})
+            if not job or job["status"] != "running":
+                return
+            query = {"_id": {"$gt": job["checkpoint"]}} if job.get("checkpoint") else {}
+            subs = await db.push_subscriptions.find(
+                query, {"_id": 1, "endpoint": 1, "p256dh": 1, "auth": 1, "user_id": 1}
+            ).sort("_id", 1).limit(PUSH_VALIDATION_BATCH_SIZE).to_list(PUSH_VALIDATION_BATCH_SIZE)
+            if not subs:
+                break
+            await _process_batch(job_id, subs)
+
+        now = datetime.now(timezone.utc)
+        job = await db.push_validation_jobs.find_one_and_update(
+            {"id": job_id, "status": "running"},
+            {"$set": {"status": "completed", "finished_at": now.isoformat(), "updated_at": now.isoformat()}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if job:
+            remaining = await db.push_subscriptions.estimated_document_count()
+            logger.info(
+                f"[PUSH-VALIDATE] Job {job_id[:8]} complete | scanned={job.get('scanned', 0)} | "
+                f"valid={job.get('valid', 0)} | invalid={job.get('invalid', 0)} | deleted={job.get('deleted', 0)}"
+            )
+            # Log with requested format for monitoring
+            logger.info(f"[PUSH CLEANUP] deleted_subscriptions={job.get('deleted', 0)} remaining={remaining}")
+    except asyncio.CancelledError:
+        # Shutdown: keep status=running and release the lease so the next
+        # startup resumes from the checkpoint right away
+        await db.push_validation_jobs.update_one(
+            {"id": job_id, "status": "running"},
+            {"$set": {"heartbeat_at": datetime.fromtimestamp(0, timezone.utc)}}
+        )
+        logger.info(f"[PUSH-VALIDATE] Job {job_id[:8]} interrupted, will resume from checkpoint")
+        raise
+    except Exception as e:
+        logger.error(f"[PUSH-VALIDATE] Job {job_id[:8]} failed: {e}")
+        await db.push_validation_jobs.update_one(
+            {"id": job_id},
+            {"$set": {"status": "failed", "error": str(e)[:200], "updated_at": datetime.now(timezone.utc).isoformat()}}
+        )
+
+
+def _spawn(job_id: str) -> None:
+    global _job_task
+    _job_task = asyncio.create_task(_run_job(job_id))
+
+
+async def _claim_orphaned_job() -> Optional[dict]:
+    """Take over a running job whose owner stopped heart-beating."""
+    now = datetime.now(timezone.utc)
+    return await db.push_validation_jobs.find_one_and_update(
+        {"status": "running", "heartbeat_at": {"$lt": now - timedelta(seconds=PUSH_VALIDATION_LEASE_SECONDS)}},
+        {"$set": {"heartbeat_at": now, "updated_at": now.isoformat()}, "$inc": {"resumed": 1}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def start_push_validation_job(started_by: Optional[str] = None) -> dict:
+    """
+    Start a validation job, or return the one already running.
+    An orphaned job (owner restarted) is resumed from its checkpoint.
+    """
+    job = await _claim_orphaned_job()
+    if job:
+        logger.info(f"[PUSH-VALIDATE] Resuming job {job['id'][:8]} from checkpoint")
+        _spawn(job["id"])
+        return job
+
+    running = await db.push_validation_jobs.find_one({"status": "running"}, {"_id": 0})
+    if running:
+        return running
+
+    now = datetime.now(timezone.utc)
+    job = {
+        "id": str(uuid.uuid4()),
+        "status": "running",
+        "dry_run": False,
+        "started_by": started_by,
+        "total_estimate": await db.push_subscriptions.estimated_document_count(),
+        "checkpoint": None,
+        "batches": 0,
+        "scanned": 0,
+        "valid": 0,
+        "invalid": 0,
+        "deleted": 0,
+        "temp_errors": 0,
+        "resumed": 0,
+        "errors_detail": [],
+        "heartbeat_at": now,
+        "created_at": now.isoformat(),
+        "updated_at": now.isoformat(),
+        "finished_at": None,
+    }
+    try:
+        await db.push_validation_jobs.insert_one(job)
+    except DuplicateKeyError:
+        # Another request/worker started one first (unique index on running jobs)
+        return await db.push_validation_jobs.find_one({"status": "running"}, {"_id": 0})
+    job.pop("_id", None)
+    logger.info(f"[PUSH-VALIDATE] Job {job['id'][:8]} started (~{job['total_estimate']} subscriptions)")
+    _spawn(job["id"])
+    return job
+
+
+async def resume_push_validation_jobs() -> None:
+    """Resume an interrupted job (app startup)."""
+    if db is None:
+        return
+    job = await _claim_orphaned_job()
+    if job:
+        logger.info(f"[PUSH-VALIDATE] Resuming job {job['id'][:8]} after restart")
+        _spawn(job["id"])
+
+
+async def stop_push_validation_job() -> None:
+    """Cancel the local job task (app shutdown). Progress stays checkpointed."""
+    global _job_task
+    if _job_task is None or _job_task.done():
+        return
+    _job_task.cancel()
+    try:
+        await _job_task
+    except asyncio.CancelledError:
+        pass
+    _job_task = None
+
+
+async def get_push_validation_job(job_id: Optional[str] = None) -> Optional[dict]:
+    """A job by id, or the most recent one."""
+    if db is None:
+        return None
+    if job_id:
+        return await db.push_validation_jobs.find_one({"id": job_id}, {"_id": 0})
+    jobs = await db.push_validation_jobs.find({}, {"_id": 0}).sort("created_at", -1).limit(1).to_list(1)
+    return jobs[0] if jobs else None
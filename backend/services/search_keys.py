@@ -0,0 +1,180 @@
+"""
+GENTURIX - Visitor Search Keys
+==============================
+Normalized, indexable search keys for visitor_authorizations and
+visitor_entries, so name / ID number / plate lookups are an index seek
+instead of a case-insensitive $regex or a Python filter over a page of
+documents.
+
+Each document carries a `search_keys` array (multikey index together with
+condominium_id) holding every prefix of every normalized word of its
+searchable fields:
+
+    "José Pérez"  -> j, jo, jos, jose, p, pe, per, pere, perez
+    "ABC-123"     -> a, ab, abc, 1, 12, 123, + abc123 and its prefixes
+
+Normalization lowercases, strips accents (NFKD) and turns punctuation into
+word breaks. Identifier fields (ID numbers, plates) also index their
+compact form (punctuation removed), so "abc123" finds "ABC-123".
+
+A query matches when every query word is a prefix of some word of the
+document ({"search_keys": {"$all": terms}}); rank_search_results orders
+the matches by how well they match (exact identifier > exact name >
+field prefix > word prefixes).
+
+Keys are maintained on write (authorization create/update, check-in).
+Documents written before this existed are filled in at startup by
+services/search_keys_backfill.py; until it has finished, search_filter's
+fallback_fields keeps them findable by the old field regex.
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# Longest prefix stored; longer query words are truncated for the index
+# lookup and checked in full by rank_search_results
+MAX_PREFIX_LENGTH = 16
+
+# Searchable fields per collection: (name fields, identifier fields)
+AUTHORIZATION_SEARCH_FIELDS = (("visitor_name", "created_by_name"), ("identification_number", "vehicle_plate"))
+ENTRY_SEARCH_FIELDS = (("visitor_name",), ("identification_number", "document_number", "vehicle_plate"))
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_search_text(value: Any) -> str:
+    """Lowercase, accent-folded text with punctuation collapsed to single spaces."""
+    if value is None:
+        return ""
+    folded = unicodedata.normalize("NFKD", str(value))
+    folded = "".join(c for c in folded if not unicodedata.combining(c)).lower()
+    return _NON_ALNUM.sub(" ", folded).strip()
+
+
+def _compact(normalized: str) -> str:
+    return normalized.replace(" ", "")
+
+
+def _prefixes(word: str) -> List[str]:
+    return [word[:i] for i in range(1, min(len(word), MAX_PREFIX_LENGTH) + 1)]
+
+
+def build_search_keys(doc: Dict[str, Any], name_fields: Sequence[str], identifier_fields: Sequence[str]) -> List[str]:
+    """Sorted, de-duplicated prefix keys for the searchable fields of a document."""
+    keys = set()
+    for field in list(name_fields) + list(identifier_fields):
+        normalized = normalize_search_text(doc.get(field))
+        if not normalized:
+            continue
+        words = normalized.split()
+        if field in identifier_fields and len(words) > 1:
+            words.append(_compact(normalized))
+        for word in words:
+            keys.update(_prefixes(word))
+    return sorted(keys)
+
+
+def authorization_search_keys(doc: Dict[str, Any]) -> List[str]:
+    """search_keys value for a visitor_authorizations document."""
+    return build_search_keys(doc, *AUTHORIZATION_SEARCH_FIELDS)
+
+
+def entry_search_keys(doc: Dict[str, Any]) -> List[str]:
+    """search_keys value for a visitor_entries document."""
+    return build_search_keys(doc, *ENTRY_SEARCH_FIELDS)
+
+
+def search_terms(query: Optional[str]) -> List[str]:
+    """Normalized query words as index keys (truncated to MAX_PREFIX_LENGTH, de-duplicated)."""
+    terms = []
+    for word in normalize_search_text(query).split():
+        term = word[:MAX_PREFIX_LENGTH]
+        if term not in terms:
+            terms.append(term)
+    return terms
+
+
+def search_filter(query: Optional[str], fallback_fields: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Mongo filter for documents matching every query word, or None for an empty query.
+
+    With fallback_fields, documents without search_keys (not backfilled
+    yet) also match when one of those fields contains the query
+    (case-insensitive regex, as before search_keys existed).
+    """
+    terms = search_terms(query)
+    if not terms:
+        return None
+    keys_filter = {"search_keys": {"$all": terms}}
+    if not fallback_fields:
+        return keys_filter
+    pattern = {"$regex": re.escape(query.strip()), "$options": "i"}
+    return {"$or": [
+        keys_filter,
+        {"search_keys": {"$exists": False}, "$or": [{field: pattern} for field in fallback_fields]},
+    ]}
+
+
+def search_score(doc: Dict[str, Any], query: Optional[str], name_fields: Sequence[str], identifier_fields: Sequence[str]) -> int:
+    """
+    How well a document matches a query (0 = no match).
+
+    100 exact identifier, 90 exact name, 70 identifier prefix, 60 name
+    prefix, 40 every query word is a word prefix in one field, 20 every
+    query word is a word prefix somewhere in the document.
+    """
+    normalized_query = normalize_search_text(query)
+    if not normalized_query:
+        return 0
+    query_words = normalized_query.split()
+    compact_query = _compact(normalized_query)
+
+    best = 0
+    document_words = []
+    for field in list(name_fields) + list(identifier_fields):
+        normalized = normalize_search_text(doc.get(field))
+        if not normalized:
+            continue
+        is_identifier = field in identifier_fields
+        words = normalized.split()
+        document_words.extend(words)
+        if is_identifier:
+            document_words.append(_compact(normalized))
+
+        value = _compact(normalized) if is_identifier else normalized
+        wanted = compact_query if is_identifier else normalized_query
+        if value == wanted:
+            best = max(best, 100 if is_identifier else 90)
+        elif value.startswith(wanted):
+            best = max(best, 70 if is_identifier else 60)
+        elif all(any(w.startswith(q) for w in words) for q in query_words):
+            best = max(best, 40)
+
+    if not best and all(any(w.startswith(q) for w in document_words) for q in query_words):
+        best = 20
+    return best
+
+
+def rank_search_results(
+    docs: Iterable[Dict[str, Any]],
+    query: Optional[str],
+    name_fields: Sequence[str],
+    identifier_fields: Sequence[str],
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Documents that match the query, best first, each with a `search_score`.
+
+    The sort is stable, so documents fetched newest-first stay newest-first
+    within the same score. Also drops index matches that only matched on a
+    truncated query word.
+    """
+    ranked = []
+    for doc in docs:
+        score = search_score(doc, query, name_fields, identifier_fields)
+        if score:
+            doc["search_score"] = score
+            ranked.append(doc)
+    ranked.sort(key=lambda d: -d["search_score"])
+    return ranked[:limit] if limit else ranked
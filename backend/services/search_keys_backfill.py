@@ -0,0 +1,241 @@
+"""
+GENTURIX - Visitor Search Keys Backfill
+=======================================
+Fills in `search_keys` (services/search_keys.py) on visitor_authorizations
+and visitor_entries written before the keys were maintained on write.
+
+Runs as a startup job (start_search_keys_backfill):
+- Streams the documents still missing keys in batches ordered by _id, one
+  bulk_write per batch
+- Checkpoints the last processed _id per collection in
+  `search_keys_backfill` after every batch, so a restart resumes from the
+  checkpoint; status=completed is recorded once both collections are done
+  and later startups skip the job entirely
+- One worker runs it at a time: the runner refreshes heartbeat_at, and a
+  job whose heartbeat is older than SEARCH_KEYS_BACKFILL_LEASE_SECONDS can
+  be taken over by any worker. The others poll until it has completed
+
+Until this process has seen status=completed, search_keys_backfill_pending()
+is True and the search endpoints also match documents without keys by the
+old field regex (search_filter fallback_fields).
+
+scripts/backfill_search_keys.py runs the same backfill by hand (e.g.
+--rebuild after changing the normalization).
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from .search_keys import (
+    AUTHORIZATION_SEARCH_FIELDS,
+    ENTRY_SEARCH_FIELDS,
+    authorization_search_keys,
+    entry_search_keys,
+)
+
+# These will be set by the main app on initialization
+db = None
+logger = logging.getLogger(__name__)
+
+SEARCH_KEYS_BACKFILL_BATCH_SIZE = int(os.environ.get("SEARCH_KEYS_BACKFILL_BATCH_SIZE", 500))
+SEARCH_KEYS_BACKFILL_LEASE_SECONDS = 120
+# How often a worker not running the job checks whether it has completed
+SEARCH_KEYS_BACKFILL_POLL_SECONDS = 30
+
+SEARCH_KEY_COLLECTIONS: List[Tuple[str, Tuple[Sequence[str], Sequence[str]], Callable[[Dict[str, Any]], List[str]]]] = [
+    ("visitor_authorizations", AUTHORIZATION_SEARCH_FIELDS, authorization_search_keys),
+    ("visitor_entries", ENTRY_SEARCH_FIELDS, entry_search_keys),
+]
+
+# _id of the single state document in search_keys_backfill
+_STATE_ID = "visitor_search_keys"
+
+_backfill_task: Optional[asyncio.Task] = None
+_backfill_complete = False
+_owner_id = str(uuid.uuid4())
+
+
+def init_search_keys_backfill(database, log=None):
+    """Initialize the backfill with dependencies from main app."""
+    global db, logger
+    db = database
+    if log:
+        logger = log
+
+
+def search_keys_backfill_pending() -> bool:
+    """True until this process has seen the backfill completed."""
+    return not _backfill_complete
+
+
+async def _backfill_batch(database, name: str, fields, build_keys, query: dict, batch_size: int,
+                          dry_run: bool = False) -> Tuple[int, Any, int]:
+    """Write keys for the next batch matching query; returns (scanned, last _id, updated)."""
+    projection = {"_id": 1}
+    for field in list(fields[0]) + list(fields[1]):
+        projection[field] = 1
+
+    batch = await database[name].find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+    if not batch:
+        return 0, None, 0
+    updated = 0
+    if not dry_run:
+        operations = [UpdateOne({"_id": doc["_id"]}, {"$set": {"search_keys": build_keys(doc)}}) for doc in batch]
+        result = await database[name].bulk_write(operations, ordered=False)
+        updated = result.modified_count
+    return len(batch), batch[-1]["_id"], updated
+
+
+async def backfill_collection(
+    database,
+    name: str,
+    fields: Tuple[Sequence[str], Sequence[str]],
+    build_keys: Callable[[Dict[str, Any]], List[str]],
+    batch_size: int = SEARCH_KEYS_BACKFILL_BATCH_SIZE,
+    rebuild: bool = False,
+    dry_run: bool = False,
+    progress: Optional[Callable[[str, int], None]] = None,
+) -> Tuple[int, int]:
+    """Backfill one collection in a single pass (no checkpoint); returns (scanned, updated)."""
+    scanned = updated = 0
+    last_id = None
+    while True:
+        query = {} if rebuild else {"search_keys": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        count, last_id, written = await _backfill_batch(database, name, fields, build_keys, query, batch_size, dry_run)
+        if not count:
+            break
+        scanned += count
+        updated += written
+        if progress:
+            progress(name, scanned)
+
+    return scanned, updated
+
+
+async def _claim_job() -> Optional[dict]:
+    """Take the job if nobody holds a live lease; None if held elsewhere or completed."""
+    now = datetime.now(timezone.utc)
+    try:
+        return await db.search_keys_backfill.find_one_and_update(
+            {
+                "_id": _STATE_ID,
+                "status": {"$ne": "completed"},
+                "$or": [
+                    {"owner": _owner_id},
+                    {"heartbeat_at": {"$lt": now - timedelta(seconds=SEARCH_KEYS_BACKFILL_LEASE_SECONDS)}},
+                ],
+            },
+            {
+                "$set": {"status": "running", "owner": _owner_id, "heartbeat_at": now, "updated_at": now.isoformat()},
+                "$setOnInsert": {"checkpoints": {}, "scanned": 0, "updated": 0, "created_at": now.isoformat()},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # State document exists: leased by another worker, or completed
+        return None
+
+
+async def _run_job(job: dict) -> None:
+    """Backfill from the job's checkpoints, then record status=completed."""
+    global _backfill_complete
+    checkpoints = job.get("checkpoints") or {}
+    for name, fields, build_keys in SEARCH_KEY_COLLECTIONS:
+        last_id = checkpoints.get(name)
+        while True:
+            query = {"search_keys": {"$exists": False}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            count, batch_last_id, written = await _backfill_batch(
+                db, name, fields, build_keys, query, SEARCH_KEYS_BACKFILL_BATCH_SIZE
+            )
+            if not count:
+                break
+            last_id = batch_last_id
+            now = datetime.now(timezone.utc)
+            result = await db.search_keys_backfill.update_one(
+                {"_id": _STATE_ID, "owner": _owner_id},
+                {
+                    "$set": {f"checkpoints.{name}": last_id, "heartbeat_at": now, "updated_at": now.isoformat()},
+                    "$inc": {"scanned": count, "updated": written},
+                }
+            )
+            if not result.matched_count:
+                logger.warning("[SEARCH-KEYS] Backfill lease lost, leaving it to the new owner")
+                return
+
+    now = datetime.now(timezone.utc)
+    job = await db.search_keys_backfill.find_one_and_update(
+        {"_id": _STATE_ID, "owner": _owner_id},
+        {"$set": {"status": "completed", "finished_at": now.isoformat(), "updated_at": now.isoformat()}},
+        projection={"_id": 0, "scanned": 1, "updated": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if job:
+        _backfill_complete = True
+        logger.info(f"[SEARCH-KEYS] Backfill complete | scanned={job.get('scanned', 0)} | updated={job.get('updated', 0)}")
+
+
+async def _backfill_loop():
+    global _backfill_complete
+    while True:
+        try:
+            state = await db.search_keys_backfill.find_one({"_id": _STATE_ID}, {"_id": 0, "status": 1})
+            if state and state.get("status") == "completed":
+                _backfill_complete = True
+                return
+            job = await _claim_job()
+            if job:
+                logger.info("[SEARCH-KEYS] Backfill running")
+                await _run_job(job)
+                if _backfill_complete:
+                    return
+        except asyncio.CancelledError:
+            # Shutdown: release the lease so the next startup resumes from the checkpoint right away
+            await db.search_keys_backfill.update_one(
+                {"_id": _STATE_ID, "owner": _owner_id, "status": "running"},
+                {"$set": {"heartbeat_at": datetime.fromtimestamp(0, timezone.utc)}}
+            )
+            raise
+        except Exception as e:
+            logger.error(f"[SEARCH-KEYS] Backfill error: {e}")
+        await asyncio.sleep(SEARCH_KEYS_BACKFILL_POLL_SECONDS)
+
+
+def start_search_keys_backfill():
+    """Start (or resume) the backfill in the running event loop (app startup). Ends once completed."""
+    global _backfill_task
+    if _backfill_complete or (_backfill_task is not None and not _backfill_task.done()):
+        return
+    _backfill_task = asyncio.create_task(_backfill_loop())
+
+
+async def stop_search_keys_backfill():
+    """Cancel the backfill (app shutdown). Progress stays checkpointed."""
+    global _backfill_task
+    if _backfill_task is None or _backfill_task.done():
+        return
+    _backfill_task.cancel()
+    try:
+        await _backfill_task
+    except asyncio.CancelledError:
+        pass
+    _backfill_task = None
+
+
+async def get_search_keys_backfill_stats() -> dict:
+    """Backfill state document and whether this process still uses the fallback."""
+    state = await db.search_keys_backfill.find_one({"_id": _STATE_ID}, {"_id": 0, "owner": 0}) if db is not None else None
+    if state:
+        state["checkpoints"] = {name: str(value) for name, value in (state.get("checkpoints") or {}).items()}
+    return {"pending": search_keys_backfill_pending(), "job": state}
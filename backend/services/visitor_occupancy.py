@@ -0,0 +1,287 @@
+"""
+GENTURIX - Visitor Occupancy
+============================
+Materialized "who is inside" per condominium. `visitor_occupancy` holds
+one small document per visitor entry that is currently inside (_id = the
+visitor_entries id), written by POST /guard/checkin and removed by
+POST /guard/checkout/{entry_id}, so inside counts and "is this
+authorization's visitor inside?" are index lookups on a collection the
+size of the current occupancy instead of queries over all historical
+visitor_entries.
+
+- claim_key: "auth:<authorization_id>" or "manual:<condominium_id>:<name>"
+  (normalized name) with a unique partial index. Inserting the occupancy
+  document is the atomic duplicate-entry check: two guards checking in the
+  same authorization (or the same manual visitor) at once cannot both
+  succeed. A claim whose entry has already been checked out (check-out
+  failed to remove the document) is released on the spot by occupy() and
+  find_occupant(), so it never blocks the visitor's next check-in.
+- visitor_entries stays the source of truth. A reconciliation job (at
+  startup, then every VISITOR_OCCUPANCY_RECONCILE_SECONDS) adds documents
+  for inside entries that are missing and removes documents whose entry is
+  no longer inside, repairing drift from partial failures or direct
+  database edits.
+"""
+
+import os
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Optional, List, Dict, Any
+
+from pymongo.errors import DuplicateKeyError
+
+from .search_keys import normalize_search_text
+
+# These will be set by the main app on initialization
+db = None
+logger = logging.getLogger(__name__)
+
+VISITOR_OCCUPANCY_RECONCILE_SECONDS = float(os.environ.get("VISITOR_OCCUPANCY_RECONCILE_SECONDS", 600))
+# Occupancy documents younger than this are never removed by reconciliation
+# (the check-in writes the occupancy document just before the entry)
+VISITOR_OCCUPANCY_GRACE_SECONDS = 60
+
+_reconciler_task: Optional[asyncio.Task] = None
+_last_reconcile: Optional[dict] = None
+
+
+def init_visitor_occupancy(database, log=None):
+    """Initialize occupancy with dependencies from main app."""
+    global db, logger
+    db = database
+    if log:
+        logger = log
+
+
+def occupancy_claim_key(entry: Dict[str, Any]) -> Optional[str]:
+    """Uniqueness key of an inside visitor: the authorization, or condominium + normalized name for manual entries."""
+    if entry.get("authorization_id"):
+        return f"auth:{entry['authorization_id']}"
+    name = normalize_search_text(entry.get("visitor_name"))
+    if name and entry.get("condominium_id"):
+        return f"manual:{entry['condominium_id']}:{name}"
+    return None
+
+
+def _occupancy_doc(entry: Dict[str, Any], claim: bool = True) -> Dict[str, Any]:
+    doc = {
+        "_id": entry["id"],
+        "condominium_id": entry.get("condominium_id"),
+        "authorization_id": entry.get("authorization_id"),
+        "visitor_name": entry.get("visitor_name"),
+        "resident_id": entry.get("resident_id"),
+        "entry_at": entry.get("entry_at"),
+        "created_at": datetime.now(timezone.utc),
+    }
+    claim_key = occupancy_claim_key(entry) if claim else None
+    if claim_key:
+        doc["claim_key"] = claim_key
+    return doc
+
+
+async def _release_if_stale(doc: dict) -> bool:
+    """
+    Delete an occupancy document whose entry is no longer inside. An entry
+    that does not exist yet only counts as gone after the grace period
+    (check-in writes the occupancy document just before the entry).
+    """
+    entry = await db.visitor_entries.find_one({"id": doc["_id"]}, {"_id": 0, "status": 1})
+    if entry is not None:
+        if entry.get("status") == "inside":
+            return False
+    elif doc.get("created_at") is None or _as_utc(doc["created_at"]) > (
+        datetime.now(timezone.utc) - timedelta(seconds=VISITOR_OCCUPANCY_GRACE_SECONDS)
+    ):
+        return False
+    await db.visitor_occupancy.delete_one({"_id": doc["_id"]})
+    logger.warning(f"[OCCUPANCY] Released stale claim {doc.get('claim_key')} of entry {doc['_id']}")
+    return True
+
+
+async def occupy(entry: Dict[str, Any], claim: bool = True) -> bool:
+    """
+    Record a visitor entry as inside. False (nothing written) when the same
+    authorization / manual visitor is already inside. claim=False records
+    it without the uniqueness claim (manual entry without a name).
+    """
+    doc = _occupancy_doc(entry, claim=claim)
+    try:
+        await db.visitor_occupancy.insert_one(doc)
+        return True
+    except DuplicateKeyError:
+        pass
+    # Claimed: retry once if the holder's entry has already left
+    holder = await db.visitor_occupancy.find_one({"claim_key": doc["claim_key"]}) if "claim_key" in doc else None
+    if holder is None or not await _release_if_stale(holder):
+        return False
+    try:
+        await db.visitor_occupancy.insert_one(doc)
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+async def vacate(entry_id: str) -> bool:
+    """Remove a visitor entry from the occupancy (check-out)."""
+    result = await db.visitor_occupancy.delete_one({"_id": entry_id})
+    return result.deleted_count > 0
+
+
+async def find_occupant(authorization_id: Optional[str] = None, condominium_id: Optional[str] = None,
+                        visitor_name: Optional[str] = None) -> Optional[dict]:
+    """The inside visitor for an authorization, or the manual visitor with this name in a condominium."""
+    claim_key = occupancy_claim_key({
+        "authorization_id": authorization_id, "condominium_id": condominium_id, "visitor_name": visitor_name
+    })
+    if not claim_key:
+        return None
+    doc = await db.visitor_occupancy.find_one({"claim_key": claim_key})
+    if doc is not None and await _release_if_stale(doc):
+        return None
+    return doc
+
+
+async def get_occupancy_by_authorization(authorization_ids: List[str]) -> Dict[str, dict]:
+    """{authorization_id: occupancy doc} for the given authorizations that have a visitor inside."""
+    if not authorization_ids:
+        return {}
+    docs = await db.visitor_occupancy.find(
+        {"authorization_id": {"$in": authorization_ids}}
+    ).sort("entry_at", 1).to_list(None)
+    # Latest entry wins if an authorization has more than one (legacy data)
+    return {doc["authorization_id"]: doc for doc in docs}
+
+
+async def count_inside(condominium_id: Optional[str] = None) -> int:
+    """Visitors currently inside a condominium (all condominiums when None)."""
+    query = {"condominium_id": condominium_id} if condominium_id else {}
+    return await db.visitor_occupancy.count_documents(query)
+
+
+async def get_inside_entries(condominium_id: Optional[str] = None, limit: int = 200) -> List[dict]:
+    """visitor_entries documents of the visitors inside, newest entry first."""
+    query = {"condominium_id": condominium_id} if condominium_id else {}
+    inside = await db.visitor_occupancy.find(query, {"_id": 1}).sort("entry_at", -1).to_list(limit)
+    if not inside:
+        return []
+    return await db.visitor_entries.find(
+        {"id": {"$in": [doc["_id"] for doc in inside]}, "status": "inside"},
+        {"_id": 0, "search_keys": 0}
+    ).sort("entry_at", -1).to_list(limit)
+
+
+# ==================== RECONCILIATION ====================
+
+async def reconcile_occupancy() -> dict:
+    """
+    Make visitor_occupancy match the inside entries in visitor_entries.
+    Returns counts: inside, added, removed, unclaimed (inside entries that
+    share an authorization / manual name with another inside entry).
+    """
+    started = datetime.now(timezone.utc)
+    grace_cutoff = started - timedelta(seconds=VISITOR_OCCUPANCY_GRACE_SECONDS)
+
+    # Occupancy first: an entry checked in between the two reads is seen
+    # as missing (insert is a no-op), never as stale
+    occupancy = await db.visitor_occupancy.find({}, {"_id": 1, "created_at": 1}).to_list(None)
+    entries = await db.visitor_entries.find(
+        {"status": "inside", "exit_at": None},
+        {"_id": 0, "id": 1, "condominium_id": 1, "authorization_id": 1, "visitor_name": 1,
+         "resident_id": 1, "entry_at": 1}
+    ).to_list(None)
+
+    occupied = {doc["_id"]: doc for doc in occupancy}
+    inside_ids = {entry["id"] for entry in entries if entry.get("id")}
+    stats = {"inside": len(inside_ids), "added": 0, "removed": 0, "unclaimed": 0}
+
+    # Missing: inside entries without an occupancy document
+    added_ids = []
+    for entry in entries:
+        if not entry.get("id") or entry["id"] in occupied:
+            continue
+        try:
+            await db.visitor_occupancy.insert_one(_occupancy_doc(entry))
+        except DuplicateKeyError as e:
+            if "claim_key" not in str(e):
+                continue  # Inserted by a check-in meanwhile
+            # Another inside entry holds the claim; still counted and listed
+            try:
+                await db.visitor_occupancy.insert_one(_occupancy_doc(entry, claim=False))
+            except DuplicateKeyError:
+                continue
+            stats["unclaimed"] += 1
+        added_ids.append(entry["id"])
+    stats["added"] = len(added_ids)
+
+    # Entries checked out while we were inserting
+    if added_ids:
+        still_inside = set(await db.visitor_entries.distinct("id", {"id": {"$in": added_ids}, "status": "inside"}))
+        gone = [entry_id for entry_id in added_ids if entry_id not in still_inside]
+        if gone:
+            await db.visitor_occupancy.delete_many({"_id": {"$in": gone}})
+            stats["added"] -= len(gone)
+
+    # Stale: occupancy documents whose entry is no longer inside
+    stale_ids = [
+        entry_id for entry_id, doc in occupied.items()
+        if entry_id not in inside_ids and (doc.get("created_at") is None or _as_utc(doc["created_at"]) < grace_cutoff)
+    ]
+    if stale_ids:
+        result = await db.visitor_occupancy.delete_many({"_id": {"$in": stale_ids}})
+        stats["removed"] = result.deleted_count
+
+    global _last_reconcile
+    _last_reconcile = {
+        **stats,
+        "at": started.isoformat(),
+        "duration_ms": round((datetime.now(timezone.utc) - started).total_seconds() * 1000, 1),
+    }
+    if stats["added"] or stats["removed"]:
+        logger.warning(f"[OCCUPANCY] Reconciled drift: {stats}")
+    else:
+        logger.info(f"[OCCUPANCY] Reconciled, no drift ({stats['inside']} inside)")
+    return stats
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def _reconciler_loop():
+    logger.info("[OCCUPANCY] Reconciler started")
+    while True:
+        try:
+            await reconcile_occupancy()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[OCCUPANCY] Reconciliation error: {e}")
+        await asyncio.sleep(VISITOR_OCCUPANCY_RECONCILE_SECONDS)
+
+
+def start_occupancy_reconciler():
+    """Start periodic reconciliation in the running event loop (app startup). The first run backfills."""
+    global _reconciler_task
+    if _reconciler_task is not None and not _reconciler_task.done():
+        return
+    _reconciler_task = asyncio.create_task(_reconciler_loop())
+
+
+async def stop_occupancy_reconciler():
+    """Cancel the reconciler (app shutdown)."""
+    global _reconciler_task
+    if _reconciler_task is None:
+        return
+    _reconciler_task.cancel()
+    try:
+        await _reconciler_task
+    except asyncio.CancelledError:
+        pass
+    _reconciler_task = None
+    logger.info("[OCCUPANCY] Reconciler stopped")
+
+
+def get_occupancy_stats() -> dict:
+    """Result of the last reconciliation in this process."""
+    return {"reconcile_interval_seconds": VISITOR_OCCUPANCY_RECONCILE_SECONDS, "last_reconcile": _last_reconcile}
@@ -0,0 +1,11 @@
+"""
+Shared pytest setup: makes the backend package (core, services, ...)
+importable from tests that check code directly instead of over HTTP.
+"""
+
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
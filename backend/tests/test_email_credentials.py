@@ -439,8 +439,9 @@ class TestEmailCredentialsFeature:
         # With send_credentials_email=true, response should include email_status
         assert "email_status" in data, "email_status should be in response"
         
-        # With placeholder API key, status should be 'skipped'
-        assert data.get("email_status") in ["success", "skipped", "failed"], \
+        # With placeholder API key, status should be 'skipped'; with Resend
+        # configured the email is 'queued' (delivery is recorded on the user later)
+        assert data.get("email_status") in ["queued", "skipped", "failed"], \
             f"Unexpected email_status: {data.get('email_status')}"
         
         print(f"✓ Email status included in response: {data.get('email_status')}")
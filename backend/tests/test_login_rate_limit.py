@@ -0,0 +1,71 @@
+"""
+Login Rate Limiter Tests - GENTURIX
+Tests the sliding-window login limiter (core/rate_limit.py):
+1. More than 5 login attempts per minute for the same email+IP get 429
+2. Other identifiers are not affected
+3. Limiter counters are exposed in /api/super-admin/cache-stats
+"""
+
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+SUPER_ADMIN_EMAIL = "superadmin@genturix.com"
+SUPER_ADMIN_PASSWORD = "SuperAdmin123!"
+MAX_ATTEMPTS_PER_MINUTE = 5
+
+
+def _attempt(email):
+    return requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": email, "password": "WrongPass123!"},
+        headers={"Content-Type": "application/json"}
+    )
+
+
+class TestLoginRateLimit:
+    """Sliding-window login limiter"""
+
+    def test_blocks_after_max_attempts(self):
+        """6th attempt within the window is rejected with 429"""
+        email = f"ratelimit_{uuid.uuid4().hex[:8]}@test.com"
+        statuses = [_attempt(email).status_code for _ in range(MAX_ATTEMPTS_PER_MINUTE + 1)]
+
+        assert 429 not in statuses[:MAX_ATTEMPTS_PER_MINUTE], f"Blocked too early: {statuses}"
+        assert statuses[-1] == 429, f"Expected 429 on attempt {MAX_ATTEMPTS_PER_MINUTE + 1}, got {statuses}"
+        print(f"✅ PASS: login limited after {MAX_ATTEMPTS_PER_MINUTE} attempts ({statuses})")
+
+    def test_other_identifiers_not_affected(self):
+        """A blocked email does not block a different email"""
+        blocked = f"ratelimit_{uuid.uuid4().hex[:8]}@test.com"
+        for _ in range(MAX_ATTEMPTS_PER_MINUTE + 1):
+            _attempt(blocked)
+
+        other = f"ratelimit_{uuid.uuid4().hex[:8]}@test.com"
+        response = _attempt(other)
+        assert response.status_code != 429, "Unrelated identifier should not be rate limited"
+        print("✅ PASS: limiter is keyed per email+IP")
+
+    def test_limiter_stats_exposed(self):
+        """GET /api/super-admin/cache-stats includes login limiter counters"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": SUPER_ADMIN_EMAIL, "password": SUPER_ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip(f"SuperAdmin login failed: {response.text}")
+        token = response.json()["access_token"]
+
+        response = requests.get(
+            f"{BASE_URL}/api/super-admin/cache-stats",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200
+        limiter = response.json()["login_rate_limiter"]
+        for key in ["max_attempts", "allowed", "rejected", "backend_errors", "backend"]:
+            assert key in limiter, f"Missing '{key}' in login limiter stats"
+        assert limiter["backend"]["backend"] in ["memory", "mongo"]
+        print(f"✅ PASS: login limiter stats = {limiter}")
@@ -14,6 +14,8 @@ import requests
 import os
 from datetime import datetime, timedelta
 
+from services import search_keys
+
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
 
 # Test credentials
@@ -351,5 +353,46 @@ class TestVisitHistoryUnauthorized:
         print(f"✓ Unauthenticated export request returns {response.status_code}")
 
 
+class TestVisitorSearchKeys:
+    """Normalized search keys behind the visit history search (services/search_keys.py)"""
+    
+    def test_keys_are_accent_folded_prefixes(self):
+        """Name, ID and plate prefixes match regardless of case, accents and dashes"""
+        entry = {"visitor_name": "María Pérez", "identification_number": "1-2345-6789", "vehicle_plate": "ABC-123"}
+        keys = set(search_keys.entry_search_keys(entry))
+        for query in ["maria", "PÉR", "mar per", "abc", "abc123", "ABC-12", "12345", "123456789"]:
+            terms = search_keys.search_filter(query)["search_keys"]["$all"]
+            assert set(terms) <= keys, f"'{query}' should match {entry}"
+        assert not {"aria", "erez"} & keys, "Only prefixes are indexed, not substrings"
+        assert search_keys.search_filter("  - ") is None
+        print("✓ Search keys match normalized prefixes")
+    
+    def test_ranking_prefers_exact_identifier(self):
+        """Exact plate beats plate prefix beats a name word prefix"""
+        docs = [
+            {"id": "name", "visitor_name": "Abc Servicios", "vehicle_plate": "XYZ-999"},
+            {"id": "prefix", "visitor_name": "Luis Mora", "vehicle_plate": "ABC-1234"},
+            {"id": "exact", "visitor_name": "Ana Solís", "vehicle_plate": "ABC-123"},
+            {"id": "none", "visitor_name": "Carlos Vargas", "vehicle_plate": "DEF-456"},
+        ]
+        ranked = search_keys.rank_search_results(docs, "abc123", *search_keys.ENTRY_SEARCH_FIELDS)
+        assert [d["id"] for d in ranked] == ["exact", "prefix"]
+        ranked = search_keys.rank_search_results(docs, "abc", *search_keys.ENTRY_SEARCH_FIELDS)
+        assert [d["id"] for d in ranked][2:] == ["name"], "Plate prefixes rank above a name prefix"
+        print("✓ Search results ranked by match quality")
+
+    def test_fallback_matches_documents_without_keys(self):
+        """While the backfill runs, documents without search_keys match by field regex"""
+        fields = search_keys.ENTRY_SEARCH_FIELDS[0] + search_keys.ENTRY_SEARCH_FIELDS[1]
+        query = search_keys.search_filter(" ABC-1.2 ", fields)
+        keyed, legacy = query["$or"]
+        assert keyed == search_keys.search_filter("ABC-1.2")
+        assert legacy["search_keys"] == {"$exists": False}
+        assert {next(iter(c)) for c in legacy["$or"]} == set(fields)
+        assert legacy["$or"][0]["visitor_name"] == {"$regex": r"ABC\-1\.2", "$options": "i"}
+        assert search_keys.search_filter(" ", fields) is None
+        print("✓ Fallback field match for documents without search keys")
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "-s"])
@@ -0,0 +1,120 @@
+"""
+Principal Cache Tests - GENTURIX
+Tests the in-process principal cache used by get_current_user:
+1. GET /api/super-admin/cache-stats exposes hit/miss counters (SuperAdmin only)
+2. Repeated authenticated requests are served from the cache
+3. Password change invalidates the cached principal (old tokens rejected immediately)
+"""
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+SUPER_ADMIN_EMAIL = "superadmin@genturix.com"
+SUPER_ADMIN_PASSWORD = "SuperAdmin123!"
+RESIDENT_EMAIL = "residente@genturix.com"
+RESIDENT_PASSWORD = "Resi123!"
+
+
+def _login(email, password):
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": email, "password": password},
+        headers={"Content-Type": "application/json"}
+    )
+    if response.status_code != 200:
+        pytest.skip(f"Authentication failed for {email}: {response.text}")
+    return response.json().get("access_token")
+
+
+class TestPrincipalCacheStats:
+    """Cache counters endpoint"""
+
+    @pytest.fixture
+    def superadmin_token(self):
+        return _login(SUPER_ADMIN_EMAIL, SUPER_ADMIN_PASSWORD)
+
+    @pytest.fixture
+    def resident_token(self):
+        return _login(RESIDENT_EMAIL, RESIDENT_PASSWORD)
+
+    def test_cache_stats_structure(self, superadmin_token):
+        """GET /api/super-admin/cache-stats returns principal cache counters"""
+        response = requests.get(
+            f"{BASE_URL}/api/super-admin/cache-stats",
+            headers={"Authorization": f"Bearer {superadmin_token}"}
+        )
+        assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
+        data = response.json()
+        principal = data["caches"]["principal"]
+        for key in ["size", "maxsize", "ttl_seconds", "hits", "misses", "hit_ratio", "evictions", "invalidations"]:
+            assert key in principal, f"Missing '{key}' in principal cache stats"
+        print(f"✅ PASS: principal cache stats = {principal}")
+        assert "billing_state" in data["caches"], "Missing billing_state cache stats"
+        print(f"✅ PASS: billing state cache stats = {data['caches']['billing_state']}")
+
+    def test_cache_stats_requires_superadmin(self, resident_token):
+        """Residents cannot read cache stats"""
+        response = requests.get(
+            f"{BASE_URL}/api/super-admin/cache-stats",
+            headers={"Authorization": f"Bearer {resident_token}"}
+        )
+        assert response.status_code == 403, f"Expected 403, got {response.status_code}"
+        print("✅ PASS: cache stats restricted to SuperAdmin")
+
+    def test_repeated_requests_hit_cache(self, superadmin_token):
+        """Repeated GET /api/auth/me calls increase the hit counter"""
+        headers = {"Authorization": f"Bearer {superadmin_token}"}
+        before = requests.get(f"{BASE_URL}/api/super-admin/cache-stats", headers=headers).json()
+        for _ in range(5):
+            assert requests.get(f"{BASE_URL}/api/auth/me", headers=headers).status_code == 200
+        after = requests.get(f"{BASE_URL}/api/super-admin/cache-stats", headers=headers).json()
+
+        # Multiple workers may split the traffic - only check when we hit the same process
+        if before.get("pid") != after.get("pid"):
+            pytest.skip("Requests served by different worker processes")
+        assert after["caches"]["principal"]["hits"] >= before["caches"]["principal"]["hits"] + 5
+        print("✅ PASS: principal served from cache on repeated requests")
+
+
+class TestPrincipalCacheInvalidation:
+    """Password change must not be masked by the cache"""
+
+    def test_old_token_rejected_after_password_change(self):
+        token = _login(RESIDENT_EMAIL, RESIDENT_PASSWORD)
+        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+
+        # Warm the cache
+        assert requests.get(f"{BASE_URL}/api/auth/me", headers=headers).status_code == 200
+
+        new_password = "CacheTest1!"
+        response = requests.post(
+            f"{BASE_URL}/api/auth/change-password",
+            json={
+                "current_password": RESIDENT_PASSWORD,
+                "new_password": new_password,
+                "confirm_password": new_password
+            },
+            headers=headers
+        )
+        if response.status_code != 200:
+            pytest.skip(f"Password change failed: {response.text}")
+
+        try:
+            response = requests.get(f"{BASE_URL}/api/auth/me", headers=headers)
+            assert response.status_code == 401, f"Old token should be rejected, got {response.status_code}"
+            print("✅ PASS: cached principal invalidated on password change")
+        finally:
+            # Restore original password
+            restore_token = _login(RESIDENT_EMAIL, new_password)
+            requests.post(
+                f"{BASE_URL}/api/auth/change-password",
+                json={
+                    "current_password": new_password,
+                    "new_password": RESIDENT_PASSWORD,
+                    "confirm_password": RESIDENT_PASSWORD
+                },
+                headers={"Authorization": f"Bearer {restore_token}", "Content-Type": "application/json"}
+            )
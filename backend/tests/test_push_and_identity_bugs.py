@@ -202,7 +202,20 @@ class TestPushValidateSubscriptions:
         assert "deleted" in data, "Response should include deleted count"
         assert "errors_detail" in data, "Response should include errors_detail"
         
+        assert "job_id" in data, "Response should include the background job id"
+        
+        status_response = requests.get(
+            f"{BASE_URL}/api/push/validate-subscriptions/status?job_id={data['job_id']}",
+            headers=auth_headers(token)
+        )
+        assert status_response.status_code == 200, f"Expected 200, got {status_response.status_code}: {status_response.text}"
+        job = status_response.json()
+        assert job["status"] in ["running", "completed", "failed"]
+        for key in ["scanned", "valid", "invalid", "deleted", "batches", "checkpoint"]:
+            assert key in job, f"Job status should include {key}"
+        
         print(f"PASS: Actual validation - Total: {data['total']}, Valid: {data['valid']}, Invalid: {data['invalid']}, Deleted: {data['deleted']}")
+        print(f"PASS: Validation job {job['id'][:8]} - status: {job['status']}, scanned: {job['scanned']}")
 
 
 class TestPushValidateUserSubscription:
@@ -16,6 +16,8 @@ RESIDENT_EMAIL = "residente@genturix.com"
 RESIDENT_PASSWORD = "Residente123!"
 ADMIN_EMAIL = "admin@genturix.com"
 ADMIN_PASSWORD = "Admin123!"
+SUPER_ADMIN_EMAIL = "superadmin@genturix.com"
+SUPER_ADMIN_PASSWORD = "SuperAdmin123!"
 
 
 class TestPushNotificationAPIs:
@@ -230,6 +232,37 @@ class TestPushNotificationAPIs:
         # Cleanup - unsubscribe
         self.session.delete(f"{BASE_URL}/api/push/unsubscribe", json=subscription)
     
+    def test_push_test_reports_per_recipient_timing(self):
+        """POST /api/push/test - Fan-out result includes per-recipient timing"""
+        login_result = self.login(GUARD_EMAIL, GUARD_PASSWORD)
+        assert login_result is not None, "Guard login failed"
+        
+        subscription = {
+            "subscription": {
+                "endpoint": f"https://fcm.googleapis.com/fcm/send/test-fanout-{uuid.uuid4()}",
+                "keys": {
+                    "p256dh": "BNcRdreALRFXTkOOUHK1EtK2wtaz5Ry4YfYCA_0QTpQtUbVlUls0VJXg7A8u-Ts1XbjhazAkj7I99e8QcYP7DkM",
+                    "auth": "tBHItJI5svbpez7KI4CCXg"
+                }
+            }
+        }
+        sub_response = self.session.post(f"{BASE_URL}/api/push/subscribe", json=subscription)
+        assert sub_response.status_code in [200, 201]
+        
+        response = self.session.post(f"{BASE_URL}/api/push/test")
+        assert response.status_code == 200, f"Push test failed: {response.status_code} - {response.text}"
+        data = response.json()
+        assert isinstance(data["elapsed_ms"], (int, float))
+        assert len(data["recipients"]) == 1
+        recipient = data["recipients"][0]
+        assert recipient["user_id"] == login_result["user"]["id"]
+        assert recipient["subscriptions"] >= 1
+        assert recipient["sent"] + recipient["failed"] == recipient["subscriptions"]
+        print(f"✅ PASS: fan-out recipient timing = {recipient}")
+        
+        # Cleanup - unsubscribe
+        self.session.delete(f"{BASE_URL}/api/push/unsubscribe", json=subscription)
+    
     # ==================== PANIC TRIGGER WITH PUSH ====================
     def test_panic_trigger_includes_push_notifications(self):
         """POST /api/security/panic - Response includes push_notifications field"""
@@ -263,6 +296,37 @@ class TestPushNotificationAPIs:
         assert isinstance(push_result["sent"], int)
         assert isinstance(push_result["failed"], int)
         assert isinstance(push_result["total"], int)
+
+        # Push runs after the response (fast path); delivery state via /push/status
+        assert push_result.get("status") == "dispatching"
+        assert isinstance(data["notified_guards"], int)
+
+    def test_push_status_panic_delivery_state(self):
+        """GET /api/push/status?source_id=<event_id> - Guard sees outbox delivery state for a panic"""
+        login_result = self.login(RESIDENT_EMAIL, RESIDENT_PASSWORD)
+        assert login_result is not None, "Resident login failed"
+        
+        panic_response = self.session.post(f"{BASE_URL}/api/security/panic", json={
+            "panic_type": "emergencia_general",
+            "location": "Test Location - Outbox Test",
+            "description": "Test panic for push delivery state"
+        })
+        assert panic_response.status_code == 200, f"Panic trigger failed: {panic_response.text}"
+        event_id = panic_response.json()["event_id"]
+        
+        self.session.headers.pop("Authorization", None)
+        login_result = self.login(GUARD_EMAIL, GUARD_PASSWORD)
+        assert login_result is not None, "Guard login failed"
+        
+        response = self.session.get(f"{BASE_URL}/api/push/status", params={"source_id": event_id})
+        assert response.status_code == 200, f"Status check failed: {response.status_code} - {response.text}"
+        data = response.json()
+        assert isinstance(data["deliveries"], list)
+        assert isinstance(data["delivery_summary"], dict)
+        for delivery in data["deliveries"]:
+            assert delivery["source_id"] == event_id
+            assert delivery["state"] in ["delivered", "retrying", "superseded", "gone", "cancelled", "failed"]
+        print(f"✅ PASS: panic {event_id[:8]} delivery summary = {data['delivery_summary']}")
     
     # ==================== MULTI-TENANT FILTERING ====================
     def test_subscriptions_filtered_by_condominium(self):
@@ -370,5 +434,82 @@ class TestPushNotificationEdgeCases:
         assert response.status_code == 422, f"Expected 422 for invalid payload, got {response.status_code}"
 
 
+
+class TestPushSubscriptionDirectory:
+    """In-memory subscription directory used for role-targeted fan-out"""
+    
+    def test_directory_stats_exposed(self):
+        """GET /api/super-admin/cache-stats includes the push subscription directory"""
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": SUPER_ADMIN_EMAIL,
+            "password": SUPER_ADMIN_PASSWORD
+        })
+        if response.status_code != 200:
+            pytest.skip(f"SuperAdmin login failed: {response.text}")
+        token = response.json()["access_token"]
+        
+        response = requests.get(
+            f"{BASE_URL}/api/super-admin/cache-stats",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200
+        directory = response.json()["push_directory"]
+        for key in ["loaded", "users", "subscriptions", "condominiums", "lookups", "fallbacks", "reloads"]:
+            assert key in directory, f"Missing '{key}' in push directory stats"
+        assert directory["loaded"] is True, "Directory should be warm-loaded at startup"
+        print(f"✅ PASS: push directory stats = {directory}")
+
+
+class TestPushDeliveryMetrics:
+    """Push delivery telemetry (per push service host and notification type)"""
+    
+    def test_push_metrics_structure(self):
+        """GET /api/push/metrics returns per-host series and panic end-to-end histograms"""
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": SUPER_ADMIN_EMAIL,
+            "password": SUPER_ADMIN_PASSWORD
+        })
+        if response.status_code != 200:
+            pytest.skip(f"SuperAdmin login failed: {response.text}")
+        token = response.json()["access_token"]
+        
+        response = requests.get(f"{BASE_URL}/api/push/metrics", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
+        data = response.json()
+        assert isinstance(data["series"], list)
+        for stage in ["first_delivered", "all_delivered", "retry_delivered"]:
+            assert stage in data["panic_end_to_end"], f"Missing panic stage '{stage}'"
+        for series in data["series"]:
+            for key in ["host", "notification_type", "latency", "status"]:
+                assert key in series
+        print(f"✅ PASS: push metrics has {len(data['series'])} series")
+    
+    def test_push_metrics_requires_superadmin(self):
+        """GET /api/push/metrics - Guard gets 403"""
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": GUARD_EMAIL,
+            "password": GUARD_PASSWORD
+        })
+        assert response.status_code == 200, "Guard login failed"
+        token = response.json()["access_token"]
+        
+        response = requests.get(f"{BASE_URL}/api/push/metrics", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 403, f"Expected 403, got {response.status_code}"
+    
+    def test_push_debug_includes_metrics_summary(self):
+        """GET /api/push/debug includes the per-host delivery summary"""
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": GUARD_EMAIL,
+            "password": GUARD_PASSWORD
+        })
+        assert response.status_code == 200, "Guard login failed"
+        token = response.json()["access_token"]
+        
+        response = requests.get(f"{BASE_URL}/api/push/debug", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        summary = response.json()["delivery_metrics"]
+        assert isinstance(summary["hosts"], list)
+        assert "panic_first_delivered_p95_ms" in summary
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
@@ -14,6 +14,8 @@ import pytest
 import requests
 import os
 
+from services import email_outbox, email_service, email_templates
+
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
 
 
@@ -141,6 +143,37 @@ class TestEmailServiceEndpoints:
         
         print(f"✓ Email service status: configured={data['configured']}, sender={data['sender']}")
 
+    # ==================== EMAIL OUTBOX STATS ENDPOINT ====================
+
+    def test_email_outbox_stats_requires_superadmin(self):
+        """Test that /api/super-admin/email-outbox requires authentication"""
+        response = self.session.get(f"{BASE_URL}/api/super-admin/email-outbox")
+        assert response.status_code in [401, 403], \
+            f"Should require authentication, got {response.status_code}"
+
+        print("✓ Email outbox stats endpoint requires authentication")
+
+    def test_email_outbox_stats_returns_metrics(self):
+        """GET /api/super-admin/email-outbox returns per-type metrics and backlog"""
+        token = self.get_superadmin_token()
+
+        response = self.session.get(
+            f"{BASE_URL}/api/super-admin/email-outbox",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+
+        assert response.status_code == 200, \
+            f"Email outbox stats failed: {response.text}"
+
+        data = response.json()
+        assert "pid" in data
+        assert "by_type" in data["metrics"], "Metrics should be grouped by email type"
+        assert isinstance(data["backlog"], list), "Backlog should be a list"
+        for row in data["backlog"]:
+            assert row["state"] in ["pending", "sent", "failed"], f"Unexpected state: {row['state']}"
+
+        print(f"✓ Email outbox: {len(data['metrics']['by_type'])} types, {len(data['backlog'])} backlog rows")
+
 
 class TestEmailServiceIntegration:
     """Tests for email service integration in various flows"""
@@ -487,5 +520,182 @@ class TestEmailServiceLogging:
             print(f"✓ Email not sent (sandbox limitation): {data.get('error')}")
 
 
+class TestBulkEmailBatchSending:
+    """send_bulk_emails against the local Resend stand-in (scripts/fake_resend_service.py)"""
+    
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        """Start the stand-in and point the Resend SDK at it"""
+        import importlib.util
+        from pathlib import Path
+        
+        backend_dir = Path(__file__).parent.parent
+        spec = importlib.util.spec_from_file_location(
+            "genturix_fake_resend_service", backend_dir / "scripts" / "fake_resend_service.py"
+        )
+        fake_resend_service = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(fake_resend_service)
+        
+        import resend
+        
+        self.fake = fake_resend_service.FakeResendServer(
+            fake_resend_service.FakeResendConfig(latency_ms=10, rate_limit=0)
+        ).start()
+        monkeypatch.setattr(resend, "api_url", self.fake.base_url)
+        monkeypatch.setattr(resend, "api_key", "re_test_key")
+        monkeypatch.setattr(email_service, "RESEND_API_KEY", "re_test_key")
+        monkeypatch.setattr(email_service, "RESEND_REQUESTS_PER_SECOND", 0)
+        yield
+        self.fake.stop()
+    
+    def send_bulk(self, recipients, **kwargs):
+        import asyncio
+        return asyncio.run(email_service.send_bulk_emails(
+            recipients, "Aviso del condominio", "<p>Hola {name}</p>", personalize=True, **kwargs
+        ))
+    
+    def test_bulk_uses_batch_endpoint_in_chunks(self):
+        """250 recipients -> 3 batch requests, per-recipient ids in recipient order"""
+        recipients = [{"email": f"resident{i}@example.com", "name": f"Residente {i}"} for i in range(250)]
+        result = self.send_bulk(recipients)
+        
+        assert result["sent"] == 250 and result["failed"] == 0
+        assert result["batches"] == 3 and result["fallbacks"] == 0
+        assert [d["recipient"] for d in result["details"]] == [r["email"] for r in recipients]
+        assert all(d["email_id"] for d in result["details"])
+        stats = self.fake.service.stats
+        assert stats.get("requests:emails/batch") == 3
+        assert "requests:emails" not in stats
+        print(f"✓ 250 emails sent in {result['batches']} batch requests ({result['elapsed_ms']}ms)")
+    
+    def test_rejected_batch_falls_back_to_single_sends(self):
+        """One invalid address fails the batch; the chunk is re-sent individually"""
+        recipients = [{"email": f"resident{i}@example.com", "name": f"Residente {i}"} for i in range(10)]
+        recipients[3]["email"] = "broken@invalid.test"
+        result = self.send_bulk(recipients)
+        
+        assert result["sent"] == 9 and result["failed"] == 1
+        assert result["fallbacks"] == 1
+        failed = [d for d in result["details"] if not d["success"]]
+        assert failed[0]["recipient"] == "broken@invalid.test"
+        assert self.fake.service.stats.get("requests:emails") == 10
+        print("✓ Invalid recipient isolated by single-send fallback")
+    
+    def test_failed_batch_is_not_resent(self, monkeypatch):
+        """429 after retries run out fails the chunk's recipients without single re-sends"""
+        monkeypatch.setattr(email_service, "RESEND_BATCH_SIZE", 5)
+        monkeypatch.setattr(email_service, "RESEND_MAX_RETRIES", 0)
+        self.fake.service.config.rate_limit = 1
+        recipients = [{"email": f"resident{i}@example.com", "name": f"Residente {i}"} for i in range(10)]
+        result = self.send_bulk(recipients)
+        
+        assert result["sent"] == 5 and result["failed"] == 5
+        assert result["failed_batches"] == 1 and result["fallbacks"] == 0
+        failed = [d for d in result["details"] if not d["success"]]
+        assert all(d["retryable"] for d in failed)
+        assert "requests:emails" not in self.fake.service.stats
+        print("✓ Failed batch reported per recipient, not re-sent individually")
+    
+    def test_rate_limited_requests_are_retried(self):
+        """429 from the provider is retried with backoff instead of failing recipients"""
+        self.fake.service.config.rate_limit = 1
+        recipients = [{"email": f"resident{i}@example.com", "name": f"Residente {i}"} for i in range(3)]
+        result = self.send_bulk(recipients, use_batch=False)
+        
+        assert result["sent"] == 3 and result["failed"] == 0
+        assert self.fake.service.stats.get("429", 0) >= 1
+        print(f"✓ Rate limited requests retried: {self.fake.service.stats.get('429')} x 429")
+
+
+
+class TestEmailOutboxFinalState:
+    """Final-state hooks of the email outbox (credentials delivery outcome)"""
+    
+    class FakeCollection:
+        def __init__(self, modified_count):
+            self.modified_count = modified_count
+            self.updates = []
+        
+        async def update_one(self, query, operation):
+            self.updates.append((query, operation))
+            return type("UpdateResult", (), {"modified_count": self.modified_count})()
+    
+    def deliver(self, monkeypatch, send_result, modified_count=1):
+        import asyncio
+        from datetime import datetime, timezone
+        
+        calls = []
+        
+        async def hook(message, state, error):
+            calls.append((message["context"], state, error))
+        
+        async def fake_send_email(**kwargs):
+            return send_result
+        
+        collection = self.FakeCollection(modified_count)
+        monkeypatch.setattr(email_outbox, "db", type("FakeDb", (), {"email_outbox": collection})())
+        monkeypatch.setattr(email_outbox, "send_email", fake_send_email)
+        monkeypatch.setitem(email_outbox._final_state_hooks, "credentials_test", hook)
+        now = datetime.now(timezone.utc)
+        doc = email_outbox._new_message(
+            "new.user@example.com", "Credenciales", "<p>x</p>", "credentials_test", None, None, "condo-1", now,
+            context={"user_id": "user-1", "actor_id": "admin-1"}
+        )
+        state = asyncio.run(email_outbox._deliver(doc, asyncio.Semaphore(1)))
+        return state, calls
+    
+    def test_permanent_failure_reported_to_hook(self, monkeypatch):
+        """A rejected credentials email reaches the hook as failed, with the error"""
+        state, calls = self.deliver(monkeypatch, {"success": False, "error": "422 invalid to", "retryable": False})
+        assert state == "failed"
+        assert calls == [({"user_id": "user-1", "actor_id": "admin-1"}, "failed", "422 invalid to")]
+        print("✓ Failed credentials email reported to the final-state hook")
+    
+    def test_sent_reported_once(self, monkeypatch):
+        """Sent messages reach the hook; a delivery that lost the race to finalize does not"""
+        state, calls = self.deliver(monkeypatch, {"success": True, "email_id": "re_1"})
+        assert state == "sent" and [c[1] for c in calls] == ["sent"]
+        _, calls = self.deliver(monkeypatch, {"success": True, "email_id": "re_1"}, modified_count=0)
+        assert calls == []
+        print("✓ Sent credentials email reported exactly once")
+    
+    def test_retryable_failure_is_not_final(self, monkeypatch):
+        """Transient failures stay pending and do not call the hook"""
+        state, calls = self.deliver(monkeypatch, {"success": False, "error": "503", "retryable": True})
+        assert state == "pending" and calls == []
+        print("✓ Retryable failure kept pending")
+
+
+class TestEmailTemplateRegistry:
+    """Compiled email templates (services/email_templates.py)"""
+    
+    def test_values_are_html_escaped(self):
+        """Names and URLs are escaped; raw fields (the action button) are not"""
+        html = email_service.get_notification_email_html(
+            title="<script>alert(1)</script>",
+            message="Torre A & B",
+            action_url="https://app.genturix.com/?a=1&b=2"
+        )
+        assert "<script>" not in html
+        assert "&lt;script&gt;alert(1)&lt;/script&gt;" in html
+        assert "Torre A &amp; B" in html
+        assert 'href="https://app.genturix.com/?a=1&amp;b=2"' in html
+        assert "<a href=" in html, "Action button HTML must not be escaped"
+        print("✓ Template values escaped, raw fields kept")
+    
+    def test_compiled_template_matches_format(self):
+        """Same output as str.format for plain values; other braces stay literal"""
+        source = "<style>p { color: red; }</style><p>Hola {name}, {condo}</p>"
+        template = email_templates.CompiledTemplate(source, fields=("name", "condo"))
+        assert template.fields == ("name", "condo")
+        assert template.render(name="Ana", condo="Los Álamos") == \
+            "<style>p { color: red; }</style><p>Hola Ana, Los Álamos</p>"
+        subject = email_templates.CompiledTemplate("Pago - {condo_name}", autoescape=False)
+        assert subject.render(condo_name="A & B") == "Pago - A & B"
+        with pytest.raises(KeyError):
+            template.render(name="Ana")
+        print("✓ Compiled template output matches")
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
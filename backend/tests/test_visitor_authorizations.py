@@ -12,6 +12,8 @@ import requests
 import os
 from datetime import datetime, timedelta
 
+from services import authorization_validity
+
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
 
 # Test credentials
@@ -554,5 +556,42 @@ class TestVisitorAuthorizationSystem:
         print(f"✓ Cleaned up {cleaned} test authorizations")
 
 
+class TestAuthorizationValidityEngine:
+    """Validity rules evaluated against one per-request clock (services/authorization_validity.py)"""
+    
+    def test_rules_against_fixed_clock(self):
+        """Each authorization type is checked against the same clock"""
+        from datetime import timezone
+        # Wednesday 2026-10-14 09:30 in Costa Rica (UTC-6)
+        clock = authorization_validity.validity_clock("America/Costa_Rica", datetime(2026, 10, 14, 15, 30, tzinfo=timezone.utc))
+        assert clock == ("2026-10-14", "09:30", "Miércoles")
+        
+        authorizations = [
+            {"authorization_type": "permanent"},
+            {"authorization_type": "permanent", "is_active": False},
+            {"authorization_type": "temporary", "valid_from": "2026-10-15", "valid_to": "2026-10-15"},
+            {"authorization_type": "temporary", "valid_from": "2026-10-10", "valid_to": "2026-10-13"},
+            {"authorization_type": "recurring", "allowed_days": ["Lunes", "Viernes"]},
+            {"authorization_type": "recurring", "allowed_days": ["Miércoles"]},
+            {"authorization_type": "extended", "valid_from": "2026-10-14", "valid_to": "2026-10-20", "allowed_hours_from": "10:00"},
+            {"authorization_type": "extended", "valid_from": "2026-10-14", "valid_to": "2026-10-20", "allowed_hours_to": "09:00"},
+            {"authorization_type": "extended", "valid_from": "2026-10-14", "allowed_hours_from": "08:00", "allowed_hours_to": "17:00"},
+        ]
+        statuses = [v["status"] for v in authorization_validity.evaluate_authorizations(authorizations, clock=clock)]
+        assert statuses == [
+            "authorized", "revoked", "not_yet_valid", "expired",
+            "not_today", "authorized", "too_early", "too_late", "authorized",
+        ]
+        print("✓ Validity rules evaluated in one pass")
+    
+    def test_invalid_timezone_falls_back_to_utc(self):
+        """Unknown timezone names use UTC (and the zone lookup is cached)"""
+        from datetime import timezone
+        now = datetime(2026, 10, 14, 15, 30, tzinfo=timezone.utc)
+        assert authorization_validity.validity_clock("Not/AZone", now) == authorization_validity.validity_clock(None, now)
+        assert authorization_validity.get_zone("America/Costa_Rica") is authorization_validity.get_zone("America/Costa_Rica")
+        print("✓ Invalid timezone falls back to UTC")
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])